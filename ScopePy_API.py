@@ -51,6 +51,7 @@ import sys
 import imp
 import logging
 import socket
+import time
 import datetime
 import configparser
 import pickle
@@ -65,8 +66,10 @@ import numpy as np
 # ScopePy modules
 import ScopePy_preferences as prefs
 import ScopePy_network as nw
+import ScopePy_telemetry as telemetry
 import ScopePy_panels as panels
 import ScopePy_channel as ch
+import ScopePy_channel_storage as storage
 import ScopePy_utilities as ut
 import ScopePy_widgets as wid
 import data_sources.data_source_base_library as DS
@@ -129,6 +132,9 @@ defaultColours = ch.channelColours()
 # Length of data before making markers into dots
 LONG_DATA = 50
 
+# Minimum time between channel selector updates when data is arriving
+CHANNEL_SIGNAL_INTERVAL_MS = 100
+
 # Supported file formats
 # ==========================
 FILE_FORMATS = ['*.csv','*.xlsx','*.ods','*.spc']
@@ -273,6 +279,15 @@ class API(QObject,comms.SignalComms):
        self.dataStore = DataStore(self)
        self.load_data_sources()
        
+       # Channel signals
+       # ===================
+       # When data arrives the channel selector signals are collected and 
+       # sent together, see emitChannelSignals()
+       self._pendingChannelSignals = OrderedDict()
+       self._channelSignalTimer = QTimer(self)
+       self._channelSignalTimer.setSingleShot(True)
+       self.connect(self._channelSignalTimer,SIGNAL("timeout()"),self.emitChannelSignals)
+       
        # Server
        # ===================
        # TODO : anything that needs starting
@@ -931,46 +946,116 @@ class API(QObject,comms.SignalComms):
         
         """
         
-        # Unpack tuple
-        channelName,dataArray = data4scope
+        self.addChannelDataBatch([data4scope])
         
-        self.dataStore.channel_lock.lockForWrite()
         
-        if channelName in self.channel_dict:
-            self.statusBar().showMessage("Receiving data on channel %s ..." % channelName, 1000)
-            
-            # Existing channel, add the data to it
-            self.channel_dict[channelName].addData2Channel(dataArray)
-            
-            logger.debug("Channel [%s] : No. chunks = %d" % (channelName,len(self.channel_dict[channelName].data_list)))
+    def addChannelDataBatch(self,channelDataList,telemetry=None,mergeChunks=False):
+        """
+        Add data for any number of channels in one go
+        
+        The channel dictionary is locked once for the whole batch. The 
+        channel selector is told about the channels later, in one 
+        "channels_updated" signal for everything that has arrived in the
+        meantime, see emitChannelSignals().
+        
+        Inputs
+        --------
+        channelDataList : list of (channelName,recarray) tuples
+            data in the order it arrived, a channel can appear more than
+            once, each array is a chunk
+        telemetry : ScopePy_telemetry.IngestTelemetry or None
+            counters of the server the data came from, the time spent 
+            waiting for the channel lock is added to them
+        mergeChunks : bool
+            If True consecutive arrays for a channel with the same columns
+            are joined into one chunk, see 
+            ScopePy_channel_storage.mergeConsecutive(). Otherwise each 
+            array is a chunk.
             
-        else:
-            self.statusBar().showMessage("Receiving new channel data : %s ..." % channelName, 1000)
+        Outputs
+        --------
+        channelNames : list of str
+            channels that received data, in the order they first appear
+        
+        """
+        
+        # Group the arrays by channel, keeping the order
+        # ------------------------------------------------
+        channelChunks = OrderedDict()
+        
+        for channelName,dataArray in channelDataList:
+            channelChunks.setdefault(channelName,[]).append(dataArray)
             
-            # Create new channel
+        if not channelChunks:
+            return []
             
-            logger.debug("Creating new channel [%s]" % channelName)
+        if mergeChunks:
+            for channelName,chunks in channelChunks.items():
+                channelChunks[channelName] = storage.mergeConsecutive(chunks)
                 
-            # Get colours for the channel from default colour set
-            # -----------------------------------------------------
-            lineStyle = self.getChannelLinestyle(len(dataArray))
+        # Add to channels
+        # ----------------------
+        start = time.perf_counter()
+        self.dataStore.channel_lock.lockForWrite()
+        
+        if telemetry is not None:
+            telemetry.lockWaited(time.perf_counter() - start)
+        
+        try:
+            for channelName,chunks in channelChunks.items():
+                
+                if channelName not in self.channel_dict:
+                    # Create new channel
+                    logger.debug("Creating new channel [%s]" % channelName)
+                    
+                    # Get colours for the channel from default colour set
+                    lineStyle = self.getChannelLinestyle(len(chunks[0]))
+                    
+                    self.channel_dict[channelName] = ch.ScopePyChannel(channelName,lineStyle)
+                    
+                for dataArray in chunks:
+                    self.channel_dict[channelName].addData2Channel(dataArray)
+                    
+                # Add channel to tree, the signal is sent later with any 
+                # others that arrive in the meantime
+                self._pendingChannelSignals[channelName] = True
+                
+        finally:
+            self.dataStore.channel_lock.unlock()
+            
+        channelNames = list(channelChunks.keys())
+        
+        if len(channelNames) == 1:
+            self.statusBar().showMessage("Receiving data on channel %s ..." % channelNames[0], 1000)
+        else:
+            self.statusBar().showMessage("Receiving data on %d channels ..." % len(channelNames), 1000)
             
-            # Create new channel
-            # -----------------------
-            self.channel_dict[channelName] = ch.ScopePyChannel(channelName,lineStyle)                                
-                                
-            self.channel_dict[channelName].addData2Channel(dataArray)
+        if not self._channelSignalTimer.isActive():
+            self._channelSignalTimer.start(CHANNEL_SIGNAL_INTERVAL_MS)
             
+        return channelNames
         
         
-        # Add channel to tree            
-        self.emit(SIGNAL("channel_added"), channelName)
+    def emitChannelSignals(self):
+        """
+        Send the channel selector signals for all channels that have received
+        data since the last time.
         
+        Data can arrive hundreds of times a second, so instead of updating the
+        channel selector for every chunk, addChannelData() records the channel
+        names and this function sends one "channels_updated" signal with the
+        list of all of them. The channel selector updates its tree once for
+        the whole list.
         
-        self.dataStore.channel_lock.unlock()
+        """
         
+        pending = self._pendingChannelSignals
+        self._pendingChannelSignals = OrderedDict()
         
-        self.emit(SIGNAL("update_channel_selector"))
+        if not pending:
+            return
+        
+        self.emit(SIGNAL("channels_updated"), list(pending.keys()))
         
 
 
@@ -2990,10 +3075,69 @@ Get The current panel object.
     #======================================================================
     #%% +++++ Server functions
     #======================================================================
-    def getCmdFromServer(self):
-        # TODO
-        pass
+    def getCmdFromServer(self,socket,command_packet):
+        """
+        Receive a command packet from the TCP server
+        
+        Inputs
+        --------
+        socket : QTcpSocket or None
+            connection the command came in on, None from the asyncio server
+        command_packet : bytes
+            packet without the length or type
+        
+        """
+        
+        logg.debug("Command packet received from server [%d bytes]" % len(command_packet))
+        
+        
+    def udpStatistics(self):
+        """
+        Loss and rate statistics for each source sending UDP datagrams
         
+        Output
+        --------
+        stats : list of dict
+            one per source, see ScopePy_udp.SourceStatistics.summary().
+            Empty if UDP is not being received.
+        
+        """
+        
+        udpServer = getattr(self._gui,'udpServer',None)
+        
+        if udpServer is None:
+            return []
+            
+        return udpServer.statistics()
+
+
+    def ingestTelemetry(self):
+        """
+        Live counters from the servers: connections, packets, bytes,
+        decode time, lock wait time, queue depth and per channel rates
+
+        The TCP server, UDP server and shared memory receiver are added
+        together, the UDP sources and shared memory rings count as 
+        connections.
+
+        Output
+        --------
+        telemetry : dict or None
+            see ScopePy_telemetry.IngestTelemetry.summary(). None if no
+            server is running.
+
+        """
+
+        summaries = []
+
+        for name in ['tcpServer','udpServer','sharedMemoryReceiver']:
+            server = getattr(self._gui,name,None)
+
+            if server is not None:
+                summaries.append(server.telemetry.summary())
+
+        return telemetry.combineSummaries(summaries)
+
     
     #======================================================================
     #%% +++++ Debugging functions
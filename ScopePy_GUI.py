@@ -58,6 +58,7 @@ from PyQt4.QtNetwork import *
 import numpy as np
 
 import ScopePy_network as nw
+import ScopePy_streamlog as streamlog
 import ScopePy_channel as ch
 import ScopePy_panels as panels
 import ScopePy_utilities as util
@@ -688,6 +689,34 @@ class MainWindow(QMainWindow):
         self.API.toolbar_manager.makeToolbars(self)
     
     
+    def makeStreamLog(self):
+        """
+        Log for the packets received by the server, if there is a folder
+        for it in the preferences
+        
+        Output
+        -------
+        writer : ScopePy_streamlog.StreamLogWriter or None
+        
+        """
+        
+        folder = self.API.preferences.streamLogFolder
+        
+        if not folder:
+            return None
+            
+        try:
+            writer = streamlog.StreamLogWriter(streamlog.makeLogFilename(folder))
+            
+        except OSError as error:
+            logger.error("Cannot log received packets in [%s] : %s" % (folder,error))
+            return None
+            
+        logger.debug("Logging received packets to [%s]" % writer.filename)
+        
+        return writer
+        
+        
     def setup_server(self):
         """
         Start the server that receives data from sources on the network
@@ -700,10 +729,17 @@ class MainWindow(QMainWindow):
         # Setup server
         #self.tcpServer = nw.TcpServer()
         
-        # Create threaded server for processing incoming data in the
-        # background. Give it a thread locking variable for writing
-        # to channel dictionary
-        self.tcpServer = nw.ThreadedTcpServer(channel_lock=self.API.dataStore.channel_lock)
+        if self.API.preferences.ingestServer == nw.SERVER_ASYNCIO:
+            # Server that handles all connections on one thread and passes
+            # the data over once per frame
+            self.tcpServer = nw.AsyncTcpServer(frameRate=self.API.preferences.plotFrameRate)
+            
+        else:
+            # Create threaded server for processing incoming data in the
+            # background. Give it a thread locking variable for writing
+            # to channel dictionary
+            self.tcpServer = nw.ThreadedTcpServer(channel_lock=self.API.dataStore.channel_lock,
+                                                  stream_log=self.makeStreamLog())
                                               
         
         
@@ -720,12 +756,35 @@ class MainWindow(QMainWindow):
         
         # Connect server's upload data signal to function in main GUI
         self.connect(self.tcpServer, SIGNAL("UpLoadChannelData"), self.API.addChannelData)
+        self.connect(self.tcpServer, SIGNAL("UpLoadChannelDataBatch"), self.API.addChannelDataBatch)
         
         # Connect channel update to tree mode update
         #self.connect(self, SIGNAL("UpdateChannelTree"),self.updateChannelTreeModel)
         
         # connect server's CommandPacket upload to API
         self.connect(self.tcpServer, SIGNAL("UpLoadCommandPacket"), self.API.getCmdFromServer)
+        
+        # Shared memory from producers on this computer, only looked for
+        # if turned on in the preferences
+        self.sharedMemoryReceiver = None
+        
+        if self.API.preferences.sharedMemory:
+            self.sharedMemoryReceiver = nw.SharedMemoryReceiver(self,frameRate=self.API.preferences.plotFrameRate)
+            self.connect(self.sharedMemoryReceiver, SIGNAL("UpLoadChannelDataBatch"), self.API.addChannelDataBatch)
+            self.sharedMemoryReceiver.start()
+        
+        # UDP datagrams from sources that can't use TCP
+        # Not being able to open the port isn't fatal, TCP still works
+        self.udpServer = None
+        
+        if self.API.preferences.udpPort:
+            udpServer = nw.UdpServer(self,frameRate=self.API.preferences.plotFrameRate)
+            
+            if udpServer.listen(QHostAddress("0.0.0.0"), self.API.preferences.udpPort):
+                self.connect(udpServer, SIGNAL("UpLoadChannelDataBatch"), self.API.addChannelDataBatch)
+                self.udpServer = udpServer
+            else:
+                logger.error("Failed to start UDP server: %s" % udpServer.errorString())
 
     #======================================================================
     #%% +++++ File menu functions ++++++
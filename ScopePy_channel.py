@@ -61,6 +61,10 @@ from PyQt4.QtGui import *
 import ScopePy_graphs as graph
 from ScopePy_widgets import *
 from ScopePy_utilities import import_module_from_file
+import ScopePy_channel_storage as storage
+import ScopePy_math_workers as workers
+import ScopePy_expressions as expressions
+from ScopePy_math_workers import EXECUTION_INLINE, EXECUTION_THREAD, EXECUTION_PROCESS
 
 
 #==============================================================================
@@ -103,11 +107,24 @@ CHUNK_MODE_ROLLOVER = 'rollover'
 
 CHUNK_MODES = [CHUNK_MODE_ALL,CHUNK_MODE_LATEST,CHUNK_MODE_FIRST,CHUNK_MODE_SELECTION,CHUNK_MODE_ROLLOVER]
 
+# Define storage constants
+STORAGE_LIST = 'list'
+STORAGE_RING = 'ring'
+
 # Functions for extracting the x and y columns (first & second) from a numpy
 # structured array
 Xdata = lambda array: array[array.dtype.names[0]]
 Ydata = lambda array: array[array.dtype.names[1]]
 
+
+def isContiguous(chunkList):
+    """
+    Check if a list of chunk numbers is in ascending order with no gaps
+    
+    """
+    
+    return all([(b-a)==1 for a,b in zip(chunkList[:-1],chunkList[1:])])
+
 #======================================================================
 #%% plot linestyle class
 #======================================================================
@@ -172,7 +189,8 @@ class ScopePyChannel(QObject):
     
     """
     
-    
+    # Data is stored in chunks that can be read with getDataFromChannel()
+    hasChunks = True
     
     
     def __init__(self,channelLabel="Unknown",lineStyle=plotLineStyle()):
@@ -220,9 +238,31 @@ class ScopePyChannel(QObject):
         # these will also be known as chunks
         self.data_list = []
         
-        # Number of chunks (= len(self.data_list))
+        # Number of chunks 
+        # (= len(self.data_list) for list storage, for ring storage this is
+        # the total number of chunks received)
         self.chunks = 0
         
+        # Storage mode
+        # By default chunks are kept forever in self.data_list. Rollover 
+        # channels can use a preallocated ring buffer instead, 
+        # see setRolloverStorage()
+        self.storage_mode = STORAGE_LIST
+        self.ring = None
+        self.ring_points_per_chunk = storage.DEFAULT_POINTS_PER_CHUNK
+        
+        # Cache of chunks stacked together, so that plots only copy new
+        # chunks when they update
+        self.concat_cache = storage.ConcatCache()
+        
+        # Statistics (min, max etc) for each chunk, so that limits of chunk
+        # selections can be found without going through the data
+        self.stats = storage.ChunkStatistics()
+        
+        # Min/max index of all the data, for plotting long channels
+        # Only used with list storage, see decimatedData()
+        self.pyramid = storage.MinMaxPyramid()
+        
         # Max number of chunks that can be used
         # Used for Rollover chunk mode
         self.rollover = np.inf
@@ -238,6 +278,16 @@ class ScopePyChannel(QObject):
         # added yet. This is to avoid searching the data list
         self.data_empty = True
         
+        # Data version
+        # Goes up by one every time the data changes, so channels derived 
+        # from this one (MathChannel) can tell if they need to recalculate
+        self.data_version = 0
+        
+        # Reset count
+        # Goes up by one when the existing chunks are thrown away or 
+        # replaced, rather than added to
+        self.reset_count = 0
+        
         # Channel plot items
         # -------------------------------
         # When a channel is plotted in a tab the plotDataItem is 
@@ -283,10 +333,69 @@ class ScopePyChannel(QObject):
             
         """
         
-        return self.data_list == []
+        return self.data_empty
+        
+        
+    def setRolloverStorage(self,rollover,points_per_chunk=None):
+        """
+        Store the channel data in a preallocated ring buffer that only keeps
+        the latest chunks.
+        
+        For channels that run for a long time in rollover mode. Only the last
+        'rollover' chunks are kept, older chunks are thrown away so the memory
+        used stays fixed. Note that the other chunk modes can then only 
+        access the chunks that are still held.
+        
+        Inputs
+        ---------
+        rollover : int
+            Number of chunks to keep, also sets self.rollover
+            
+        points_per_chunk : int
+            Estimate of number of points in each chunk, used to size the
+            buffer. The buffer will grow if the estimate is too low.
+            
+        """
+        
+        self.rollover = int(rollover)
+        
+        if points_per_chunk:
+            self.ring_points_per_chunk = points_per_chunk
+            
+        self.storage_mode = STORAGE_RING
+        
+        # Move any existing data into the ring buffer
+        existing = self.data_list if self.ring is None else self.ring.chunks()
+        
+        self.data_list = []
+        self.ring = None
+        self.concat_cache.invalidate()
+        self.data_version += 1
+        
+        # Ring buffers don't keep all the data so there is no min/max index
+        self.pyramid = None
+        
+        if existing:
+            kept = existing[-self.rollover:]
+            self._makeRing(existing[0].dtype,self.chunks-len(kept))
+            
+            for chunk in kept:
+                self.ring.append(chunk)
+                
+            self.stats.discardBefore(self.ring.first_chunk)
+            
         
         
+    def _makeRing(self,dtype,first_chunk):
+        """
+        Create the ring buffer for the channel
+        
+        """
         
+        self.ring = storage.RingBuffer(dtype,self.rollover,
+                                       points_per_chunk=self.ring_points_per_chunk,
+                                       first_chunk=first_chunk)
+                                       
         
     def clearChannelData(self):
         """
@@ -298,6 +407,22 @@ class ScopePyChannel(QObject):
         self.data_empty = True
         self.chunks = 0
         
+        # Ring buffer is recreated when the next chunk arrives
+        self.ring = None
+        
+        self.concat_cache.invalidate()
+        self.data_version += 1
+        self.reset_count += 1
+        self.stats.clear()
+        
+        if self.pyramid is not None:
+            self.pyramid.clear()
+        
+        self.xMinValue = None
+        self.xMaxValue = None
+        self.yMinValue = None
+        self.yMaxValue = None
+        
         
         
     def addData2Channel(self,recArray,update_signal=True):
@@ -341,34 +466,14 @@ class ScopePyChannel(QObject):
         
         
         
-        # Set the min and max
-        xmin = newArray[x_axis].min()
-        xmax = newArray[x_axis].max()
-        ymin = newArray[y_axis].min()
-        ymax = newArray[y_axis].max()
-        
-        if not self.xMinValue or xmin < self.xMinValue:
-            self.xMinValue = xmin
-        
-        if not self.xMaxValue or xmax > self.xMaxValue:
-            self.xMaxValue = xmax
-            
-        if not self.yMinValue or ymin < self.yMinValue:
-            self.yMinValue = ymin
-        
-        if not self.yMaxValue or ymax > self.yMaxValue:
-            self.yMaxValue = ymax
-            
-        
-        
         # Add new data
         if self.data_empty:
             # Set the axis names
             self.x_axis = x_axis
             self.y_axis = y_axis
         
-            # Add chunk of data to the list
-            self.data_list.append(newArray)
+            # Add chunk of data to storage
+            self._storeChunk(newArray)
             
             # Log the column names
             self.column_names = column_names
@@ -380,7 +485,7 @@ class ScopePyChannel(QObject):
             # Check first two column names are the same
             # note 0:2 is interpreted as 0:1 in Python
             if self.column_names[0:2] == recArray.dtype.names:
-                self.data_list.append(newArray)
+                self._storeChunk(newArray)
                 
                 
             else:
@@ -388,8 +493,12 @@ class ScopePyChannel(QObject):
                 # don't match
                 return False
                 
+        # Set the min and max
+        self.updateMinMax(self.stats.summary([self.chunks]))
+        
         # Increment the number of chunks
         self.chunks += 1
+        self.data_version += 1
         
         # Trigger any plot updates
         if update_signal:
@@ -399,6 +508,58 @@ class ScopePyChannel(QObject):
         return True
         
         
+    def _storeChunk(self,chunk):
+        """
+        Add chunk to the channel's storage
+        
+        """
+        
+        if self.storage_mode == STORAGE_RING:
+            if self.ring is None:
+                self._makeRing(chunk.dtype,self.chunks)
+                
+            self.ring.append(chunk)
+            
+        else:
+            self.data_list.append(chunk)
+            
+        # Update statistics, throwing away any for chunks no longer stored
+        self.stats.append(Xdata(chunk),Ydata(chunk))
+        
+        if self.pyramid is not None:
+            self.pyramid.append(Xdata(chunk),Ydata(chunk))
+        
+        if self.ring is not None:
+            self.stats.discardBefore(self.ring.first_chunk)
+            
+            
+    def updateMinMax(self,summary):
+        """
+        Update the overall min and max values of the channel from the
+        statistics of some new data
+        
+        Input
+        ------
+        summary : ScopePy_channel_storage.ChunkSummary
+        
+        """
+        
+        if summary is None or summary.count == 0:
+            return
+        
+        if self.xMinValue is None or summary.xmin < self.xMinValue:
+            self.xMinValue = summary.xmin
+        
+        if self.xMaxValue is None or summary.xmax > self.xMaxValue:
+            self.xMaxValue = summary.xmax
+            
+        if self.yMinValue is None or summary.ymin < self.yMinValue:
+            self.yMinValue = summary.ymin
+        
+        if self.yMaxValue is None or summary.ymax > self.yMaxValue:
+            self.yMaxValue = summary.ymax
+        
+        
     def setAxisName(self,axis,newName):
         """ Set the name of an individual axis
         
@@ -427,8 +588,16 @@ class ScopePyChannel(QObject):
             self.y_axis = newName
             
         # Replace existing names in all chunks
-        for chunk in range(self.chunks):
-            self.data_list[chunk].dtype.names = newAxisNames
+        # The chunks have an extra transparency column which keeps its name
+        if self.ring is not None:
+            self.ring.setNames(newAxisNames)
+            
+        for chunk in self.data_list:
+            chunk.dtype.names = newAxisNames + chunk.dtype.names[2:]
+            
+        # Cached data still has the old names
+        self.concat_cache.invalidate()
+        self.data_version += 1
             
 
 
@@ -469,24 +638,55 @@ class ScopePyChannel(QObject):
             
         # Select data according to the policy
         # =====================================
+        chunkList = self.selectChunks(chunkMode,chunkList)
+                
+        if DEBUG:
+            print("Chunk list:",chunkList)
+                
+        # Extract the specified chunks and return
+        return self.getDataFromChannel(chunkList,cacheKey=chunkMode)
+        
+        
+        
+    def selectChunks(self,chunkMode,chunkList=[0]):
+        """
+        Get the list of chunk numbers used by a chunk mode
+        
+        Inputs
+        ------------
+        chunkMode = string giving the policy type
+        chunkList = list of chunks, only used by CHUNK_MODE_SELECTION
+        
+        Outputs
+        -----------
+        chunkList = list of chunk numbers or None if there are no chunks
+        
+        """
+        
+        # With a ring buffer only the most recent chunks are available
+        if self.ring is not None:
+            first = self.ring.first_chunk
+        else:
+            first = 0
+        
         if chunkMode == CHUNK_MODE_LATEST:
             chunkList = [self.chunks-1]
             
         elif chunkMode == CHUNK_MODE_FIRST:
-            chunkList = [0]
+            chunkList = [first]
             
         elif chunkMode == CHUNK_MODE_ALL:
-            chunkList = list(range(self.chunks))
+            chunkList = list(range(first,self.chunks))
             
         elif chunkMode == CHUNK_MODE_ROLLOVER:
             # In this mode we return a maximum number of chunks up to the value
             # in self.rollover.
             if self.chunks < self.rollover:
                 # Number of chunks is less than the rollover
-                chunkList = list(range(self.chunks))
+                chunkList = list(range(first,self.chunks))
             else:
                 # More chunks than rollover value, return the latest chunks
-                chunkList = list(range(self.chunks-self.rollover,self.chunks))
+                chunkList = list(range(max(first,self.chunks-self.rollover),self.chunks))
             
         elif chunkMode == CHUNK_MODE_SELECTION:
             # Check chunkList is not empty
@@ -494,17 +694,15 @@ class ScopePyChannel(QObject):
                 return
             if chunkList == [-1]:
                 chunkList =[self.chunks-1]
+            elif first > 0:
+                chunkList = [c for c in chunkList if c >= first]
                 
-        if DEBUG:
-            print("Chunk list:",chunkList)
-                
-        # Extract the specified chunks and return
-        return self.getDataFromChannel(chunkList)
+        return chunkList
             
             
             
             
-    def getDataFromChannel(self,chunkList):
+    def getDataFromChannel(self,chunkList,cacheKey=None):
         """
         Basic extraction of data combining all specified chunks
         into one recarray
@@ -512,7 +710,13 @@ class ScopePyChannel(QObject):
         Inputs
         ---------------
         chunkList: list
-            list of numpy recarrays
+            list of chunk numbers
+            
+        cacheKey : str
+            Name of the cache entry used to store the stacked chunks, 
+            normally the chunk mode. Use a different key for each type of
+            selection so they don't overwrite each other. If None the key
+            is chosen from the type of chunk list.
         """
         
         if DEBUG:
@@ -522,23 +726,141 @@ class ScopePyChannel(QObject):
         # Exit if list is empty
         if not chunkList:
             return
+            
+        # Ring buffer storage
+        # ----------------------
+        # Consecutive chunks are returned as a view of the buffer without
+        # copying
+        if self.ring is not None:
+            if isContiguous(chunkList):
+                totalData = self.ring.view(chunkList[0],chunkList[-1])
+            else:
+                chunk_views = [self.ring.chunk(index) for index in chunkList]
+                chunk_views = [c for c in chunk_views if c is not None]
+                
+                # All the chunks may have been dropped from the ring
+                if chunk_views:
+                    totalData = np.concatenate(chunk_views)
+                else:
+                    totalData = np.zeros(0,self.ring.dtype)
+                
+            return totalData.view(np.recarray)
         
-        # Extract all the selected chunks into a separate list
-        data2Return = []
-        for index in chunkList:
-            data2Return.append(self.data_list[index])
+        # Single chunk
+        # -------------
+        # Nothing to stack
+        if len(chunkList) == 1:
+            return self.data_list[chunkList[0]].view(np.recarray)
             
-        totalData = stack_arrays(data2Return, asrecarray=True, usemask=False)
+        # Multiple chunks
+        # -----------------
+        # Stacked chunks are cached between calls so only new chunks are
+        # copied
+        if cacheKey is None:
+            cacheKey = 'range' if isContiguous(chunkList) else 'selection'
+            
+        totalData = self.concat_cache.get(cacheKey,chunkList,
+                                          lambda index: self.data_list[index])
+        
+        if totalData is None:
+            # Chunks are different types, stack them the slow way
+            data2Return = [self.data_list[index] for index in chunkList]
+            
+            totalData = stack_arrays(data2Return, asrecarray=True, usemask=False)
             
         if DEBUG:
             print("Selected data")
             print(totalData)
             
-        # Stack all the selected rearrays together
-        # and return
         return totalData
         
         
+    def dataStats(self,chunkMode=None,chunkList = [0]):
+        """
+        Get statistics of the data returned by data() for the same inputs,
+        without extracting the data.
+        
+        Inputs
+        ------------
+        chunkMode = string giving the policy type
+        chunkList = list of chunks, only used by CHUNK_MODE_SELECTION
+        
+        Outputs
+        -----------
+        summary = ScopePy_channel_storage.ChunkSummary namedtuple with
+                  fields xmin, xmax, ymin, ymax, count, xmean, ymean, xstd,
+                  ystd and x_monotonic. None if the channel is empty.
+        
+        """
+        
+        if self.data_empty:
+            return
+            
+        if chunkMode is None:
+            chunkMode = self.chunkMode
+            
+        return self.stats.summary(self.selectChunks(chunkMode,chunkList))
+        
+        
+    def canDecimate(self,chunkMode=None):
+        """
+        True if decimatedData() can reduce the data for the chunk mode,
+        without reading the data. Ring buffer (rollover) storage has no 
+        min/max index, so it is never reduced.
+        
+        """
+        
+        if chunkMode is None:
+            chunkMode = self.chunkMode
+            
+        return self.pyramid is not None and not self.data_empty and chunkMode == CHUNK_MODE_ALL
+        
+        
+    def decimatedData(self,x_lo,x_hi,n_px,chunkMode=None):
+        """
+        Get the x and y data reduced to the points needed to plot it
+        
+        Uses the min/max index (self.pyramid) to return about 2 to 8 points
+        per pixel, made up of the min and max values of the samples in each 
+        pixel, so that peaks are not lost. When zoomed in far enough the 
+        raw samples in the x range are returned.
+        
+        This only works for all the data in the channel (CHUNK_MODE_ALL) 
+        when the x data is in ascending order.
+        
+        Inputs
+        ---------
+        x_lo,x_hi : float
+            x range being plotted
+            
+        n_px : int
+            width of the plot in pixels
+            
+        chunkMode : str
+            chunk mode being plotted
+            
+        Outputs
+        ---------
+        x,y : numpy arrays or None if the data can't be reduced
+        
+        """
+        
+        if not self.canDecimate(chunkMode):
+            return
+            
+        data = self.data(chunkMode=CHUNK_MODE_ALL)
+        
+        # Index must cover the same data
+        if data is None or len(data) != self.pyramid.samples:
+            return
+            
+        if not self.dataStats(chunkMode=CHUNK_MODE_ALL).x_monotonic:
+            return
+            
+        return self.pyramid.decimate(data[self.x_axis],data[self.y_axis],
+                                     x_lo,x_hi,n_px)
+        
+        
     @property
     def x(self):
         """
@@ -597,8 +919,13 @@ class ScopePyChannel(QObject):
                 
         """
         
+        if self.ring is not None:
+            data_list = [chunk.copy() for chunk in self.ring.chunks()]
+        else:
+            data_list = self.data_list
+            
         channel_export = {'name':self.name,
-                          'data':self.data_list,
+                          'data':data_list,
                           'plotstyle':self.plot_lineStyle
                           }
                           
@@ -669,6 +996,25 @@ class ScopePyChannel(QObject):
         self.chunks = len(self.data_list)
         self.data_empty = False
         
+        # Rebuild statistics and min/max index
+        self.stats.clear()
+        self.pyramid = storage.MinMaxPyramid()
+        
+        for chunk in self.data_list:
+            self.stats.append(Xdata(chunk),Ydata(chunk))
+            self.pyramid.append(Xdata(chunk),Ydata(chunk))
+            
+        self.updateMinMax(self.stats.summary(list(range(self.chunks))))
+        
+        # Put data into ring buffer if required
+        self.ring = None
+        self.concat_cache.invalidate()
+        self.data_version += 1
+        self.reset_count += 1
+        
+        if self.storage_mode == STORAGE_RING:
+            self.setRolloverStorage(self.rollover)
+        
         # Update column names
         self.x_axis = column_names[0]
         self.y_axis = column_names[1]
@@ -689,6 +1035,9 @@ class GroupChannel(ScopePyChannel):
 
     """
     
+    # All the data comes from the table in one go
+    hasChunks = False
+    
     
     def __init__(self,datasourceTableWrapper,x_column_name,y_column_name,*args,**kwargs):
         """
@@ -780,6 +1129,17 @@ class GroupChannel(ScopePyChannel):
         return data_array
         
         
+    def dataStats(self,**kwargs):
+        """
+        Statistics of the table data, calculated directly from the columns
+        
+        """
+        
+        data_array = self.data()
+        
+        return storage.summarise(data_array[self.x_axis],data_array[self.y_axis])
+        
+        
 
                     
 #======================================================================
@@ -787,10 +1147,96 @@ class GroupChannel(ScopePyChannel):
 #======================================================================
 
                     
+class ChannelSnapshot():
+    """
+    The data of a channel at one moment, as seen by a MathFunction
+    
+    The channel's data() is called once, the first time it is needed, and 
+    the same array is then used for x, y and data(). Without this a 
+    function like lambda chan : (chan.x,20*np.log10(chan.y)) stacks all 
+    the chunks of the channel twice.
+    
+    Anything else is passed on to the channel, so functions can use the
+    snapshot in the same way as the channel.
+    
+    """
+    
+    def __init__(self,channel,data=None):
+        """
+        Inputs
+        --------
+        channel : ScopePyChannel
+        data : numpy structured array or None
+            data to use instead of channel.data(), e.g. a single chunk
+            
+        """
+        
+        self.channel = channel
+        self._data = data
+        
+        
+    def data(self,**kwargs):
+        """
+        Channel data, using the channel's chunk mode
+        
+        The inputs are only for compatibility with ScopePyChannel.data(),
+        other chunk modes go straight to the channel.
+        
+        """
+        
+        if kwargs:
+            return self.channel.data(**kwargs)
+            
+        if self._data is None:
+            self._data = self.channel.data()
+            
+        return self._data
+        
+        
+    @property
+    def x(self):
+        
+        return self.data()[self.channel.x_axis]
+        
+        
+    @property
+    def y(self):
+        
+        return self.data()[self.channel.y_axis]
+        
+        
+    def __getattr__(self,name):
+        
+        return getattr(self.channel,name)
+        
+        
+        
 class MathChannel(ScopePyChannel):
     """
     Math channels are derived from other channels, they apply a function
     to the source channel and return a transformed version of the data
+    
+    There are two ways of working:
+    
+    * Chunk by chunk, when the function is chunk local 
+      (MathFunction.chunk_local) and all the sources have chunks. Each new
+      chunk of the sources is transformed once, when it arrives, and 
+      stored as a chunk of this channel. All the chunk modes then work as 
+      they do for a normal channel. Sources whose chunks are different 
+      lengths, e.g. 2 chunks of 100 points and 4 of 50, use all the data 
+      at once instead.
+    
+    * All the data at once, for other functions. The output is kept until
+      a source channel or the function changes, so plots can call data() 
+      as often as they like. See dataKey().
+      
+      Slow functions can be run in a worker thread or process, see 
+      MathFunction.execution. data() then returns the last output until 
+      the new one is ready, and the plots are updated when it arrives.
+      
+      Element-wise functions are traced into an expression, together with
+      any math channel sources that haven't been calculated, and worked 
+      out in one pass over the original data. See ScopePy_expressions.
 
     """
     
@@ -820,14 +1266,55 @@ class MathChannel(ScopePyChannel):
         self.x_axis = self.source[0].x_axis
         self.y_axis = self.source[0].y_axis     
         
+        # Start with the same chunk settings as the first source
+        self.chunkMode = self.source[0].chunkMode
+        self.rollover = self.source[0].rollover
+        
+        # Last output of the function and the key it was made with
+        self.cached_data = None
+        self.cached_key = None
+        
+        # Key for self.data_version
+        self.version_key = None
+        
+        # Key for the chunks calculated so far, see chunkKey()
+        self.chunk_key = None
+        
+        # State carried from chunk to chunk by StreamingMathFunctions
+        self.stream_state = None
+        
+        # Chunk key of sources whose chunks don't line up, see updateChunks()
+        self.unaligned_key = None
+        
+        # Calculation running in a worker and the key it was started with
+        self.pending = None
+        self.pending_key = None
+        
+        # Function key of a function that can't be traced, see expression()
+        self.untraced_key = None
+        
         # Copy data from source channel
         self.updateFromSource()
         
         # Link to source channels for updates
         for channel in self.source:
             self.connect(channel,SIGNAL("updateChannelPlot"),self.updateAll)
+            
+        # Output from the workers arrives on another thread, update the
+        # plots from the GUI thread
+        self.connect(self,SIGNAL("mathOutputReady"),self.updatePlots,Qt.QueuedConnection)
         
         
+    @property
+    def hasChunks(self):
+        """
+        True when the output is calculated chunk by chunk
+        
+        """
+        
+        return (getattr(self.mathFunction,'chunk_local',False) and 
+                all([channel.hasChunks for channel in self.source]) and
+                self.unaligned_key != self.chunkKey())
         
         
     def updateFromSource(self):
@@ -837,6 +1324,9 @@ class MathChannel(ScopePyChannel):
         """
         
         logger.debug("MathFunction [%s]: Updating from source" % self.name)
+        
+        if self.hasChunks and self.updateChunks():
+            return
            
         self.chunks = self.source[0].chunks
         
@@ -853,26 +1343,285 @@ class MathChannel(ScopePyChannel):
         self.updatePlots()
         
         
-    def data(self,**kwargs):
+    # -----------------------------------------------------------
+    # Chunk by chunk calculation
+    # -----------------------------------------------------------
+    def chunkKey(self):
+        """
+        Key that changes when the chunks calculated so far are no longer
+        valid, because a source has been cleared or the function has 
+        changed
+        
+        """
+        
+        sources = tuple([(id(channel),channel.reset_count) for channel in self.source])
+        
+        return (sources,) + self.functionKey()
+        
+        
+    def resetChunks(self):
+        """
+        Throw away the calculated chunks and start again from the oldest
+        chunk available in all the sources
+        
+        """
+        
+        self.clearChannelData()
+        
+        # Only keep as many chunks as the sources if they use ring buffers
+        if any([channel.ring is not None for channel in self.source]):
+            self.setRolloverStorage(min([channel.rollover for channel in self.source]))
+            
+        elif self.storage_mode == STORAGE_RING:
+            self.storage_mode = STORAGE_LIST
+            self.pyramid = storage.MinMaxPyramid()
+        
+        # Number the chunks the same as the source chunks
+        self.chunks = self.firstSourceChunk()
+        self.stats.first_chunk = self.chunks
+        
+        if isinstance(self.mathFunction,StreamingMathFunction):
+            self.stream_state = self.mathFunction.initialState()
+        
+        
+    def firstSourceChunk(self):
+        """
+        Number of the oldest chunk that all the sources still have
+        
+        """
+        
+        return max([channel.ring.first_chunk if channel.ring is not None else 0 
+                    for channel in self.source])
+        
+        
+    def updateChunks(self):
+        """
+        Transform any new source chunks
+        
+        Chunk n of this channel is made from chunk n of every source, so
+        the number of chunks is the smallest number in any source.
+        
+        Output
+        -------
+        success : bool
+            False if the source chunks are different lengths. The chunks 
+            are thrown away and the channel uses all the data at once 
+            until the sources are cleared or the function changes.
+        
+        """
+        
+        # Math channel sources must be up to date first
+        for channel in self.source:
+            if isinstance(channel,MathChannel) and channel.hasChunks:
+                channel.updateChunks()
+                
+        if not self.hasChunks:
+            return False
+        
+        key = self.chunkKey()
+        
+        if key != self.chunk_key or self.chunks < self.firstSourceChunk():
+            self.resetChunks()
+            self.chunk_key = key
+            
+        last_chunk = min([channel.chunks for channel in self.source])
+        
+        streaming = isinstance(self.mathFunction,StreamingMathFunction)
+            
+        for index in range(self.chunks,last_chunk):
+            source_chunks = [channel.getDataFromChannel([index]) for channel in self.source]
+            
+            if len(set([len(chunk) for chunk in source_chunks])) > 1:
+                logger.debug("MathChannel [%s]: source chunks are different lengths, using all the data" % 
+                             self.name)
+                
+                self.clearChannelData()
+                self.unaligned_key = key
+                self.chunk_key = None
+                
+                return False
+            
+            if streaming:
+                x_in = source_chunks[0][self.source[0].x_axis]
+                y_in = source_chunks[0][self.source[0].y_axis]
+                
+                x_out,y_out,self.stream_state = self.mathFunction.processChunk(x_in,y_in,
+                                                                               self.stream_state)
+                
+            else:
+                x_out,y_out = self.mathFunction([ChannelSnapshot(channel,chunk) for 
+                                                 channel,chunk in zip(self.source,source_chunks)])
+            
+            self.addData2Channel(self.outputArray(x_out,y_out),update_signal=False)
+            
+        return True
+            
+            
+    # -----------------------------------------------------------
+    # All data calculation
+    # -----------------------------------------------------------
+    @property
+    def execution(self):
+        """
+        Where the function is run when working on all the data at once,
+        see MathFunction.execution
+        
+        """
+        
+        return getattr(self.mathFunction,'execution',EXECUTION_INLINE)
+        
+        
+    def functionKey(self):
+        """
+        Key made from the function and its parameters
+        
+        """
+        
+        parameters = tuple(sorted([(name,repr(value)) for name,value in 
+                                   self.mathFunction.parameters.items()]))
+        
+        return (id(self.mathFunction),id(self.mathFunction.function),parameters)
+        
+        
+    def dataKey(self):
+        """
+        Key that changes whenever the output of the function could change
+        
+        Made from the data version, chunk mode and rollover of each source
+        channel and the function and its parameters.
+        
+        """
+        
+        sources = tuple([(channel.data_version,channel.chunkMode,channel.rollover) 
+                         for channel in self.source])
+        
+        return (sources,) + self.functionKey()
+        
+        
+    @property
+    def data_version(self):
+        """
+        Version of the output data, goes up by one every time the sources
+        or the function change, so math channels can use math channels as 
+        sources
+        
+        """
+        
+        key = self.dataKey()
+        
+        # The output of a worker arrives later than the change to the 
+        # sources, that is a new version too
+        if self.execution != EXECUTION_INLINE and not self.hasChunks:
+            key = (key,self.cached_key)
+        
+        if key != self.version_key:
+            self.version_key = key
+            self._data_version += 1
+            
+        return self._data_version
+        
+        
+    @data_version.setter
+    def data_version(self,value):
+        
+        self._data_version = value
+        
+        
+    def data(self,chunkMode=None,chunkList=[0]):
         """
         Re-implementation of the data() function 
         
-        Returns an array with the transformed x and y values
+        Returns an array with the transformed x and y values. 
+        
+        When calculating chunk by chunk any new chunks are transformed and 
+        the data is returned according to the chunk mode in the same way 
+        as ScopePyChannel.data().
+        
+        Otherwise the chunk mode is ignored, the function is applied to 
+        the data of the sources in their own chunk mode. It is only run 
+        again if dataKey() has changed since the last time. Functions that
+        run in a worker return the last output, or None before the first
+        one is ready. Math channels with a source run in a worker return 
+        None until that source has its first output, see sourcesReady().
         
         Output
         -------
         data_array : numpy structured array
             data_array[x] = x_out
             data_array[y] = y_out
+            Don't modify it, the same array is returned until the data 
+            changes
         
         """               
         
-        # Apply function to source channels
-        x_out,y_out = self.mathFunction(self.source)
+        if self.hasChunks and self.updateChunks():
+            return super(MathChannel,self).data(chunkMode,chunkList)
+        
+        key = self.dataKey()
+        
+        if self.cached_data is not None and key == self.cached_key:
+            return self.cached_data
+            
+        if not self.sourcesReady():
+            return self.cached_data
+            
+        if self.execution != EXECUTION_INLINE:
+            self.startWorker(key)
+            
+            return self.cached_data
+        
+        evaluator = self.evaluator()
+        
+        if evaluator is not None:
+            # One pass over the source data, straight into the output
+            data_array = np.empty(evaluator.length,[(self.x_axis,float),(self.y_axis,float)])
+            
+            evaluator.evaluate([data_array[self.x_axis],data_array[self.y_axis]])
+            
+        else:
+            # Apply function to source channels
+            # Each source is read once however many times the function uses it
+            x_out,y_out = self.mathFunction([ChannelSnapshot(channel) for channel in self.source])
+            
+            data_array = self.outputArray(x_out,y_out)
+        
+        self.cached_data = data_array
+        self.cached_key = key
         
-        dtype = [(self.x_axis,float),(self.y_axis,float)]
+        return self.cached_data
         
-        data_array = np.zeros(len(x_out),dtype)
+        
+    def sourcesReady(self):
+        """
+        False if a source, or a source of a source, is a math channel run 
+        in a worker that doesn't have its first output yet
+        
+        Asking those sources for their data starts their workers.
+        
+        """
+        
+        for channel in self.source:
+            if not isinstance(channel,MathChannel) or channel.hasChunks:
+                continue
+                
+            if channel.execution != EXECUTION_INLINE:
+                if channel.data() is None:
+                    return False
+                    
+            elif channel.cached_key != channel.dataKey() and not channel.sourcesReady():
+                return False
+                
+        return True
+        
+        
+    def outputArray(self,x_out,y_out):
+        """
+        Put the output of the function into a structured array with the
+        channel's axis names
+        
+        """
+        
+        data_array = np.zeros(len(x_out),[(self.x_axis,float),(self.y_axis,float)])
         
         data_array[self.x_axis] = x_out
         data_array[self.y_axis] = y_out
@@ -880,6 +1629,180 @@ class MathChannel(ScopePyChannel):
         return data_array
         
         
+    # -----------------------------------------------------------
+    # Expression calculation
+    # -----------------------------------------------------------
+    def expression(self,snapshots=None):
+        """
+        Output of the function as expressions of the source data
+        
+        Math channel sources that haven't been calculated are traced too, 
+        so a chain of math channels becomes one expression of the original
+        channels.
+        
+        Inputs
+        --------
+        snapshots : dict
+            ChannelSnapshots of the sources read so far, by id(), so a 
+            channel used more than once in the chain is only read once
+        
+        Outputs
+        --------
+        x_out,y_out : ScopePy_expressions.Expression or None if the 
+            function can't be traced
+        
+        """
+        
+        if self.execution != EXECUTION_INLINE or self.hasChunks:
+            return
+            
+        key = self.functionKey()
+        
+        if key == self.untraced_key:
+            return
+            
+        if snapshots is None:
+            snapshots = {}
+            
+        traced = expressions.trace(self.mathFunction,
+                                   [self.tracedSource(channel,snapshots) for channel in self.source])
+        
+        if traced is None:
+            self.untraced_key = key
+            
+        return traced
+        
+        
+    def tracedSource(self,channel,snapshots):
+        """
+        Source channel for tracing the function
+        
+        """
+        
+        if isinstance(channel,MathChannel) and channel.cached_key != channel.dataKey():
+            traced = channel.expression(snapshots)
+            
+            if traced is not None:
+                return expressions.TracedChannel(channel,*traced)
+                
+        if id(channel) not in snapshots:
+            snapshots[id(channel)] = ChannelSnapshot(channel)
+            
+        snapshot = snapshots[id(channel)]
+        
+        return expressions.TracedChannel(channel,expressions.Input(snapshot.x),
+                                         expressions.Input(snapshot.y))
+        
+        
+    def evaluator(self):
+        """
+        Evaluator for the function and any sources that can be traced
+        
+        Outputs
+        --------
+        evaluator : ScopePy_expressions.Evaluator or None if the function
+            has to be run on the arrays
+        
+        """
+        
+        try:
+            traced = self.expression()
+            
+            if traced is not None:
+                return expressions.Evaluator(traced)
+                
+        except expressions.ExpressionError as error:
+            logger.debug("MathChannel [%s]: not using an expression : %s" % (self.name,error))
+            
+            
+    # -----------------------------------------------------------
+    # Calculation in a worker
+    # -----------------------------------------------------------
+    def startWorker(self,key):
+        """
+        Start running the function in the worker pool for the data key
+        
+        Only one calculation is run at a time for each channel. If the 
+        sources change again before it has started it is cancelled and 
+        replaced. If it has already started its output is used when it 
+        arrives, and the latest data is calculated after that.
+        
+        """
+        
+        if self.pending is not None:
+            if key == self.pending_key:
+                return
+                
+            if not self.pending.done() and not self.pending.cancel():
+                # Still running, finishWorker() asks for the data again
+                return
+                
+        # Read the sources now, on the GUI thread. Ring buffers are copied 
+        # as new chunks can overwrite them while the function is running
+        snapshots = []
+        
+        for channel in self.source:
+            source_data = channel.data()
+            
+            if getattr(channel,'ring',None) is not None:
+                source_data = source_data.copy()
+                
+            snapshots.append(ChannelSnapshot(channel,source_data))
+            
+        self.pending_key = key
+        self.pending = workers.defaultPool().submit(self.execution,self.mathFunction,snapshots)
+        
+        self.pending.add_done_callback(lambda future : self.finishWorker(future,key))
+        
+        
+    def finishWorker(self,future,key):
+        """
+        Store the output from a worker and update the plots
+        
+        Called from the worker's thread.
+        
+        """
+        
+        if future.cancelled():
+            return
+            
+        try:
+            x_out,y_out = future.result()
+            
+        except Exception:
+            # Not tried again until the sources or the function change
+            logger.exception("MathChannel [%s]: function [%s] failed" % 
+                             (self.name,self.mathFunction.name))
+            return
+            
+        # The data before the key, data() checks the key
+        self.cached_data = self.outputArray(x_out,y_out)
+        self.cached_key = key
+        
+        self.emit(SIGNAL("mathOutputReady"))
+        
+        
+    def dataStats(self,**kwargs):
+        """
+        Statistics of the transformed data
+        
+        When calculating chunk by chunk these come from the chunk 
+        statistics, otherwise they are calculated directly from the 
+        function output.
+        
+        """
+        
+        if self.hasChunks and self.updateChunks():
+            return super(MathChannel,self).dataStats(**kwargs)
+        
+        data_array = self.data(**kwargs)
+        
+        if data_array is None:
+            return
+        
+        return storage.summarise(data_array[self.x_axis],data_array[self.y_axis])
+        
+        
     def getSourceData(self,**kwargs):
         """
         Get the data from all source channels and put in a list
@@ -899,8 +1822,18 @@ class MathChannel(ScopePyChannel):
         
         check_empty = [chan.isEmpty for chan in self.source]
         
-        
-        return all(check_empty)
+        if all(check_empty):
+            return True
+            
+        if self.hasChunks:
+            return False
+            
+        # Nothing to show until a worker has finished, for this channel or
+        # for one of its sources
+        if self.execution != EXECUTION_INLINE:
+            return self.data() is None
+            
+        return not self.sourcesReady()
         
     
         
@@ -953,6 +1886,28 @@ class MathFunction():
         # a single one
         self.is_list_input = False
         
+        # Chunk local functions work on each point (or each chunk) on its 
+        # own, so the output for a chunk never changes once it has been 
+        # calculated. MathChannel then only has to transform new chunks.
+        # Set to True for functions like 20*log10(y), leave as False for 
+        # functions that need all the data, e.g. statistics.
+        self.chunk_local = False
+        
+        # Where the function is run when it works on all the data at once:
+        #   EXECUTION_INLINE  : on the GUI thread, for quick functions
+        #   EXECUTION_THREAD  : in a worker thread
+        #   EXECUTION_PROCESS : in a worker process, for slow functions. 
+        #                       Only for functions loaded from a file.
+        # Chunk by chunk calculation is always inline.
+        # See ScopePy_math_workers
+        self.execution = EXECUTION_INLINE
+        
+        # File and position in its mathFunctions list, set by 
+        # load_math_functions(). Used to load the function in a worker 
+        # process.
+        self.source_file = None
+        self.source_index = None
+        
         # Parameters
         # Extra parameters that the function can use
         # Dictionary of [parameter_name,parameter_value] pairs
@@ -1005,7 +1960,7 @@ class MathFunction():
         
         # Get number of input channels
         # = number of arguments
-        arg_spec = inspect.getargspec(inputFunction)
+        arg_spec = inspect.getfullargspec(inputFunction)
         
         self.function_inputs = arg_spec.args
         self.number_function_inputs = len(self.function_inputs)
@@ -1017,6 +1972,89 @@ class MathFunction():
         
     function = property(getFunction,setFunction)
     
+    
+    
+class StreamingMathFunction(MathFunction):
+    """
+    Base class for MathChannel functions that keep state from one chunk to
+    the next, e.g. filters and running averages
+    
+    The function is given one chunk of the source channel at a time, with
+    the state left by the previous chunk, so each new chunk takes the same
+    time however long the channel is. The state is kept by the MathChannel,
+    so the same function can be used by several channels.
+    
+    Subclasses implement initialState() and processChunk(). Settings go in
+    self.parameters, changing them starts the channel again from the 
+    oldest chunk.
+    
+    Example
+    --------
+    >>> class CumulativeSum(StreamingMathFunction):
+    ...     def initialState(self):
+    ...         return 0.0
+    ...     def processChunk(self,x,y,state):
+    ...         y_out = np.cumsum(y) + state
+    ...         return x,y_out,y_out[-1] if len(y_out) else state
+    
+    """
+    
+    def __init__(self):
+        
+        super(StreamingMathFunction,self).__init__()
+        
+        # Always worked out chunk by chunk, from one source channel
+        self.chunk_local = True
+        self.function_inputs = ['channel']
+        self.number_function_inputs = 1
+        
+        
+    def __call__(self,channel_list):
+        """
+        Process all the data of a channel in one go, for sources that don't
+        have chunks
+        
+        """
+        
+        channel = channel_list[0]
+        
+        x_out,y_out,state = self.processChunk(channel.x,channel.y,self.initialState())
+        
+        return x_out,y_out
+        
+        
+    def initialState(self):
+        """
+        State before the first chunk
+        
+        """
+        
+        return None
+        
+        
+    def processChunk(self,x,y,state):
+        """
+        Process one chunk
+        
+        Inputs
+        --------
+        x,y : numpy arrays
+            chunk of the source channel
+        state :
+            state after the previous chunk, or initialState()
+            
+        Outputs
+        --------
+        x_out,y_out : numpy arrays
+            transformed chunk, can be a different length to the input
+        state :
+            state for the next chunk
+            
+        """
+        
+        raise NotImplementedError("StreamingMathFunction: processChunk() must be defined")
+        
+        
         
 
 def load_math_functions(path_list):
@@ -1079,6 +2117,12 @@ def load_math_functions(path_list):
                 
                 if hasattr(module,"mathFunctions"):
                     logger.debug("load_math_functions: Loading panels from [%s]" % file)
+                    
+                    # Record where they came from for worker processes
+                    for index,function in enumerate(module.mathFunctions):
+                        function.source_file = os.path.abspath(os.path.join(path,file))
+                        function.source_index = index
+                        
                     math_functions += module.mathFunctions
                     
     return math_functions 
@@ -1419,6 +2463,8 @@ class ChannelTreeModel(QAbstractItemModel):
         Inputs
         --------
         channel = string name of channel, used as a key for channelDict
+        callReset = reset the model, set to False when adding several 
+                    channels and reset afterwards
         """
         
         # Create new channel branch with channel name as the label
@@ -1440,7 +2486,9 @@ class ChannelTreeModel(QAbstractItemModel):
           
             
             chunksChild.setField(1,"%d" % self.channelDict[channel].chunks)
-            self.reset()
+            
+            if callReset:
+                self.reset()
             return
             
         else:
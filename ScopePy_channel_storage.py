@@ -0,0 +1,1241 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 09:12:40 2026
+
+@author: john
+
+ScopePy Channel storage
+===================================
+
+Storage engines used by ScopePy channels to hold their chunks of data.
+
+By default a channel keeps every chunk in a python list. This module provides
+alternative storage that doesn't need a Qt event loop, so it can be used (and
+tested) outside the GUI:
+
+* RingBuffer : preallocated, fixed memory storage for rollover channels
+* ConcatCache : cache of chunks joined together for plotting, updated
+  incrementally as chunks arrive
+* ChunkStatistics : table of min/max and other statistics for each chunk so
+  that the limits of any chunk selection can be found without looking at
+  the data
+* MinMaxPyramid : multi-resolution min/max index for plotting very long
+  channels with only as many points as there are pixels
+
+"""
+
+#==============================================================================
+#%% License
+#==============================================================================
+
+"""
+Copyright 2015 John Bainbridge
+
+This file is part of ScopePy.
+
+ScopePy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+ScopePy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+#======================================================================
+#%% Imports
+#======================================================================
+import logging
+from collections import deque, namedtuple
+
+import numpy as np
+
+
+#==============================================================================
+#%% Logger
+#==============================================================================
+# create logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Add do nothing handler
+logger.addHandler(logging.NullHandler())
+
+
+#======================================================================
+#%% Constants
+#======================================================================
+
+# Default guess at the number of points in a chunk, used for sizing
+# ring buffers when the caller doesn't know
+DEFAULT_POINTS_PER_CHUNK = 1000
+
+# Growth factor for concatenation cache buffers
+CACHE_GROWTH_FACTOR = 2
+
+# Columns of the chunk statistics table
+STATS_DTYPE = [('xmin',float),('xmax',float),
+               ('ymin',float),('ymax',float),
+               ('count',np.int64),
+               ('xsum',float),('xsumsq',float),
+               ('ysum',float),('ysumsq',float),
+               ('x_monotonic',bool)]
+
+# Initial number of rows in chunk statistics table
+STATS_INITIAL_ROWS = 64
+
+
+# Min/max pyramid settings
+# Number of samples in each bucket of the finest level and the number of
+# buckets combined into one bucket of the next level
+PYRAMID_BASE_BUCKET = 16
+PYRAMID_FACTOR = 4
+
+# Columns of each pyramid level, the min and max y value in each bucket and 
+# the x values where they occur
+PYRAMID_DTYPE = [('x_ymin',float),('ymin',float),
+                 ('x_ymax',float),('ymax',float)]
+
+
+# Statistics of a selection of data
+ChunkSummary = namedtuple('ChunkSummary',['xmin','xmax','ymin','ymax','count',
+                                          'xmean','ymean','xstd','ystd',
+                                          'x_monotonic'])
+
+
+#======================================================================
+#%% Ring buffer class
+#======================================================================
+
+class RingBuffer():
+    """
+    Fixed memory storage for the latest chunks of a channel.
+
+    The buffer is a numpy structured array that is allocated once, sized
+    from the maximum number of chunks and an estimate of the number of
+    points in each chunk. When a new chunk arrives the oldest chunks are
+    evicted to make room, so memory does not grow however long the channel
+    runs.
+
+    Programming note
+    -----------------
+    The buffer is "mirrored": it is twice the capacity and every row is
+    written at position p and p + capacity. This means any window of up to
+    'capacity' rows is always one contiguous slice of the buffer, even when
+    it wraps around the end. So reading data out never needs a copy.
+
+    Views returned by view() and chunk() point into the buffer, they are
+    only valid until the data they show is evicted.
+
+    Example usage
+    --------------
+    >>> ring = RingBuffer([('x',float),('y',float)],max_chunks=200,points_per_chunk=10)
+    >>> ring.append(chunk)
+    >>> data = ring.view()
+
+    """
+
+    def __init__(self,dtype,max_chunks,points_per_chunk=DEFAULT_POINTS_PER_CHUNK,
+                 first_chunk=0):
+        """
+        Create empty ring buffer
+
+        Inputs
+        ---------
+        dtype : numpy dtype or list
+            structured dtype of the chunks to be stored
+
+        max_chunks : int
+            Maximum number of chunks to be kept (i.e. the channel rollover)
+
+        points_per_chunk : int
+            Estimate of the number of rows in each chunk. Used to
+            preallocate the buffer, it will grow if the estimate is too low.
+
+        first_chunk : int
+            Chunk number of the first chunk that will be appended. Used when
+            a channel that already has chunks is converted to a ring buffer.
+
+        """
+
+        assert max_chunks >= 1, "RingBuffer: max_chunks must be 1 or greater"
+
+        self.dtype = np.dtype(dtype)
+        self.max_chunks = int(max_chunks)
+
+        # Number of rows that can be held
+        self.capacity = max(int(self.max_chunks*points_per_chunk),1)
+
+        # Mirrored storage
+        self._buffer = np.zeros(2*self.capacity,self.dtype)
+
+        # Chunk table
+        # -------------
+        # Absolute row position of the start of each chunk and its length.
+        # Absolute positions count every row ever written, the position in
+        # the buffer is the absolute position modulo the capacity.
+        self._starts = deque()
+        self._lengths = deque()
+
+        # Chunk number of the oldest chunk still in the buffer
+        self.first_chunk = first_chunk
+
+        # Absolute row position of the end of the data
+        self._end = 0
+
+        # Number of rows currently held
+        self.rows = 0
+
+
+    def __len__(self):
+        return self.rows
+
+
+    def __str__(self):
+
+        txt = [
+            "RingBuffer:",
+            "Chunks = %i to %i" % (self.first_chunk,self.last_chunk),
+            "Rows = %i" % self.rows,
+            "Capacity = %i rows" % self.capacity,
+            ]
+
+        return "\n".join(txt)
+
+    def __repr__(self):
+        return self.__str__()
+
+
+    @property
+    def n_chunks(self):
+        """
+        Number of chunks currently held in the buffer
+        """
+        return len(self._lengths)
+
+
+    @property
+    def last_chunk(self):
+        """
+        Chunk number of the newest chunk in the buffer, -1 if empty
+        """
+        return self.first_chunk + self.n_chunks - 1
+
+
+    @property
+    def names(self):
+        return self.dtype.names
+
+
+    def setNames(self,names):
+        """
+        Rename the columns of the buffer. Any views subsequently returned
+        use the new names.
+
+        Input
+        ------
+        names : tuple of str
+            New names for the first len(names) columns, any remaining
+            columns keep their names.
+
+        """
+
+        names = tuple(names) + self.dtype.names[len(names):]
+
+        # Make a new dtype rather than editing the existing one, which may
+        # be shared with other arrays
+        new_dtype = np.dtype(self.dtype.descr)
+        new_dtype.names = names
+
+        self._buffer = self._buffer.view(new_dtype)
+        self.dtype = new_dtype
+
+
+    def clear(self):
+        """
+        Remove all chunks, keeping the allocated memory
+        """
+
+        self.first_chunk += self.n_chunks
+        self._starts.clear()
+        self._lengths.clear()
+        self._end = 0
+        self.rows = 0
+
+
+    def append(self,chunk):
+        """
+        Add a chunk to the end of the buffer, evicting old chunks as required
+
+        Input
+        ------
+        chunk : numpy structured array
+            Must have the same column names as the buffer
+
+        Output
+        --------
+        chunk_number : int
+            Chunk number given to the new chunk
+
+        """
+
+        n = len(chunk)
+
+        # Evict the oldest chunks to keep within max_chunks
+        # ---------------------------------------------------
+        while self.n_chunks >= self.max_chunks:
+            self._evict()
+
+        # Make sure the buffer is big enough
+        # ------------------------------------
+        # All chunks kept must fit in the buffer. If the points per chunk
+        # estimate was too low then grow rather than lose chunks that
+        # the rollover says we should keep
+        if self.rows + n > self.capacity:
+            self._grow(max(2*self.capacity,self.rows+n))
+
+        # Write the chunk
+        # ------------------
+        self._write(self._end,chunk)
+
+        self._starts.append(self._end)
+        self._lengths.append(n)
+
+        self._end += n
+        self.rows += n
+
+        return self.last_chunk
+
+
+    def view(self,first_chunk=None,last_chunk=None):
+        """
+        Return a contiguous view of a range of chunks
+
+        Inputs
+        ---------
+        first_chunk,last_chunk : int or None
+            Chunk numbers of the first and last chunks (inclusive). Chunks
+            that are no longer in the buffer are ignored. None gives the
+            oldest/newest chunk.
+
+        Output
+        --------
+        data_view : numpy structured array
+            View into the buffer, no data is copied.
+
+        """
+
+        if self.n_chunks == 0:
+            return self._buffer[0:0]
+
+        # Limit the chunks to what's in the buffer
+        if first_chunk is None or first_chunk < self.first_chunk:
+            first_chunk = self.first_chunk
+
+        if last_chunk is None or last_chunk > self.last_chunk:
+            last_chunk = self.last_chunk
+
+        if last_chunk < first_chunk:
+            return self._buffer[0:0]
+
+        # Get absolute row positions
+        first_index = first_chunk - self.first_chunk
+        last_index = last_chunk - self.first_chunk
+
+        start = self._starts[first_index]
+        stop = self._starts[last_index] + self._lengths[last_index]
+
+        return self._slice(start,stop)
+
+
+    def chunk(self,chunk_number):
+        """
+        Return view of a single chunk
+
+        Input
+        ------
+        chunk_number : int
+
+        Output
+        -------
+        chunk_view : numpy structured array or None if the chunk has been
+        evicted
+
+        """
+
+        index = chunk_number - self.first_chunk
+
+        if index < 0 or index >= self.n_chunks:
+            return None
+
+        start = self._starts[index]
+
+        return self._slice(start,start+self._lengths[index])
+
+
+    def chunks(self):
+        """
+        Return list of views of all the chunks held
+        """
+
+        return [self._slice(start,start+n) for start,n in zip(self._starts,self._lengths)]
+
+
+    # ------------------------------------------------------------------------
+    # Internal functions
+    # ------------------------------------------------------------------------
+
+    def _slice(self,start,stop):
+        """
+        Contiguous view of rows between two absolute positions
+        """
+
+        p = start % self.capacity
+
+        return self._buffer[p:p+(stop-start)]
+
+
+    def _write(self,start,values):
+        """
+        Write values into both halves of the mirrored buffer starting at
+        an absolute row position, wrapping around the end if necessary
+        """
+
+        cap = self.capacity
+        n = len(values)
+        p = start % cap
+
+        # Part up to the end of the first half
+        first = min(n,cap-p)
+        self._buffer[p:p+first] = values[:first]
+        self._buffer[p+cap:p+cap+first] = values[:first]
+
+        # Remainder wraps around to the start
+        rest = n - first
+        if rest > 0:
+            self._buffer[0:rest] = values[first:]
+            self._buffer[cap:cap+rest] = values[first:]
+
+
+    def _evict(self):
+        """
+        Drop the oldest chunk
+        """
+
+        self._starts.popleft()
+        self.rows -= self._lengths.popleft()
+        self.first_chunk += 1
+
+
+    def _grow(self,new_capacity):
+        """
+        Reallocate the buffer with a larger capacity, keeping all chunks
+        """
+
+        logger.debug("RingBuffer: growing from %i to %i rows" % (self.capacity,new_capacity))
+
+        # Copy out the current contents
+        if self.rows > 0:
+            contents = self._slice(self._end-self.rows,self._end).copy()
+        else:
+            contents = self._buffer[0:0]
+
+        # Reallocate and rebase absolute positions to zero
+        offset = self._end - self.rows
+        self.capacity = int(new_capacity)
+        self._buffer = np.zeros(2*self.capacity,self.dtype)
+
+        self._starts = deque([s-offset for s in self._starts])
+        self._end = self.rows
+
+        self._write(0,contents)
+
+
+
+#======================================================================
+#%% Concatenation cache classes
+#======================================================================
+
+class ConcatCache():
+    """
+    Cache of channel chunks joined into one array.
+
+    Plotting a channel stacks all the selected chunks into one array every
+    time the plot is updated. This class keeps the stacked array between
+    updates so that when new chunks arrive only they are copied in.
+
+    There is one cache entry per key (usually the chunk mode). Each entry
+    holds a range of consecutive chunks in a buffer that is larger than
+    needed, new chunks are written after the end and chunks that drop off
+    the start (e.g. rollover mode) are skipped by moving the start of the
+    data along. When the buffer is full the data is copied into a new buffer
+    CACHE_GROWTH_FACTOR times bigger, so the cost of adding data is
+    proportional to the amount of new data not the total.
+
+    Non-consecutive chunk selections are cached as they are and rebuilt when
+    the selection changes.
+
+    Arrays returned are views into the buffers. Data is only ever written
+    after the end of a view, never inside it, so views already handed out
+    stay valid.
+
+    Example usage
+    --------------
+    >>> cache = ConcatCache()
+    >>> data = cache.get('all',[0,1,2],lambda n: data_list[n])
+
+    """
+
+    def __init__(self):
+
+        # Cache entries, indexed by key
+        self._entries = {}
+
+        # Counter incremented every time the cache is invalidated
+        self.generation = 0
+
+
+    def invalidate(self):
+        """
+        Throw away all cached data. Must be called if existing chunks are
+        changed or removed.
+        """
+
+        self._entries.clear()
+        self.generation += 1
+
+
+    def get(self,key,chunkList,getChunk):
+        """
+        Get chunks joined into a single array
+
+        Inputs
+        --------
+        key : hashable
+            Name of the cache entry to use, e.g. the chunk mode
+
+        chunkList : list of int
+            Chunk numbers to join together
+
+        getChunk : function
+            Function that takes a chunk number and returns the chunk
+
+        Output
+        --------
+        data : numpy recarray or None
+            None is returned if the chunks can't be cached because they don't
+            all have the same dtype.
+
+        """
+
+        if not chunkList:
+            return None
+
+        first = chunkList[0]
+        last = chunkList[-1]
+
+        consecutive = (last - first + 1) == len(chunkList) and \
+            all([(b-a)==1 for a,b in zip(chunkList[:-1],chunkList[1:])])
+
+        entry = self._entries.get(key)
+
+        # Non consecutive selection
+        # ---------------------------
+        if not consecutive:
+            selection = tuple(chunkList)
+
+            if entry is None or entry.selection != selection:
+                entry = _CacheEntry()
+                entry.selection = selection
+
+                if not entry.extend([getChunk(n) for n in chunkList]):
+                    self._entries.pop(key,None)
+                    return None
+
+                self._entries[key] = entry
+
+            return entry.data()
+
+        # Consecutive selection
+        # -----------------------
+        # Update an existing entry if it overlaps the start of the selection
+        # and only needs chunks adding to the end
+        if entry is None or entry.selection is not None or \
+                not (entry.first <= first <= entry.last + 1) or last < entry.last:
+            entry = _CacheEntry()
+            entry.first = first
+            entry.last = first - 1
+            self._entries[key] = entry
+
+        # Drop chunks from the start
+        entry.dropTo(first)
+
+        # Add new chunks to the end
+        new_chunks = [getChunk(n) for n in range(entry.last+1,last+1)]
+
+        if not entry.extend(new_chunks):
+            self._entries.pop(key,None)
+            return None
+
+        entry.last = last
+
+        return entry.data()
+
+
+
+class _CacheEntry():
+    """
+    Single entry in a ConcatCache, holds the buffer and the chunks in it.
+    """
+
+    def __init__(self):
+
+        self.buffer = None
+        self.dtype = None
+
+        # Rows of the buffer that contain data
+        self.start = 0
+        self.end = 0
+
+        # Chunk numbers in buffer and their lengths, for consecutive ranges
+        self.first = 0
+        self.last = -1
+        self.lengths = deque()
+
+        # Chunk numbers for non consecutive selections
+        self.selection = None
+
+
+    def data(self):
+        """
+        View of the cached data
+        """
+
+        return self.buffer[self.start:self.end].view(np.recarray)
+
+
+    def dropTo(self,first):
+        """
+        Skip over chunks before chunk number 'first'
+        """
+
+        while self.first < first and self.lengths:
+            self.start += self.lengths.popleft()
+            self.first += 1
+
+        self.first = first
+
+
+    def extend(self,chunks):
+        """
+        Copy chunks onto the end of the buffer
+
+        Output
+        -------
+        success : bool
+            False if the chunks do not have the same dtype as the buffer
+
+        """
+
+        if self.dtype is None and chunks:
+            self.dtype = chunks[0].dtype
+
+        if any([chunk.dtype != self.dtype for chunk in chunks]):
+            return False
+
+        n_new = sum([len(chunk) for chunk in chunks])
+        rows = self.end - self.start
+
+        # Make more room if necessary
+        if self.buffer is None or self.end + n_new > len(self.buffer):
+            new_buffer = np.empty(max(CACHE_GROWTH_FACTOR*(rows + n_new),1),self.dtype)
+
+            if rows > 0:
+                new_buffer[:rows] = self.buffer[self.start:self.end]
+
+            self.buffer = new_buffer
+            self.start = 0
+            self.end = rows
+
+        for chunk in chunks:
+            n = len(chunk)
+            self.buffer[self.end:self.end+n] = chunk
+            self.end += n
+            self.lengths.append(n)
+
+        return True
+
+
+
+def mergeConsecutive(chunks):
+    """
+    Join runs of consecutive chunks with the same dtype into one chunk
+
+    Inputs
+    --------
+    chunks : list of numpy structured arrays
+        in the order they arrived
+
+    Outputs
+    --------
+    merged : list of numpy structured arrays
+        chunks on their own are returned as they are, without copying
+
+    """
+
+    runs = []
+
+    for chunk in chunks:
+        if runs and runs[-1][0].dtype == chunk.dtype:
+            runs[-1].append(chunk)
+        else:
+            runs.append([chunk])
+
+    return [run[0] if len(run) == 1 else np.concatenate(run) for run in runs]
+
+
+
+#======================================================================
+#%% Chunk statistics classes
+#======================================================================
+
+class ChunkStatistics():
+    """
+    Table of statistics for each chunk in a channel.
+
+    When a chunk arrives its min, max, count, sum and sum of squares are
+    calculated for the x and y data, along with a flag saying whether the x
+    data is in ascending order. These are stored as one row per chunk in a
+    numpy structured array.
+
+    The statistics for any selection of chunks can then be calculated from
+    the table, which only has one row per chunk, instead of from the data.
+
+    Example usage
+    --------------
+    >>> stats = ChunkStatistics()
+    >>> stats.append(x,y)
+    >>> summary = stats.summary([0,1,2])
+    >>> summary.xmin
+
+    """
+
+    def __init__(self,first_chunk=0):
+
+        self._table = np.zeros(STATS_INITIAL_ROWS,STATS_DTYPE)
+
+        # Rows of the table in use
+        self._start = 0
+        self._end = 0
+
+        # Chunk number of the first row in use
+        self.first_chunk = first_chunk
+
+
+    def __len__(self):
+        return self._end - self._start
+
+
+    @property
+    def last_chunk(self):
+        """
+        Chunk number of the newest chunk, first_chunk - 1 if empty
+        """
+        return self.first_chunk + len(self) - 1
+
+
+    @property
+    def table(self):
+        """
+        View of the statistics for the chunks held
+        """
+        return self._table[self._start:self._end]
+
+
+    def clear(self):
+        """
+        Remove all statistics and restart the chunk numbering at zero
+        """
+
+        self._start = 0
+        self._end = 0
+        self.first_chunk = 0
+
+
+    def append(self,x,y):
+        """
+        Add statistics for a new chunk
+
+        Inputs
+        --------
+        x,y : numpy arrays
+            x and y data of the chunk
+
+        Output
+        --------
+        chunk_number : int
+
+        """
+
+        if self._end == len(self._table):
+            self._makeRoom()
+
+        row = self._table[self._end:self._end+1]
+        n = len(x)
+
+        row['count'] = n
+
+        if n == 0:
+            row['xmin'] = row['ymin'] = np.inf
+            row['xmax'] = row['ymax'] = -np.inf
+            row['xsum'] = row['xsumsq'] = row['ysum'] = row['ysumsq'] = 0
+            row['x_monotonic'] = True
+
+        else:
+            row['xmin'] = x.min()
+            row['xmax'] = x.max()
+            row['ymin'] = y.min()
+            row['ymax'] = y.max()
+            row['xsum'] = x.sum()
+            row['xsumsq'] = np.dot(x,x)
+            row['ysum'] = y.sum()
+            row['ysumsq'] = np.dot(y,y)
+            row['x_monotonic'] = bool(np.all(x[1:] >= x[:-1]))
+
+        self._end += 1
+
+        return self.last_chunk
+
+
+    def discardBefore(self,chunk_number):
+        """
+        Remove statistics for chunks before chunk_number, used when a
+        ring buffer throws chunks away
+        """
+
+        n = min(chunk_number - self.first_chunk,len(self))
+
+        if n <= 0:
+            return
+
+        self._start += n
+        self.first_chunk += n
+
+
+    def summary(self,chunkList):
+        """
+        Combine the statistics of a list of chunks
+
+        Input
+        ------
+        chunkList : list of int
+            chunk numbers, chunks not in the table are ignored
+
+        Output
+        --------
+        summary : ChunkSummary or None if there are no chunks
+
+        """
+
+        if not chunkList:
+            return None
+
+        first = chunkList[0]
+        last = chunkList[-1]
+
+        # Consecutive chunks are a slice of the table
+        if (last - first + 1) == len(chunkList) and first <= last:
+            first = max(first,self.first_chunk)
+            last = min(last,self.last_chunk)
+
+            rows = self.table[first-self.first_chunk:last-self.first_chunk+1]
+
+        else:
+            index = np.asarray(chunkList) - self.first_chunk
+            index = index[(index >= 0) & (index < len(self))]
+            rows = self.table[index]
+
+        return _combineRows(rows)
+
+
+    def _makeRoom(self):
+        """
+        Make room for more rows, either by moving the rows in use to the start
+        of the table or by making a bigger table
+        """
+
+        n = len(self)
+
+        if self._start > n:
+            # More than half the table is discarded rows, reuse them
+            self._table[:n] = self._table[self._start:self._end]
+        else:
+            new_table = np.zeros(2*len(self._table),STATS_DTYPE)
+            new_table[:n] = self._table[self._start:self._end]
+            self._table = new_table
+
+        self._start = 0
+        self._end = n
+
+
+
+def summarise(x,y):
+    """
+    Calculate the statistics of x and y data directly
+
+    Used for channels that don't store chunks, such as math channels
+
+    Inputs
+    --------
+    x,y : numpy arrays
+
+    Output
+    --------
+    summary : ChunkSummary
+
+    """
+
+    stats = ChunkStatistics()
+    stats.append(np.asarray(x,float),np.asarray(y,float))
+
+    return _combineRows(stats.table)
+
+
+
+def _combineRows(rows):
+    """
+    Combine rows from a statistics table into a ChunkSummary
+
+    """
+
+    if len(rows) == 0:
+        return None
+
+    count = int(rows['count'].sum())
+
+    if count == 0:
+        return ChunkSummary(np.inf,-np.inf,np.inf,-np.inf,0,
+                            np.nan,np.nan,np.nan,np.nan,True)
+
+    xmean = rows['xsum'].sum()/count
+    ymean = rows['ysum'].sum()/count
+
+    # Variance from sum of squares, rounding can make this slightly negative
+    xvar = max(rows['xsumsq'].sum()/count - xmean**2,0.0)
+    yvar = max(rows['ysumsq'].sum()/count - ymean**2,0.0)
+
+    # x is in order if every chunk is and each chunk starts after the
+    # previous one ends. Empty chunks are ignored.
+    used = rows[rows['count'] > 0]
+    x_monotonic = bool(np.all(used['x_monotonic']) and
+                       np.all(used['xmin'][1:] >= used['xmax'][:-1]))
+
+    return ChunkSummary(rows['xmin'].min(),rows['xmax'].max(),
+                        rows['ymin'].min(),rows['ymax'].max(),
+                        count,xmean,ymean,np.sqrt(xvar),np.sqrt(yvar),
+                        x_monotonic)
+
+
+
+#======================================================================
+#%% Min/Max pyramid classes
+#======================================================================
+
+class MinMaxPyramid():
+    """
+    Multi-resolution min/max index of a channel's data, for plotting long
+    channels quickly.
+
+    The data is split into buckets of PYRAMID_BASE_BUCKET samples, and the
+    min and max y values of each bucket are stored (with the x values where
+    they occur). This is level 0. Each level above combines PYRAMID_FACTOR
+    buckets from the level below, so level k buckets are
+    PYRAMID_BASE_BUCKET*PYRAMID_FACTOR**k samples long.
+
+    To plot the data on a graph that is n_px pixels wide, the coarsest level
+    that still has about one bucket per pixel is used, and each bucket is
+    drawn as two points, its min and its max. Because the min and max are
+    kept, peaks are never lost however far the plot is zoomed out. When
+    there are only a few samples per pixel the raw samples are used.
+
+    The index is built incrementally as chunks arrive. Only complete
+    buckets are stored, samples at the end that don't fill a bucket are
+    taken from the raw data when needed.
+
+    Programming note
+    -----------------
+    The index refers to sample positions, so it is only valid for the full
+    data of a channel (all chunks in order). decimate() also needs the x
+    data to be in ascending order.
+
+    Example usage
+    --------------
+    >>> pyramid = MinMaxPyramid()
+    >>> pyramid.append(x_chunk,y_chunk)
+    >>> x_plot,y_plot = pyramid.decimate(x_all,y_all,x_lo,x_hi,n_px=800)
+
+    """
+
+    def __init__(self,base_bucket=PYRAMID_BASE_BUCKET,factor=PYRAMID_FACTOR):
+
+        self.base_bucket = int(base_bucket)
+        self.factor = int(factor)
+
+        self.clear()
+
+
+    def clear(self):
+        """
+        Remove all data from the index
+        """
+
+        # Total number of samples added
+        self.samples = 0
+
+        # Levels, each is a growable numpy array with a count of buckets used
+        self.levels = []
+        self.level_counts = []
+
+        # Samples that don't yet fill a level 0 bucket
+        self._pending_x = np.zeros(0)
+        self._pending_y = np.zeros(0)
+
+
+    def bucketSize(self,level):
+        """
+        Number of samples in each bucket of a level
+        """
+        return self.base_bucket*self.factor**level
+
+
+    def level(self,level):
+        """
+        Get the buckets of a level
+
+        Output
+        -------
+        buckets : numpy structured array with PYRAMID_DTYPE columns
+        """
+        return self.levels[level][:self.level_counts[level]]
+
+
+    def append(self,x,y):
+        """
+        Add new samples to the end of the index
+
+        Inputs
+        --------
+        x,y : numpy arrays
+
+        """
+
+        n = len(x)
+        if n == 0:
+            return
+
+        self.samples += n
+
+        # Level 0 from raw data
+        # -----------------------
+        if len(self._pending_x) > 0:
+            x = np.concatenate((self._pending_x,x))
+            y = np.concatenate((self._pending_y,y))
+
+        b = self.base_bucket
+        n_full = (len(x)//b)*b
+
+        self._pending_x = np.array(x[n_full:],float)
+        self._pending_y = np.array(y[n_full:],float)
+
+        if n_full == 0:
+            return
+
+        x_buckets = np.asarray(x[:n_full],float).reshape(-1,b)
+        y_buckets = np.asarray(y[:n_full],float).reshape(-1,b)
+
+        rows = np.arange(len(y_buckets))
+        imin = y_buckets.argmin(axis=1)
+        imax = y_buckets.argmax(axis=1)
+
+        new = np.zeros(len(y_buckets),PYRAMID_DTYPE)
+        new['x_ymin'] = x_buckets[rows,imin]
+        new['ymin'] = y_buckets[rows,imin]
+        new['x_ymax'] = x_buckets[rows,imax]
+        new['ymax'] = y_buckets[rows,imax]
+
+        self._addBuckets(0,new)
+
+        # Higher levels
+        # ---------------
+        # Combine complete groups of buckets from the level below
+        level = 0
+        while self.level_counts[level] >= self.factor*(self._count(level+1) + 1):
+            self._buildLevel(level+1)
+            level += 1
+
+
+    def decimate(self,x,y,x_lo,x_hi,n_px):
+        """
+        Reduce data to the points needed to plot it between two x values
+
+        Inputs
+        --------
+        x,y : numpy arrays
+            All the data that has been added to the index, x must be in
+            ascending order
+
+        x_lo,x_hi : float
+            x range being plotted
+
+        n_px : int
+            Width of the plot in pixels
+
+        Outputs
+        ---------
+        x_plot,y_plot : numpy arrays
+            Points to plot. These cover the x range plus at least one point
+            either side so that lines go to the edge of the plot.
+
+        """
+
+        n_px = max(int(n_px),1)
+
+        # Find visible samples, including one either side
+        i0 = max(int(np.searchsorted(x,x_lo,side='left')) - 1,0)
+        i1 = min(int(np.searchsorted(x,x_hi,side='right')) + 1,len(x))
+
+        # Choose level
+        # ------------
+        # Use the coarsest level with at least one bucket per pixel.
+        # If there aren't enough samples for level 0 use the raw data.
+        n_visible = i1 - i0
+        level = -1
+
+        while level + 1 < len(self.levels) and \
+                n_visible//self.bucketSize(level+1) >= n_px:
+            level += 1
+
+        if level < 0:
+            return x[i0:i1],y[i0:i1]
+
+        # Collect points
+        # ---------------
+        x_parts = []
+        y_parts = []
+
+        self._collect(level,x,y,i0,i1,x_parts,y_parts)
+
+        return np.concatenate(x_parts),np.concatenate(y_parts)
+
+
+    # ------------------------------------------------------------------------
+    # Internal functions
+    # ------------------------------------------------------------------------
+
+    def _count(self,level):
+        """
+        Number of buckets in a level, 0 if the level doesn't exist
+        """
+
+        if level >= len(self.levels):
+            return 0
+
+        return self.level_counts[level]
+
+
+    def _addBuckets(self,level,new):
+        """
+        Add buckets to the end of a level, growing the level if needed
+        """
+
+        if level == len(self.levels):
+            self.levels.append(np.zeros(max(len(new),STATS_INITIAL_ROWS),PYRAMID_DTYPE))
+            self.level_counts.append(0)
+
+        count = self.level_counts[level]
+        buckets = self.levels[level]
+
+        if count + len(new) > len(buckets):
+            grown = np.zeros(max(2*len(buckets),count+len(new)),PYRAMID_DTYPE)
+            grown[:count] = buckets[:count]
+            self.levels[level] = buckets = grown
+
+        buckets[count:count+len(new)] = new
+        self.level_counts[level] = count + len(new)
+
+
+    def _buildLevel(self,level):
+        """
+        Make new buckets in a level from complete groups of buckets in the
+        level below
+        """
+
+        f = self.factor
+        below = self.level(level-1)
+
+        start = self._count(level)*f
+        n_groups = (len(below) - start)//f
+
+        groups = below[start:start+n_groups*f].reshape(-1,f)
+        rows = np.arange(n_groups)
+
+        imin = groups['ymin'].argmin(axis=1)
+        imax = groups['ymax'].argmax(axis=1)
+
+        new = np.zeros(n_groups,PYRAMID_DTYPE)
+        new['x_ymin'] = groups['x_ymin'][rows,imin]
+        new['ymin'] = groups['ymin'][rows,imin]
+        new['x_ymax'] = groups['x_ymax'][rows,imax]
+        new['ymax'] = groups['ymax'][rows,imax]
+
+        self._addBuckets(level,new)
+
+
+    def _collect(self,level,x,y,i0,i1,x_parts,y_parts):
+        """
+        Add points from a level for samples i0 to i1. Samples beyond the
+        last complete bucket of the level are collected from the level below
+        (or the raw data below level 0).
+        """
+
+        if level < 0:
+            x_parts.append(x[i0:i1])
+            y_parts.append(y[i0:i1])
+            return
+
+        size = self.bucketSize(level)
+        count = self.level_counts[level]
+
+        # Buckets that overlap the samples, including partly visible buckets
+        # at the edges
+        j0 = i0//size
+        j1 = min(-(-i1//size),count)
+
+        if j1 > j0:
+            buckets = self.level(level)[j0:j1]
+
+            # Two points per bucket, min and max in the order they occur
+            min_first = buckets['x_ymin'] <= buckets['x_ymax']
+
+            xy = np.empty((len(buckets),2))
+            yy = np.empty((len(buckets),2))
+
+            xy[:,0] = np.where(min_first,buckets['x_ymin'],buckets['x_ymax'])
+            xy[:,1] = np.where(min_first,buckets['x_ymax'],buckets['x_ymin'])
+            yy[:,0] = np.where(min_first,buckets['ymin'],buckets['ymax'])
+            yy[:,1] = np.where(min_first,buckets['ymax'],buckets['ymin'])
+
+            x_parts.append(xy.ravel())
+            y_parts.append(yy.ravel())
+
+        # Samples after the last complete bucket
+        tail = max(j1*size,i0)
+
+        if tail < i1:
+            self._collect(level-1,x,y,tail,i1,x_parts,y_parts)
@@ -0,0 +1,549 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 09:30:14 2026
+
+@author: john
+
+ScopePy record daemon
+===================================
+
+Headless recorder for capturing long streams without the GUI, e.g.
+overnight. Data sent to ScopePy over TCP or UDP is received exactly as the
+GUI receives it (ScopePy_ingest.IngestServer with
+ScopePy_protocol.decodePacket, and ScopePy_udp.UdpReceiver), but instead of
+going into channels every chunk is appended to an HDF5 file.
+
+The file can be opened later in ScopePy with the HDF5 data source. Each
+channel is a dataset in the "channels" group:
+
+    /channels/<channel name>    table with one column per data column
+
+Datasets are chunked, compressed and can be appended to, so the file can be
+added to by running the daemon again. The data is written to the file at a
+fixed interval, so little is lost if the daemon is stopped abruptly.
+
+No Qt event loop is used, the daemon runs from the command line:
+
+    python ScopePy_daemon.py capture.h5
+
+Stop with Ctrl-C. The throughput and the time taken by each write to the
+file are printed at exit.
+
+"""
+
+#==============================================================================
+#%% License
+#==============================================================================
+
+"""
+Copyright 2015 John Bainbridge
+
+This file is part of ScopePy.
+
+ScopePy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+ScopePy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+#======================================================================
+#%% Imports
+#======================================================================
+import sys
+import time
+import signal
+import argparse
+import logging
+
+import numpy as np
+import h5py
+
+import ScopePy_protocol as protocol
+import ScopePy_ingest as ingest
+import ScopePy_streamlog as streamlog
+import ScopePy_udp as udp
+
+
+#==============================================================================
+#%% Logger
+#==============================================================================
+# create logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Add do nothing handler
+logger.addHandler(logging.NullHandler())
+
+
+#======================================================================
+#%% Constants
+#======================================================================
+
+# Group in the HDF5 file that holds the channels
+CHANNEL_GROUP = 'channels'
+
+# Rows per HDF5 chunk
+DEFAULT_CHUNK_ROWS = 65536
+
+# gzip compression level, 0 for no compression
+DEFAULT_COMPRESSION_LEVEL = 1
+
+# Time between writes to the file [s]
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+# Times per second the received data is taken from the servers, as the
+# GUI's ingest rate
+DEFAULT_DRAIN_RATE = 30
+
+
+#======================================================================
+#%% Functions
+#======================================================================
+
+def datasetName(channelLabel):
+    """
+    Name for a channel's dataset
+
+    '/' separates groups in HDF5 so it can't be used in a name
+
+    """
+
+    name = channelLabel.replace('/','_')
+
+    if name in ['','.']:
+        name = '_'
+
+    return name
+
+
+
+def percentile(values,percent):
+
+    if not values:
+        return 0.0
+
+    return float(np.percentile(values,percent))
+
+
+
+#======================================================================
+#%% HDF5 recorder
+#======================================================================
+
+class HDF5Recorder():
+    """
+    Appends channel data to an HDF5 file
+
+    Data is collected with add() and written with flush().
+
+    """
+
+    def __init__(self,filename,chunkRows=DEFAULT_CHUNK_ROWS,
+                 compression=DEFAULT_COMPRESSION_LEVEL):
+        """
+        Inputs
+        ---------
+        filename : str
+            HDF5 file, added to if it already exists
+        chunkRows : int
+            rows per HDF5 chunk
+        compression : int
+            gzip level, 0 for no compression
+
+        """
+
+        self.filename = filename
+        self.chunkRows = chunkRows
+        self.compression = compression
+
+        self.file = h5py.File(filename,'a')
+        self.group = self.file.require_group(CHANNEL_GROUP)
+
+        if 'created' not in self.file.attrs:
+            self.file.attrs['created'] = time.strftime('%Y-%m-%d %H:%M:%S')
+            self.file.attrs['recorder'] = 'ScopePy_daemon'
+
+        # Datasets by (channelLabel,column names)
+        self.datasets = {}
+
+        # Arrays waiting to be written, by channel
+        self.pending = {}
+
+        # Counters
+        self.rows = 0
+        self.bytes = 0
+        self.flushTimes = []
+
+
+    def add(self,channels):
+        """
+        Collect data to be written at the next flush
+
+        The arrays are kept until then, not copied.
+
+        Inputs
+        --------
+        channels : list of (channelLabel,array) tuples
+
+        """
+
+        for channelLabel,data in channels:
+            self.pending.setdefault(channelLabel,[]).append(data)
+
+
+    def flush(self):
+        """
+        Write the collected data to the file
+
+        Outputs
+        --------
+        duration : float
+            time taken [s]
+
+        """
+
+        if not self.pending:
+            return 0.0
+
+        start = time.perf_counter()
+
+        for channelLabel,arrays in self.pending.items():
+            self.append(channelLabel,arrays)
+
+        self.pending = {}
+        self.file.flush()
+
+        duration = time.perf_counter() - start
+        self.flushTimes.append(duration)
+
+        return duration
+
+
+    def append(self,channelLabel,arrays):
+        """
+        Append arrays to a channel's dataset
+
+        Consecutive arrays with the same type are written together.
+
+        """
+
+        group = []
+
+        for data in arrays + [None]:
+
+            if group and (data is None or data.dtype != group[0].dtype):
+                block = np.concatenate(group) if len(group) > 1 else group[0]
+                self.appendBlock(channelLabel,block)
+                group = []
+
+            if data is not None:
+                group.append(np.asarray(data))
+
+
+    def appendBlock(self,channelLabel,data):
+
+        dataset = self.dataset(channelLabel,data.dtype)
+
+        if data.dtype != dataset.dtype:
+            data = data.astype(dataset.dtype)
+
+        start = dataset.shape[0]
+        dataset.resize((start+len(data),))
+        dataset[start:] = data
+
+        self.rows += len(data)
+        self.bytes += data.nbytes
+
+
+    def dataset(self,channelLabel,dtype):
+        """
+        Get or make the dataset for a channel
+
+        If the columns of a channel change, the new columns go into a new
+        dataset, named with a number on the end.
+
+        """
+
+        key = (channelLabel,dtype.names)
+
+        if key in self.datasets:
+            return self.datasets[key]
+
+        name = datasetName(channelLabel)
+        number = 1
+
+        while name in self.group:
+            existing = self.group[name]
+
+            if existing.attrs.get('channel_name') == channelLabel and existing.dtype.names == dtype.names:
+                # From a previous recording
+                self.datasets[key] = existing
+                return existing
+
+            number += 1
+            name = "%s (%d)" % (datasetName(channelLabel),number)
+
+        options = {}
+
+        if self.compression:
+            options = {'compression':'gzip','compression_opts':self.compression,
+                       'shuffle':True}
+
+        dataset = self.group.create_dataset(name,shape=(0,),maxshape=(None,),
+                                            dtype=dtype,chunks=(self.chunkRows,),
+                                            **options)
+        dataset.attrs['channel_name'] = channelLabel
+
+        logger.debug("HDF5Recorder: New dataset [%s]" % dataset.name)
+
+        self.datasets[key] = dataset
+
+        return dataset
+
+
+    def close(self):
+        """
+        Write anything left and close the file
+
+        """
+
+        if self.file is None:
+            return
+
+        self.flush()
+        self.file.close()
+        self.file = None
+
+
+
+#======================================================================
+#%% Daemon
+#======================================================================
+
+class RecordDaemon():
+    """
+    Receives data and records it without the GUI
+
+    """
+
+    def __init__(self,filename,host='0.0.0.0',port=streamlog.DEFAULT_PORT,udpPort=udp.UDP_PORT,
+                 flushInterval=DEFAULT_FLUSH_INTERVAL,chunkRows=DEFAULT_CHUNK_ROWS,
+                 compression=DEFAULT_COMPRESSION_LEVEL):
+        """
+        Inputs
+        ---------
+        filename : str
+            HDF5 file to record to
+        host : str
+            address to listen on
+        port : int
+            TCP port
+        udpPort : int
+            UDP port, 0 for no UDP
+        flushInterval : float
+            time between writes to the file [s]
+        chunkRows, compression :
+            see HDF5Recorder
+
+        """
+
+        self.host = host
+        self.port = port
+        self.udpPort = udpPort
+        self.flushInterval = flushInterval
+
+        self.recorder = HDF5Recorder(filename,chunkRows,compression)
+
+        # Receivers, as used by the GUI
+        self.tcpServer = ingest.IngestServer(protocol.decodePacket)
+        self.udpReceiver = udp.UdpReceiver() if udpPort else None
+
+        self.running = False
+        self.startTime = None
+        self.stopTime = None
+
+
+    def start(self):
+        """
+        Start receiving
+
+        Outputs
+        --------
+        success : bool
+
+        """
+
+        if not self.tcpServer.start(self.host,self.port):
+            logger.error("RecordDaemon: Failed to start TCP server : %s" % self.tcpServer.errorString())
+            return False
+
+        if self.udpReceiver is not None and not self.udpReceiver.start(self.host,self.udpPort):
+            logger.error("RecordDaemon: Failed to start UDP receiver : %s" % self.udpReceiver.errorString())
+            self.tcpServer.stop()
+            return False
+
+        self.running = True
+        self.startTime = time.monotonic()
+
+        return True
+
+
+    def stop(self,*args):
+        """
+        Make run() return, can be used as a signal handler
+
+        """
+
+        self.running = False
+
+
+    def run(self,duration=None):
+        """
+        Record until stop() is called
+
+        Inputs
+        --------
+        duration : float or None
+            stop after this time [s]
+
+        """
+
+        drainInterval = 1.0/DEFAULT_DRAIN_RATE
+        lastFlush = time.monotonic()
+
+        while self.running:
+            time.sleep(drainInterval)
+
+            self.drain()
+
+            now = time.monotonic()
+
+            if now - lastFlush >= self.flushInterval:
+                self.recorder.flush()
+                lastFlush = now
+
+            if duration is not None and now - self.startTime >= duration:
+                self.running = False
+
+
+    def drain(self):
+        """
+        Pass received data to the recorder
+
+        """
+
+        self.recorder.add(self.tcpServer.drain())
+
+        # Commands are for the GUI, there's nothing to record
+        for command_packet in self.tcpServer.drainCommands():
+            logger.debug("Daemon: ignoring command packet [%d bytes]" % len(command_packet))
+
+        if self.udpReceiver is not None:
+            self.recorder.add(self.udpReceiver.drain())
+
+
+    def close(self):
+        """
+        Stop receiving, write everything received and close the file
+
+        """
+
+        self.tcpServer.stop()
+
+        if self.udpReceiver is not None:
+            self.udpReceiver.stop()
+
+        self.drain()
+        self.recorder.close()
+
+        self.stopTime = time.monotonic()
+
+
+    def report(self):
+        """
+        Throughput and write times
+
+        Outputs
+        --------
+        report : str
+
+        """
+
+        elapsed = max((self.stopTime or time.monotonic()) - (self.startTime or time.monotonic()),1e-9)
+        flushTimes = [t*1000 for t in self.recorder.flushTimes]
+
+        lines = ["Recorded to %s" % self.recorder.filename,
+                 "  Time            : %.1f s" % elapsed,
+                 "  Channels        : %d" % len(self.recorder.datasets),
+                 "  Rows            : %d" % self.recorder.rows,
+                 "  Data            : %.1f MB (%.2f MB/s)" % (self.recorder.bytes/1e6,self.recorder.bytes/1e6/elapsed),
+                 "  TCP packets     : %d (%d bad)" % (self.tcpServer.packets,self.tcpServer.decodeErrors),
+                 "  Writes          : %d" % len(flushTimes),
+                 "  Write time [ms] : mean %.1f, 99%% %.1f, max %.1f" % (np.mean(flushTimes) if flushTimes else 0.0,
+                                                                        percentile(flushTimes,99),
+                                                                        max(flushTimes) if flushTimes else 0.0)]
+
+        if self.udpReceiver is not None:
+            for stats in self.udpReceiver.stats():
+                lines.append("  UDP %-11s : %d datagrams, %d lost" % (stats['source'],stats['datagrams'],stats['lost']))
+
+        return "\n".join(lines)
+
+
+
+#======================================================================
+#%% Command line
+#======================================================================
+
+def main(argv=None):
+    """
+    Run the daemon from the command line
+
+    """
+
+    parser = argparse.ArgumentParser(description="Record data sent to ScopePy to an HDF5 file, without the GUI")
+    parser.add_argument('filename',help="HDF5 file, added to if it exists")
+    parser.add_argument('--host',default='0.0.0.0',help="address to listen on")
+    parser.add_argument('--port',type=int,default=streamlog.DEFAULT_PORT,help="TCP port")
+    parser.add_argument('--udp-port',type=int,default=udp.UDP_PORT,help="UDP port, 0 for no UDP")
+    parser.add_argument('--flush-interval',type=float,default=DEFAULT_FLUSH_INTERVAL,
+                        help="time between writes to the file [s]")
+    parser.add_argument('--compression',type=int,default=DEFAULT_COMPRESSION_LEVEL,
+                        help="gzip level 0-9, 0 for none")
+    parser.add_argument('--duration',type=float,default=None,help="stop after this time [s]")
+
+    args = parser.parse_args(argv)
+
+    daemon = RecordDaemon(args.filename,args.host,args.port,args.udp_port,
+                          args.flush_interval,compression=args.compression)
+
+    if not daemon.start():
+        return 1
+
+    signal.signal(signal.SIGINT,daemon.stop)
+    signal.signal(signal.SIGTERM,daemon.stop)
+
+    print("Recording to %s, Ctrl-C to stop" % args.filename)
+
+    try:
+        daemon.run(args.duration)
+    finally:
+        daemon.close()
+
+    print(daemon.report())
+
+    return 0
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,476 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 28 10:07:44 2026
+
+@author: john
+
+ScopePy lazy math expressions
+===================================
+
+Works out chains of element-wise math functions in one pass, without
+making a full size array for every step.
+
+A math function is traced by calling it with channels whose x and y are
+Expressions instead of arrays. Arithmetic and numpy ufuncs on an
+Expression don't calculate anything, they build a graph of the
+operations. Math channels of math channels put their graphs together,
+so dB of the difference of two channels becomes one graph from the
+original channel data.
+
+The Evaluator then runs the graph over blocks of BLOCK_SIZE points, so
+the data stays in the cache. Each operation writes into a scratch buffer
+of one block (the ufunc out= argument), and buffers are used again as
+soon as the operation that needs them is done. A chain of N operations
+uses a few block sized buffers instead of N full size arrays.
+
+Only element-wise functions can be traced. Anything else, e.g. np.diff,
+indexing, len() or if statements on the data, stops the trace and the
+function is run on the arrays as normal.
+
+Example
+--------
+>>> x,y = trace(mathFunction,[TracedChannel(channel,Input(x_data),Input(y_data))])
+>>> evaluator = Evaluator([x,y])
+>>> evaluator.evaluate([x_out,y_out])
+
+This module has no Qt code.
+
+"""
+
+#==============================================================================
+#%% License
+#==============================================================================
+
+"""
+Copyright 2015 John Bainbridge
+
+This file is part of ScopePy.
+
+ScopePy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+ScopePy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+#======================================================================
+#%% Imports
+#======================================================================
+import logging
+
+import numpy as np
+
+
+#==============================================================================
+#%% Logger
+#==============================================================================
+# create logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Add do nothing handler
+logger.addHandler(logging.NullHandler())
+
+
+#======================================================================
+#%% Constants
+#======================================================================
+
+# Points worked out at a time, 64 kB per float64 buffer so a few buffers
+# stay in the L2 cache
+BLOCK_SIZE = 8192
+
+# Kinds of argument in an Evaluator step
+ARG_INPUT = 'input'
+ARG_BUFFER = 'buffer'
+ARG_CONSTANT = 'constant'
+
+
+class ExpressionError(Exception):
+    """
+    The function can't be worked out as an expression
+
+    """
+
+    pass
+
+
+
+#======================================================================
+#%% Expressions
+#======================================================================
+
+def _isConstant(value):
+    """
+    True for scalars that can go into an expression
+
+    Bools are left out, in a traced function they are the result of a
+    comparison that wasn't traced, e.g. of something that isn't an
+    Expression.
+
+    """
+
+    return (isinstance(value,(int,float,complex,np.number)) and
+            not isinstance(value,(bool,np.bool_)))
+
+
+def _forward(ufunc):
+
+    return lambda self,other : ufunc(self,other)
+
+
+def _reverse(ufunc):
+
+    return lambda self,other : ufunc(other,self)
+
+
+class Expression():
+    """
+    Base of the expression graph nodes
+
+    Supports the arithmetic and comparison operators and numpy ufuncs
+    with one output, called with Expressions and numeric scalars.
+    Everything else numpy does with an Expression raises TypeError.
+
+    == and != make Operations too, so Expressions are hashed by identity.
+
+    """
+
+    def __array_ufunc__(self,ufunc,method,*inputs,**kwargs):
+
+        if method != '__call__' or kwargs or ufunc.nout != 1:
+            return NotImplemented
+
+        # Arrays would need to be split into blocks too
+        for value in inputs:
+            if not isinstance(value,Expression) and not _isConstant(value):
+                return NotImplemented
+
+        return Operation(ufunc,inputs)
+
+
+    def __array_function__(self,func,types,args,kwargs):
+
+        return NotImplemented
+
+
+    def __bool__(self):
+
+        raise ExpressionError("Expression: no truth value until it is evaluated")
+
+
+    __add__ = _forward(np.add)
+    __radd__ = _reverse(np.add)
+    __sub__ = _forward(np.subtract)
+    __rsub__ = _reverse(np.subtract)
+    __mul__ = _forward(np.multiply)
+    __rmul__ = _reverse(np.multiply)
+    __truediv__ = _forward(np.true_divide)
+    __rtruediv__ = _reverse(np.true_divide)
+    __floordiv__ = _forward(np.floor_divide)
+    __rfloordiv__ = _reverse(np.floor_divide)
+    __mod__ = _forward(np.remainder)
+    __rmod__ = _reverse(np.remainder)
+    __pow__ = _forward(np.power)
+    __rpow__ = _reverse(np.power)
+    __lt__ = _forward(np.less)
+    __le__ = _forward(np.less_equal)
+    __gt__ = _forward(np.greater)
+    __ge__ = _forward(np.greater_equal)
+    __eq__ = _forward(np.equal)
+    __ne__ = _forward(np.not_equal)
+    __hash__ = object.__hash__
+
+    def __neg__(self):
+
+        return np.negative(self)
+
+
+    def __pos__(self):
+
+        return self
+
+
+    def __abs__(self):
+
+        return np.absolute(self)
+
+
+
+class Input(Expression):
+    """
+    Array going into the expression, e.g. the y data of a channel
+
+    """
+
+    def __init__(self,array):
+
+        self.array = np.asarray(array)
+
+        if self.array.ndim != 1:
+            raise ExpressionError("Input: only 1D arrays can be used")
+
+
+    def __repr__(self):
+
+        return "<Input %d points>" % len(self.array)
+
+
+
+class Operation(Expression):
+    """
+    A ufunc applied to Expressions and scalars
+
+    """
+
+    def __init__(self,ufunc,inputs):
+
+        self.ufunc = ufunc
+        self.inputs = inputs
+
+
+    def __repr__(self):
+
+        return "<Operation %s>" % self.ufunc.__name__
+
+
+
+#======================================================================
+#%% Tracing
+#======================================================================
+
+class TracedChannel():
+    """
+    Channel given to a math function when it is traced
+
+    x and y are Expressions, anything else is passed on to the channel.
+    Functions that need the data array itself can't be traced.
+
+    """
+
+    def __init__(self,channel,x,y):
+
+        self.channel = channel
+        self.x = x
+        self.y = y
+
+
+    def data(self,**kwargs):
+
+        raise ExpressionError("TracedChannel: function uses the data array")
+
+
+    def __getattr__(self,name):
+
+        return getattr(self.channel,name)
+
+
+
+def trace(mathFunction,channels):
+    """
+    Get the output of a math function as Expressions
+
+    Anything in the function that isn't an Expression or a numeric
+    scalar, e.g. a bool from comparing something else, stops the trace.
+
+    Inputs
+    --------
+    mathFunction : MathFunction
+    channels : list of TracedChannel
+
+    Outputs
+    --------
+    x_out,y_out : Expressions, or None if the function can't be traced
+
+    """
+
+    try:
+        output = mathFunction(channels)
+
+    except Exception as error:
+        logger.debug("trace: [%s] is not element-wise : %s" % (getattr(mathFunction,'name',''),error))
+        return
+
+    if (not isinstance(output,tuple) or len(output) != 2 or
+            not all([isinstance(value,Expression) for value in output])):
+        return
+
+    return output
+
+
+
+#======================================================================
+#%% Evaluation
+#======================================================================
+
+class Evaluator():
+    """
+    Expressions compiled into a list of steps that work on one block of
+    points at a time
+
+    Each operation gets a scratch buffer the size of a block. A buffer is
+    given to another operation once everything that uses it has run.
+
+    """
+
+    def __init__(self,outputs):
+        """
+        Inputs
+        --------
+        outputs : list of Expressions
+
+        Raises ExpressionError if the inputs are not all the same length.
+
+        """
+
+        self.outputs = outputs
+
+        # Operations in the order they are worked out, inputs first
+        operations = []
+        self.inputs = []
+        seen = set()
+
+        stack = [(node,False) for node in reversed(outputs)]
+
+        while stack:
+            node,ready = stack.pop()
+
+            if ready:
+                operations.append(node)
+                continue
+
+            if id(node) in seen:
+                continue
+
+            seen.add(id(node))
+
+            if isinstance(node,Input):
+                self.inputs.append(node)
+                continue
+
+            stack.append((node,True))
+            stack.extend([(value,False) for value in reversed(node.inputs)
+                          if isinstance(value,Expression)])
+
+        lengths = set([len(node.array) for node in self.inputs])
+
+        if len(lengths) != 1:
+            raise ExpressionError("Evaluator: inputs are different lengths %s" % sorted(lengths))
+
+        self.length = lengths.pop()
+
+        self._compile(operations)
+
+
+    def _compile(self,operations):
+        """
+        Make the steps and give out the buffers
+
+        """
+
+        # Output types, from the operations on empty arrays
+        probe = {id(node):node.array[:0] for node in self.inputs}
+
+        for node in operations:
+            probe[id(node)] = node.ufunc(*[probe[id(value)] if isinstance(value,Expression)
+                                           else value for value in node.inputs])
+
+        # Number of times each node is used, outputs are kept until they
+        # have been copied
+        uses = {}
+
+        for node in operations:
+            for value in node.inputs:
+                if isinstance(value,Expression):
+                    uses[id(value)] = uses.get(id(value),0) + 1
+
+        for node in self.outputs:
+            uses[id(node)] = uses.get(id(node),0) + 1
+
+        # Where each node's values are
+        slots = {id(node):(ARG_INPUT,index) for index,node in enumerate(self.inputs)}
+
+        self.buffer_dtypes = []
+        free = {}
+        self.steps = []
+
+        for node in operations:
+            args = []
+
+            for value in node.inputs:
+                if isinstance(value,Expression):
+                    args.append(slots[id(value)])
+                else:
+                    args.append((ARG_CONSTANT,value))
+
+            # Finished buffers can be used for this result, ufuncs can
+            # write over their own inputs
+            for value in node.inputs:
+                if not isinstance(value,Expression):
+                    continue
+
+                uses[id(value)] -= 1
+                kind,index = slots[id(value)]
+
+                if uses[id(value)] == 0 and kind == ARG_BUFFER:
+                    free.setdefault(self.buffer_dtypes[index],[]).append(index)
+
+            dtype = probe[id(node)].dtype
+
+            if free.get(dtype):
+                index = free[dtype].pop()
+            else:
+                index = len(self.buffer_dtypes)
+                self.buffer_dtypes.append(dtype)
+
+            slots[id(node)] = (ARG_BUFFER,index)
+            self.steps.append((node.ufunc,args,index))
+
+        self.output_slots = [slots[id(node)] for node in self.outputs]
+
+
+    def evaluate(self,targets,block_size=BLOCK_SIZE):
+        """
+        Work out the outputs
+
+        Inputs
+        --------
+        targets : list of numpy arrays
+            one for each output, self.length long. Can be fields of a
+            structured array.
+        block_size : int
+            points worked out at a time
+
+        """
+
+        buffers = [np.empty(min(block_size,self.length),dtype) for dtype in self.buffer_dtypes]
+
+        for start in range(0,self.length,block_size):
+            stop = min(start + block_size,self.length)
+            n = stop - start
+
+            def value(arg):
+
+                kind,ref = arg
+
+                if kind == ARG_INPUT:
+                    return self.inputs[ref].array[start:stop]
+
+                if kind == ARG_BUFFER:
+                    return buffers[ref][:n]
+
+                return ref
+
+            for ufunc,args,index in self.steps:
+                ufunc(*[value(arg) for arg in args],out=buffers[index][:n])
+
+            for target,slot in zip(targets,self.output_slots):
+                target[start:stop] = value(slot)
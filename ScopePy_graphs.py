@@ -65,6 +65,8 @@ along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
 import sys
 import logging
 import copy
+import time
+import weakref
 from collections import OrderedDict
 
 import numpy as np
@@ -123,6 +125,30 @@ DEFAULT_GRID = np.arange(-10.0,10.0,2)
 # Maximum number of markers
 MAX_MARKERS = 4
 
+# Marker rendering
+# Markers are drawn as dots when the fraction of the plot area they would
+# cover is more than MARKER_DENSITY_LIMIT, i.e. when they would overlap
+MARKER_DENSITY_LIMIT = 0.5
+
+# Size in pixels of dots used instead of markers
+MARKER_DOT_SIZE_PX = 2
+
+# Maximum number of marker pixmaps kept
+MARKER_CACHE_SIZE = 256
+
+# Maximum number of tick labels kept by each axis, several screens full
+# so scrolling back and forth still uses the cache
+TICK_LABEL_CACHE_SIZE = 128
+
+# Default maximum number of times a second that graphs are redrawn when
+# channel data arrives
+DEFAULT_PLOT_FRAME_RATE = 30
+
+# Size in bytes of Qt's qreal type, used for filling QPolygonF directly
+# from numpy arrays. This is a double except on some embedded Qt builds,
+# see qrealSize().
+SIZEOF_QREAL = 8
+
 
 DEBUG = False
 
@@ -136,6 +162,191 @@ floating point coordinates such as QPointF(), QRectF()
 """
 
 
+#=============================================================================
+#%% Plot update scheduler
+#=============================================================================
+
+class PlotUpdateScheduler(QObject):
+    """
+    Collects requests to redraw channels on graphs and carries them out at
+    a maximum frame rate.
+    
+    When data arrives quickly on many channels, each chunk triggers a 
+    redraw request. Instead of redrawing every time, the channel is marked 
+    as needing a redraw (dirty) and at the next frame each graph redraws its
+    dirty channels once. The first request after an idle period is drawn
+    straight away (on the next pass of the event loop), so slow updates
+    are not delayed.
+    
+    One scheduler is shared by all graphs, see plotUpdateScheduler().
+    
+    Counters
+    ----------
+    requested : number of redraw requests received
+    coalesced : requests that were combined with an earlier request for the
+                same graph, i.e. the redraws saved
+    dropped : requests for graphs that were deleted before the frame
+    frames : number of frames
+    redraws : number of graph redraws
+    
+    """
+    
+    def __init__(self,frame_rate=DEFAULT_PLOT_FRAME_RATE,parent=None):
+        
+        super(PlotUpdateScheduler, self).__init__(parent)
+        
+        # Dirty graphs
+        # Indexed by id of the graph, each entry is a weak reference to 
+        # the graph and a set of channel names
+        self._dirty = OrderedDict()
+        
+        # Frame timer
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self.connect(self._timer,SIGNAL("timeout()"),self.redraw)
+        
+        # Time of last frame
+        self._lastFrame = 0.0
+        
+        self.setFrameRate(frame_rate)
+        self.resetCounters()
+        
+        
+    def setFrameRate(self,frame_rate):
+        """
+        Set the maximum number of frames per second
+        
+        Input
+        -------
+        frame_rate : float
+            frames per second, 0 or None removes the limit
+            
+        """
+        
+        self.frame_rate = frame_rate
+        
+        if frame_rate:
+            self.frame_interval = 1.0/frame_rate
+        else:
+            self.frame_interval = 0.0
+            
+            
+    def resetCounters(self):
+        """
+        Set all the counters to zero
+        """
+        
+        self.requested = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.frames = 0
+        self.redraws = 0
+        
+        
+    def counters(self):
+        """
+        Get the counters as a dictionary
+        """
+        
+        return {'requested':self.requested,
+                'coalesced':self.coalesced,
+                'dropped':self.dropped,
+                'frames':self.frames,
+                'redraws':self.redraws,
+                'pending':len(self._dirty)}
+                
+                
+    def requestUpdate(self,graph,channel_name):
+        """
+        Mark a channel on a graph as needing a redraw
+        
+        Inputs
+        --------
+        graph : GraphWidget or any object with a redrawChannels() method
+        channel_name : str
+        
+        """
+        
+        self.requested += 1
+        
+        key = id(graph)
+        
+        if key in self._dirty:
+            self.coalesced += 1
+            self._dirty[key][1].add(channel_name)
+        else:
+            self._dirty[key] = (weakref.ref(graph),set([channel_name]))
+            
+        # Start timer for the next frame
+        if not self._timer.isActive():
+            wait = self._lastFrame + self.frame_interval - time.time()
+            self._timer.start(max(int(wait*1000),0))
+            
+            
+    def redraw(self):
+        """
+        Redraw all dirty channels
+        
+        """
+        
+        dirty = self._dirty
+        self._dirty = OrderedDict()
+        
+        self._lastFrame = time.time()
+        self.frames += 1
+        
+        for graph_ref,channel_names in dirty.values():
+            graph = graph_ref()
+            
+            if graph is None:
+                self.dropped += len(channel_names)
+                continue
+                
+            try:
+                graph.redrawChannels(channel_names)
+            except RuntimeError:
+                # Underlying C++ object has been deleted
+                self.dropped += len(channel_names)
+                continue
+                
+            self.redraws += 1
+            
+            
+    def flush(self):
+        """
+        Carry out any pending redraws now
+        """
+        
+        self._timer.stop()
+        
+        if self._dirty:
+            self.redraw()
+            
+            
+            
+# Shared scheduler
+_plot_update_scheduler = None
+
+
+def plotUpdateScheduler():
+    """
+    Get the update scheduler shared by all graphs, creating it if needed
+    
+    Output
+    --------
+    scheduler : PlotUpdateScheduler
+    
+    """
+    
+    global _plot_update_scheduler
+    
+    if _plot_update_scheduler is None:
+        _plot_update_scheduler = PlotUpdateScheduler()
+        
+    return _plot_update_scheduler
+    
+    
+    
 #=============================================================================
 #%% Graph widget class definition
 #=============================================================================
@@ -220,6 +431,20 @@ class GraphWidget(QGraphicsView):
         self.horizontalMarkers = {}
         self.verticalMarkers = {}
         
+        # Layered rendering
+        # -------------------
+        # Static items are cached, see setLayeredRendering()
+        self.layeredRendering = True
+        
+        # Update scheduling
+        # -------------------
+        # Channel updates are collected and redrawn at a maximum frame rate
+        self.updateScheduler = plotUpdateScheduler()
+        
+        frame_rate = getattr(self.preferences,'plotFrameRate',None)
+        if frame_rate is not None:
+            self.updateScheduler.setFrameRate(frame_rate)
+        
         
         
         # Axis scales
@@ -339,6 +564,80 @@ class GraphWidget(QGraphicsView):
         self.addLegend()
         self.hideLegend()
         
+        # Cache the items that don't change when data arrives
+        self.setLayeredRendering(self.layeredRendering)
+        
+        
+    # Layered rendering
+    # ================
+    
+    def staticItems(self):
+        """
+        List of items that only change when the plot is resized, restyled or 
+        the axes change. i.e. everything except the data.
+        
+        """
+        
+        items = [self.background,self.plotBox,
+                 self.xCentreAxis,self.yCentreAxis,
+                 self.xBottomAxis,self.xTopAxis,
+                 self.yLeftAxis,self.yRightAxis]
+                 
+        if hasattr(self,'legend'):
+            items.append(self.legend)
+            
+        return items
+        
+        
+    def setLayeredRendering(self,enable):
+        """
+        Turn layered rendering on or off
+        
+        In layered rendering the static items (background, plot box, grid,
+        axes and legend) are drawn into cached pixmaps, so when data 
+        arrives only the data series are redrawn. The caches are refreshed 
+        by invalidateStaticLayers() when the plot is resized, restyled or
+        the axes change.
+        
+        Input
+        --------
+        enable : bool
+        
+        """
+        
+        self.layeredRendering = enable
+        
+        if enable:
+            cacheMode = QGraphicsItem.DeviceCoordinateCache
+        else:
+            cacheMode = QGraphicsItem.NoCache
+            
+        for item in self.staticItems():
+            item.setCacheMode(cacheMode)
+            
+            
+    def invalidateStaticLayers(self):
+        """
+        Force the static items to be redrawn, refreshing their caches
+        
+        """
+        
+        if not hasattr(self,'background'):
+            return
+            
+        for item in self.staticItems():
+            item.update()
+            
+            
+    def resizeEvent(self,event):
+        """
+        Reimplemented to refresh the cached layers
+        """
+        
+        super(GraphWidget, self).resizeEvent(event)
+        
+        self.invalidateStaticLayers()
+        
     
     # Axis limits
     # ================
@@ -504,10 +803,7 @@ class GraphWidget(QGraphicsView):
         #self.channelSeries[channel.name].drawMarkers = False
         
         # Update scaling
-        data = channel.data(chunkMode=chunkMode)
-        
-        if not channel.isEmpty:
-            self.updateScaling(data[channel.x_axis],data[channel.y_axis])
+        self.updateScalingFromStats(self.channelSeries[channel.name].stats)
             
         # Update legend
         self.legend.updateLegend()
@@ -534,11 +830,7 @@ class GraphWidget(QGraphicsView):
         
         # Update the scaling values with the remaining channels
         self.clearScaling()
-        
-        for ch_series in self.channelSeries.values():
-            channel = ch_series.channel
-            data = channel.data(chunkMode=ch_series.chunkMode)
-            self.updateScaling(data[channel.x_axis],data[channel.y_axis])
+        self.updateScalingFromChannels()
             
             
         
@@ -637,15 +929,56 @@ class GraphWidget(QGraphicsView):
             
         """
         
+        if len(xdata) == 0 or len(ydata) == 0:
+            return
+            
+        self.updateScalingLimits(np.min(xdata),np.max(xdata),
+                                 np.min(ydata),np.max(ydata))
+        
+        
+    def updateScalingFromStats(self,stats):
+        """
+        Update the min and max axis values from channel statistics
+        
+        Input
+        ------
+        stats : ChunkSummary from ScopePyChannel.dataStats() or None
+        
+        """
+        
+        if stats is None or stats.count == 0:
+            return
+            
+        self.updateScalingLimits(stats.xmin,stats.xmax,stats.ymin,stats.ymax)
+        
+        
+    def updateScalingFromChannels(self):
+        """
+        Update the min and max axis values from the statistics of all 
+        channels on the graph
+        
+        """
+        
+        for ch_series in self.channelSeries.values():
+            self.updateScalingFromStats(ch_series.getStats())
+            
+            
+    def updateScalingLimits(self,xdata_min,xdata_max,ydata_min,ydata_max):
+        """
+        Update the min and max axis values if the new limits are outside
+        the current ones
+        
+        Inputs
+        -----------
+        xdata_min,xdata_max,ydata_min,ydata_max : float
+            limits of a new series
+            
+        """
+        
         # Update x
         # ----------------
         update_x = False
         
-        # Get min and max for x
-        xdata_min = min(xdata)
-        xdata_max = max(xdata)
-        
-        
         if xdata_min < self.coordinateManager.x_data_min_DC:
             self.coordinateManager.x_data_min_DC = xdata_min
             update_x = True
@@ -664,11 +997,6 @@ class GraphWidget(QGraphicsView):
         # ----------------
         update_y = False
         
-        # Get min and max for x
-        ydata_min = min(ydata)
-        ydata_max = max(ydata)
-        
-        
         if ydata_min < self.coordinateManager.y_data_min_DC:
             self.coordinateManager.y_data_min_DC = ydata_min
             update_y = True
@@ -692,6 +1020,43 @@ class GraphWidget(QGraphicsView):
         self.coordinateManager.reset_data_min_max()
         
         
+    def dataLimits(self):
+        """
+        Get the min and max of all the data on the graph
+        
+        Channels use their statistics, other series use their data.
+        
+        Output
+        --------
+        limits : tuple or None
+            (xmin, xmax, ymin, ymax) or None if there is no data
+            
+        """
+        
+        limits = [np.inf,-np.inf,np.inf,-np.inf]
+        
+        def update(xmin,xmax,ymin,ymax):
+            limits[0] = min(limits[0],xmin)
+            limits[1] = max(limits[1],xmax)
+            limits[2] = min(limits[2],ymin)
+            limits[3] = max(limits[3],ymax)
+            
+        for ch_series in self.channelSeries.values():
+            stats = ch_series.stats
+            if stats is not None and stats.count > 0:
+                update(stats.xmin,stats.xmax,stats.ymin,stats.ymax)
+                
+        for series in self.graphSeries.values():
+            if len(series.x_DC) > 0 and len(series.y_DC) > 0:
+                update(np.min(series.x_DC),np.max(series.x_DC),
+                       np.min(series.y_DC),np.max(series.y_DC))
+                       
+        if limits[0] > limits[1]:
+            return
+            
+        return tuple(limits)
+        
+        
             
             
     def update(self):
@@ -741,9 +1106,11 @@ class GraphWidget(QGraphicsView):
         
     def updateChannel(self,channel_name):
         """
-        Force a channel to re-draw
+        Request a channel to re-draw
         
-        This is normally connected to a signal from the ScopePy_channel class
+        This is normally connected to a signal from the ScopePy_channel class.
+        The redraw is not done immediately, it is passed to the update
+        scheduler which combines all the requests that arrive between frames.
         
         Input
         -------
@@ -754,9 +1121,27 @@ class GraphWidget(QGraphicsView):
         if not channel_name in self.channelSeries:
             return
             
+        self.updateScheduler.requestUpdate(self,channel_name)
         
-        self.channelSeries[channel_name].updateFromChannel()
-        self.channelSeries[channel_name].forceUpdate()
+        
+    def redrawChannels(self,channel_names):
+        """
+        Re-draw channels immediately
+        
+        Called by the update scheduler
+        
+        Input
+        -------
+        channel_names: list or set of str
+        
+        """
+        
+        for channel_name in channel_names:
+            if not channel_name in self.channelSeries:
+                continue
+                
+            self.channelSeries[channel_name].updateFromChannel()
+            self.channelSeries[channel_name].forceUpdate()
 
 
     def recalculate_graphs(self):
@@ -838,21 +1223,21 @@ class GraphWidget(QGraphicsView):
         
         logger.debug("Autoscale selected")
         
-        self.coordinateManager.autoscale()
+        self.coordinateManager.autoscale(fromData=True)
         
         
     def autoscaleX(self):
         
         logger.debug("Autoscale X selected")
         
-        self.coordinateManager.autoscale('x')
+        self.coordinateManager.autoscale('x',fromData=True)
         
         
     def autoscaleY(self):
         
         logger.debug("Autoscale Y selected")
         
-        self.coordinateManager.autoscale('y')
+        self.coordinateManager.autoscale('y',fromData=True)
         
         
         
@@ -949,6 +1334,9 @@ class GraphWidget(QGraphicsView):
         self.legend.backgroundColour = getColor('legend-backgroundColor',QColor(Qt.black).name())
         self.legend.textColour = getColor('legend-textColor',QColor(Qt.lightGray).name())
         self.legend.fontsize = int(styles['standard_plot'].get('legend-fontsize',8))
+        
+        # Redraw cached items in the new style
+        self.invalidateStaticLayers()
       
       
 
@@ -1095,6 +1483,10 @@ class Axis(QGraphicsItem):
         self.axisColor = Qt.gray
         self.axisTransparency = 255
         
+        # Cache of tick label text, see staticTickLabel()
+        self._tickLabelCache = OrderedDict()
+        self._tickLabelFontKey = None
+        
         self.tickLabelColor = Qt.gray
         self.tickLabelTransparency = 255
         
@@ -1430,6 +1822,52 @@ class Axis(QGraphicsItem):
         
             
         
+    def staticTickLabel(self,text,painter):
+        """
+        Get a QStaticText for a tick label
+        
+        The text layout is cached so labels that don't change are not laid
+        out again on every paint. The cache is emptied if the font changes.
+        When streaming the labels change as the axis scrolls, so only the
+        TICK_LABEL_CACHE_SIZE most recently used labels are kept.
+        
+        Inputs
+        --------
+        text : str
+            label text
+        painter : QPainter
+            painter with the font set
+            
+        Output
+        --------
+        static_text : QStaticText
+        
+        """
+        
+        font = painter.font()
+        font_key = font.key()
+        
+        if font_key != self._tickLabelFontKey:
+            self._tickLabelCache = OrderedDict()
+            self._tickLabelFontKey = font_key
+            
+        if text in self._tickLabelCache:
+            self._tickLabelCache.move_to_end(text)
+            return self._tickLabelCache[text]
+            
+        static_text = QStaticText(text)
+        static_text.setTextFormat(Qt.PlainText)
+        static_text.prepare(painter.transform(),font)
+        
+        # Store, throwing away the least recently used when the cache is full
+        self._tickLabelCache[text] = static_text
+        
+        if len(self._tickLabelCache) > TICK_LABEL_CACHE_SIZE:
+            self._tickLabelCache.popitem(last=False)
+            
+        return static_text
+        
+        
     def drawAxisTickLabels(self,painter):
         """Draw the tick labels on the axis
         The label text comes from the coordinate manager fully formatted
@@ -1484,8 +1922,8 @@ class Axis(QGraphicsItem):
             tickLabel = tickLabelList[index]
             
             # Get actual label width and height
-            labelRect = painter.boundingRect(tickLabelRect,tickLabelAlignment
-                ,tickLabel)
+            staticLabel = self.staticTickLabel(tickLabel,painter)
+            labelRect = QRectF(QPointF(0,0),staticLabel.size())
 
             txtWidth = labelRect.width()
             txtHeight = labelRect.height()
@@ -1507,8 +1945,7 @@ class Axis(QGraphicsItem):
             
             
             
-            painter.drawText(QRectF(xpos,ypos,txtWidth,txtHeight),
-                             tickLabelAlignment,tickLabel)
+            painter.drawStaticText(QPointF(xpos,ypos),staticLabel)
             
             if DEBUG:
                 painter.setPen(QColor(Qt.red))
@@ -2884,21 +3321,21 @@ class PlotBox(QGraphicsItem):
         
         logger.debug("Autoscale selected")
         
-        self.coordinateManager.autoscale()
+        self.coordinateManager.autoscale(fromData=True)
         
         
     def autoscaleX(self):
         
         logger.debug("Autoscale X selected")
         
-        self.coordinateManager.autoscale('x')
+        self.coordinateManager.autoscale('x',fromData=True)
         
         
     def autoscaleY(self):
         
         logger.debug("Autoscale Y selected")
         
-        self.coordinateManager.autoscale('y')
+        self.coordinateManager.autoscale('y',fromData=True)
         
     def copyPlotSignal(self):
         
@@ -2977,15 +3414,22 @@ class GraphSeries(QGraphicsItem):
         
         # Points to plot
         # ---------------
-        # List of QPoints that holds the local coordinates of every point in
-        # the series
-        self.xy_points = []
+        # QPolygonF that holds the local coordinates of every point in
+        # the series, also kept as numpy arrays
+        self.xy_points = QPolygonF()
+        self.x_IC = np.zeros(0)
+        self.y_IC = np.zeros(0)
         
         # Marker list
         # ----------------
-        # Used to hold all marker items
+        # Not used for drawing, markers are stamped from a cached pixmap at
+        # the points in self.x_IC,self.y_IC. See drawMarkerBatch()
         self.markerList = []
         
+        # Key identifying the marker shape for the pixmap cache
+        self.markerShapeKey = None
+        self.markerIsDot = False
+        
         # Create list TODO : remove when markers are working
 #        if self.drawMarkers:
 #            self.create_markers()
@@ -3095,11 +3539,78 @@ class GraphSeries(QGraphicsItem):
         painter.setPen(pen)
         painter.setBrush(brush)
         
+        self.drawMarkerBatch(painter,pen,brush)
         
-        for marker in self.markerList:
-            painter.save()
-            painter.drawPath(marker)
-            painter.restore()
+        
+    def drawMarkerBatch(self,painter,penColour,brushColour):
+        """
+        Draw all the markers in one go
+        
+        The marker shape is drawn once into a pixmap (cached between paints)
+        and the pixmap is stamped at every point. This is done in device 
+        (pixel) coordinates. If the markers would overlap they are drawn as
+        dots instead.
+        
+        Inputs
+        ---------
+        painter : QPainter
+        penColour,brushColour : QColor
+            colours for the marker outline and fill
+            
+        """
+        
+        if len(self.x_IC) == 0:
+            return
+            
+        if self.markerShapeKey is None:
+            self.create_markers()
+            
+        # Convert points to device coordinates
+        # --------------------------------------
+        world = painter.worldTransform()
+        x_PX,y_PX = mapArrays(world,self.x_IC,self.y_IC)
+        
+        # Marker size in pixels
+        width_PX = abs(world.m11())*self.markerSize
+        height_PX = abs(world.m22())*self.markerSize
+        
+        # Only draw markers that can be seen
+        clip_PX = world.mapRect(self.clipRect)
+        
+        visible = ((x_PX >= clip_PX.left() - width_PX) & 
+                   (x_PX <= clip_PX.right() + width_PX) &
+                   (y_PX >= clip_PX.top() - height_PX) &
+                   (y_PX <= clip_PX.bottom() + height_PX))
+                   
+        x_PX = x_PX[visible]
+        y_PX = y_PX[visible]
+        
+        n_markers = len(x_PX)
+        if n_markers == 0:
+            return
+            
+        # Choose dots or markers
+        # ------------------------
+        # Use dots when the markers would cover too much of the plot
+        clip_area = max(clip_PX.width()*clip_PX.height(),1.0)
+        density = n_markers*width_PX*height_PX/clip_area
+        
+        painter.save()
+        painter.resetTransform()
+        
+        if density > MARKER_DENSITY_LIMIT or self.markerIsDot:
+            pen = QPen(penColour)
+            pen.setWidthF(max(min(width_PX,height_PX,MARKER_DOT_SIZE_PX),1))
+            painter.setPen(pen)
+            painter.drawPoints(array2polygon(x_PX,y_PX))
+            
+        else:
+            pixmap = markerPixmap(self.markerShape,self.markerShapeKey,
+                                  width_PX,height_PX,penColour,brushColour)
+                                  
+            drawPixmapBatch(painter,pixmap,x_PX,y_PX)
+            
+        painter.restore()
         
 
             
@@ -3122,12 +3633,13 @@ class GraphSeries(QGraphicsItem):
         
         #self.x_IC,self.y_IC = self.coordinateManager.data2item(self,self.x_DC,self.y_DC)
         
-        self.xy_points = self.coordinateManager.data2itemQPoints(self,self.x_DC,self.y_DC)
+        x_DC,y_DC = self.plotData()
+        
+        self.xy_points,self.x_IC,self.y_IC = self.coordinateManager.data2itemPolygon(self,x_DC,y_DC)
         
         # Create a path for the lines
         self.lines = QPainterPath()
-        #self.lines.addPolygon(array2polygon(self.x_IC,self.y_IC))
-        self.lines.addPolygon(QPolygonF(self.xy_points))
+        self.lines.addPolygon(self.xy_points)
         
         # Set recalculate to False
         # Must be set by external event, such as axis range changing
@@ -3136,6 +3648,22 @@ class GraphSeries(QGraphicsItem):
         #self.prepareGeometryChange()
         
         
+    def plotData(self):
+        """
+        Get the x and y data to be drawn
+        
+        Derived classes can re-implement this to draw a reduced version of
+        the data.
+        
+        Outputs
+        ----------
+        x_DC,y_DC : numpy arrays
+        
+        """
+        
+        return self.x_DC,self.y_DC
+        
+        
     def forceUpdate(self):
         """
         Reimplemented update function.
@@ -3159,24 +3687,21 @@ class GraphSeries(QGraphicsItem):
     # ------------------------------------------------------------------------
     
     def create_markers(self):
-        """Create all markers required from GraphMarker items
+        """Prepare markers for drawing
+        
+        Markers are drawn from the item coordinates of the points 
+        (self.x_IC,self.y_IC) by drawMarkerBatch(), so all that's needed here
+        is to identify the marker shape, which may have changed.
         """
         
         if not self.drawMarkers:
             return
         
-        # Initialise list
-        self.markerList = []
+        self.markerShapeKey = markerShapeKey(self.markerShape)
         
-        for Point in self.xy_points:            
-            tr = QTransform()
-            tr.translate(Point.x(),Point.y())
-            # TODO : aspect ratio conversion needed here
-            tr.scale(self.markerSize,self.markerSize)
-            
-            finalPath = tr.map(self.markerShape)
-            
-            self.markerList.append(finalPath)
+        # Dot markers have no size, they are always drawn as points
+        shape_rect = self.markerShape.boundingRect()
+        self.markerIsDot = shape_rect.width() == 0 and shape_rect.height() == 0
             
             
         
@@ -3235,6 +3760,18 @@ class ChannelGraphSeries(GraphSeries):
         
         self.chunkMode = kwargs.get('chunkMode',ch.CHUNK_MODE_ALL)
         
+        # Statistics of the data being plotted
+        self.stats = None
+        
+        # What was drawn last time, used to append new chunks to the
+        # existing lines. See appendLines()
+        self.renderState = None
+        self.plotDecimated = False
+        
+        # Item coordinates of the lines, with room to add new points
+        self.lineBuffer = LineBuffer()
+        self._xy_points = None
+        
         self.getData()
         
         # Initialise base class
@@ -3296,47 +3833,317 @@ class ChannelGraphSeries(GraphSeries):
             
         """
         
-        # Get chunks that are in the correct range
-        indexList = [x for x in chunkIndexList if x < self.channel.chunks]
+        # Get chunks that are in the correct range
+        indexList = [x for x in chunkIndexList if x < self.channel.chunks]
+        
+        # TODO : Do some sort of checking on this
+        
+        if indexList:
+            self.chunkSelection = indexList
+            
+        
+     
+        
+    def getData(self):
+        """
+        Get data from channel according to chunk mode
+        
+        """
+        
+        # Handle empty channels
+        if self.channel.isEmpty:
+            self.x_DC = []
+            self.y_DC = []
+            self.stats = None
+            logger.debug('ChannelSeries getData: returning empty data')
+            return
+            
+            
+        data = self.channel.data(chunkMode=self.chunkMode,chunkList=self.chunkSelection)
+        
+        self.x_DC = data[self.channel.x_axis]
+        self.y_DC = data[self.channel.y_axis]
+        
+        # Get min/max etc from the channel's chunk statistics rather than
+        # going through all the data
+        self.getStats()
+        
+        # Update limits for coordinate manager
+        # TODO : This is a bit kludgy needs some rethinking
+        if hasattr(self,'coordinateManager') and self.stats is not None and self.stats.count > 0:
+            self.coordinateManager.updateDataMinMax(self.stats.xmin,
+                                                    self.stats.xmax,
+                                                    self.stats.ymin,
+                                                    self.stats.ymax)
+                                                    
+                                                    
+    def getStats(self):
+        """
+        Get statistics of the channel data for the current chunk mode
+        
+        Output
+        --------
+        stats : ChunkSummary or None if the channel is empty
+        
+        """
+        
+        if self.channel.isEmpty:
+            self.stats = None
+        else:
+            self.stats = self.channel.dataStats(chunkMode=self.chunkMode,
+                                                chunkList=self.chunkSelection)
+                                                
+        return self.stats
+                                                    
+        
+        
+    
+    def plotData(self):
+        """
+        Get the x and y data to be drawn
+        
+        Long channels are reduced to a few points per pixel using the 
+        channel's min/max index, peaks are kept. Otherwise all the data is
+        drawn.
+        
+        Outputs
+        ----------
+        x_DC,y_DC : numpy arrays
+        
+        """
+        
+        # Only worth reducing when there are more points than pixels
+        cm = self.coordinateManager
+        n_px = cm.plotBoxWidth_PX()
+        
+        self.plotDecimated = False
+        
+        if self.stats is None or self.stats.count <= 2*n_px or not self.stats.x_monotonic:
+            return self.x_DC,self.y_DC
+            
+        reduced = self.channel.decimatedData(cm.x_min_DC,cm.x_max_DC,n_px,
+                                             chunkMode=self.chunkMode)
+        
+        if reduced is None:
+            return self.x_DC,self.y_DC
+            
+        self.plotDecimated = True
+        
+        return reduced
+        
+        
+    def create_lines(self):
+        """
+        Create the graph lines, only converting new chunks if possible
+        
+        When the channel has had chunks added since the last time and the
+        axes have not been rescaled, the new points are appended to the 
+        existing path. Otherwise the whole path is rebuilt.
+        
+        """
+        
+        # Chunks being drawn this time
+        chunkList = None
+        if not self.channel.isEmpty:
+            chunkList = self.channel.selectChunks(self.chunkMode,self.chunkSelection)
+            
+        key = self.renderKey()
+        
+        if not self.appendLines(key,chunkList):
+            super(ChannelGraphSeries, self).create_lines()
+            self.renderState = None
+            
+            # Copy into a buffer that new points can be added to
+            self.lineBuffer.reset(self.x_IC,self.y_IC)
+            self.x_IC = self.lineBuffer.x
+            self.y_IC = self.lineBuffer.y
+            
+            if chunkList and ch.isContiguous(chunkList):
+                self.renderState = {'key':key,
+                                    'first_chunk':chunkList[0],
+                                    'last_chunk':chunkList[-1],
+                                    'generation':self.channel.concat_cache.generation,
+                                    'points':len(self.x_DC),
+                                    'stale':0,
+                                    'decimated':self.plotDecimated}
+                                    
+                                    
+    @property
+    def xy_points(self):
+        """
+        Polygon of the points in the series
+        
+        Only made from x_IC,y_IC when it is needed, appendLines() adds new
+        points to the path directly.
+        
+        """
+        
+        if self._xy_points is None:
+            self._xy_points = array2polygon(self.x_IC,self.y_IC)
+            
+        return self._xy_points
+        
+        
+    @xy_points.setter
+    def xy_points(self,points):
+        
+        self._xy_points = points
+        
+        
+    def renderKey(self):
+        """
+        Summary of the data to item coordinate conversion
+        
+        Output
+        --------
+        key : tuple
+            (x scale, y scale, x offset, y offset) in item coordinates
+            
+        """
+        
+        x_IC,y_IC = self.coordinateManager.data2item(self,np.array([0.0,1.0]),
+                                                          np.array([0.0,1.0]))
+                                                          
+        return (x_IC[1]-x_IC[0],y_IC[1]-y_IC[0],x_IC[0],y_IC[0])
+        
+        
+    def appendLines(self,key,chunkList):
+        """
+        Add the points from new chunks onto the existing lines
+        
+        Used for streaming data. The lines can be extended if:
         
-        # TODO : Do some sort of checking on this
+        * the axis scales have not changed since the last draw. If only the
+          x axis has moved (a sliding rollover window) the existing path 
+          is shifted across.
+        * the chunks drawn last time are the start of the current chunks, 
+          apart from chunks dropped off the front in rollover mode, which
+          must be out of sight.
+        * the data was not decimated last time and won't be now. Ring 
+          buffer (rollover) storage is never decimated, so large rollover
+          windows are always appended.
         
-        if indexList:
-            self.chunkSelection = indexList
+        Points from dropped chunks are left in the path until there are
+        more of them than live points, then the path is rebuilt.
+        
+        Inputs
+        --------
+        key : tuple
+            from renderKey()
+        chunkList : list of chunk numbers
+            chunks to be drawn
             
+        Outputs
+        --------
+        appended : bool
+            False if the lines need to be rebuilt
+            
+        """
         
-     
+        state = self.renderState
         
-    def getData(self):
-        """
-        Get data from channel according to chunk mode
+        if state is None or not chunkList or state['decimated']:
+            return False
+            
+        if self.chunkMode not in [ch.CHUNK_MODE_ALL,ch.CHUNK_MODE_ROLLOVER]:
+            return False
+            
+        if state['generation'] != self.channel.concat_cache.generation:
+            return False
+            
+        if not ch.isContiguous(chunkList):
+            return False
+            
+        first = chunkList[0]
+        last = chunkList[-1]
         
-        """
+        if first < state['first_chunk'] or last < state['last_chunk'] or first > state['last_chunk']:
+            return False
+            
+        # Only x offset is allowed to change
+        dx = renderShift(state['key'],key)
+        if dx is None:
+            return False
+            
+        # Let plotData() reduce long data, if it can
+        n_px = self.coordinateManager.plotBoxWidth_PX()
+        if self.stats is None:
+            return False
+            
+        if (self.stats.count > 2*n_px and self.stats.x_monotonic and 
+                self.channel.canDecimate(self.chunkMode)):
+            return False
+            
+        # Work out what has been dropped and added
+        # -----------------------------------------
+        if first > state['first_chunk']:
+            kept = self.channel.stats.summary(list(range(first,state['last_chunk']+1)))
+            n_kept = kept.count if kept is not None else 0
+        else:
+            n_kept = state['points']
+            
+        n_dropped = state['points'] - n_kept
+        n_new = len(self.x_DC) - n_kept
+        stale = state['stale']
         
-        # Handle empty channels
-        if self.channel.isEmpty:
-            self.x_DC = []
-            self.y_DC = []
-            logger.debug('ChannelSeries getData: returning empty data')
-            return
+        if n_dropped < 0 or n_new < 0 or len(self.x_IC) != stale + state['points']:
+            return False
             
+        if stale + n_dropped > n_kept:
+            return False
             
-        data = self.channel.data(chunkMode=self.chunkMode,chunkList=self.chunkSelection)
+        # Dropped points must not be visible after shifting. Older stale
+        # points can only come back into view if the axis moves left
+        check_start = 0 if dx > 0 else stale
+        check_x = self.x_IC[check_start:stale+n_dropped] + dx
+        check_y = self.y_IC[check_start:stale+n_dropped]
         
-        self.x_DC = data[self.channel.x_axis]
-        self.y_DC = data[self.channel.y_axis]
+        if len(check_x) > 0:
+            clip = self.coordinateManager.itemClipRect(self)
+            
+            visible = ((check_x >= clip.left()) & (check_x <= clip.right()) &
+                       (check_y >= clip.top()) & (check_y <= clip.bottom()))
+                       
+            if visible.any():
+                return False
+                
+        # Update the lines
+        # -----------------
+        # x_IC,y_IC are views of self.lineBuffer, so they follow the shift
+        # and the new points
+        if dx != 0:
+            self.lines.translate(dx,0)
+            self.lineBuffer.shift(dx)
+            
+        if n_new > 0:
+            x_new,y_new = self.coordinateManager.data2item(self,self.x_DC[-n_new:],
+                                                                self.y_DC[-n_new:])
+                                                                
+            # Join onto the last point of the existing line
+            n_old = self.lineBuffer.count
+            self.lineBuffer.append(x_new,y_new)
+            
+            start = max(n_old-1,0)
+            self.lines.addPolygon(array2polygon(self.lineBuffer.x[start:],
+                                                self.lineBuffer.y[start:]))
+                                                
+        self.x_IC = self.lineBuffer.x
+        self.y_IC = self.lineBuffer.y
+        
+        # Polygon made again from x_IC,y_IC if anything asks for it
+        self._xy_points = None
+            
+        state.update({'key':key,
+                      'first_chunk':first,
+                      'last_chunk':last,
+                      'points':len(self.x_DC),
+                      'stale':stale + n_dropped})
+                      
+        self.recalculate = False
         
-        # Update limits for coordinate manager
-        # TODO : This is a bit kludgy needs some rethinking
-        if hasattr(self,'coordinateManager'):
-            self.coordinateManager.updateDataMinMax(self.x_DC.min(),
-                                                    self.x_DC.max(),
-                                                    self.y_DC.min(),
-                                                    self.y_DC.max())
-                                                    
+        return True
         
         
-    
     def updateChunkData(self):
         """
         General update when the chunk mode changes
@@ -3831,6 +4638,9 @@ class GraphLegend(QGraphicsItem):
             
         self.calculateCellDimensions()
         
+        # Redraw, this also refreshes the cached image of the legend
+        self.update()
+        
         
         
     
@@ -4858,20 +5668,20 @@ class CoordinateManager():
         if xmin < self.x_data_min_DC:
             self.x_data_min_DC = xmin
             
-        if xmax < self.x_data_max_DC:
+        if xmax > self.x_data_max_DC:
             self.x_data_max_DC = xmax
             
             
         if ymin < self.y_data_min_DC:
             self.y_data_min_DC = ymin
             
-        if ymax < self.y_data_max_DC:
+        if ymax > self.y_data_max_DC:
             self.y_data_max_DC = ymax
             
         
         
         
-    def autoscale(self,axis=None):
+    def autoscale(self,axis=None,fromData=False):
         """
         Autoscale the individual or both axes
         
@@ -4885,8 +5695,27 @@ class CoordinateManager():
             None - autoscales both axes
             'x' or 'y' autoscales individual axis
             
+        fromData : bool
+            True : recalculate the min and max values from the data currently
+                   on the graph (uses channel statistics)
+            False : use the stored min and max values
+            
         """
         
+        # Get limits of data currently plotted
+        # ===========================================
+        # Channels carry statistics of their data so the limits can be 
+        # recalculated without going through the data.
+        if fromData and hasattr(self.viewport,'dataLimits'):
+            limits = self.viewport.dataLimits()
+            
+            if limits is not None:
+                if axis not in ['y','Y']:
+                    self.x_data_min_DC,self.x_data_max_DC = limits[0:2]
+                    
+                if axis not in ['x','X']:
+                    self.y_data_min_DC,self.y_data_max_DC = limits[2:4]
+        
         # Check for min/max values being the same
         # ===========================================
         if self.x_data_min_DC == self.x_data_max_DC:
@@ -5121,6 +5950,8 @@ class CoordinateManager():
         self.x_grid_minor_DC = np.arange(newScale.niceMin,newScale.niceMax,newScale.minorTickSpacing)
         
         self.update_label_format("x")
+        
+        self.invalidateStaticLayers()
             
 
     def update_y_axis(self,new_min_DC,new_max_DC):
@@ -5149,6 +5980,18 @@ class CoordinateManager():
         self.y_grid_minor_DC = np.arange(newScale.niceMin,newScale.niceMax,newScale.minorTickSpacing)
         
         self.update_label_format("y")
+        
+        self.invalidateStaticLayers()
+        
+        
+    def invalidateStaticLayers(self):
+        """
+        Tell the graph that the axes have changed so cached items need
+        redrawing
+        """
+        
+        if hasattr(self.viewport,'invalidateStaticLayers'):
+            self.viewport.invalidateStaticLayers()
 
 
     # Convenience functions for updating the axis limits
@@ -5322,21 +6165,63 @@ class CoordinateManager():
         # Convert to scene coordinates
         x_data_SC,y_data_SC = self.data2scene(x_data_DC,y_data_DC)
         
-        # Use QGraphicsItem.mapFromScene() to convert to item's
-        # local coordinate system
-        nData = len(x_data_SC)
-        x_data_IC = np.zeros(nData)
-        y_data_IC = np.zeros(nData)
+        # Convert to item's local coordinate system
+        # This is the same as QGraphicsItem.mapFromScene() but the transform
+        # is applied to the whole array at once
+        scene2item = self.scene2itemTransform(graphics_item)
         
-        for iP in range(nData):
-            pt_IC = graphics_item.mapFromScene(QPointF(x_data_SC[iP],y_data_SC[iP]))
-            
-            x_data_IC[iP] = pt_IC.x()
-            y_data_IC[iP] = pt_IC.y()
-            
+        return mapArrays(scene2item,x_data_SC,y_data_SC)
+        
+        
+    def scene2itemTransform(self,graphics_item):
+        """
+        Get the transform from scene coordinates to the local coordinates of 
+        a QGraphicsItem. Equivalent to QGraphicsItem.mapFromScene()
+        
+        Inputs
+        ------------
+        graphics_item = instance of QGraphicsItem
+        
+        Output
+        --------
+        transform = QTransform
+        
+        """
+        
+        transform,invertible = graphics_item.sceneTransform().inverted()
+        
+        # Non-invertible transforms mean the item has been scaled to
+        # nothing, use identity as mapFromScene() does
+        if not invertible:
+            return QTransform()
             
-        # Return arrays
-        return x_data_IC,y_data_IC
+        return transform
+        
+        
+    def data2itemPolygon(self,graphics_item,x_data_DC,y_data_DC):
+        """
+        Map data coordinates into a QPolygonF in QGraphicsItem local coordinate
+        system [IC].
+        
+        The conversion is done on whole arrays and the polygon is filled 
+        directly from the arrays, so no QPointF objects are created.
+        
+        Inputs
+        ------------
+        graphics_item = instance of QGraphicsItem
+        x_data_DC, y_data_DC = x,y coordinates to be converted. Both are arrays
+                                or lists
+                                
+        Outputs
+        --------
+        polygon = QPolygonF of points in item coordinates
+        x_data_IC,y_data_IC = numpy arrays of item coordinates
+        
+        """
+        
+        x_data_IC,y_data_IC = self.data2item(graphics_item,x_data_DC,y_data_DC)
+        
+        return array2polygon(x_data_IC,y_data_IC),x_data_IC,y_data_IC
         
         
     def data2itemQPoints(self,graphics_item,x_data_DC,y_data_DC):
@@ -5360,21 +6245,10 @@ class CoordinateManager():
         
         """
         
-        # Convert to scene coordinates
-        x_data_SC,y_data_SC = self.data2scene(x_data_DC,y_data_DC)
-        
-        # Use QGraphicsItem.mapFromScene() to convert to item's
-        # local coordinate system
-        nData = len(x_data_SC)
-        
-        QPoint_list = []
-        for iP in range(nData):
-            QPoint_list.append(graphics_item.mapFromScene(QPointF(x_data_SC[iP],y_data_SC[iP])) )
-            
-            
+        polygon,x_IC,y_IC = self.data2itemPolygon(graphics_item,x_data_DC,y_data_DC)
             
         # Return list of QPoints
-        return QPoint_list
+        return list(polygon)
         
         
         
@@ -5506,6 +6380,19 @@ class CoordinateManager():
         
         return QRectF(pb_x_SC,pb_y_SC,pb_width_SC,pb_height_SC)
     
+    def plotBoxWidth_PX(self):
+        """
+        Width of the plot box in pixels
+        
+        Output
+        ------
+        width_PX = int
+        
+        """
+        
+        return max(int(self.plot_box_width_NC*self.viewport.width()),1)
+        
+        
     def viewport2sceneRect(self):
         """ Return the viewport rectangle in scene coordinates
         
@@ -7424,10 +8311,42 @@ class NiceScale:
 
 #%%
 
+def qrealSize():
+    """
+    Find the size of Qt's qreal type
+    
+    Reads back the memory of a polygon with a known point, first as 
+    doubles then as floats.
+    
+    Outputs
+    ---------
+    size = 8 or 4 bytes, None if neither matches
+    
+    """
+    
+    poly = QPolygonF([QPointF(1.5,-2.25)])
+    
+    for size,dtype in [(8,np.float64),(4,np.float32)]:
+        ptr = poly.data()
+        ptr.setsize(2*size)
+        
+        if list(np.frombuffer(ptr,dtype=dtype)) == [1.5,-2.25]:
+            return size
+            
+            
+try:
+    SIZEOF_QREAL = qrealSize() or SIZEOF_QREAL
+except Exception:
+    logger.debug("qrealSize: can't read QPolygonF memory, assuming %d byte qreal" % SIZEOF_QREAL)
+
+
 def array2polygon(x,y):
     """
     Convert an array or list of coordinates to a QPolygonF
     
+    The polygon is created at the right size and its memory is filled 
+    directly from the arrays, instead of creating a QPointF for every point.
+    
     Inputs
     ---------
     x,y = coordinates
@@ -7436,14 +8355,282 @@ def array2polygon(x,y):
     -----------
     poly = QPolygonF
     """
-    #nPoints = len(x)
-    #assert nPoints==len(y),"array2polygon : x and y are different lengths"
     
-    #point_list = [QPointF(x[iP],y[iP]) for iP in range(nPoints)]
+    x = np.asarray(x,dtype=float)
+    y = np.asarray(y,dtype=float)
+    
+    nPoints = len(x)
+    assert nPoints==len(y),"array2polygon : x and y are different lengths"
+    
+    poly = QPolygonF(nPoints)
+    
+    if nPoints == 0:
+        return poly
+    
+    # The polygon's data is a contiguous array of (x,y) pairs of qreal, 
+    # which is a double on desktop platforms, see qrealSize()
+    ptr = poly.data()
+    ptr.setsize(2*nPoints*SIZEOF_QREAL)
+    
+    if SIZEOF_QREAL == 8:
+        buffer = np.frombuffer(ptr,dtype=np.float64)
+    else:
+        buffer = np.frombuffer(ptr,dtype=np.float32)
+        
+    buffer[0::2] = x
+    buffer[1::2] = y
+        
+    return poly
+    
+    
+def renderShift(old_key,key):
+    """
+    Work out if existing lines can be reused after the axes have changed
+    
+    Inputs
+    ---------
+    old_key,key = render keys from ChannelGraphSeries.renderKey(), for 
+                  the last draw and this draw
+    
+    Outputs
+    -----------
+    dx = x shift in item coordinates to apply to the old lines, None if
+         the scales or y offset have changed and the lines must be rebuilt
+    """
+    
+    if key[0] != old_key[0] or key[1] != old_key[1] or key[3] != old_key[3]:
+        return None
+        
+    return key[2] - old_key[2]
+    
+    
+class LineBuffer():
+    """
+    x,y coordinates of a line, in arrays with room to add points on the end
+    
+    When the arrays are full they are copied into arrays twice the size, so
+    the cost of adding points is proportional to the number of new points
+    not the length of the line.
+    
+    x and y are views into the arrays, they must be read again after the
+    line is changed. shift() moves the points in place, so views handed
+    out earlier move with it, unless append() has since copied the points
+    into bigger arrays. Views from before a copy keep the old points.
+    
+    Example usage
+    --------------
+    >>> buffer = LineBuffer()
+    >>> buffer.reset(x_IC,y_IC)
+    >>> buffer.append(x_new,y_new)
+    
+    """
+    
+    def __init__(self):
+        
+        self.x_buffer = np.zeros(0)
+        self.y_buffer = np.zeros(0)
+        
+        # Number of points in use
+        self.count = 0
+        
+        
+    @property
+    def x(self):
+        
+        return self.x_buffer[:self.count]
+        
+        
+    @property
+    def y(self):
+        
+        return self.y_buffer[:self.count]
+        
+        
+    def reset(self,x,y):
+        """
+        Replace the line with a copy of x,y
+        """
+        
+        self.x_buffer = np.array(x,dtype=float)
+        self.y_buffer = np.array(y,dtype=float)
+        self.count = len(self.x_buffer)
+        
+        
+    def append(self,x,y):
+        """
+        Add points to the end of the line
+        """
+        
+        n = len(x)
+        
+        if self.count + n > len(self.x_buffer):
+            self._grow(max(2*len(self.x_buffer),self.count + n))
+            
+        self.x_buffer[self.count:self.count+n] = x
+        self.y_buffer[self.count:self.count+n] = y
+        self.count += n
+        
+        
+    def shift(self,dx):
+        """
+        Move the line along the x axis, in place
+        """
+        
+        self.x_buffer[:self.count] += dx
+        
+        
+    def _grow(self,capacity):
+        
+        for name in ['x_buffer','y_buffer']:
+            new_buffer = np.empty(capacity)
+            new_buffer[:self.count] = getattr(self,name)[:self.count]
+            setattr(self,name,new_buffer)
+            
+            
+def markerShapeKey(path):
+    """
+    Make a hashable key that identifies a marker shape
+    
+    Input
+    -------
+    path = QPainterPath of the marker shape
+    
+    Output
+    -------
+    key = tuple of the path elements
+    
+    """
+    
+    key = []
+    
+    for index in range(path.elementCount()):
+        element = path.elementAt(index)
+        key.append((int(element.type),round(element.x,6),round(element.y,6)))
+        
+    return tuple(key)
+    
+    
+# Cache of marker pixmaps, see markerPixmap()
+_marker_pixmaps = OrderedDict()
+    
+    
+def markerPixmap(shape,shapeKey,width_PX,height_PX,penColour,brushColour):
+    """
+    Get a pixmap of a marker
+    
+    Pixmaps are cached for each combination of shape, size and colour, so
+    each marker is only drawn once.
+    
+    Inputs
+    --------
+    shape = QPainterPath of marker, with unit size centred on (0,0)
+    shapeKey = key for shape from markerShapeKey()
+    width_PX,height_PX = size of marker in pixels
+    penColour,brushColour = QColor for outline and fill
+    
+    Output
+    --------
+    pixmap = QPixmap with the marker in the centre
+    
+    """
+    
+    # Sizes are rounded to 1/4 pixel so that small zoom changes still 
+    # use the cache
+    width_PX = round(width_PX*4)/4
+    height_PX = round(height_PX*4)/4
+    
+    key = (shapeKey,width_PX,height_PX,penColour.rgba(),brushColour.rgba())
+    
+    if key in _marker_pixmaps:
+        return _marker_pixmaps[key]
+        
+    # Draw marker
+    # -------------
+    # Leave a border for the outline
+    pix_width = int(np.ceil(width_PX)) + 4
+    pix_height = int(np.ceil(height_PX)) + 4
+    
+    pixmap = QPixmap(pix_width,pix_height)
+    pixmap.fill(Qt.transparent)
+    
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setPen(penColour)
+    painter.setBrush(brushColour)
+    painter.translate(pix_width/2,pix_height/2)
+    painter.scale(width_PX,height_PX)
+    painter.drawPath(shape)
+    painter.end()
+    
+    # Store, throwing away the oldest when the cache is full
+    _marker_pixmaps[key] = pixmap
+    
+    if len(_marker_pixmaps) > MARKER_CACHE_SIZE:
+        _marker_pixmaps.popitem(last=False)
+        
+    return pixmap
+    
+    
+def drawPixmapBatch(painter,pixmap,x,y):
+    """
+    Draw a pixmap centred on each of a set of points
+    
+    Inputs
+    --------
+    painter = QPainter
+    pixmap = QPixmap
+    x,y = numpy arrays of point coordinates in the painter's coordinates
+    
+    """
+    
+    if hasattr(painter,'drawPixmapFragments'):
+        # Draw all in one call, fragments are positioned by their centres
+        source = QRectF(pixmap.rect())
+        
+        fragments = [QPainter.PixmapFragment.create(QPointF(xc,yc),source) 
+                     for xc,yc in zip(x.tolist(),y.tolist())]
+                                      
+        painter.drawPixmapFragments(fragments,pixmap)
+        
+    else:
+        # Older Qt, draw individually from the top left corners
+        x = x - pixmap.width()/2
+        y = y - pixmap.height()/2
+        
+        for xp,yp in zip(x.tolist(),y.tolist()):
+            painter.drawPixmap(QPointF(xp,yp),pixmap)
+    
+    
+def mapArrays(transform,x,y):
+    """
+    Apply a QTransform to arrays of coordinates
+    
+    Gives the same result as calling transform.map() on each point.
+    
+    Inputs
+    ---------
+    transform = QTransform
+    x,y = numpy arrays of coordinates
+    
+    Outputs
+    -----------
+    x_mapped,y_mapped = numpy arrays of transformed coordinates
+    
+    """
+    
+    x = np.asarray(x,dtype=float)
+    y = np.asarray(y,dtype=float)
     
-    point_list = [QPointF(xv,yv) for xv,yv in zip(x.tolist(),y.tolist())]
+    x_mapped = transform.m11()*x + transform.m21()*y + transform.dx()
+    y_mapped = transform.m12()*x + transform.m22()*y + transform.dy()
+    
+    # Perspective transforms
+    if transform.isAffine():
+        return x_mapped,y_mapped
         
-    return QPolygonF(point_list)
+    w = transform.m13()*x + transform.m23()*y + transform.m33()
+    
+    return x_mapped/w,y_mapped/w
     
 #%% Colours
 
@@ -0,0 +1,640 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:45:19 2026
+
+@author: john
+
+ScopePy asyncio ingest server
+===================================
+
+Server that receives data packets from all connections on a single
+background thread, using asyncio, as an alternative to the thread per
+connection ThreadedTcpServer in ScopePy_network.
+
+Decoded data is put on one queue. The GUI takes everything on the queue in
+one go with IngestServer.drain(), once per frame, so there is no locking of
+the channel dictionary on the network side. If the GUI falls behind and the
+queue gets too long, reading from the connections is paused until the
+queue is drained.
+
+This module has no Qt code, the packet decoding is passed in by the caller.
+The Qt wrapper is ScopePy_network.AsyncTcpServer.
+
+Example
+--------
+>>> server = IngestServer(ScopePy_protocol.decodePacket)
+>>> server.start('0.0.0.0',63406)
+>>> ...
+>>> for channelLabel,data in server.drain():
+...     addChannelData((channelLabel,data))
+
+"""
+
+#==============================================================================
+#%% License
+#==============================================================================
+
+"""
+Copyright 2015 John Bainbridge
+
+This file is part of ScopePy.
+
+ScopePy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+ScopePy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+#======================================================================
+#%% Imports
+#======================================================================
+import time
+import logging
+import asyncio
+import threading
+from collections import deque
+
+import ScopePy_protocol as protocol
+import ScopePy_telemetry as telemetry
+
+
+#==============================================================================
+#%% Logger
+#==============================================================================
+# create logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Add do nothing handler
+logger.addHandler(logging.NullHandler())
+
+
+#======================================================================
+#%% Constants
+#======================================================================
+
+# Packet length at the start of every packet
+LENGTH_HEADER = protocol.LENGTH_HEADER
+
+# Size of the buffer used for reading small packets [bytes]. Packets with
+# more than this left to read are read straight into their own buffer.
+INGEST_READ_SIZE = 64*1024
+
+# Reading is paused when more than this many channel arrays are waiting
+# to be drained
+INGEST_MAX_QUEUED = 10000
+
+# Time to wait for the server thread to start [s]
+INGEST_START_TIMEOUT = 5.0
+
+# Largest packet accepted, including the length [bytes]. A longer length is
+# taken to be a corrupt stream, and the connection is closed rather than
+# trying to allocate the memory.
+MAX_PACKET_SIZE = 512*1024*1024
+
+
+#======================================================================
+#%% Exceptions
+#======================================================================
+
+# Raised for packets that can't be read, see ScopePy_protocol
+PacketError = protocol.PacketError
+
+
+def checkPacketLength(packetLength):
+    """
+    Check the length read from the start of a packet
+
+    Inputs
+    --------
+    packetLength : int
+        total length of the packet including the length itself
+
+    Raises PacketError if the length is shorter than the length header or
+    longer than MAX_PACKET_SIZE.
+
+    """
+
+    if packetLength < LENGTH_HEADER.size:
+        raise PacketError("Packet length [%d] is too short" % packetLength)
+
+    if packetLength > MAX_PACKET_SIZE:
+        raise PacketError("Packet length [%d] is more than the maximum [%d]" %
+                          (packetLength,MAX_PACKET_SIZE))
+
+
+#======================================================================
+#%% Packet reader
+#======================================================================
+
+class PacketReader():
+    """
+    Splits a stream of bytes into wrapped packets
+
+    Bytes are fed in as they arrive from a connection, in any sized pieces.
+    Each packet is read into its own buffer, allocated once its length is
+    known, so the data extracted from it can be used without copying.
+    Any number of packets can follow each other on the same connection.
+
+    The rest of a large packet can also be read straight into its buffer,
+    see packetBuffer().
+
+    Example
+    ----------
+    >>> reader = PacketReader()
+    >>> for packet in reader.feed(bytesFromSocket):
+    ...     packetType,remainingPacket = getPacketType(packet)
+
+    """
+
+    def __init__(self):
+
+        # Packet length being read
+        self.header = bytearray(LENGTH_HEADER.size)
+        self.headerBytes = 0
+
+        # Packet being read, None while reading the length
+        self.packet = None
+        self.packetBytes = 0
+
+
+    @property
+    def bytesNeeded(self):
+        """
+        Number of bytes needed to finish the current length or packet
+
+        """
+
+        if self.packet is None:
+            return LENGTH_HEADER.size - self.headerBytes
+        else:
+            return len(self.packet) - self.packetBytes
+
+
+    def feed(self,data):
+        """
+        Add bytes from the connection
+
+        Input
+        -------
+        data : bytes, bytearray or memoryview
+
+        Output
+        -------
+        packets : list of bytearray
+            complete packets with the length stripped off
+
+        Raises PacketError if a packet length is bad, see MAX_PACKET_SIZE.
+        The connection should be closed, the rest of the stream can't be
+        split into packets.
+
+        """
+
+        view = memoryview(data)
+        packets = []
+
+        while len(view) > 0:
+            nBytes = min(len(view),self.bytesNeeded)
+
+            if self.packet is None:
+                # Reading the packet length
+                self.header[self.headerBytes:self.headerBytes+nBytes] = view[:nBytes]
+                self.headerBytes += nBytes
+
+                if self.headerBytes == LENGTH_HEADER.size:
+                    packetLength, = LENGTH_HEADER.unpack(self.header)
+                    checkPacketLength(packetLength)
+
+                    self.packet = bytearray(packetLength - LENGTH_HEADER.size)
+                    self.packetBytes = 0
+                    self.headerBytes = 0
+
+            else:
+                self.packet[self.packetBytes:self.packetBytes+nBytes] = view[:nBytes]
+                self.packetBytes += nBytes
+
+            view = view[nBytes:]
+
+            packets.extend(self.finished())
+
+        return packets
+
+
+    def packetBuffer(self):
+        """
+        Unread part of the packet being read, for reading straight into
+
+        Output
+        -------
+        buffer : memoryview or None
+            None while reading a packet length. Call filled() after
+            writing to it.
+
+        """
+
+        if self.packet is None:
+            return None
+
+        return memoryview(self.packet)[self.packetBytes:]
+
+
+    def filled(self,nBytes):
+        """
+        Count bytes written into packetBuffer()
+
+        Output
+        -------
+        packets : list of bytearray
+            the packet if it is now complete
+
+        """
+
+        self.packetBytes += nBytes
+
+        return self.finished()
+
+
+    def finished(self):
+        """
+        Take the packet if it is complete
+
+        """
+
+        if self.packet is not None and self.packetBytes == len(self.packet):
+            packet = self.packet
+            self.packet = None
+            return [packet]
+
+        return []
+
+
+
+#======================================================================
+#%% Server class
+#======================================================================
+
+class IngestServer():
+    """
+    asyncio server running on its own thread
+
+    """
+
+    def __init__(self,decoder,maxQueued=INGEST_MAX_QUEUED):
+        """
+        Inputs
+        ---------
+        decoder : function
+            decoder(packet) is called with each packet, without the length,
+            as a bytearray. It returns (channels,reply) where channels is a
+            list of (channelLabel,array) tuples to queue and reply is bytes
+            to send back to the client or None. It can also return
+            (channels,reply,commands) where commands is a list of command
+            packets to queue, see drainCommands().
+        maxQueued : int
+            number of queued arrays at which reading is paused
+
+        """
+
+        self.decoder = decoder
+        self.maxQueued = maxQueued
+
+        # Decoded data waiting for the GUI
+        self.queue = deque()
+
+        # Command packets waiting for the GUI
+        self.commands = deque()
+
+        # asyncio objects, only used on the server thread
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.connections = set()
+        self.paused = set()
+
+        # Address actually used, port 0 picks a free port
+        self.port = None
+
+        self.error = None
+
+        # Counters
+        self.connectionCount = 0
+        self.packets = 0
+        self.bytes = 0
+        self.decodeErrors = 0
+        self.pauses = 0
+
+        # Live counters for the API and telemetry panel
+        self.telemetry = telemetry.IngestTelemetry()
+
+
+    @property
+    def isListening(self):
+
+        return self.thread is not None and self.thread.is_alive()
+
+
+    def start(self,host,port):
+        """
+        Start the server thread and listen for connections
+
+        Inputs
+        --------
+        host : str
+            address to listen on
+        port : int
+            port number
+
+        Outputs
+        --------
+        success : bool
+            False if the server could not listen, see errorString()
+
+        """
+
+        if self.isListening:
+            return True
+
+        self.error = None
+        started = threading.Event()
+
+        self.thread = threading.Thread(target=self.run,args=(host,port,started),
+                                       name='IngestServer')
+        self.thread.daemon = True
+        self.thread.start()
+
+        started.wait(INGEST_START_TIMEOUT)
+
+        if self.error is not None:
+            self.thread.join()
+            return False
+
+        return self.isListening
+
+
+    def errorString(self):
+        """
+        Description of the last error
+
+        """
+
+        return str(self.error) if self.error is not None else ''
+
+
+    def stop(self):
+        """
+        Close all connections and stop the server thread
+
+        """
+
+        if not self.isListening:
+            return
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+    def run(self,host,port,started):
+        """
+        Server thread
+
+        """
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        try:
+            self.server = self.loop.run_until_complete(
+                self.loop.create_server(lambda: IngestProtocol(self),host,port))
+
+        except OSError as error:
+            logger.error("IngestServer: Failed to listen on [%s:%d] : %s" % (host,port,error))
+            self.error = error
+            self.loop.close()
+            started.set()
+            return
+
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.debug("IngestServer: Listening on [%s:%d]" % (host,self.port))
+        started.set()
+
+        try:
+            self.loop.run_forever()
+
+        finally:
+            # Shut down
+            self.server.close()
+
+            for connection in list(self.connections):
+                connection.transport.abort()
+
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.loop.close()
+
+            logger.debug("IngestServer: Stopped")
+
+
+    # ------------------------------------------------------------------------
+    # Called on the server thread
+    # ------------------------------------------------------------------------
+
+    def connectionMade(self,connection):
+
+        self.connections.add(connection)
+        self.connectionCount += 1
+        self.telemetry.connectionOpened()
+
+        # Don't start reading a new connection if the queue is full
+        if len(self.queue) > self.maxQueued:
+            self.pauseReading(connection)
+
+
+    def connectionLost(self,connection):
+
+        self.connections.discard(connection)
+        self.paused.discard(connection)
+        self.telemetry.connectionClosed()
+
+
+    def handlePacket(self,connection,packet):
+        """
+        Decode a complete packet and queue the data
+
+        """
+
+        nBytes = len(packet) + LENGTH_HEADER.size
+
+        self.packets += 1
+        self.bytes += nBytes
+
+        start = time.perf_counter()
+
+        try:
+            result = self.decoder(packet)
+            channels,reply = result[:2]
+
+        except Exception as error:
+            self.decodeErrors += 1
+            self.telemetry.decodeError(nBytes)
+            logger.error("IngestServer: Failed to decode packet : %s" % error)
+            return
+
+        self.telemetry.packetReceived(nBytes,time.perf_counter() - start,channels)
+
+        self.queue.extend(channels)
+        self.telemetry.setQueueDepth(len(self.queue))
+
+        if len(result) > 2:
+            self.commands.extend(result[2])
+
+        # Queued before the reply, so the client knows it has arrived
+        if reply:
+            connection.transport.write(reply)
+
+        if len(self.queue) > self.maxQueued:
+            self.pauseReading(connection)
+
+
+    def pauseReading(self,connection):
+
+        if connection not in self.paused:
+            connection.transport.pause_reading()
+            self.paused.add(connection)
+            self.pauses += 1
+
+
+    def resumeReading(self):
+
+        for connection in list(self.paused):
+            if not connection.transport.is_closing():
+                connection.transport.resume_reading()
+
+        self.paused.clear()
+
+
+    # ------------------------------------------------------------------------
+    # Called from the GUI thread
+    # ------------------------------------------------------------------------
+
+    def drain(self):
+        """
+        Take all the data waiting on the queue
+
+        Outputs
+        --------
+        channels : list of (channelLabel,array) tuples
+            in the order they were received
+
+        """
+
+        channels = []
+
+        for index in range(len(self.queue)):
+            channels.append(self.queue.popleft())
+
+        self.telemetry.setQueueDepth(len(self.queue))
+        self.telemetry.advance()
+
+        # Restart any paused connections
+        if self.paused and self.isListening:
+            self.loop.call_soon_threadsafe(self.resumeReading)
+
+        return channels
+
+
+    def drainCommands(self):
+        """
+        Take all the command packets waiting on the queue
+
+        Outputs
+        --------
+        commands : list of bytes
+            command packets without the length or type, in the order they
+            were received
+
+        """
+
+        commands = []
+
+        for index in range(len(self.commands)):
+            commands.append(self.commands.popleft())
+
+        return commands
+
+
+
+#======================================================================
+#%% Connection class
+#======================================================================
+
+class IngestProtocol(asyncio.BufferedProtocol):
+    """
+    Reads wrapped packets from one connection
+
+    Small packets are read into a shared buffer and split up by a
+    PacketReader, so many packets can be read in one go. Once the length of
+    a large packet is known, the rest of it is read straight into its own
+    buffer.
+
+    """
+
+    def __init__(self,server):
+
+        self.server = server
+        self.transport = None
+
+        self.buffer = bytearray(INGEST_READ_SIZE)
+        self.reader = PacketReader()
+
+        # True if the last get_buffer was the packet buffer
+        self.direct = False
+
+
+    def connection_made(self,transport):
+
+        self.transport = transport
+        self.server.connectionMade(self)
+
+
+    def connection_lost(self,exc):
+
+        self.server.connectionLost(self)
+
+
+    def get_buffer(self,sizehint):
+
+        if self.reader.bytesNeeded >= len(self.buffer):
+            packetBuffer = self.reader.packetBuffer()
+
+            if packetBuffer is not None:
+                self.direct = True
+                return packetBuffer
+
+        self.direct = False
+        return self.buffer
+
+
+    def buffer_updated(self,nbytes):
+
+        if self.direct:
+            packets = self.reader.filled(nbytes)
+
+        else:
+            try:
+                packets = self.reader.feed(memoryview(self.buffer)[:nbytes])
+
+            except PacketError as error:
+                logger.error("IngestServer: %s, closing connection" % error)
+                self.transport.abort()
+                return
+
+        for packet in packets:
+            self.server.handlePacket(self,packet)
@@ -0,0 +1,722 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 23 09:14:26 2026
+
+@author: john
+
+ScopePy load generator
+===================================
+
+Runs a number of simulated data sources at the same time, sending to
+ScopePy, and reports the throughput and latency. Use it to get a baseline
+for comparing server types and protocol changes.
+
+Each producer runs in its own process and sends packets for one or more
+channels at a fixed rate (or as fast as it can) using one of the
+protocols:
+
+* v1    : original data packets, no acknowledgement (DATA_PACKET_NOACK)
+* v1ack : original data packets, waiting for each acknowledgement
+* v2    : version 2 frames, with the y column in any numeric type
+* udp   : UDP datagrams
+
+The server is either a ScopePy that is already running (--server external)
+or one started by the load generator in the same way as the GUI does
+(asyncio, threaded or udp). With an in-process server the data is added to
+real ScopePy channels and the report includes:
+
+* end-to-end latency, from the packet being sent to the data being added
+  to a channel. Producers put the time they send a packet in the first x
+  value, so the producers and server must be on the same computer.
+* frame time, the time spent receiving and adding data in each GUI frame
+
+Examples
+---------
+    python ScopePy_loadgen.py --producers 4 --channels 2 --points 10000 --rate 100
+    python ScopePy_loadgen.py --server threaded --protocol v1 --rate 0
+    python ScopePy_loadgen.py --suite
+
+"""
+
+#==============================================================================
+#%% License
+#==============================================================================
+
+"""
+Copyright 2015 John Bainbridge
+
+This file is part of ScopePy.
+
+ScopePy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+ScopePy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+#======================================================================
+#%% Imports
+#======================================================================
+import sys
+import time
+import socket
+import argparse
+import logging
+import multiprocessing
+
+import numpy as np
+
+import ScopePy_network as nw
+import ScopePy_protocol as protocol
+import ScopePy_ingest as ingest
+import ScopePy_udp as udp
+import ScopePy_channel as ch
+
+
+#==============================================================================
+#%% Logger
+#==============================================================================
+# create logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Add do nothing handler
+logger.addHandler(logging.NullHandler())
+
+
+#======================================================================
+#%% Constants
+#======================================================================
+
+PROTOCOLS = ['v1','v1ack','v2','udp']
+
+SERVERS = ['asyncio','threaded','udp','external']
+
+# Time to wait for more data after the producers finish [s]
+DRAIN_TIME = 2.0
+
+# Time allowed for the producers to connect [s]
+CONNECT_TIMEOUT = 10.0
+
+# Spacing of the x values in each packet [s]
+X_STEP = 1e-6
+
+# Standard runs for --suite : (server, protocol, dtype)
+SUITE = [('asyncio','v1','float64'),
+         ('asyncio','v2','float64'),
+         ('asyncio','v2','int16'),
+         ('threaded','v1','float64'),
+         ('threaded','v2','int16'),
+         ('udp','udp','int16')]
+
+
+#======================================================================
+#%% Settings
+#======================================================================
+
+class LoadSettings():
+    """
+    Settings for one load test
+
+    """
+
+    def __init__(self,producers=4,channels=1,points=10000,dtype='float64',
+                 rate=100.0,protocolName='v2',duration=5.0,server='asyncio',
+                 host='127.0.0.1',port=nw.SOCKET_PORT,frameRate=nw.DEFAULT_INGEST_RATE):
+        """
+        Inputs
+        ---------
+        producers : int
+            number of producer processes
+        channels : int
+            channels per producer, packets go to each channel in turn
+        points : int
+            points per packet
+        dtype : str
+            numpy type of the y data, v1 packets are always float64
+        rate : float
+            packets per second from each producer, 0 for as fast as
+            possible
+        protocolName : str
+            one of PROTOCOLS
+        duration : float
+            time the producers send for [s]
+        server : str
+            one of SERVERS
+        host,port :
+            address of the server, port 0 picks a free port for an
+            in-process server
+        frameRate : float
+            GUI frame rate for in-process servers [Hz]
+
+        """
+
+        self.producers = producers
+        self.channels = channels
+        self.points = points
+        self.dtype = 'float64' if protocolName.startswith('v1') else dtype
+        self.rate = rate
+        self.protocolName = protocolName
+        self.duration = duration
+        self.server = server
+        self.host = host
+        self.port = port
+        self.frameRate = frameRate
+
+
+    def __str__(self):
+
+        rate = "max" if not self.rate else "%g/s" % self.rate
+
+        return ("%s server, %s protocol, %d producers x %d channels, %d x %s points, %s" %
+                (self.server,self.protocolName,self.producers,self.channels,
+                 self.points,self.dtype,rate))
+
+
+
+#======================================================================
+#%% Producer
+#======================================================================
+
+def makeData(settings):
+    """
+    Template data for a producer's packets
+
+    """
+
+    dtype = [('x','<f8'),('y',np.dtype(settings.dtype).newbyteorder('<'))]
+
+    data = np.zeros(settings.points,dtype)
+
+    phase = np.linspace(0,4*np.pi,settings.points)
+
+    if data.dtype['y'].kind == 'f':
+        data['y'] = np.sin(phase)
+    else:
+        data['y'] = (np.sin(phase)*min(np.iinfo(data.dtype['y']).max,1000)).astype(data.dtype['y'])
+
+    return data
+
+
+
+def producer(index,settings,port,ready,go,results):
+    """
+    Producer process
+
+    Inputs
+    --------
+    index : int
+        producer number, used in the channel names
+    settings : LoadSettings
+    port : int
+        port to send to
+    ready : multiprocessing.Queue
+        producer puts its index on it when connected
+    go : multiprocessing.Event
+        all producers start sending when this is set
+    results : multiprocessing.Queue
+        producer puts a dict of its results on it at the end
+
+    """
+
+    nw.logger.setLevel(logging.WARNING)
+
+    data = makeData(settings)
+    offsets = np.arange(settings.points)*X_STEP
+
+    labels = ["Load %d.%d" % (index,channel) for channel in range(settings.channels)]
+
+    # Connect
+    # ---------
+    if settings.protocolName == 'udp':
+        sender = udp.UdpSender(settings.host,port)
+        conn = None
+    else:
+        conn = socket.create_connection((settings.host,port))
+        conn.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)
+
+    ready.put(index)
+    go.wait()
+
+    # Send
+    # ------
+    packets = 0
+    nBytes = 0
+    roundTrips = []
+
+    start = time.perf_counter()
+
+    while True:
+        now = time.perf_counter()
+
+        if now - start >= settings.duration:
+            break
+
+        if settings.rate:
+            due = start + packets/settings.rate
+
+            if due > now:
+                time.sleep(due - now)
+
+        label = labels[packets % len(labels)]
+        sendTime = time.time()
+        data['x'] = sendTime + offsets
+
+        if settings.protocolName == 'udp':
+            sender.sendData(label,data)
+            nBytes += data.nbytes
+
+        else:
+            if settings.protocolName == 'v2':
+                packet = protocol.encodeFrame([(label,data)])
+            elif settings.protocolName == 'v1ack':
+                packet = nw.makeDataPacket(label,data['x'],data['y'],['x','y'])
+            else:
+                packet = nw.makeDataPacket(label,data['x'],data['y'],['x','y'],
+                                           packetType=nw.DATA_PACKET_NOACK)
+
+            packet = nw.wrapDataPacket(packet)
+            conn.sendall(packet)
+            nBytes += len(packet)
+
+            if settings.protocolName == 'v1ack':
+                nw.readPacket(conn)
+                roundTrips.append(time.time() - sendTime)
+
+        packets += 1
+
+    elapsed = time.perf_counter() - start
+
+    if conn is not None:
+        conn.close()
+    else:
+        sender.close()
+
+    results.put({'index':index,'packets':packets,'rows':packets*settings.points,
+                 'bytes':nBytes,'elapsed':elapsed,'roundTrips':roundTrips})
+
+
+
+#======================================================================
+#%% In-process server
+#======================================================================
+
+class ChannelSink():
+    """
+    Adds received data to ScopePy channels, as API.addChannelDataBatch(),
+    and measures the latency and the time taken
+
+    Each chunk added counts as a packet. UDP packets arrive in several
+    chunks, so rows are used to check that everything has arrived.
+
+    """
+
+    def __init__(self):
+
+        self.channels = {}
+
+        self.packets = 0
+        self.rows = 0
+        self.bytes = 0
+        self.latencies = []
+
+        # Time spent adding data [s]
+        self.busyTime = 0.0
+
+        # When data was last added [perf_counter s]
+        self.lastAdded = None
+
+
+    def addBatch(self,channelDataList):
+
+        start = time.perf_counter()
+
+        for channelName,data in channelDataList:
+
+            if channelName not in self.channels:
+                self.channels[channelName] = ch.ScopePyChannel(channelName)
+
+            self.channels[channelName].addData2Channel(data)
+
+            self.latencies.append(time.time() - data[data.dtype.names[0]][0])
+            self.packets += 1
+            self.rows += len(data)
+            self.bytes += data.nbytes
+
+        end = time.perf_counter()
+        self.busyTime += end - start
+
+        if channelDataList:
+            self.lastAdded = end
+
+
+    def add(self,channelData):
+
+        self.addBatch([channelData])
+
+
+
+class PolledServer():
+    """
+    In-process asyncio or UDP server, drained once per frame like the GUI
+
+    """
+
+    def __init__(self,settings):
+
+        self.settings = settings
+        self.sink = ChannelSink()
+        self.frameTimes = []
+
+        if settings.server == 'udp':
+            self.receiver = udp.UdpReceiver()
+        else:
+            self.receiver = ingest.IngestServer(nw.decodePacket)
+
+
+    def start(self):
+
+        if not self.receiver.start(self.settings.host,self.settings.port):
+            raise RuntimeError("Load generator: server failed to start : %s" % self.receiver.errorString())
+
+        return self.receiver.port
+
+
+    def run(self,producersDone):
+        """
+        Drain the server once per frame until the producers have finished
+        and everything has arrived
+
+        """
+
+        interval = 1.0/self.settings.frameRate
+
+        while True:
+            time.sleep(interval)
+
+            start = time.perf_counter()
+            self.sink.addBatch(self.receiver.drain())
+            self.frameTimes.append(time.perf_counter() - start)
+
+            if producersDone.finished(self.sink.rows):
+                break
+
+        self.receiver.stop()
+
+
+
+class QtServer():
+    """
+    In-process ThreadedTcpServer, with a Qt event loop like the GUI
+
+    """
+
+    def __init__(self,settings):
+
+        from PyQt4.QtCore import QCoreApplication,QReadWriteLock,QTimer,SIGNAL
+        from PyQt4.QtNetwork import QHostAddress
+
+        self.settings = settings
+        self.sink = ChannelSink()
+        self.frameTimes = []
+
+        self.app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+        self.lock = QReadWriteLock()
+
+        self.server = nw.ThreadedTcpServer(channel_lock=self.lock)
+        self.server.connect(self.server,SIGNAL("UpLoadChannelData"),self.sink.add)
+        self.server.connect(self.server,SIGNAL("UpLoadChannelDataBatch"),self.sink.addBatch)
+
+        self.address = QHostAddress(settings.host)
+
+        self.timer = QTimer()
+        self.timer.setInterval(int(1000/settings.frameRate))
+        self.server.connect(self.timer,SIGNAL("timeout()"),self.frame)
+
+
+    def start(self):
+
+        if not self.server.listen(self.address,self.settings.port):
+            raise RuntimeError("Load generator: server failed to start : %s" % self.server.errorString())
+
+        return self.server.serverPort()
+
+
+    def run(self,producersDone):
+        """
+        Run the event loop until the producers have finished and everything
+        has arrived
+
+        """
+
+        self.producersDone = producersDone
+        self.lastBusyTime = 0.0
+
+        self.timer.start()
+        self.app.exec_()
+
+        self.timer.stop()
+        self.server.close()
+
+
+    def frame(self):
+        """
+        Record the time spent adding data since the last frame
+
+        """
+
+        self.frameTimes.append(self.sink.busyTime - self.lastBusyTime)
+        self.lastBusyTime = self.sink.busyTime
+
+        if self.producersDone.finished(self.sink.rows):
+            self.app.quit()
+
+
+
+class ProducerResults():
+    """
+    Collects producer results and decides when a load test has finished
+
+    """
+
+    def __init__(self,queue,nProducers):
+
+        self.queue = queue
+        self.nProducers = nProducers
+        self.results = []
+
+        # Rows received and when that last changed
+        self.rows = 0
+        self.lastProgress = time.monotonic()
+
+
+    def __call__(self):
+        """
+        True when all the producers have finished
+
+        """
+
+        while not self.queue.empty():
+            self.results.append(self.queue.get())
+
+        return len(self.results) == self.nProducers
+
+
+    def finished(self,rows):
+        """
+        True when all the producers have finished and either all their rows
+        have been received or nothing more has arrived for DRAIN_TIME
+
+        Inputs
+        --------
+        rows : int
+            rows received so far
+
+        """
+
+        now = time.monotonic()
+
+        if rows != self.rows:
+            self.rows = rows
+            self.lastProgress = now
+
+        if not self():
+            return False
+
+        return (rows >= sum([r['rows'] for r in self.results]) or
+                now - self.lastProgress > DRAIN_TIME)
+
+
+
+#======================================================================
+#%% Load test
+#======================================================================
+
+def percentiles(values,scale=1000.0):
+    """
+    50%, 90%, 99% and max of values, scaled (to ms by default)
+
+    """
+
+    if not values:
+        return [0.0,0.0,0.0,0.0]
+
+    values = np.asarray(values)*scale
+
+    return list(np.percentile(values,[50,90,99])) + [float(values.max())]
+
+
+
+def runLoad(settings):
+    """
+    Run one load test
+
+    Inputs
+    --------
+    settings : LoadSettings
+
+    Outputs
+    --------
+    results : dict
+        sent/received packets and bytes, rates, latency and frame time
+        percentiles [ms]
+
+    """
+
+    if settings.protocolName == 'udp' and settings.server not in ['udp','external']:
+        raise ValueError("Load generator: the udp protocol needs the udp server")
+
+    context = multiprocessing.get_context('spawn')
+
+    # Server
+    # --------
+    if settings.server == 'external':
+        server = None
+        port = settings.port
+    elif settings.server == 'threaded':
+        server = QtServer(settings)
+        port = server.start()
+    else:
+        server = PolledServer(settings)
+        port = server.start()
+
+    # Producers
+    # -----------
+    ready = context.Queue()
+    resultQueue = context.Queue()
+    go = context.Event()
+
+    processes = [context.Process(target=producer,args=(index,settings,port,ready,go,resultQueue))
+                 for index in range(settings.producers)]
+
+    for process in processes:
+        process.start()
+
+    for index in range(settings.producers):
+        ready.get(timeout=CONNECT_TIMEOUT)
+
+    producersDone = ProducerResults(resultQueue,settings.producers)
+
+    go.set()
+    start = time.perf_counter()
+
+    if server is None:
+        while not producersDone():
+            time.sleep(0.05)
+    else:
+        server.run(producersDone)
+
+    for process in processes:
+        process.join()
+
+    # Results
+    # ---------
+    sent = producersDone.results
+    elapsed = max([r['elapsed'] for r in sent])
+
+    results = {'settings':str(settings),
+               'elapsed':elapsed,
+               'sentPackets':sum([r['packets'] for r in sent]),
+               'sentRows':sum([r['rows'] for r in sent]),
+               'sentBytes':sum([r['bytes'] for r in sent]),
+               'roundTrip':percentiles(sum([r['roundTrips'] for r in sent],[]))}
+
+    if server is not None:
+        results['receivedElapsed'] = (server.sink.lastAdded or start) - start
+        results['receivedPackets'] = server.sink.packets
+        results['receivedRows'] = server.sink.rows
+        results['receivedBytes'] = server.sink.bytes
+        results['latency'] = percentiles(server.sink.latencies)
+        results['frameTime'] = percentiles(server.frameTimes)
+        results['channels'] = len(server.sink.channels)
+
+    return results
+
+
+
+def formatResults(results):
+    """
+    Results as text for printing
+
+    """
+
+    elapsed = max(results['elapsed'],1e-9)
+
+    lines = [results['settings'],
+             "  Sent           : %8.0f packets/s %8.1f MB/s" % (results['sentPackets']/elapsed,
+                                                               results['sentBytes']/1e6/elapsed)]
+
+    if 'receivedPackets' in results:
+        lost = results['sentRows'] - results['receivedRows']
+        received = max(results['receivedElapsed'],1e-9)
+
+        lines += ["  Received       : %8.0f packets/s %8.1f MB/s  (%d points not received)" %
+                  (results['receivedPackets']/received,results['receivedBytes']/1e6/received,lost),
+                  "  Latency   [ms] : 50%% %7.2f  90%% %7.2f  99%% %7.2f  max %7.2f" % tuple(results['latency']),
+                  "  Frame time[ms] : 50%% %7.2f  90%% %7.2f  99%% %7.2f  max %7.2f" % tuple(results['frameTime'])]
+
+    if results['roundTrip'][-1] > 0:
+        lines.append("  Ack time  [ms] : 50%% %7.2f  90%% %7.2f  99%% %7.2f  max %7.2f" % tuple(results['roundTrip']))
+
+    return "\n".join(lines)
+
+
+
+#======================================================================
+#%% Command line
+#======================================================================
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Send simulated data to ScopePy and measure the throughput")
+    parser.add_argument('--producers',type=int,default=4,help="number of producer processes")
+    parser.add_argument('--channels',type=int,default=1,help="channels per producer")
+    parser.add_argument('--points',type=int,default=10000,help="points per packet")
+    parser.add_argument('--dtype',default='float64',help="numpy type of the y data (v2 and udp only)")
+    parser.add_argument('--rate',type=float,default=100.0,
+                        help="packets per second from each producer, 0 for as fast as possible")
+    parser.add_argument('--protocol',choices=PROTOCOLS,default='v2')
+    parser.add_argument('--server',choices=SERVERS,default='asyncio',
+                        help="server to start in this process, or 'external' for a running ScopePy")
+    parser.add_argument('--host',default='127.0.0.1')
+    parser.add_argument('--port',type=int,default=None,
+                        help="server port, default is ScopePy's port for 'external' and a free port otherwise")
+    parser.add_argument('--duration',type=float,default=5.0,help="time to send for [s]")
+    parser.add_argument('--suite',action='store_true',help="run the standard set of tests")
+
+    args = parser.parse_args(argv)
+
+    nw.logger.setLevel(logging.WARNING)
+
+    if args.port is None:
+        if args.server == 'external':
+            args.port = udp.UDP_PORT if args.protocol == 'udp' else nw.SOCKET_PORT
+        else:
+            args.port = 0
+
+    if args.suite:
+        runs = SUITE
+    else:
+        runs = [(args.server,args.protocol,args.dtype)]
+
+    for server,protocolName,dtype in runs:
+        settings = LoadSettings(args.producers,args.channels,args.points,dtype,args.rate,
+                                protocolName,args.duration,server,args.host,args.port)
+
+        print(formatResults(runLoad(settings)))
+        print()
+
+    return 0
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 27 09:52:18 2026
+
+@author: john
+
+ScopePy math channel workers
+===================================
+
+Runs slow math functions away from the GUI thread, so a function like a
+probability plot of a long channel doesn't freeze the whole program.
+
+Each MathFunction has an execution policy:
+
+* EXECUTION_INLINE : run in MathChannel.data(), on the GUI thread. The
+  default, best for quick functions.
+* EXECUTION_THREAD : run in a worker thread. The GUI stays responsive
+  while numpy or scipy are working, but pure Python code still holds up
+  the GUI because of the GIL.
+* EXECUTION_PROCESS : run in a worker process, for slow functions that
+  hold the GIL. The source data is put in shared memory so only the
+  output is sent back through a pipe. The function is loaded again in the
+  worker from the file it was loaded from (see load_math_functions()), so
+  it must be in a math function file. Functions that aren't are run in a
+  thread instead.
+
+All math channels share one MathWorkerPool, see defaultPool().
+MathChannel keeps showing its last output while the new one is being
+worked out.
+
+This module has no Qt code.
+
+"""
+
+#==============================================================================
+#%% License
+#==============================================================================
+
+"""
+Copyright 2015 John Bainbridge
+
+This file is part of ScopePy.
+
+ScopePy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+ScopePy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+#======================================================================
+#%% Imports
+#======================================================================
+import os
+import atexit
+import threading
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from ScopePy_shared_memory import createSharedMemory, unlinkSharedMemory
+from ScopePy_utilities import import_module_from_file
+
+
+#==============================================================================
+#%% Logger
+#==============================================================================
+# create logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Add do nothing handler
+logger.addHandler(logging.NullHandler())
+
+
+#======================================================================
+#%% Constants
+#======================================================================
+
+# Execution policies for MathFunction.execution
+EXECUTION_INLINE = 'inline'
+EXECUTION_THREAD = 'thread'
+EXECUTION_PROCESS = 'process'
+
+EXECUTION_POLICIES = [EXECUTION_INLINE,EXECUTION_THREAD,EXECUTION_PROCESS]
+
+# Number of workers of each type
+THREAD_WORKERS = 2
+PROCESS_WORKERS = max(1,(os.cpu_count() or 2) - 1)
+
+# Worker processes are started fresh rather than forked from the GUI
+START_METHOD = 'spawn'
+
+
+#======================================================================
+#%% Shared memory input
+#======================================================================
+
+class SharedArray():
+    """
+    Copy of a numpy array in shared memory, for sending to a worker process
+
+    The owner removes the shared memory with release() when the worker
+    has finished.
+
+    """
+
+    def __init__(self,array):
+
+        array = np.ascontiguousarray(array)
+
+        # Shared memory can't be zero size
+        self.shm = createSharedMemory(None,max(array.nbytes,1))
+
+        # Copied as bytes, which is quicker than copying field by field
+        shared = np.frombuffer(self.shm.buf,np.uint8,count=array.nbytes)
+        shared[:] = array.reshape(-1).view(np.uint8)
+
+        # No views can be left when the memory is closed
+        del shared
+
+        self.description = (self.shm.name,array.shape,array.dtype)
+
+
+    def release(self):
+
+        self.shm.close()
+        unlinkSharedMemory(self.shm)
+
+
+
+#======================================================================
+#%% Worker side
+#======================================================================
+
+class WorkerChannel():
+    """
+    Source channel as seen by a math function running in a worker process
+
+    Has the data and the axis names of the channel, not the channel
+    itself.
+
+    """
+
+    def __init__(self,name,x_axis,y_axis,data):
+
+        self.name = name
+        self.x_axis = x_axis
+        self.y_axis = y_axis
+        self._data = data
+
+
+    def data(self,**kwargs):
+
+        return self._data
+
+
+    @property
+    def x(self):
+
+        return self._data[self.x_axis]
+
+
+    @property
+    def y(self):
+
+        return self._data[self.y_axis]
+
+
+
+# Math function modules loaded by this worker process
+# {path:(modification time,module)}
+_modules = {}
+
+
+def findMathFunction(source_file,source_index,name):
+    """
+    Find a math function in its file, loading the file again if it has
+    changed
+
+    Inputs
+    --------
+    source_file : str
+        full path of the math function file
+    source_index : int
+        position in the file's mathFunctions list
+    name : str
+        name of the function, used if the position has changed
+
+    Outputs
+    --------
+    mathFunction : MathFunction
+
+    """
+
+    mtime = os.path.getmtime(source_file)
+
+    if source_file not in _modules or _modules[source_file][0] != mtime:
+        module = import_module_from_file(source_file)
+
+        if module is None or not hasattr(module,'mathFunctions'):
+            raise ImportError("Can't load math functions from [%s]" % source_file)
+
+        _modules[source_file] = (mtime,module)
+
+    functions = _modules[source_file][1].mathFunctions
+
+    if source_index < len(functions) and functions[source_index].name == name:
+        return functions[source_index]
+
+    for function in functions:
+        if function.name == name:
+            return function
+
+    raise LookupError("Math function [%s] is not in [%s]" % (name,source_file))
+
+
+def runInProcess(source_file,source_index,name,parameters,sources):
+    """
+    Run a math function in a worker process
+
+    Inputs
+    --------
+    source_file,source_index,name :
+        where to find the function, see findMathFunction()
+    parameters : dict
+        the function's parameters in the GUI
+    sources : list of tuples
+        (channel name, x axis, y axis, SharedArray.description) for each
+        source channel
+
+    Outputs
+    --------
+    x_out,y_out : numpy float arrays
+
+    """
+
+    mathFunction = findMathFunction(source_file,source_index,name)
+    mathFunction.parameters.update(parameters)
+
+    blocks = []
+    channels = []
+
+    try:
+        for channel_name,x_axis,y_axis,(shm_name,shape,dtype) in sources:
+            # Worker processes share the GUI's resource tracker, which 
+            # already has this memory on its list, so it is opened as 
+            # normal and the GUI takes it off the list when it unlinks it
+            shm = shared_memory.SharedMemory(name=shm_name)
+            blocks.append(shm)
+
+            channels.append(WorkerChannel(channel_name,x_axis,y_axis,
+                                          np.ndarray(shape,dtype,buffer=shm.buf)))
+
+        x_out,y_out = mathFunction(channels)
+
+        # Copy before the shared memory goes, the output can be a view of
+        # the input
+        x_out = np.array(x_out,dtype=float)
+        y_out = np.array(y_out,dtype=float)
+
+    finally:
+        del channels[:]
+
+        for shm in blocks:
+            try:
+                shm.close()
+            except BufferError:
+                # The function has kept a view of the data, the memory is
+                # closed when the worker exits
+                logger.warning("runInProcess: [%s] kept a reference to its input" % name)
+
+    return x_out,y_out
+
+
+def runInThread(mathFunction,channels):
+    """
+    Run a math function in a worker thread
+
+    """
+
+    return mathFunction(channels)
+
+
+
+#======================================================================
+#%% Worker pool
+#======================================================================
+
+def canRunInProcess(mathFunction):
+    """
+    True if the math function can be found by a worker process
+
+    """
+
+    return getattr(mathFunction,'source_file',None) is not None
+
+
+class MathWorkerPool():
+    """
+    Threads and processes that run math functions
+
+    The pools are only started when they are first used.
+
+    Example
+    --------
+    >>> pool = MathWorkerPool()
+    >>> future = pool.submit(EXECUTION_PROCESS,mathFunction,channels)
+    >>> x_out,y_out = future.result()
+
+    """
+
+    def __init__(self,threads=THREAD_WORKERS,processes=PROCESS_WORKERS):
+
+        self.threads = threads
+        self.processes = processes
+
+        self._threadPool = None
+        self._processPool = None
+        self._lock = threading.Lock()
+
+
+    def threadPool(self):
+
+        with self._lock:
+            if self._threadPool is None:
+                self._threadPool = ThreadPoolExecutor(self.threads,
+                                                      thread_name_prefix='ScopePy_math')
+
+            return self._threadPool
+
+
+    def processPool(self,restart=False):
+
+        with self._lock:
+            if self._processPool is not None and restart:
+                self._processPool.shutdown(wait=False,cancel_futures=True)
+                self._processPool = None
+
+            if self._processPool is None:
+                context = multiprocessing.get_context(START_METHOD)
+                self._processPool = ProcessPoolExecutor(self.processes,mp_context=context)
+
+            return self._processPool
+
+
+    def submit(self,policy,mathFunction,channels):
+        """
+        Start running a math function
+
+        Inputs
+        --------
+        policy : str
+            EXECUTION_THREAD or EXECUTION_PROCESS
+        mathFunction : MathFunction
+        channels : list of channel snapshots
+            source channels with their data already read, see
+            ScopePy_channel.ChannelSnapshot. The data must not change
+            while the function runs.
+
+        Outputs
+        --------
+        future : concurrent.futures.Future
+            result is (x_out,y_out)
+
+        """
+
+        if policy not in [EXECUTION_THREAD,EXECUTION_PROCESS]:
+            raise ValueError("MathWorkerPool: unknown execution policy [%s]" % policy)
+
+        if policy == EXECUTION_PROCESS:
+            if canRunInProcess(mathFunction):
+                return self.submitProcess(mathFunction,channels)
+
+            logger.warning("MathWorkerPool: [%s] is not from a math function file, running in a thread" %
+                           mathFunction.name)
+
+        return self.threadPool().submit(runInThread,mathFunction,channels)
+
+
+    def submitProcess(self,mathFunction,channels):
+        """
+        Run a math function in a worker process, with the channel data in
+        shared memory
+
+        """
+
+        blocks = [SharedArray(channel.data()) for channel in channels]
+
+        sources = [(channel.name,channel.x_axis,channel.y_axis,block.description)
+                   for channel,block in zip(channels,blocks)]
+
+        args = (runInProcess,mathFunction.source_file,mathFunction.source_index,
+                mathFunction.name,dict(mathFunction.parameters),sources)
+
+        try:
+            try:
+                future = self.processPool().submit(*args)
+
+            except BrokenProcessPool:
+                # A worker has died, e.g. killed by the user, start again
+                logger.warning("MathWorkerPool: restarting worker processes")
+                future = self.processPool(restart=True).submit(*args)
+
+        except Exception:
+            for block in blocks:
+                block.release()
+            raise
+
+        future.add_done_callback(lambda future : [block.release() for block in blocks])
+
+        return future
+
+
+    def shutdown(self,wait=True):
+        """
+        Stop the workers, anything not started is cancelled
+
+        """
+
+        with self._lock:
+            for pool in [self._threadPool,self._processPool]:
+                if pool is not None:
+                    pool.shutdown(wait=wait,cancel_futures=True)
+
+            self._threadPool = None
+            self._processPool = None
+
+
+
+# Pool shared by all math channels
+_defaultPool = None
+_defaultLock = threading.Lock()
+
+
+def defaultPool():
+    """
+    The worker pool shared by all math channels
+
+    """
+
+    global _defaultPool
+
+    with _defaultLock:
+        if _defaultPool is None:
+            _defaultPool = MathWorkerPool()
+            atexit.register(_defaultPool.shutdown,wait=False)
+
+        return _defaultPool
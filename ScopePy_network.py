@@ -45,15 +45,25 @@ along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
 #=============================================================================
 #%% Imports
 #=============================================================================
+import time
 
 import socket
 import logging
+import threading
+import queue
+import atexit
 
 from PyQt4.QtCore import *
 from PyQt4.QtNetwork import *
 
 import numpy as np
 
+import ScopePy_protocol as protocol
+import ScopePy_ingest as ingest
+import ScopePy_shared_memory as sharedmem
+import ScopePy_udp as udp
+import ScopePy_telemetry as telemetry
+
 
 #==============================================================================
 #%% Logger
@@ -86,18 +96,75 @@ logger.addHandler(con)
 
 
 # Magic number for identifying Scope Py packets
-MAGIC_NUMBER = 7616893
+MAGIC_NUMBER = protocol.MAGIC_NUMBER
+
+# Packet type identifiers, see ScopePy_protocol
+DATA_PACKET = protocol.DATA_PACKET
+COMMAND_PACKET = protocol.COMMAND_PACKET
+
+# Data packet that the server does not reply to
+DATA_PACKET_NOACK = protocol.DATA_PACKET_NOACK
+
+# Version 2 frames with several channels
+DATA_FRAME_V2 = protocol.DATA_FRAME_V2
 
-# Packet type identifiers
-DATA_PACKET = 4001
-COMMAND_PACKET = 3456
+# Server replies, the same from all the servers
+DATA_REPLY = protocol.DATA_REPLY
+COMMAND_REPLY = protocol.COMMAND_REPLY
 
 # uint64 size in bytes
-SIZEOF_UINT64 = 8
+SIZEOF_UINT64 = protocol.SIZEOF_UINT64
+
+# Packet headers - little endian unsigned 64 bit integers
+# Packet length
+LENGTH_HEADER = protocol.LENGTH_HEADER
+# Packet type
+TYPE_HEADER = protocol.TYPE_HEADER
+# Data packet : No. rows, No. columns, length of column names
+DATA_HEADER = protocol.DATA_HEADER
+
+# Largest packet accepted [bytes], see ScopePy_ingest
+MAX_PACKET_SIZE = ingest.MAX_PACKET_SIZE
+
+# Badly formed packet
+PacketError = ingest.PacketError
+
+# Splits a stream into packets, used by all the TCP servers
+PacketReader = ingest.PacketReader
+
+# Maximum number of bytes to take from a socket in one read
+READ_BLOCK_SIZE = 1024*1024
+
+# Time to wait for data on a streaming connection before checking if it
+# has been closed [ms]
+SOCKET_READ_TIMEOUT_MS = 30000
+
+# Servers that can be used for receiving data
+SERVER_THREADED = 'threaded'
+SERVER_ASYNCIO = 'asyncio'
+SERVER_TYPES = [SERVER_THREADED,SERVER_ASYNCIO]
+
+# Default rate at which the asyncio server passes data to the GUI [Hz]
+# 0 or None passes it on every time round the event loop
+DEFAULT_INGEST_RATE = 30
+
+# Shared memory rings are checked for at this interval [ms]
+RING_SEARCH_INTERVAL_MS = 1000
+
+# ScopeClient settings
+# Maximum number of packets waiting to be sent
+CLIENT_QUEUE_SIZE = 1000
+# Packets are joined into writes of up to this size [bytes]
+CLIENT_BATCH_BYTES = 256*1024
 
 SOCKET_PORT = 63406
 
-DEBUG = True
+# Port for UDP datagrams
+UDP_PORT = udp.UDP_PORT
+
+# Debug output on the data path. Logging every packet costs throughput,
+# so it is off unless needed, see ThreadedTcpServer.telemetry for counters
+DEBUG = False
 
 
 #=============================================================================
@@ -107,7 +174,8 @@ DEBUG = True
 
 
 
-def makeDataPacket(channelLabel,xdata,ydata,columnNamesList = None):
+def makeDataPacket(channelLabel,xdata,ydata,columnNamesList = None,
+                   packetType = DATA_PACKET):
     """
     Convert a numpy array into a packet for sending to Scope Py GUI
     
@@ -116,6 +184,8 @@ def makeDataPacket(channelLabel,xdata,ydata,columnNamesList = None):
     channelLabel = Label for scope channel  [string]
     xdata,ydata = input data may list or 1D arrays 
     columnNamesList = list of column names
+    packetType = DATA_PACKET or DATA_PACKET_NOACK if the server should not
+                 reply
     
     Outputs
     -----------
@@ -139,7 +209,8 @@ def makeDataPacket(channelLabel,xdata,ydata,columnNamesList = None):
     
     # Create numpy array from input data
     # make sure the data is arranged in columns
-    array_in = np.array([xdata,ydata]).transpose()
+    array_in = np.column_stack((np.asarray(xdata,dtype='<f8'),
+                                np.asarray(ydata,dtype='<f8')))
     
     
     # Get dimensions
@@ -169,157 +240,68 @@ def makeDataPacket(channelLabel,xdata,ydata,columnNamesList = None):
     dataPacket = []
     
     # Add Packet type as 64 bit unsigned integer
-    dataPacket.append( np.uint64(DATA_PACKET).tostring() )
-    
-    # Add Number of rows as 64 bit unsigned integer
-    dataPacket.append( np.uint64(nRows).tostring() )
-    
-    # Add Number of columns as 64 bit unsigned integer
-    dataPacket.append( np.uint64(nCols).tostring() )
+    dataPacket.append( TYPE_HEADER.pack(packetType) )
     
     # Add Column names 
     
     # Package the column names into a comma delimited list 
-    # Add the length of the column name package first and then the list itself.
-    colNamePackage = ','.join(columnNamesList)
+    colNamePackage = ','.join(columnNamesList).encode()
     
-    # Add length of package as 64 bit int
-    dataPacket.append(np.uint64(len(colNamePackage)).tostring() )
+    # Add Number of rows, number of columns and length of the column name
+    # package as 64 bit unsigned integers
+    dataPacket.append( DATA_HEADER.pack(nRows,nCols,len(colNamePackage)) )
     
     # Add column name package as bytes
-    dataPacket.append(colNamePackage.encode())
+    dataPacket.append(colNamePackage)
     
     # Add data 
-    dataPacket.append( np.float64(array_in).tostring())
+    dataPacket.append( array_in.tobytes() )
     
     # Return byte string packet by joining all the items in the list
     return b''.join(dataPacket)
      
-def getPacketType(packet):
-    """ packetType,remainingPacket = getPacketType(packet)
-    
-    Read first unit64 from unwrapped packet string to identify which
-    packet has been sent. Then return the rest of the packet for extraction
-    by other functions
+# Version 1 packets are decoded by ScopePy_protocol, which has no Qt code,
+# so they can be read without the GUI, e.g. by ScopePy_daemon
+getPacketType = protocol.getPacketType
+extractDataPacket = protocol.extractDataPacket
+decodePacket = protocol.decodePacket
     
-    Input
-    --------
-    packet = byte string packet
     
-    Outputs
-    ----------
-    packetType = numerical packet type as defined at top of this file
-    remainingPacket = packet with type stripped off
     
+def decodeFrame(packet):
     """
+    Extract data from a version 2 frame
     
-    packetType = np.fromstring(packet[0:SIZEOF_UINT64],dtype = 'uint64')
-    
-    return int(packetType),packet[SIZEOF_UINT64:]
-    
-    
-                
-def extractDataPacket(packet):
-    """
-    Extract 2D array data from packet
+    Frames that can't be decoded are logged and dropped, so a bad frame 
+    doesn't close the connection.
     
     Inputs
     --------
-    packet = byte string packet as returned by by getPacketType
+    packet = frame as returned by getPacketType
     
     Outputs
     --------
-    (channelNumber,array_out) = tuple of outputs
-    
-    Where
-        channelLabel : str
-            Scope channel to add data to
-        array_out = 2D numpy recarray with column names included
+    channels = list of (channelLabel,array_out) tuples, as returned by
+               extractDataPacket()
     
     """
-
-    # Extract integer data (No. Rows, columns and header string)    
-    # -----------------------------------------------------------------------
-    # Get all 4 numbers in one shot
-    # Gives array with [Channel, No. Rows,No. Cols,Length of Column header string]
-
-    nH = 3 # Number of integers to extract first
-    
-    numData = np.fromstring(packet[0:SIZEOF_UINT64*nH],dtype = 'uint64')
-    nRows = numData[0]
-    nCols = numData[1]
-    headerLength = int(numData[2])
-    
     
-    # Extract header
-    # ----------------
-    # Slice out header, convert from bytes to string and separate by delimiters
-    headerList = packet[SIZEOF_UINT64*nH:SIZEOF_UINT64*nH+headerLength].decode().split(',')
-    
-    # Extract channel label as the first item
-    channelLabel = headerList[0]
-    
-    # Extract the numerical data
-    # ---------------------------
-    # extract the remaining string and convert to float64
-    # this produces a 1D array
-    array_out = np.fromstring(packet[SIZEOF_UINT64*nH+headerLength:],dtype='float64')
-    
-    # resize to original dimensions
-    array_out = array_out.reshape((nRows,nCols))
-    
-    # convert to recarray and add column headers
-    recarray_out = np.core.records.fromarrays(array_out.transpose(), 
-                                             names = headerList[1:])
-                                            
-    return (channelLabel,recarray_out)                                                                                                                                     
-                                             
-    
-
+    try:
+        return protocol.decodeFrame(packet)
+    except protocol.FrameError as error:
+        logger.error("Dropping data frame : %s" % error)
+        return []
+        
+        
+        
 #=============================================================================
 # %% Client side for sending data
 #=============================================================================
 
 
-def wrapDataPacket(dataPacket):
-    """ Wrap the data packet for sending over TCIP connection
-    This just adds the length of the total packet to the front of
-    the data packet. The server can then read this first and will
-    then know how long to read data from the connection.
-    
-    Input
-    ------
-    dataPacket : str or bytes
-        output of makeDataPacket()
-    
-    """
-    
-    # Convert to bytes if necessary
-    # -----------------------------
-    if not isinstance(dataPacket,bytes):
-        dataPacket = dataPacket.encode()
-    
-    # Get length of packet
-    # ------------------------
-    pkLen = len(dataPacket)
+wrapDataPacket = protocol.wrapDataPacket
     
-    # Check for empty packets
-    # return without error for now
     
-    if pkLen == 0:
-        return
-        
-    
-    # Add to packet
-    # ------------------------
-    # Add the total length of the packet including the size of the integer
-    # that is being added
-    wrappedPacket = b''.join([np.uint64(pkLen+SIZEOF_UINT64).tostring(),dataPacket])
-    
-    # Return bytes packet
-    return wrappedPacket
-    
-        
     
 def sendPacket(hostIP,dataPacket):
     """ Send the packet over a TCIP link to the GUI server
@@ -383,7 +365,8 @@ def sendPacket(hostIP,dataPacket):
     
     
 
-def send2scope(channel_name,x_data,y_data,x_label,y_label,scope_IP=None):
+def send2scope(channel_name,x_data,y_data,x_label,y_label,scope_IP=None,
+               acknowledge=True):
     """
     Send x,y data to a scope channel
     
@@ -411,19 +394,25 @@ def send2scope(channel_name,x_data,y_data,x_label,y_label,scope_IP=None):
         IP address of the computer where ScopePy is running.
         If not specified then it is assumed that it is the same computer.
         
+    acknowledge : bool
+        the server replies to each data packet (DATA_PACKET). Set to False
+        to send DATA_PACKET_NOACK packets, which the server does not reply 
+        to, for higher rates.
+        
         
     Outputs
     --------
     success : bool
-        returns True if a successful transfer
+        True if the data was queued for sending and the connection to 
+        ScopePy is working. False if the last attempt to send to this 
+        address failed, e.g. ScopePy isn't running or isn't listening. The 
+        error is in defaultClient(scope_IP,acknowledge).lastError.
         
-    """
-    
-    # Get Scope IP address
-    # ----------------------
-    if not scope_IP:
-        scope_IP = socket.gethostname() 
+    The data is sent by a ScopeClient that is kept open for all calls to 
+    the same address, see defaultClient(). Sending happens in the 
+    background, so an error sending this data is reported by the next call.
         
+    """
     
     # Validate data TODO
     # -------------------
@@ -431,14 +420,415 @@ def send2scope(channel_name,x_data,y_data,x_label,y_label,scope_IP=None):
     assert len(x_data)==len(y_data), "ScopePy: x and y data are different lengths"
     
     
-    # Make data packet
-    # ------------------
-    dataPacket = makeDataPacket(channel_name,x_data,y_data,[x_label,y_label])
-    
-    
     # Send data to scope
     # -------------------
-    return sendPacket(scope_IP,dataPacket)
+    return defaultClient(scope_IP,acknowledge).sendData(channel_name,x_data,y_data,x_label,y_label)
+    
+    
+    
+def send2ring(ring,channel_name,x_data,y_data,x_label,y_label):
+    """
+    Send x,y data to a scope channel through shared memory
+    
+    For acquisition programs running on the same computer as ScopePy. 
+    The data keeps its own type, e.g. int16, and is copied once into the 
+    shared memory. If ScopePy has not kept up and the ring is full the data 
+    is dropped, this never waits.
+    
+    Inputs
+    --------
+    ring : ScopePy_shared_memory.RingProducer
+        made with openRing()
+        
+    Other inputs are the same as send2scope()
+        
+    Outputs
+    --------
+    success : bool
+        False if the data was dropped, see ring.overflows
+        
+    Example
+    --------
+    >>> ring = openRing('adc')
+    >>> send2ring(ring,'ADC 1',t,samples,'time','volts')
+    >>> ring.close()
+    
+    """
+    
+    assert len(x_data)==len(y_data), "ScopePy: x and y data are different lengths"
+    
+    x_data = np.asarray(x_data)
+    y_data = np.asarray(y_data)
+    
+    data = np.empty(len(x_data),[(x_label,x_data.dtype),(y_label,y_data.dtype)])
+    data[x_label] = x_data
+    data[y_label] = y_data
+    
+    return ring.write([(channel_name,data)])
+    
+    
+    
+def openRing(name,capacity=sharedmem.DEFAULT_RING_CAPACITY):
+    """
+    Create a shared memory ring for send2ring()
+    
+    ScopePy finds the ring by its name and starts reading from it.
+    
+    Inputs
+    --------
+    name : str
+        unique name for the ring
+    capacity : int
+        size of the ring [bytes]
+        
+    Outputs
+    --------
+    ring : ScopePy_shared_memory.RingProducer
+    
+    """
+    
+    return sharedmem.RingProducer(name,capacity)
+    
+    
+    
+class ScopeClient():
+    """
+    Client that keeps a connection open to ScopePy and sends packets from
+    a background thread
+    
+    Packets are put on a queue and returned from straight away. The thread
+    joins queued packets together into writes of up to CLIENT_BATCH_BYTES.
+    If the queue is full, sending blocks until there is space.
+    
+    By default the server is told not to reply to data packets 
+    (DATA_PACKET_NOACK). If acknowledge is set the replies are read after 
+    each write, so there is one round trip per batch rather than per packet.
+    
+    Sending errors happen on the thread, after the packet has been queued.
+    The error is kept in lastError until a write succeeds, and until then
+    send() returns False.
+    
+    Example
+    ---------
+    >>> client = ScopeClient()
+    >>> for n in range(1000):
+    ...     client.sendData('Test',x,y[n],'time','amplitude')
+    >>> client.close()
+    
+    """
+    
+    def __init__(self,hostIP=None,port=SOCKET_PORT,acknowledge=False,
+                 queueSize=CLIENT_QUEUE_SIZE,batchBytes=CLIENT_BATCH_BYTES):
+        """
+        Inputs
+        ---------
+        hostIP : str
+            address of the computer running ScopePy, defaults to this one
+        port : int
+            server port
+        acknowledge : bool
+            wait for the server to reply to each data packet
+        queueSize : int
+            maximum number of packets waiting to be sent
+        batchBytes : int
+            maximum size of one write
+            
+        """
+        
+        self.hostIP = hostIP if hostIP else socket.gethostname()
+        self.port = port
+        self.acknowledge = acknowledge
+        self.batchBytes = batchBytes
+        
+        self.queue = queue.Queue(maxsize=queueSize)
+        self.socket = None
+        
+        # Counters
+        self.packetsSent = 0
+        self.bytesSent = 0
+        self.writes = 0
+        self.replies = 0
+        
+        # Last error from the sending thread
+        self.lastError = None
+        
+        self.thread = threading.Thread(target=self.run,name='ScopeClient')
+        self.thread.daemon = True
+        self.thread.start()
+        
+        
+    def sendData(self,channel_name,x_data,y_data,x_label,y_label,timeout=None):
+        """
+        Queue x,y data for a scope channel
+        
+        Inputs are the same as send2scope(). 
+        
+        Outputs
+        --------
+        success : bool
+            False if the queue stayed full for longer than timeout
+        
+        """
+        
+        packetType = DATA_PACKET if self.acknowledge else DATA_PACKET_NOACK
+        
+        dataPacket = makeDataPacket(channel_name,x_data,y_data,
+                                    [x_label,y_label],packetType=packetType)
+                                    
+        return self.send(dataPacket,timeout)
+        
+        
+    def sendChannels(self,channels,compress=False,timeout=None):
+        """
+        Queue data for several channels in one version 2 frame
+        
+        The server does not reply to frames.
+        
+        Inputs
+        --------
+        channels : list of (channel_name, array) tuples
+            array is a numpy structured array, columns keep their own type
+            see ScopePy_protocol.encodeFrame()
+        compress : bool
+            compress the frame with zlib
+        timeout : float or None
+            time to wait for space in the queue [s]
+            
+        Outputs
+        --------
+        success : bool
+            False if the queue stayed full for longer than timeout
+        
+        """
+        
+        return self.send(protocol.encodeFrame(channels,compress),timeout)
+        
+        
+    def send(self,dataPacket,timeout=None):
+        """
+        Queue a packet for sending
+        
+        Inputs
+        --------
+        dataPacket : bytes
+            packet from makeDataPacket()
+        timeout : float or None
+            time to wait for space in the queue [s]. None waits forever
+            
+        Outputs
+        --------
+        success : bool
+            False if the queue stayed full for longer than timeout, or if
+            the last write failed, see lastError. In the second case the 
+            packet is still queued, the thread makes a new connection for 
+            it.
+        
+        """
+        
+        if not self.thread.is_alive():
+            raise RuntimeError("ScopeClient: client has been closed")
+            
+        wrappedPacket = wrapDataPacket(dataPacket)
+        
+        if wrappedPacket is None:
+            return False
+            
+        try:
+            self.queue.put(wrappedPacket,timeout=timeout)
+        except queue.Full:
+            return False
+            
+        return self.lastError is None
+        
+        
+    def flush(self):
+        """
+        Wait until all queued packets have been sent
+        
+        """
+        
+        self.queue.join()
+        
+        
+    def close(self):
+        """
+        Send any queued packets, then stop the thread and close the 
+        connection
+        
+        """
+        
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+            
+            
+    def run(self):
+        """
+        Sending thread
+        
+        """
+        
+        running = True
+        
+        while running:
+            
+            # Wait for a packet then take as many more as will fit in a batch
+            # -----------------------------------------------------------------
+            batch = [self.queue.get()]
+            nBytes = len(batch[0]) if batch[0] is not None else 0
+            
+            while batch[-1] is not None and nBytes < self.batchBytes:
+                try:
+                    packet = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                    
+                batch.append(packet)
+                if packet is not None:
+                    nBytes += len(packet)
+                    
+            # None is the signal to stop
+            if batch[-1] is None:
+                running = False
+                packets = batch[:-1]
+            else:
+                packets = batch
+                
+            # Send
+            # -------
+            try:
+                if packets:
+                    self.write(packets)
+                    self.lastError = None
+                    
+            except (OSError,RuntimeError,PacketError) as error:
+                logger.error("ScopeClient: Failed to send to [%s:%d] : %s" % (self.hostIP,self.port,error))
+                self.lastError = error
+                self.disconnect()
+                
+            finally:
+                for packet in batch:
+                    self.queue.task_done()
+                    
+        self.disconnect()
+        
+        
+    def write(self,packets):
+        """
+        Send a list of wrapped packets in one write and read any replies
+        
+        """
+        
+        self.connect()
+            
+        data = b''.join(packets)
+        self.socket.sendall(data)
+        
+        self.packetsSent += len(packets)
+        self.bytesSent += len(data)
+        self.writes += 1
+        
+        # Read replies to the packets that have them
+        # ------------------------------------------
+        for packet in packets:
+            packetType, = TYPE_HEADER.unpack_from(packet,LENGTH_HEADER.size)
+            
+            if packetType in [DATA_PACKET,COMMAND_PACKET]:
+                recvPacket(self.socket)
+                self.replies += 1
+                
+                
+    def connect(self):
+        """
+        Connect to the server if not already connected
+        
+        Raises OSError if the server can't be reached.
+        
+        """
+        
+        if self.socket is None:
+            self.socket = socket.create_connection((self.hostIP,self.port))
+            self.socket.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)
+            
+            
+    def disconnect(self):
+        """
+        Close the connection, a new one is made for the next packet
+        
+        """
+        
+        if self.socket is not None:
+            try:
+                self.socket.close()
+            finally:
+                self.socket = None
+                
+                
+                
+# Clients used by send2scope(), one for each address and acknowledge setting
+_defaultClients = {}
+_defaultClientsLock = threading.Lock()
+
+
+def defaultClient(scope_IP=None,acknowledge=True):
+    """
+    Get the client used by send2scope() for an address
+    
+    The client is created on first use and kept open. All clients are
+    closed when Python exits, after sending any queued packets.
+    
+    A new client connects straight away, so if ScopePy isn't running the
+    first send2scope() returns False rather than the error only being 
+    found by the sending thread.
+    
+    Inputs
+    --------
+    scope_IP : str
+        IP address of the computer where ScopePy is running.
+        If not specified then it is assumed that it is the same computer.
+        
+    acknowledge : bool
+        get the client that waits for the server to reply to each packet
+        
+    Outputs
+    --------
+    client : ScopeClient
+    
+    """
+    
+    if not scope_IP:
+        scope_IP = socket.gethostname()
+        
+    with _defaultClientsLock:
+        client = _defaultClients.get((scope_IP,acknowledge))
+        
+        if client is None or not client.thread.is_alive():
+            client = ScopeClient(scope_IP,acknowledge=acknowledge)
+            _defaultClients[(scope_IP,acknowledge)] = client
+            
+            # Nothing is queued yet, so the thread isn't using the socket
+            try:
+                client.connect()
+            except OSError as error:
+                logger.error("ScopeClient: Failed to connect to [%s:%d] : %s" % (scope_IP,client.port,error))
+                client.lastError = error
+            
+    return client
+    
+    
+@atexit.register
+def closeDefaultClients():
+    """
+    Close all the send2scope() clients
+    
+    """
+    
+    with _defaultClientsLock:
+        clients = list(_defaultClients.values())
+        _defaultClients.clear()
+        
+    for client in clients:
+        client.close()
         
 
 #=============================================================================
@@ -536,53 +926,14 @@ def readDataPacket(conn):
     if DEBUG:
         print("Reading packet ...")
     
-    # Read packet length
-    # ---------------------
-    # Keep reading until we have the first uint64 number from
-    # the packet
-    packet = b''
-    
-    while len(packet) < SIZEOF_UINT64:
-        # Get data from socket
-        chunk = conn.recv(SIZEOF_UINT64-len(packet))
-        
-        # If we received nothing then assume socket
-        # has been lost
-        if chunk == b'':
-            raise RuntimeError("socket connection broken : reading packet length")
-            
-        # Data received - add it to the packet
-        packet = packet + chunk
-        
-    # Packet should now contain the length of the total packet
-    # decode the length
-    packetLength = np.fromstring(packet[0:SIZEOF_UINT64],dtype = 'uint64')
-    
-    if DEBUG:
-        print("\tPacket Length = %d" % packetLength)
-        print("\tReading rest of packet ...")
-    
-    # Read the rest of the packet
-    # -------------------------------
-    while len(packet) < packetLength:
-        # Get data from socket
-        chunk = conn.recv(packetLength-len(packet))
-        
-        # If we received nothing then assume socket
-        # has been lost
-        if chunk == b'':
-            raise RuntimeError("socket connection broken : reading packet")
-            
-        # Data received - add it to the packet
-        packet = packet + chunk
+    packet = recvPacket(conn)
     
-    # TODO : translate packet back into numbers
     if DEBUG:
-        print("\tPacket received [%d bytes]:" % len(packet))
-        #print(packet)
+        print("\tPacket received [%d bytes]:" % (len(packet)+SIZEOF_UINT64))
     
     # Extract data from packet
-    array_out = extractDataPacket(packet[SIZEOF_UINT64:])
+    packetType,remainingPacket = getPacketType(packet)
+    array_out = extractDataPacket(remainingPacket)
     
     if DEBUG:
         print("Numerical data extracted:")
@@ -638,53 +989,75 @@ def readPacket(conn):
 #    if DEBUG:
 #        print("Reading packet ...")
     
-    # Read packet length
-    # ---------------------
-    # Keep reading until we have the first uint64 number from
-    # the packet
-    packet = b''
+    packet = recvPacket(conn)
     
-    while len(packet) < SIZEOF_UINT64:
-        # Get data from socket
-        chunk = conn.recv(SIZEOF_UINT64-len(packet))
-        
-        # If we received nothing then assume socket
-        # has been lost
-        if chunk == b'':
-            raise RuntimeError("readPacket: socket connection broken : reading packet length")
-            
-        # Data received - add it to the packet
-        packet = packet + chunk
+    if DEBUG:
+        logger.debug("readPacket: Packet received [%d bytes]:" % (len(packet)+SIZEOF_UINT64))
+        logger.debug("Packet=\n%s" % packet)
         
-    # Packet should now contain the length of the total packet
-    # decode the length
-    packetLength = np.fromstring(packet[0:SIZEOF_UINT64],dtype = 'uint64')
+    return packet.decode('utf-8')    
     
-    logger.debug("readPacket: Packet Length = %d" % packetLength)
-    logger.debug("readPacket: Reading rest of packet ...")
     
-    # Read the rest of the packet
-    # -------------------------------
-    while len(packet) < packetLength:
-        # Get data from socket
-        chunk = conn.recv(packetLength-len(packet))
-        
-        # If we received nothing then assume socket
-        # has been lost
-        if chunk == b'':
-            raise RuntimeError("socket connection broken : reading packet")
-            
-        # Data received - add it to the packet
-        packet = packet + chunk
     
+def recvInto(conn,buffer):
+    """
+    Fill a buffer from a socket
     
+    Inputs
+    -----------
+    conn : socket
+    buffer : bytearray or memoryview
+        buffer to fill, the whole buffer is filled
+        
+    """
     
-    logger.debug("readPacket: Packet received [%d bytes]:" % len(packet))
-    if DEBUG:
-        logger.debug("Packet=\n%s" % packet[SIZEOF_UINT64:])
+    view = memoryview(buffer)
+    
+    while len(view) > 0:
+        nBytes = conn.recv_into(view)
         
-    return packet[SIZEOF_UINT64:].decode('utf-8')    
-
+        # If we received nothing then assume socket
+        # has been lost
+        if nBytes == 0:
+            raise RuntimeError("socket connection broken : reading packet")
+            
+        view = view[nBytes:]
+        
+        
+        
+def recvPacket(conn):
+    """
+    Read one wrapped packet from a socket
+    
+    The length is read first and then the rest of the packet is read 
+    straight into a buffer of the right size.
+    
+    Input
+    -----------
+    conn = socket
+    
+    Output
+    ----------
+    packet : bytearray
+        packet with the length stripped off
+        
+    Raises PacketError if the length is bad, see MAX_PACKET_SIZE.
+        
+    """
+    
+    header = bytearray(LENGTH_HEADER.size)
+    recvInto(conn,header)
+    
+    packetLength, = LENGTH_HEADER.unpack(header)
+    ingest.checkPacketLength(packetLength)
+    
+    packet = bytearray(packetLength - LENGTH_HEADER.size)
+    recvInto(conn,packet)
+    
+    return packet
+    
+    
+    
 #=============================================================================
 #%% QT4 Server 
 #=============================================================================
@@ -753,82 +1126,58 @@ class Socket(QTcpSocket):
         # Connect socket to custom read response method
         self.connect(self, SIGNAL("readyRead()"),self.readPacket)
         self.connect(self, SIGNAL("disconnected()"), self.deleteLater)
-        self.nextBlockSize = 0
+        self.packetReader = PacketReader()
         self.upLoadFunction = upLoadFunction
         
         
     def readPacket(self):
-        """ Read wrapped packet using QT4 functions
+        """ Read wrapped packets using QT4 functions
         
-        Output
-        ------
-        dataPacket = byte string packet ready for extractDataPacket()
+        All the bytes available are passed to the packet reader, every 
+        complete data packet is sent to the upload function.
         
         """
         if DEBUG:
             print("Reading packet")
         
-        # Create a stream object to read bytes into
-        # ------------------------------------------
-        stream = QDataStream(self)
-        stream.setVersion(QDataStream.Qt_4_2)
-        
-        # Read first uint64 from packet to get the packet length
-        # -------------------------------------------------------
-        # Wait until we have enough bytes to make a 64bit Unsigned integer
-        if self.nextBlockSize == 0:
-            if self.bytesAvailable() < SIZEOF_UINT64:
-                print("\tBytes less than SIZEOF_UINT64")
-                # Not enough bytes accumulated, so return
-                return
-                
-            # Read in enough bytes to make a uint64           
-            plBytes = stream.readRawData(SIZEOF_UINT64)
-            print("Bytes read:")
-            print(plBytes)
-            
-            # Convert bytes to uint64 using numpy
-            packetLength = int(np.fromstring(plBytes, dtype=np.uint64))
-            
-            # Read the size of the rest of the packet
-            self.nextBlockSize = packetLength - SIZEOF_UINT64
+        while self.bytesAvailable() > 0:
+            data = self.read(min(self.bytesAvailable(),READ_BLOCK_SIZE))
             
-            print("Packet length = %i" % packetLength)
-            print("Reading rest of packet [%i]" % self.nextBlockSize)
-            
-        # Read rest of packet
-        # --------------------------------------------
-        # Wait for all the bytes to arrive
-        if self.bytesAvailable() < self.nextBlockSize:
-            print("\tBytes less than packet size")
-            return
-            
-        # Read the packet
-        # Read in the raw bytes
-        packet = stream.readRawData(self.nextBlockSize)
-        
-        # Get the packet type
-        packetType,remainingPacket = getPacketType(packet)
-        
-        if DEBUG:
-            print("\tPacket type = %d" % packetType)
-        
-        # Select the action for each packet type
-        if packetType == DATA_PACKET:
-            
-       
-            # Extract numerical data and channel label
-            data4scope = extractDataPacket(remainingPacket)
-           
-      
-            if DEBUG:
-                print("Data packet received [size = %d bytes]" % len(remainingPacket))
-                print(remainingPacket)
-                print("\n\nNumerical data is:")
-                print(data4scope[1])
+            try:
+                packets = self.packetReader.feed(data)
+            except PacketError as error:
+                logger.error("Socket: %s, closing connection" % error)
+                self.abort()
+                return
             
-            # Upload the array to calling function
-            self.upLoadFunction(data4scope)
+            for packet in packets:
+                
+                # Get the packet type
+                packetType,remainingPacket = getPacketType(packet)
+                
+                if DEBUG:
+                    print("\tPacket type = %d" % packetType)
+                
+                # Select the action for each packet type
+                if packetType in [DATA_PACKET,DATA_PACKET_NOACK]:
+                    
+                    # Extract numerical data and channel label
+                    try:
+                        data4scope = extractDataPacket(remainingPacket)
+                    except PacketError as error:
+                        logger.error("Socket: Dropping data packet : %s" % error)
+                        continue
+                    
+                    if DEBUG:
+                        print("Data packet received [size = %d bytes]" % len(remainingPacket))
+                    
+                    # Upload the array to calling function
+                    self.upLoadFunction(data4scope)
+                    
+                elif packetType == DATA_FRAME_V2:
+                    
+                    for data4scope in decodeFrame(remainingPacket):
+                        self.upLoadFunction(data4scope)
         
         
         
@@ -846,7 +1195,20 @@ class ThreadedTcpServer(QTcpServer):
     
 
     def __init__(self, parent=None,channel_lock=None,
-                 upload_function=None):
+                 upload_function=None,stream_log=None):
+        """
+        Inputs
+        --------
+        channel_lock : QReadWriteLock
+            lock for the channel dictionary
+        stream_log : ScopePy_streamlog.StreamLogWriter or None
+            if given, every packet received is written to this log before
+            it is decoded, so the session can be replayed
+        
+        The server counts connections, packets, decode time and lock
+        waits in self.telemetry, a ScopePy_telemetry.IngestTelemetry.
+        
+        """
         
         super(ThreadedTcpServer, self).__init__(parent)
         
@@ -855,15 +1217,37 @@ class ThreadedTcpServer(QTcpServer):
         # Thread locking variable for channel dictionary
         self.channel_lock = channel_lock
         self.upload_function = upload_function 
+        
+        # Raw packet log
+        self.stream_log = stream_log
+        
+        # Number of connections so far, identifies connections in the log
+        self.connectionCount = 0
+        
+        # Live counters, shared by all the socket threads
+        self.telemetry = telemetry.IngestTelemetry()
+        
+        # The rates are worked out on a timer, there is no drain timer as
+        # in the other servers
+        self.rateTimer = QTimer(self)
+        self.rateTimer.setInterval(int(1000*telemetry.RATE_INTERVAL))
+        self.connect(self.rateTimer,SIGNAL("timeout()"),self.telemetry.advance)
+        self.rateTimer.start()
 
 
 
     def incomingConnection(self, socketId):
         
+        self.connectionCount += 1
+        
         # Create a thread to process the incoming socket
         thread = SocketThread(socketId, self,upLoadFunction=self.uploadDataArray,
                               lock=self.channel_lock,
-                              commandUploadFunction=self.sendCmd2API)
+                              commandUploadFunction=self.sendCmd2API,
+                              batchUploadFunction=self.uploadDataBatch,
+                              streamLog=self.stream_log,
+                              connectionNumber=self.connectionCount,
+                              telemetry=self.telemetry)
                               
         self.connect(thread, SIGNAL("finished()"),
                      thread, SLOT("deleteLater()"))
@@ -891,11 +1275,29 @@ class ThreadedTcpServer(QTcpServer):
         """
         
         
-        logger.debug("Sending UpLoad data array signal")
+        if DEBUG:
+            logger.debug("Sending UpLoad data array signal")
         
         self.emit(SIGNAL("UpLoadChannelData"), dataArray)
         
         
+    def uploadDataBatch(self,channels):
+        """
+        Emit a signal with data for several channels, from a version 2
+        frame. The GUI adds them all in one go.
+        
+        Input
+        ------
+        channels : list of (channelLabel,array) tuples
+        
+        """
+        
+        if DEBUG:
+            logger.debug("Sending UpLoad data batch signal")
+        
+        self.emit(SIGNAL("UpLoadChannelDataBatch"), channels)
+        
+        
         
     def sendCmd2API(self,socket,command_packet):
         """
@@ -917,8 +1319,6 @@ class ThreadedTcpServer(QTcpServer):
         command_packet : byte string
             raw command packet
         
-        TODO : pass socket here
-        
         """
         
         logger.debug("Send command from server to main API")
@@ -937,14 +1337,23 @@ class SocketThread(QThread):
     # TODO : Could try a QMutex instead.
 
     def __init__(self, socketId, parent,upLoadFunction=None,lock=None,
-                 commandUploadFunction=None):
+                 commandUploadFunction=None,batchUploadFunction=None,
+                 streamLog=None,connectionNumber=0,telemetry=None):
         super(SocketThread, self).__init__(parent)
         self.socketId = socketId
         
+        # Raw packet log, see ThreadedTcpServer
+        self.streamLog = streamLog
+        self.connectionNumber = connectionNumber
+        
+        # Server counters, see ThreadedTcpServer
+        self.telemetry = telemetry
         
         
-        # Store upload function
+        
+        # Store upload functions
         self.upLoadFunction = upLoadFunction
+        self.batchUploadFunction = batchUploadFunction
         
         # Channel dictionary thread locker
         self.channel_lock = lock
@@ -969,104 +1378,543 @@ class SocketThread(QThread):
             
         # Read packet data from socket
         # --------------------------------
+        # The connection is kept open for as many packets as the client
+        # sends. Packets are processed as soon as they are complete, without
+        # waiting for more data if several arrive together.
+        reader = PacketReader()
+        stream = QDataStream(socket)
+        stream.setVersion(QDataStream.Qt_4_2)
         
-        while socket.state() == QAbstractSocket.ConnectedState:
-            
+        if self.telemetry is not None:
+            self.telemetry.connectionOpened()
         
-            nextBlockSize = 0
-            
-            # Create a stream to read the packet
-            stream = QDataStream(socket)
-            stream.setVersion(QDataStream.Qt_4_2)
-            
-            # Read packet length from first 64bit integer
-            if (socket.waitForReadyRead() and
-                socket.bytesAvailable() >= SIZEOF_UINT64):
-                    
-                # Read the 64 bits in byte form
-                plBytes = stream.readRawData(SIZEOF_UINT64)
-                
-                # Convert bytes to uint64 using numpy
-                packetLength = int(np.fromstring(plBytes, dtype=np.uint64))
-                
-                # Read the size of the rest of the packet
-                nextBlockSize = packetLength - SIZEOF_UINT64
-                
-            else:
-                #self.sendError(socket, "Cannot read client request")
-                return
+        try:
+            while True:
                 
+                if socket.bytesAvailable() == 0:
+                    if not socket.waitForReadyRead(SOCKET_READ_TIMEOUT_MS):
+                        if socket.state() != QAbstractSocket.ConnectedState:
+                            logger.debug("Socket closed")
+                            return
+                        continue
+                        
+                # Read in the raw bytes
+                data = stream.readRawData(min(socket.bytesAvailable(),READ_BLOCK_SIZE))
                 
-            # Read in the rest of the packet
-            # ------------------------------------------
-            # Wait for all the data to accumulate
-            # this is required for large amounts of data
-            while socket.bytesAvailable() < nextBlockSize:
-                
-                if not socket.waitForReadyRead(60000):
-                    logger.debug("Socket closed while reading client payload data")
+                try:
+                    packets = reader.feed(data)
+                except PacketError as error:
+                    logger.error("SocketThread: %s, closing connection" % error)
+                    socket.abort()
                     return
-                    
                 
+                for packet in packets:
+                    if self.streamLog is not None:
+                        self.streamLog.write(packet,self.connectionNumber)
+                        
+                    self.processPacket(socket,packet)
                     
-            # Read the packet
-            # Read in the raw bytes
-            packet = stream.readRawData(nextBlockSize)
-            
-            
-            # Process the packet
-            # ---------------------------
-            
-            # Get the packet type
-            packetType,remainingPacket = getPacketType(packet)
+        finally:
+            if self.telemetry is not None:
+                self.telemetry.connectionClosed()
+                
+                
+    def processPacket(self,socket,packet):
+        """
+        Process one complete packet
+        
+        Input
+        ------
+        socket : QTcpSocket
+            connection to the client
             
+        packet : bytearray
+            packet with the length removed
             
+        """
+        
+        # Get the packet type
+        packetType,remainingPacket = getPacketType(packet)
+        
+        if DEBUG:
             logger.debug("Incoming packet : Type = %d" % packetType)
-                
             
-            # Select the action for each packet type
+        
+        # Select the action for each packet type
+        if packetType in [DATA_PACKET,DATA_PACKET_NOACK]:
+            
+            # TODO : send reply back to client
+            # something like this:
             if packetType == DATA_PACKET:
-                
-                # TODO : send reply back to client
-                # something like this:
-                socket.writeData(wrapDataPacket("Packet received"))
-           
-                # Extract numerical data and channel label
+                socket.writeData(wrapDataPacket(DATA_REPLY))
+       
+            # Extract numerical data and channel label
+            start = time.perf_counter()
+            
+            try:
                 data4scope = extractDataPacket(remainingPacket)
-               
-          
+            except PacketError as error:
+                logger.error("SocketThread: Dropping data packet : %s" % error)
                 
+                if self.telemetry is not None:
+                    self.telemetry.decodeError(len(packet) + LENGTH_HEADER.size)
+                return
+                
+            self.countPacket(packet,start,[data4scope])
+            
+            if DEBUG:
                 logger.debug("Data packet received [size = %d bytes]" % len(remainingPacket))
                 logger.debug("Data label : [%s]" % data4scope[0])
-                    
                 
-                # Upload data - lock for this thread
-                # ++++++++++++++++++++++++++++++++++++++
-                try:
-                    self.channel_lock.lockForWrite()
-                    
-                    
+            
+            # Upload data - lock for this thread
+            # ++++++++++++++++++++++++++++++++++++++
+            try:
+                self.lockChannels()
+                
+                if DEBUG:
                     logger.debug("Locking channel dict for [%s]" % data4scope[0])
+                
+                # Upload the array to calling function
+                self.upLoadFunction(data4scope)
+                
+            finally:
+                self.channel_lock.unlock()
+                
+                if DEBUG:
+                    logger.debug("unlocking channel dict for [%s]\n" % data4scope[0])
+                
+                
+        elif packetType == DATA_FRAME_V2:
+            
+            start = time.perf_counter()
+            
+            try:
+                channels = protocol.decodeFrame(remainingPacket)
+            except Exception as error:
+                logger.error("SocketThread: Dropping data frame : %s" % error)
+                
+                if self.telemetry is not None:
+                    self.telemetry.decodeError(len(packet) + LENGTH_HEADER.size)
+                return
+                
+            self.countPacket(packet,start,channels)
+            
+            if DEBUG:
+                logger.debug("Data frame received [%d channels]" % len(channels))
+            
+            # Upload all the channels together
+            if channels:
+                try:
+                    self.lockChannels()
                     
-                    # Upload the array to calling function
-                    self.upLoadFunction(data4scope)
+                    self.batchUploadFunction(channels)
                     
                 finally:
                     self.channel_lock.unlock()
-                    logger.debug("unlocking channel dict for [%s]\n" % data4scope[0])
-                    
-                    # Close the socket
-                    # TODO
+        
+        
+        
+        elif packetType == COMMAND_PACKET:
+            logger.debug("A command packet has arrived at the server")
+            
+            self.commandUploadFunction(socket,bytes(remainingPacket))
+                
+            socket.writeData(wrapDataPacket(COMMAND_REPLY))
+            
+            
+    def countPacket(self,packet,start,channels):
+        """
+        Add a decoded packet to the server telemetry
+        
+        Input
+        ------
+        packet : bytearray
+            packet with the length removed
+        start : float
+            time.perf_counter() when decoding started
+        channels : list of (channelLabel,array) tuples
+            decoded data
+            
+        """
+        
+        if self.telemetry is not None:
+            self.telemetry.packetReceived(len(packet) + LENGTH_HEADER.size,
+                                          time.perf_counter() - start,channels)
             
             
+    def lockChannels(self):
+        """
+        Lock the channel dictionary for writing, counting the time spent
+        waiting for the lock
+        
+        """
+        
+        start = time.perf_counter()
+        self.channel_lock.lockForWrite()
+        
+        if self.telemetry is not None:
+            self.telemetry.lockWaited(time.perf_counter() - start)
+        
+        
+        
+#=============================================================================
+#%% asyncio Server 
+#=============================================================================
+# Alternative to ThreadedTcpServer, all connections are handled on one
+# thread and the data is passed to the GUI at a fixed rate
+        
+        
+def frameInterval(frameRate):
+    """
+    Timer interval for passing data to the GUI
+    
+    Inputs
+    --------
+    frameRate : float or None
+        frames per second, 0 or None for no limit
+        
+    Outputs
+    --------
+    interval : int
+        [ms], 0 runs the timer every time round the event loop
+        
+    """
+    
+    if not frameRate:
+        return 0
+        
+    return int(1000/frameRate)
+    
+    
+class AsyncTcpServer(QObject):
+    """
+    Qt wrapper for ScopePy_ingest.IngestServer
+    
+    Has the same signals as ThreadedTcpServer and the listen() and
+    errorString() methods of QTcpServer, so it can be used in its place.
+    
+    All the data received since the last frame is sent to the GUI by a 
+    timer, as a list of (channelLabel,array) tuples in one 
+    "UpLoadChannelDataBatch" signal, with the telemetry so the time the
+    GUI waits for the channel lock is counted. Command packets are sent 
+    with the "UpLoadCommandPacket" signal, one at a time. There is no 
+    socket to pass with them, so None is sent in its place.
+    
+    """
+    
+    def __init__(self,parent=None,frameRate=DEFAULT_INGEST_RATE):
+        
+        super(AsyncTcpServer, self).__init__(parent)
+        
+        self.ingestServer = ingest.IngestServer(decodePacket)
+        
+        # Live counters, as ThreadedTcpServer
+        self.telemetry = self.ingestServer.telemetry
+        
+        # Timer for passing data to the GUI
+        self.timer = QTimer(self)
+        self.timer.setInterval(frameInterval(frameRate))
+        self.connect(self.timer,SIGNAL("timeout()"),self.drainQueue)
+        
+        
+    def listen(self,address,port):
+        """
+        Start the server
+        
+        Inputs
+        --------
+        address : QHostAddress
+        port : int
+        
+        Outputs
+        --------
+        success : bool
+        
+        """
+        
+        if not self.ingestServer.start(address.toString(),port):
+            return False
             
-            elif packetType == COMMAND_PACKET:
-                logger.debug("A command packet has arrived at the server")
+        self.timer.start()
+        
+        return True
+        
+        
+    def errorString(self):
+        
+        return self.ingestServer.errorString()
+        
+        
+    def close(self):
+        """
+        Stop the server
+        
+        """
+        
+        self.timer.stop()
+        self.ingestServer.stop()
+        
+        
+    def drainQueue(self):
+        """
+        Send all the data received since the last time to the GUI
+        
+        """
+        
+        channels = self.ingestServer.drain()
+        
+        if channels:
+            self.emit(SIGNAL("UpLoadChannelDataBatch"), channels, self.telemetry)
+            
+        for command_packet in self.ingestServer.drainCommands():
+            self.emit(SIGNAL("UpLoadCommandPacket"), None, command_packet)
+        
+        
+        
+#=============================================================================
+#%% Shared memory receiver
+#=============================================================================
+        
+        
+class SharedMemoryReceiver(QObject):
+    """
+    Reads data from shared memory rings made by producers on this computer
+    
+    New rings are found automatically. On every frame all the data waiting
+    in the rings is sent to the GUI in one "UpLoadChannelDataBatch" signal.
+    The arrays are views of the shared memory, so the signal must be 
+    connected directly (same thread). The space is given back to the 
+    producer after the signal returns.
+    
+    Each ring counts as a connection in self.telemetry, and each read 
+    from a ring as a packet.
+    
+    """
+    
+    def __init__(self,parent=None,frameRate=DEFAULT_INGEST_RATE):
+        
+        super(SharedMemoryReceiver, self).__init__(parent)
+        
+        # Rings being read, by name
+        self.rings = {}
+        
+        # Rings that could not be opened, so they aren't tried again
+        self.badRings = set()
+        
+        # Live counters, as the TCP servers
+        self.telemetry = telemetry.IngestTelemetry()
+        
+        self.timer = QTimer(self)
+        self.timer.setInterval(frameInterval(frameRate))
+        self.connect(self.timer,SIGNAL("timeout()"),self.readRings)
+        
+        self.searchTimer = QTimer(self)
+        self.searchTimer.setInterval(RING_SEARCH_INTERVAL_MS)
+        self.connect(self.searchTimer,SIGNAL("timeout()"),self.findRings)
+        
+        
+    def start(self):
+        
+        self.findRings()
+        self.timer.start()
+        self.searchTimer.start()
+        
+        
+    def close(self):
+        
+        self.timer.stop()
+        self.searchTimer.stop()
+        
+        for ring in self.rings.values():
+            ring.close()
+            self.telemetry.connectionClosed()
+            
+        self.rings = {}
+        
+        
+    def attach(self,name):
+        """
+        Start reading from a ring
+        
+        Input
+        ------
+        name : str
+            name of the shared memory
+            
+        Output
+        ------
+        success : bool
+        
+        """
+        
+        if name in self.rings:
+            return True
+            
+        try:
+            self.rings[name] = sharedmem.RingConsumer(name)
+            
+        except sharedmem.RingNotReady:
+            # Still being created, try again next time
+            return False
+            
+        except (OSError,ValueError) as error:
+            logger.error("Cannot read shared memory [%s] : %s" % (name,error))
+            self.badRings.add(name)
+            return False
+            
+        logger.debug("Reading from shared memory [%s]" % name)
+        self.telemetry.connectionOpened()
+        
+        return True
+        
+        
+    def findRings(self):
+        """
+        Attach to any new rings, and remove rings left behind by producers
+        that have died
+        
+        """
+        
+        for name in sharedmem.findRings():
+            if name not in self.rings and name not in self.badRings:
+                self.attach(name)
                 
-                dummy = "dummy"
-                self.commandUploadFunction(dummy,remainingPacket)
-                    
-                socket.writeData(wrapDataPacket("success|dummy return"))
-                # TODO pass socket back as well
+        for name,ring in list(self.rings.items()):
+            if ring.backlog == 0 and not ring.isClosed and not ring.producerAlive:
+                logger.debug("Shared memory [%s] producer has gone, removing it" % name)
+                ring.unlink()
+                ring.close()
+                del self.rings[name]
+                self.telemetry.connectionClosed()
+                
+                
+    def readRings(self):
+        """
+        Send everything in the rings to the GUI
+        
+        """
+        
+        channels = []
+        
+        for ring in self.rings.values():
+            start = time.perf_counter()
+            first = len(channels)
+            channels.extend(ring.read())
+            readTime = time.perf_counter() - start
+            
+            if len(channels) > first:
+                self.telemetry.packetReceived(sum([data.nbytes for label,data in channels[first:]]),
+                                              readTime,channels[first:])
+                
+        if channels:
+            self.emit(SIGNAL("UpLoadChannelDataBatch"), channels, self.telemetry)
+            
+        del channels
+        
+        self.telemetry.advance()
+        
+        # Give the space back to the producers
+        for name,ring in list(self.rings.items()):
+            ring.release()
+            
+            if ring.isClosed and ring.backlog == 0:
+                logger.debug("Shared memory [%s] closed by producer" % name)
+                ring.close()
+                del self.rings[name]
+                self.telemetry.connectionClosed()
+                
+                
+                
+#=============================================================================
+#%% UDP server 
+#=============================================================================
+        
+        
+class UdpServer(QObject):
+    """
+    Qt wrapper for ScopePy_udp.UdpReceiver
+    
+    Receives datagrams from sources that can only send UDP. All the data 
+    put back in order since the last frame is sent to the GUI in one 
+    "UpLoadChannelDataBatch" signal.
+    
+    """
     
+    def __init__(self,parent=None,frameRate=DEFAULT_INGEST_RATE):
+        
+        super(UdpServer, self).__init__(parent)
+        
+        self.receiver = udp.UdpReceiver()
+        
+        # Live counters, as the TCP servers
+        self.telemetry = self.receiver.telemetry
+        
+        # Timer for passing data to the GUI
+        self.timer = QTimer(self)
+        self.timer.setInterval(frameInterval(frameRate))
+        self.connect(self.timer,SIGNAL("timeout()"),self.drainQueue)
+        
+        
+    def listen(self,address,port):
+        """
+        Start receiving
+        
+        Inputs
+        --------
+        address : QHostAddress
+        port : int
+        
+        Outputs
+        --------
+        success : bool
+        
+        """
+        
+        if not self.receiver.start(address.toString(),port):
+            return False
             
+        self.timer.start()
+        
+        return True
+        
+        
+    def errorString(self):
+        
+        return self.receiver.errorString()
+        
+        
+    def close(self):
+        """
+        Stop receiving
+        
+        """
+        
+        self.timer.stop()
+        self.receiver.stop()
+        
+        
+    def statistics(self):
+        """
+        Loss and rate statistics for each source
+        
+        Output
+        -------
+        stats : list of dict
+            see ScopePy_udp.SourceStatistics.summary()
+        
+        """
+        
+        return self.receiver.stats()
+        
+        
+    def drainQueue(self):
+        """
+        Send all the data received since the last time to the GUI
+        
+        """
+        
+        channels = self.receiver.drain()
+        
+        if channels:
+            self.emit(SIGNAL("UpLoadChannelDataBatch"), channels, self.telemetry)
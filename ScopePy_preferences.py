@@ -62,6 +62,7 @@ from PyQt4.QtGui import *
 # My libraries
 import ScopePy_keyboard as kbd
 from ScopePy_utilities import minidir
+from ScopePy_graphs import DEFAULT_PLOT_FRAME_RATE
 
 #==============================================================================
 #%% Logger
@@ -94,6 +95,23 @@ DEFAULT_PREFS_FILE = os.path.join(os.path.expanduser('~'),'.ScopePy','preference
 
 BASEPATH, dummy = os.path.split(os.path.abspath(__file__))
 
+# Default server for receiving data : 'threaded' or 'asyncio'
+# see ScopePy_network.SERVER_TYPES
+DEFAULT_INGEST_SERVER = 'threaded'
+
+# Default port for UDP datagrams, 0 turns UDP off. UDP has no connections
+# so anything on the network can send to it, it has to be turned on by
+# the user, usually with ScopePy_udp.UDP_PORT (63407)
+DEFAULT_UDP_PORT = 0
+
+# Read data from shared memory rings made by producers on this computer,
+# see ScopePy_shared_memory
+DEFAULT_SHARED_MEMORY = False
+
+# Default folder for logs of the packets received by the threaded server,
+# empty for no logging. See ScopePy_streamlog
+DEFAULT_STREAM_LOG_FOLDER = ''
+
 #==============================================================================
 #%% Functions
 #==============================================================================
@@ -201,6 +219,25 @@ class Preferences():
         # =========================
         self.keyboard = kbd.makeDefaultKeyboardShortcuts()
         
+        # Plotting
+        # ==========================
+        # Maximum number of graph redraws per second
+        self.plotFrameRate = DEFAULT_PLOT_FRAME_RATE
+        
+        # Network
+        # ==========================
+        # Server used for incoming data
+        self.ingestServer = DEFAULT_INGEST_SERVER
+        
+        # Port for UDP datagrams, 0 for no UDP
+        self.udpPort = DEFAULT_UDP_PORT
+        
+        # Read shared memory rings
+        self.sharedMemory = DEFAULT_SHARED_MEMORY
+        
+        # Folder for logging received packets, empty for no logging
+        self.streamLogFolder = DEFAULT_STREAM_LOG_FOLDER
+        
         
     def save(self):
         """
@@ -255,6 +292,15 @@ class Preferences():
         if self.theme:
             config['THEME']['SELECTED'] = self.theme
             
+        config['PLOTTING'] = {}
+        config['PLOTTING']['FRAME_RATE'] = str(self.plotFrameRate)
+        
+        config['NETWORK'] = {}
+        config['NETWORK']['INGEST_SERVER'] = self.ingestServer
+        config['NETWORK']['UDP_PORT'] = str(self.udpPort)
+        config['NETWORK']['SHARED_MEMORY'] = str(self.sharedMemory)
+        config['NETWORK']['STREAM_LOG_FOLDER'] = self.streamLogFolder
+            
         
         
         # TODO : add keyboard shortcuts
@@ -317,6 +363,20 @@ class Preferences():
         if 'THEME' in config:
             self.theme = readIfExists(config['THEME'],'SELECTED','default')
             
+        if 'PLOTTING' in config:
+            self.plotFrameRate = float(readIfExists(config['PLOTTING'],'FRAME_RATE',
+                                                    DEFAULT_PLOT_FRAME_RATE))
+                                                    
+        if 'NETWORK' in config:
+            self.ingestServer = readIfExists(config['NETWORK'],'INGEST_SERVER',
+                                             DEFAULT_INGEST_SERVER)
+            self.udpPort = int(readIfExists(config['NETWORK'],'UDP_PORT',
+                                            DEFAULT_UDP_PORT))
+            self.sharedMemory = config['NETWORK'].getboolean('SHARED_MEMORY',
+                                                             DEFAULT_SHARED_MEMORY)
+            self.streamLogFolder = readIfExists(config['NETWORK'],'STREAM_LOG_FOLDER',
+                                                DEFAULT_STREAM_LOG_FOLDER)
+            
     
     
     
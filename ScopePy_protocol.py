@@ -0,0 +1,612 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:20:47 2026
+
+@author: john
+
+ScopePy data protocol version 2
+===================================
+
+Frame format for sending data to ScopePy, alongside the original
+DATA_PACKET format, which is also decoded here.
+
+Compared to the original format a frame:
+
+* starts with a magic number and version so it can be checked
+* keeps the data type of each column, e.g. int16 from an ADC is sent as
+  2 bytes instead of being converted to float64
+* holds several channels
+* can be compressed with zlib, decided frame by frame
+
+Frames are sent as packets in the same way as data packets, wrapped with
+the packet length by wrapDataPacket(). This module has no Qt or socket
+code, so packets can be decoded without the GUI, e.g. by ScopePy_daemon.
+
+Frame layout
+--------------
+All integers are little endian.
+
+* Packet type [uint64] DATA_FRAME_V2
+* Frame header [FRAME_HEADER]
+    - magic number [uint32]
+    - version [uint8]
+    - flags [uint8] FLAG_ZLIB if the body is compressed
+    - number of channels [uint16]
+    - length of the uncompressed body [uint64]
+* Body, possibly compressed, one block per channel:
+    - channel header [CHANNEL_HEADER] : No. rows [uint64],
+      No. columns [uint16], length of channel label [uint16]
+    - channel label [utf-8]
+    - for each column [COLUMN_HEADER] : numpy dtype string [4 bytes],
+      length of column name [uint16], then the column name [utf-8]
+    - data : rows of packed records, columns in the order above
+
+The data of each channel is a numpy structured array with no padding, so
+it is decoded as a view of the frame without copying.
+
+"""
+
+#==============================================================================
+#%% License
+#==============================================================================
+
+"""
+Copyright 2015 John Bainbridge
+
+This file is part of ScopePy.
+
+ScopePy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+ScopePy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+#======================================================================
+#%% Imports
+#======================================================================
+import logging
+import struct
+import zlib
+
+import numpy as np
+
+
+#==============================================================================
+#%% Logger
+#==============================================================================
+# create logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Add do nothing handler
+logger.addHandler(logging.NullHandler())
+
+
+#======================================================================
+#%% Constants
+#======================================================================
+
+# Packet type identifiers for version 1 packets
+DATA_PACKET = 4001
+COMMAND_PACKET = 3456
+
+# Data packet that the server does not reply to
+DATA_PACKET_NOACK = 4002
+
+# Packet type for version 2 frames
+DATA_FRAME_V2 = 4010
+
+# Replies sent by the servers to DATA_PACKET and COMMAND_PACKET
+DATA_REPLY = "Packet received"
+COMMAND_REPLY = "Command received"
+
+# Magic number for identifying ScopePy packets
+MAGIC_NUMBER = 7616893
+
+PROTOCOL_VERSION = 2
+
+# Flags
+FLAG_ZLIB = 0x01
+
+# uint64 size in bytes
+SIZEOF_UINT64 = 8
+
+# Headers
+# Packet length
+LENGTH_HEADER = struct.Struct('<Q')
+# Packet type
+TYPE_HEADER = struct.Struct('<Q')
+# Version 1 data packet : No. rows, No. columns, length of column names
+DATA_HEADER = struct.Struct('<QQQ')
+# Version 2 frames
+FRAME_HEADER = struct.Struct('<IBBHQ')
+CHANNEL_HEADER = struct.Struct('<QHH')
+COLUMN_HEADER = struct.Struct('<4sH')
+
+# Default zlib compression level, low levels are much faster and still
+# get most of the reduction on sampled data
+DEFAULT_ZLIB_LEVEL = 1
+
+# Largest uncompressed frame body accepted [bytes], compressed frames are
+# never inflated beyond this or the length in their header
+MAX_BODY_SIZE = 1024*1024*1024
+
+# Column types that can be sent
+ALLOWED_KINDS = 'iuf'
+
+
+#======================================================================
+#%% Exceptions
+#======================================================================
+
+class FrameError(ValueError):
+    """
+    Frame can't be decoded
+
+    """
+    pass
+
+
+class PacketError(ValueError):
+    """
+    Packet is badly formed
+
+    """
+    pass
+
+
+#======================================================================
+#%% Encoding
+#======================================================================
+
+def packedDtype(dtype):
+    """
+    Little endian dtype with no padding between the columns
+
+    Inputs
+    --------
+    dtype : numpy structured dtype
+
+    Outputs
+    --------
+    packed : numpy dtype
+
+    """
+
+    columns = []
+
+    for name in dtype.names:
+        column_type = dtype.fields[name][0]
+
+        if column_type.kind not in ALLOWED_KINDS or column_type.shape:
+            raise TypeError("Column [%s] has type %s, only integer and float columns can be sent" % (name,column_type))
+
+        columns.append((name,column_type.newbyteorder('<')))
+
+    return np.dtype(columns)
+
+
+
+def encodeFrame(channels,compress=False,level=DEFAULT_ZLIB_LEVEL):
+    """
+    Make a version 2 frame packet
+
+    Inputs
+    --------
+    channels : list of (channelLabel, array) tuples
+        channelLabel : str
+        array : numpy structured array or recarray, one column per field
+                integer and float columns are sent with their own type
+    compress : bool
+        compress the frame with zlib. If compression doesn't make the frame
+        smaller it is sent uncompressed.
+    level : int
+        zlib compression level
+
+    Outputs
+    --------
+    packet : bytes
+        frame packet ready for ScopePy_network.wrapDataPacket()
+
+    Example
+    --------
+    >>> adc = np.zeros(1000,dtype=[('time','<f4'),('volts','<i2')])
+    >>> packet = encodeFrame([('ADC 1',adc)])
+
+    """
+
+    body = b''.join(frameBodyParts(channels))
+
+    # Compression
+    # -------------
+    flags = 0
+
+    if compress:
+        compressed = zlib.compress(body,level)
+
+        if len(compressed) < len(body):
+            flags |= FLAG_ZLIB
+            payload = compressed
+        else:
+            payload = body
+    else:
+        payload = body
+
+    header = FRAME_HEADER.pack(MAGIC_NUMBER,PROTOCOL_VERSION,flags,
+                               len(channels),len(body))
+
+    return b''.join([TYPE_HEADER.pack(DATA_FRAME_V2),header,payload])
+
+
+
+def frameParts(channels):
+    """
+    Uncompressed frame, without the packet type, as a list of buffers
+
+    Used to copy a frame straight into another buffer without joining it
+    together first.
+
+    Inputs
+    --------
+    channels : list of (channelLabel, array) tuples
+        as encodeFrame()
+
+    Outputs
+    --------
+    parts : list of bytes or memoryview
+        the frame is these joined together
+
+    """
+
+    body = frameBodyParts(channels)
+    bodyLength = sum([len(part) for part in body])
+
+    header = FRAME_HEADER.pack(MAGIC_NUMBER,PROTOCOL_VERSION,0,
+                               len(channels),bodyLength)
+
+    return [header] + body
+
+
+
+def frameBodyParts(channels):
+    """
+    Channel blocks of a frame body as a list of buffers
+
+    """
+
+    body = []
+
+    for channelLabel,array in channels:
+
+        dtype = packedDtype(array.dtype)
+        data = np.ascontiguousarray(array,dtype=dtype).reshape(-1)
+
+        label = channelLabel.encode()
+
+        body.append(CHANNEL_HEADER.pack(len(data),len(dtype),len(label)))
+        body.append(label)
+
+        for name in dtype.names:
+            name_bytes = name.encode()
+            body.append(COLUMN_HEADER.pack(dtype.fields[name][0].str.encode(),len(name_bytes)))
+            body.append(name_bytes)
+
+        body.append(memoryview(data.view(np.uint8)))
+
+    return body
+
+
+
+#======================================================================
+#%% Decoding
+#======================================================================
+
+def decodeFrame(packet):
+    """
+    Extract channel data from a version 2 frame
+
+    Inputs
+    --------
+    packet : bytes, bytearray or memoryview
+        frame with the packet type removed, as returned by
+        ScopePy_network.getPacketType()
+
+    Outputs
+    --------
+    channels : list of (channelLabel, recarray) tuples
+        if the frame is not compressed the recarrays are views of the
+        packet
+
+    Raises FrameError if the frame is not a valid version 2 frame.
+    Compressed bodies are only inflated to the length in the header, so a
+    small frame can't use up the memory.
+
+    """
+
+    view = memoryview(packet)
+
+    if len(view) < FRAME_HEADER.size:
+        raise FrameError("Frame is too short [%d bytes]" % len(view))
+
+    magic,version,flags,nChannels,bodyLength = FRAME_HEADER.unpack_from(view)
+
+    if magic != MAGIC_NUMBER:
+        raise FrameError("Frame has wrong magic number [%d]" % magic)
+
+    if version != PROTOCOL_VERSION:
+        raise FrameError("Unsupported frame version [%d]" % version)
+
+    if bodyLength > MAX_BODY_SIZE:
+        raise FrameError("Frame body of %d bytes is more than the maximum [%d]" %
+                         (bodyLength,MAX_BODY_SIZE))
+
+    body = view[FRAME_HEADER.size:]
+
+    if flags & FLAG_ZLIB:
+        decompressor = zlib.decompressobj()
+
+        try:
+            body = memoryview(decompressor.decompress(body,bodyLength + 1))
+        except zlib.error as error:
+            raise FrameError("Frame body can't be decompressed : %s" % error)
+
+        if len(body) > bodyLength or decompressor.unconsumed_tail or not decompressor.eof:
+            raise FrameError("Frame body is longer than expected [%d bytes]" % bodyLength)
+
+    if len(body) != bodyLength:
+        raise FrameError("Frame body is %d bytes, expected %d" % (len(body),bodyLength))
+
+    return decodeChannels(body,nChannels)
+
+
+
+def decodeChannels(body,nChannels):
+    """
+    Extract channel blocks from a frame body
+
+    Also used for the channel block in UDP datagrams (ScopePy_udp).
+
+    Inputs
+    --------
+    body : memoryview
+        uncompressed body
+    nChannels : int
+        number of channel blocks in the body
+
+    Outputs
+    --------
+    channels : list of (channelLabel, recarray) tuples
+        views of the body
+
+    Raises FrameError if the blocks are corrupt.
+
+    """
+
+    channels = []
+    offset = 0
+
+    try:
+        for index in range(nChannels):
+            nRows,nCols,labelLength = CHANNEL_HEADER.unpack_from(body,offset)
+            offset += CHANNEL_HEADER.size
+
+            channelLabel = bytes(body[offset:offset+labelLength]).decode()
+            offset += labelLength
+
+            columns = []
+
+            for column in range(nCols):
+                typeString,nameLength = COLUMN_HEADER.unpack_from(body,offset)
+                offset += COLUMN_HEADER.size
+
+                name = bytes(body[offset:offset+nameLength]).decode()
+                offset += nameLength
+
+                columns.append((name,typeString.rstrip(b'\0').decode()))
+
+            dtype = np.dtype(columns)
+
+            array = np.frombuffer(body,dtype=dtype,count=nRows,offset=offset)
+            offset += nRows*dtype.itemsize
+
+            channels.append((channelLabel,array.view(np.recarray)))
+
+    except (struct.error,ValueError,TypeError) as error:
+        raise FrameError("Frame is corrupt : %s" % error)
+
+    return channels
+
+
+
+#======================================================================
+#%% Version 1 packets
+#======================================================================
+
+def getPacketType(packet):
+    """ packetType,remainingPacket = getPacketType(packet)
+
+    Read first unit64 from unwrapped packet string to identify which
+    packet has been sent. Then return the rest of the packet for extraction
+    by other functions
+
+    Input
+    --------
+    packet = byte string, bytearray or memoryview packet
+
+    Outputs
+    ----------
+    packetType = numerical packet type as defined at top of this file
+    remainingPacket = memoryview of the packet with type stripped off,
+                      the packet is not copied
+
+    """
+
+    packetType, = TYPE_HEADER.unpack_from(packet)
+
+    return packetType,memoryview(packet)[TYPE_HEADER.size:]
+
+
+
+def extractDataPacket(packet):
+    """
+    Extract 2D array data from packet
+
+    Inputs
+    --------
+    packet = byte string packet as returned by by getPacketType
+
+    Outputs
+    --------
+    (channelNumber,array_out) = tuple of outputs
+
+    Where
+        channelLabel : str
+            Scope channel to add data to
+        array_out = 2D numpy recarray with column names included
+
+    The recarray is a view onto the packet, not a copy. Each row of the
+    packet data is one record.
+
+    Raises PacketError if the packet is too short or the header doesn't
+    match the data.
+
+    """
+
+    if len(packet) < DATA_HEADER.size:
+        raise PacketError("Data packet is too short [%d bytes]" % len(packet))
+
+    # Extract integer data (No. Rows, columns and header string)
+    # -----------------------------------------------------------------------
+    nRows,nCols,headerLength = DATA_HEADER.unpack_from(packet)
+
+
+    # Extract header
+    # ----------------
+    # Slice out header, convert from bytes to string and separate by delimiters
+    start = DATA_HEADER.size
+
+    try:
+        headerList = bytes(packet[start:start+headerLength]).decode().split(',')
+    except UnicodeDecodeError as error:
+        raise PacketError("Data packet column names can't be read : %s" % error)
+
+    # Extract channel label as the first item
+    channelLabel = headerList[0]
+
+    # Extract the numerical data
+    # ---------------------------
+    # The data is stored row by row, so each row is a record of float64
+    # columns
+    try:
+        dtype = np.dtype([(name,'<f8') for name in headerList[1:]])
+    except ValueError as error:
+        raise PacketError("Data packet has bad column names : %s" % error)
+
+    if len(dtype) != nCols:
+        raise PacketError("Data packet has %d columns but %d column names" % (nCols,len(dtype)))
+
+    if len(packet) < start + headerLength + nRows*dtype.itemsize:
+        raise PacketError("Data packet is %d bytes, too short for %d rows" % (len(packet),nRows))
+
+    recarray_out = np.frombuffer(packet,dtype=dtype,count=nRows,
+                                 offset=start+headerLength).view(np.recarray)
+
+    return (channelLabel,recarray_out)
+
+
+
+def wrapDataPacket(dataPacket):
+    """ Wrap the data packet for sending over TCIP connection
+    This just adds the length of the total packet to the front of
+    the data packet. The server can then read this first and will
+    then know how long to read data from the connection.
+
+    Input
+    ------
+    dataPacket : str or bytes
+        output of makeDataPacket()
+
+    """
+
+    # Convert to bytes if necessary
+    # -----------------------------
+    if not isinstance(dataPacket,bytes):
+        dataPacket = dataPacket.encode()
+
+    # Get length of packet
+    # ------------------------
+    pkLen = len(dataPacket)
+
+    # Check for empty packets
+    # return without error for now
+
+    if pkLen == 0:
+        return
+
+
+    # Add to packet
+    # ------------------------
+    # Add the total length of the packet including the size of the integer
+    # that is being added
+    wrappedPacket = b''.join([LENGTH_HEADER.pack(pkLen+SIZEOF_UINT64),dataPacket])
+
+    # Return bytes packet
+    return wrappedPacket
+
+
+
+def decodePacket(packet):
+    """
+    Decode any type of packet
+
+    Used by the asyncio server, see ScopePy_ingest, and by ScopePy_daemon.
+
+    Inputs
+    --------
+    packet = packet with the length removed
+
+    Outputs
+    --------
+    (channels,reply,commands) = tuple of outputs
+
+    Where
+        channels : list of (channelLabel,array_out) tuples
+            data for the scope, empty for command packets
+        reply : bytes or None
+            wrapped packet to send back to the client
+        commands : list of bytes
+            command packet for the GUI, empty for data packets
+
+    """
+
+    packetType,remainingPacket = getPacketType(packet)
+
+    if packetType == DATA_PACKET:
+        return [extractDataPacket(remainingPacket)],wrapDataPacket(DATA_REPLY),[]
+
+    elif packetType == DATA_PACKET_NOACK:
+        return [extractDataPacket(remainingPacket)],None,[]
+
+    elif packetType == DATA_FRAME_V2:
+        try:
+            return decodeFrame(remainingPacket),None,[]
+        except FrameError as error:
+            logger.error("Dropping data frame : %s" % error)
+            return [],None,[]
+
+    elif packetType == COMMAND_PACKET:
+        # Passed to the GUI by ScopePy_network.AsyncTcpServer, the client waits for a reply
+        return [],wrapDataPacket(COMMAND_REPLY),[bytes(remainingPacket)]
+
+    logger.error("Unknown packet type [%d]" % packetType)
+
+    return [],None,[]
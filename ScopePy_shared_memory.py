@@ -0,0 +1,605 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:05:11 2026
+
+@author: john
+
+ScopePy shared memory transport
+===================================
+
+Ring buffer in shared memory for sending data to ScopePy from another
+process on the same computer, without going through a socket.
+
+There is one producer (the acquisition process) and one consumer (ScopePy)
+per ring, so no locks are needed. The producer only moves the write
+position and the consumer only moves the read position. If the consumer
+falls behind and the ring is full the producer drops the data and counts
+it as an overflow, it never waits.
+
+Each record in the ring is a version 2 frame (see ScopePy_protocol), so
+several channels with their own column types can be sent in one record.
+The consumer decodes frames as views of the shared memory, the data is
+only copied when it is added to the channels.
+
+The producer creates the ring and removes it when closed. Rings are named
+with RING_PREFIX so ScopePy can find them, see findRings(). If the producer
+dies without closing the ring, the consumer removes it once it has read
+what is left, see RingConsumer.producerAlive.
+
+This module has no Qt code.
+
+Example
+--------
+Producer:
+
+>>> ring = RingProducer('ScopePy_adc',capacity=64*1024*1024)
+>>> ring.write([('ADC 1',adc_data)])
+
+Consumer:
+
+>>> ring = RingConsumer('ScopePy_adc')
+>>> channels = ring.read()
+>>> ... use the data ...
+>>> ring.release()
+
+"""
+
+#==============================================================================
+#%% License
+#==============================================================================
+
+"""
+Copyright 2015 John Bainbridge
+
+This file is part of ScopePy.
+
+ScopePy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+ScopePy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+#======================================================================
+#%% Imports
+#======================================================================
+import os
+import logging
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+import ScopePy_protocol as protocol
+
+
+#==============================================================================
+#%% Logger
+#==============================================================================
+# create logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Add do nothing handler
+logger.addHandler(logging.NullHandler())
+
+
+#======================================================================
+#%% Constants
+#======================================================================
+
+# Start of shared memory names that ScopePy looks for
+RING_PREFIX = 'ScopePy_'
+
+# Identifies a ScopePy ring ('SPYRING1' as a little endian integer)
+RING_MAGIC = int.from_bytes(b'SPYRING1','little')
+
+# Header - uint64 values at the start of the shared memory
+# Written by the producer
+HDR_MAGIC = 0
+HDR_CAPACITY = 1
+HDR_WRITE_POS = 2
+HDR_RECORDS = 3
+HDR_OVERFLOWS = 4
+HDR_OVERFLOW_BYTES = 5
+HDR_CLOSED = 6
+HDR_PID = 7
+# Written by the consumer
+HDR_READ_POS = 8
+
+# Header size in bytes, the read position is on its own cache line
+HEADER_SIZE = 128
+
+# Each record is its length [uint64] followed by the frame. Records start
+# on 8 byte boundaries.
+RECORD_ALIGN = 8
+RECORD_HEADER = 8
+
+# Length of the record that marks the rest of the ring as unused, the next
+# record is at the start of the ring
+WRAP_MARKER = 0xFFFFFFFFFFFFFFFF
+
+# Default ring size [bytes]
+DEFAULT_RING_CAPACITY = 64*1024*1024
+
+
+#======================================================================
+#%% Exceptions
+#======================================================================
+
+class RingNotReady(Exception):
+    """
+    The shared memory exists but the producer hasn't set up the header yet
+
+    """
+    pass
+
+
+
+#======================================================================
+#%% Functions
+#======================================================================
+
+def findRings():
+    """
+    Names of the ScopePy rings that exist
+
+    Only works on systems where shared memory appears in /dev/shm, such as
+    Linux. Returns an empty list elsewhere.
+
+    Outputs
+    --------
+    names : list of str
+
+    """
+
+    if not os.path.isdir('/dev/shm'):
+        return []
+
+    return sorted([name for name in os.listdir('/dev/shm') if name.startswith(RING_PREFIX)])
+
+
+
+def alignUp(nBytes):
+    """
+    Round up to a multiple of RECORD_ALIGN
+
+    """
+
+    return (nBytes + RECORD_ALIGN - 1)//RECORD_ALIGN*RECORD_ALIGN
+
+
+
+# Shared memory made by this process, see createSharedMemory()
+_createdNames = set()
+
+
+def createSharedMemory(name,size):
+    """
+    Make new shared memory, owned by this process
+
+    Inputs
+    --------
+    name : str or None
+        None picks a unique name
+    size : int
+        bytes
+
+    """
+
+    shm = shared_memory.SharedMemory(name=name,create=True,size=size)
+    _createdNames.add(shm._name)
+
+    return shm
+
+
+
+def attachSharedMemory(name):
+    """
+    Open existing shared memory without taking ownership of it
+
+    By default Python removes shared memory it has opened when it exits,
+    which would remove the ring under the producer.
+
+    """
+
+    try:
+        return shared_memory.SharedMemory(name=name,track=False)
+
+    except TypeError:
+        # Before Python 3.13 there is no track option, take it off the
+        # resource tracker's list again. The list has one entry per name,
+        # so memory made by this process has to stay on it.
+        shm = shared_memory.SharedMemory(name=name)
+
+        if shm._name not in _createdNames:
+            resource_tracker.unregister(shm._name,'shared_memory')
+
+        return shm
+
+
+
+def unlinkSharedMemory(shm):
+    """
+    Remove shared memory opened with attachSharedMemory()
+
+    """
+
+    # Before Python 3.13 unlink() also takes the memory off the resource
+    # tracker's list, so it has to be put back on first
+    if not hasattr(shm,'_track') and shm._name not in _createdNames:
+        resource_tracker.register(shm._name,'shared_memory')
+
+    _createdNames.discard(shm._name)
+    shm.unlink()
+
+
+
+def processExists(pid):
+    """
+    True if a process with this id is running
+
+    Processes owned by other users count as running.
+
+    """
+
+    try:
+        os.kill(pid,0)
+
+    except ProcessLookupError:
+        return False
+
+    except PermissionError:
+        return True
+
+    return True
+
+
+
+#======================================================================
+#%% Producer
+#======================================================================
+
+class RingProducer():
+    """
+    Writes frames into a new shared memory ring
+
+    """
+
+    def __init__(self,name,capacity=DEFAULT_RING_CAPACITY):
+        """
+        Inputs
+        ---------
+        name : str
+            name of the shared memory, RING_PREFIX is added if it is not
+            already there
+        capacity : int
+            size of the ring in bytes
+
+        """
+
+        if not name.startswith(RING_PREFIX):
+            name = RING_PREFIX + name
+
+        capacity = alignUp(capacity)
+
+        self.name = name
+        self.capacity = capacity
+
+        self.shm = createSharedMemory(name,HEADER_SIZE+capacity)
+
+        self.header = np.ndarray(HEADER_SIZE//8,dtype='<u8',buffer=self.shm.buf)
+        self.data = self.shm.buf[HEADER_SIZE:HEADER_SIZE+capacity]
+
+        self.header[:] = 0
+        self.header[HDR_CAPACITY] = capacity
+        self.header[HDR_PID] = os.getpid()
+        self.header[HDR_MAGIC] = RING_MAGIC
+
+        # Local copy of the write position, only this process changes it
+        self.writePos = 0
+
+
+    @property
+    def overflows(self):
+        """
+        Number of writes dropped because the ring was full
+
+        """
+
+        return int(self.header[HDR_OVERFLOWS])
+
+
+    @property
+    def freeBytes(self):
+
+        return self.capacity - (self.writePos - int(self.header[HDR_READ_POS]))
+
+
+    def write(self,channels):
+        """
+        Write data for one or more channels as one record
+
+        Inputs
+        --------
+        channels : list of (channelLabel, array) tuples
+            see ScopePy_protocol.encodeFrame()
+
+        Outputs
+        --------
+        success : bool
+            False if there was not enough room and the data was dropped
+
+        """
+
+        parts = protocol.frameParts(channels)
+        frameLength = sum([len(part) for part in parts])
+        recordLength = alignUp(RECORD_HEADER + frameLength)
+
+        if recordLength > self.capacity:
+            raise ValueError("RingProducer: record of %d bytes is bigger than the ring" % recordLength)
+
+        # Space needed, including skipping the end of the ring if the
+        # record doesn't fit there
+        offset = self.writePos % self.capacity
+        skip = self.capacity - offset if offset + recordLength > self.capacity else 0
+
+        if skip + recordLength > self.freeBytes:
+            self.header[HDR_OVERFLOWS] += 1
+            self.header[HDR_OVERFLOW_BYTES] += frameLength
+            return False
+
+        if skip:
+            self.data[offset:offset+RECORD_HEADER] = WRAP_MARKER.to_bytes(8,'little')
+            self.writePos += skip
+            offset = 0
+
+        # Copy the frame in
+        self.data[offset:offset+RECORD_HEADER] = frameLength.to_bytes(8,'little')
+        position = offset + RECORD_HEADER
+
+        for part in parts:
+            self.data[position:position+len(part)] = part
+            position += len(part)
+
+        # Publish the record, the data has to be in place before the write
+        # position moves
+        self.writePos += recordLength
+        self.header[HDR_RECORDS] += 1
+        self.header[HDR_WRITE_POS] = self.writePos
+
+        return True
+
+
+    def close(self):
+        """
+        Mark the ring as closed and remove it
+
+        The consumer can still read anything left in it until it closes
+        its own end.
+
+        """
+
+        if self.shm is None:
+            return
+
+        self.header[HDR_CLOSED] = 1
+
+        del self.header
+        self.data.release()
+
+        self.shm.close()
+
+        try:
+            unlinkSharedMemory(self.shm)
+        except FileNotFoundError:
+            pass
+
+        self.shm = None
+
+
+
+#======================================================================
+#%% Consumer
+#======================================================================
+
+class RingConsumer():
+    """
+    Reads frames from a shared memory ring made by a RingProducer
+
+    """
+
+    def __init__(self,name):
+        """
+        Inputs
+        ---------
+        name : str
+            name of the shared memory
+
+        """
+
+        self.name = name
+
+        try:
+            self.shm = attachSharedMemory(name)
+        except ValueError:
+            # Created but not sized yet
+            raise RingNotReady("RingConsumer: [%s] is not ready" % name)
+
+        self.header = np.ndarray(HEADER_SIZE//8,dtype='<u8',buffer=self.shm.buf)
+
+        magic = int(self.header[HDR_MAGIC])
+
+        if magic == 0:
+            self.close()
+            raise RingNotReady("RingConsumer: [%s] is not ready" % name)
+
+        if magic != RING_MAGIC:
+            self.close()
+            raise ValueError("RingConsumer: [%s] is not a ScopePy ring" % name)
+
+        self.capacity = int(self.header[HDR_CAPACITY])
+        self.data = self.shm.buf[HEADER_SIZE:HEADER_SIZE+self.capacity]
+
+        # Position after the records returned by read()
+        self.readPos = int(self.header[HDR_READ_POS])
+        self.pendingPos = self.readPos
+
+        # Counters
+        self.records = 0
+        self.bytes = 0
+        self.decodeErrors = 0
+
+
+    @property
+    def isClosed(self):
+        """
+        True if the producer has closed the ring
+
+        """
+
+        return bool(self.header[HDR_CLOSED])
+
+
+    @property
+    def producerAlive(self):
+        """
+        False if the process that made the ring has gone without closing
+        it
+
+        Rings without a process id, or made in another process namespace
+        (e.g. a container) where the id can't be checked, count as alive.
+
+        """
+
+        pid = int(self.header[HDR_PID])
+
+        return pid == 0 or processExists(pid)
+
+
+    @property
+    def overflows(self):
+        """
+        Number of writes the producer has dropped
+
+        """
+
+        return int(self.header[HDR_OVERFLOWS])
+
+
+    @property
+    def backlog(self):
+        """
+        Number of bytes written but not yet read
+
+        """
+
+        return int(self.header[HDR_WRITE_POS]) - self.pendingPos
+
+
+    def read(self,maxBytes=None):
+        """
+        Decode the records written since the last read
+
+        The arrays are views of the shared memory. They are only valid until
+        release() is called, after that the producer can write over them.
+
+        Inputs
+        --------
+        maxBytes : int or None
+            stop after this many bytes of records, None reads everything
+
+        Outputs
+        --------
+        channels : list of (channelLabel, recarray) tuples
+
+        """
+
+        writePos = int(self.header[HDR_WRITE_POS])
+        channels = []
+        start = self.pendingPos
+
+        while self.pendingPos < writePos:
+
+            if maxBytes is not None and self.pendingPos - start >= maxBytes:
+                break
+
+            offset = self.pendingPos % self.capacity
+            frameLength = int.from_bytes(self.data[offset:offset+RECORD_HEADER],'little')
+
+            if frameLength == WRAP_MARKER:
+                self.pendingPos += self.capacity - offset
+                continue
+
+            frame = self.data[offset+RECORD_HEADER:offset+RECORD_HEADER+frameLength]
+
+            try:
+                channels.extend(protocol.decodeFrame(frame))
+            except protocol.FrameError as error:
+                self.decodeErrors += 1
+                logger.error("RingConsumer: Dropping record : %s" % error)
+
+            self.pendingPos += alignUp(RECORD_HEADER + frameLength)
+            self.records += 1
+            self.bytes += frameLength
+
+        return channels
+
+
+    def release(self):
+        """
+        Let the producer reuse the space of the records returned by read()
+
+        """
+
+        self.readPos = self.pendingPos
+        self.header[HDR_READ_POS] = self.readPos
+
+
+    def unlink(self):
+        """
+        Remove a ring that its producer has left behind, see producerAlive
+
+        The ring can still be read until it is closed.
+
+        """
+
+        try:
+            unlinkSharedMemory(self.shm)
+        except FileNotFoundError:
+            pass
+
+
+    def close(self):
+        """
+        Detach from the ring
+
+        Any arrays from read() must not be used after this.
+
+        """
+
+        if self.shm is None:
+            return
+
+        del self.header
+
+        try:
+            if hasattr(self,'data'):
+                self.data.release()
+                del self.data
+
+            self.shm.close()
+
+        except BufferError:
+            # Arrays from read() are still using the memory, it is freed
+            # when they are
+            pass
+
+        self.shm = None
@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 22 09:04:51 2026
+
+@author: john
+
+ScopePy stream log
+===================================
+
+Recording and replay of the packets received by the ScopePy server, for
+reproducing exactly what the server received when debugging.
+
+StreamLogWriter appends every packet, as received and before decoding,
+with the time it arrived to a binary log file. The ThreadedTcpServer in
+ScopePy_network writes one when it is given a writer.
+
+replay() reads the log back and passes each packet to a function at the
+original rate, N times faster or as fast as possible. From the command
+line the packets are sent to a running ScopePy, so they go through the
+same decoding, channel and plotting code as the original data:
+
+    python ScopePy_streamlog.py session.spylog --speed 1
+    python ScopePy_streamlog.py session.spylog --speed max
+
+At maximum speed this is a repeatable ingest benchmark that doesn't need
+the original hardware. With --decode-only the packets are only decoded,
+with ScopePy_protocol.decodePacket, without sending them anywhere.
+
+This module has no Qt code.
+
+File layout
+--------------
+All integers are little endian.
+
+* File header [FILE_HEADER]
+    - magic [8 bytes] LOG_MAGIC
+    - version [uint32]
+    - reserved [uint32]
+    - time the log was started [float64] seconds since the epoch
+* Records, one per packet
+    - record header [RECORD_HEADER] : time since the log started [uint64]
+      in nanoseconds, packet length [uint64], connection number [uint32]
+    - packet, with its length removed, as passed to
+      ScopePy_protocol.decodePacket()
+
+A record cut short at the end of the file, e.g. if ScopePy crashed, is
+ignored when reading.
+
+"""
+
+#==============================================================================
+#%% License
+#==============================================================================
+
+"""
+Copyright 2015 John Bainbridge
+
+This file is part of ScopePy.
+
+ScopePy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+ScopePy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+#======================================================================
+#%% Imports
+#======================================================================
+import os
+import sys
+import time
+import struct
+import socket
+import select
+import atexit
+import argparse
+import threading
+import logging
+
+
+#==============================================================================
+#%% Logger
+#==============================================================================
+# create logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Add do nothing handler
+logger.addHandler(logging.NullHandler())
+
+
+#======================================================================
+#%% Constants
+#======================================================================
+
+LOG_MAGIC = b'SPYLOG\r\n'
+
+LOG_VERSION = 1
+
+# File extension
+LOG_EXTENSION = '.spylog'
+
+# Headers
+FILE_HEADER = struct.Struct('<8sIId')
+RECORD_HEADER = struct.Struct('<QQI')
+
+# Packet length at the start of every packet, as ScopePy_network
+LENGTH_HEADER = struct.Struct('<Q')
+
+# Size of the file buffer [bytes]
+LOG_BUFFER_SIZE = 1024*1024
+
+# Buffered records are written to disk at least this often [s]
+LOG_FLUSH_INTERVAL = 1.0
+
+# Default address for replaying to ScopePy, as ScopePy_network
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 63406
+
+
+#======================================================================
+#%% Functions
+#======================================================================
+
+def makeLogFilename(folder):
+    """
+    New log filename, with the date and time, in the given folder
+
+    """
+
+    return os.path.join(folder,time.strftime('ScopePy_%Y%m%d_%H%M%S') + LOG_EXTENSION)
+
+
+
+#======================================================================
+#%% Writer
+#======================================================================
+
+class StreamLogWriter():
+    """
+    Appends packets to a new log file
+
+    write() can be called from several threads.
+
+    """
+
+    def __init__(self,filename):
+        """
+        Inputs
+        ---------
+        filename : str
+            log file, replaced if it exists
+
+        """
+
+        self.filename = filename
+
+        self.lock = threading.Lock()
+
+        self.file = open(filename,'wb',buffering=LOG_BUFFER_SIZE)
+        self.file.write(FILE_HEADER.pack(LOG_MAGIC,LOG_VERSION,0,time.time()))
+
+        self.startTime = time.monotonic_ns()
+        self.lastFlush = time.monotonic()
+
+        # Counters
+        self.packets = 0
+        self.bytes = 0
+
+        # Make sure everything is on disk when ScopePy exits
+        atexit.register(self.close)
+
+        logger.debug("StreamLogWriter: Logging packets to [%s]" % filename)
+
+
+    def write(self,packet,connection=0,timestamp=None):
+        """
+        Add a packet to the log
+
+        Inputs
+        --------
+        packet : bytes, bytearray or memoryview
+            packet with the length removed
+        connection : int
+            number of the connection the packet arrived on
+        timestamp : int or None
+            time since the log was started [ns], now if None
+
+        """
+
+        if timestamp is None:
+            timestamp = time.monotonic_ns() - self.startTime
+
+        with self.lock:
+            if self.file is None:
+                return
+
+            self.file.write(RECORD_HEADER.pack(timestamp,len(packet),connection))
+            self.file.write(packet)
+
+            self.packets += 1
+            self.bytes += len(packet)
+
+            now = time.monotonic()
+
+            if now - self.lastFlush >= LOG_FLUSH_INTERVAL:
+                self.file.flush()
+                self.lastFlush = now
+
+
+    def close(self):
+
+        with self.lock:
+            if self.file is None:
+                return
+
+            self.file.close()
+            self.file = None
+
+        atexit.unregister(self.close)
+
+
+
+#======================================================================
+#%% Reader
+#======================================================================
+
+class StreamLogReader():
+    """
+    Reads the packets from a log file
+
+    Iterate over the reader to get (timestamp,connection,packet) tuples
+    where timestamp is in seconds from the start of the log and packet is
+    a bytearray.
+
+    """
+
+    def __init__(self,filename):
+        """
+        Inputs
+        ---------
+        filename : str
+            log file
+
+        Raises ValueError if the file isn't a stream log.
+
+        """
+
+        self.filename = filename
+
+        with open(filename,'rb') as logFile:
+            header = logFile.read(FILE_HEADER.size)
+
+        if len(header) < FILE_HEADER.size:
+            raise ValueError("StreamLogReader: [%s] is too short to be a stream log" % filename)
+
+        magic,version,reserved,self.startTime = FILE_HEADER.unpack(header)
+
+        if magic != LOG_MAGIC:
+            raise ValueError("StreamLogReader: [%s] is not a stream log" % filename)
+
+        if version != LOG_VERSION:
+            raise ValueError("StreamLogReader: [%s] has unsupported version [%d]" % (filename,version))
+
+
+    def __iter__(self):
+
+        with open(self.filename,'rb') as logFile:
+            logFile.seek(FILE_HEADER.size)
+
+            while True:
+                header = logFile.read(RECORD_HEADER.size)
+
+                if len(header) < RECORD_HEADER.size:
+                    break
+
+                timestamp,length,connection = RECORD_HEADER.unpack(header)
+
+                packet = bytearray(length)
+
+                if logFile.readinto(packet) < length:
+                    logger.debug("StreamLogReader: Last record is incomplete")
+                    break
+
+                yield timestamp*1e-9,connection,packet
+
+
+
+#======================================================================
+#%% Replay
+#======================================================================
+
+def replay(filename,handler,speed=1.0):
+    """
+    Pass the packets in a log to a function at the rate they arrived,
+    starting straight away with the first packet
+
+    Inputs
+    --------
+    filename : str
+        log file
+    handler : function
+        handler(connection,packet) is called for every packet
+    speed : float or None
+        replay speed, 1 is the original rate, 10 is ten times faster.
+        None replays as fast as possible.
+
+    Outputs
+    --------
+    stats : dict
+        packets, bytes, elapsed [s], maxLag [s] the furthest replay fell
+        behind the original timing
+
+    """
+
+    packets = 0
+    nBytes = 0
+    maxLag = 0.0
+
+    start = time.perf_counter()
+    firstTimestamp = None
+
+    for timestamp,connection,packet in StreamLogReader(filename):
+
+        # Time from the first packet, not from when the log was started, so
+        # the idle time before the first packet isn't replayed
+        if firstTimestamp is None:
+            firstTimestamp = timestamp
+
+        if speed:
+            due = start + (timestamp - firstTimestamp)/speed
+            lag = time.perf_counter() - due
+
+            if lag < 0:
+                time.sleep(-lag)
+            else:
+                maxLag = max(maxLag,lag)
+
+        handler(connection,packet)
+
+        packets += 1
+        nBytes += len(packet)
+
+    return {'packets':packets,
+            'bytes':nBytes,
+            'elapsed':time.perf_counter() - start,
+            'maxLag':maxLag}
+
+
+
+class TcpReplayer():
+    """
+    Sends logged packets to a ScopePy server
+
+    Each logged connection gets its own connection to the server, so the
+    packets are received in the same way as the originals.
+
+    """
+
+    def __init__(self,host=DEFAULT_HOST,port=DEFAULT_PORT):
+
+        self.address = (host,port)
+
+        # Sockets by logged connection number
+        self.sockets = {}
+
+
+    def __call__(self,connection,packet):
+        """
+        Send a packet, use as a replay() handler
+
+        """
+
+        sock = self.sockets.get(connection)
+
+        if sock is None:
+            sock = socket.create_connection(self.address)
+            self.sockets[connection] = sock
+
+        sock.sendall(LENGTH_HEADER.pack(len(packet)+LENGTH_HEADER.size))
+        sock.sendall(packet)
+
+        # Throw away replies so they don't fill the socket buffer
+        while select.select([sock],[],[],0)[0]:
+            if not sock.recv(65536):
+                break
+
+
+    def close(self):
+
+        for sock in self.sockets.values():
+            sock.close()
+
+        self.sockets = {}
+
+
+
+#======================================================================
+#%% Command line
+#======================================================================
+
+def main(argv=None):
+    """
+    Replay a log from the command line
+
+    """
+
+    parser = argparse.ArgumentParser(description="Replay a ScopePy stream log")
+    parser.add_argument('filename',help="stream log file")
+    parser.add_argument('--speed',default='1',
+                        help="replay speed: 1 for the original rate, N for N times faster, 'max' for as fast as possible")
+    parser.add_argument('--host',default=DEFAULT_HOST,help="address of ScopePy")
+    parser.add_argument('--port',type=int,default=DEFAULT_PORT,help="TCP port of ScopePy")
+    parser.add_argument('--decode-only',action='store_true',
+                        help="decode the packets without sending them to ScopePy")
+
+    args = parser.parse_args(argv)
+
+    speed = None if args.speed == 'max' else float(args.speed)
+
+    if args.decode_only:
+        import ScopePy_protocol as protocol
+
+        handler = lambda connection,packet: protocol.decodePacket(packet)
+        destination = "decoder"
+
+    else:
+        handler = TcpReplayer(args.host,args.port)
+        destination = "%s:%d" % (args.host,args.port)
+
+    try:
+        stats = replay(args.filename,handler,speed)
+    finally:
+        if not args.decode_only:
+            handler.close()
+
+    elapsed = max(stats['elapsed'],1e-9)
+
+    print("Replayed %s to %s at %s speed" % (args.filename,destination,args.speed))
+    print("  Packets  : %d (%.0f /s)" % (stats['packets'],stats['packets']/elapsed))
+    print("  Data     : %.1f MB (%.2f MB/s)" % (stats['bytes']/1e6,stats['bytes']/1e6/elapsed))
+    print("  Time     : %.2f s" % elapsed)
+
+    if speed:
+        print("  Max lag  : %.1f ms" % (stats['maxLag']*1000))
+
+    return 0
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 24 09:37:12 2026
+
+@author: john
+
+ScopePy ingest telemetry
+===================================
+
+Counters for the network servers, so it is possible to see what the
+server is doing while it is running without turning on debug logging.
+
+The servers call IngestTelemetry methods as data arrives, from any thread,
+and advance() regularly to work out the rates. The API and the "Ingest
+Telemetry" panel call summary() to get the totals and the rates over the
+last second or so, combining the servers with combineSummaries().
+
+Counters
+-----------
+* connections open and total connections
+* packets (frames) and bytes received
+* time spent decoding packets
+* time spent waiting for the channel dictionary lock
+* queue depth, for servers that queue data for the GUI
+* rows, bytes and rates for each channel
+
+This module has no Qt code.
+
+"""
+
+#==============================================================================
+#%% License
+#==============================================================================
+
+"""
+Copyright 2015 John Bainbridge
+
+This file is part of ScopePy.
+
+ScopePy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+ScopePy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+#======================================================================
+#%% Imports
+#======================================================================
+import time
+import threading
+import logging
+
+
+#==============================================================================
+#%% Logger
+#==============================================================================
+# create logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Add do nothing handler
+logger.addHandler(logging.NullHandler())
+
+
+#======================================================================
+#%% Constants
+#======================================================================
+
+# Rates are averaged over at least this long [s]
+RATE_INTERVAL = 1.0
+
+
+#======================================================================
+#%% Channel counters
+#======================================================================
+
+class ChannelCounters():
+    """
+    Rows and bytes received for one channel
+
+    """
+
+    def __init__(self,name):
+
+        self.name = name
+        self.chunks = 0
+        self.rows = 0
+        self.bytes = 0
+
+        # Values at the start of the rate interval
+        self.markRows = 0
+        self.markBytes = 0
+
+        # Rates over the last complete interval [/s]
+        self.rowRate = 0.0
+        self.byteRate = 0.0
+
+
+    def summary(self):
+
+        return {'channel':self.name,
+                'chunks':self.chunks,
+                'rows':self.rows,
+                'bytes':self.bytes,
+                'rowRate':self.rowRate,
+                'byteRate':self.byteRate}
+
+
+    def mark(self,interval):
+
+        self.rowRate = (self.rows - self.markRows)/interval
+        self.byteRate = (self.bytes - self.markBytes)/interval
+
+        self.markRows = self.rows
+        self.markBytes = self.bytes
+
+
+
+#======================================================================
+#%% Telemetry
+#======================================================================
+
+class IngestTelemetry():
+    """
+    Counters for one server
+
+    All methods can be called from any thread.
+
+    """
+
+    # Counters that have a rate
+    RATE_COUNTERS = ['packets','bytes','decodeTime','lockWaitTime']
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+
+        self.reset()
+
+
+    def reset(self):
+        """
+        Set all counters back to zero
+
+        """
+
+        with self.lock:
+            self.startTime = time.monotonic()
+
+            self.connections = 0
+            self.connectionCount = 0
+
+            self.packets = 0
+            self.bytes = 0
+            self.decodeErrors = 0
+
+            # Times [s]
+            self.decodeTime = 0.0
+            self.lockWaitTime = 0.0
+            self.maxLockWait = 0.0
+
+            self.queueDepth = 0
+            self.maxQueueDepth = 0
+
+            self.channels = {}
+
+            # Values at the start of the rate interval
+            self.markTime = self.startTime
+            self.marks = dict([(name,0) for name in self.RATE_COUNTERS])
+
+            # Rates over the last complete interval
+            self.rates = dict([(name,0.0) for name in self.RATE_COUNTERS])
+
+
+    # ------------------------------------------------------------------------
+    # Called by the servers
+    # ------------------------------------------------------------------------
+
+    def connectionOpened(self):
+
+        with self.lock:
+            self.connections += 1
+            self.connectionCount += 1
+
+
+    def connectionClosed(self):
+
+        with self.lock:
+            self.connections -= 1
+
+
+    def packetReceived(self,nBytes,decodeTime,channels):
+        """
+        Count a decoded packet
+
+        Inputs
+        --------
+        nBytes : int
+            size of the packet, including the length
+        decodeTime : float
+            time taken to decode it [s]
+        channels : list of (channelLabel,array) tuples
+            decoded data
+
+        """
+
+        with self.lock:
+            self.packets += 1
+            self.bytes += nBytes
+            self.decodeTime += decodeTime
+
+            for channelLabel,data in channels:
+                counters = self.channels.get(channelLabel)
+
+                if counters is None:
+                    counters = self.channels[channelLabel] = ChannelCounters(channelLabel)
+
+                counters.chunks += 1
+                counters.rows += len(data)
+                counters.bytes += data.nbytes
+
+
+    def decodeError(self,nBytes):
+
+        with self.lock:
+            self.packets += 1
+            self.bytes += nBytes
+            self.decodeErrors += 1
+
+
+    def lockWaited(self,waitTime):
+        """
+        Count time spent waiting for the channel dictionary lock [s]
+
+        """
+
+        with self.lock:
+            self.lockWaitTime += waitTime
+            self.maxLockWait = max(self.maxLockWait,waitTime)
+
+
+    def setQueueDepth(self,depth):
+
+        with self.lock:
+            self.queueDepth = depth
+            self.maxQueueDepth = max(self.maxQueueDepth,depth)
+
+
+    # ------------------------------------------------------------------------
+    # Rates
+    # ------------------------------------------------------------------------
+
+    def advance(self,now=None):
+        """
+        Work out the rates and start a new interval, if the current one
+        is at least RATE_INTERVAL long
+
+        Called regularly by the servers, e.g. when the data is drained, so
+        reading the summary doesn't change the rates.
+
+        Inputs
+        --------
+        now : float or None
+            time.monotonic() value, for testing
+
+        """
+
+        if now is None:
+            now = time.monotonic()
+
+        with self.lock:
+            interval = now - self.markTime
+
+            if interval < RATE_INTERVAL:
+                return
+
+            for name in self.RATE_COUNTERS:
+                self.rates[name] = (getattr(self,name) - self.marks[name])/interval
+                self.marks[name] = getattr(self,name)
+
+            for counters in self.channels.values():
+                counters.mark(interval)
+
+            self.markTime = now
+
+
+    # ------------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------------
+
+    def summary(self,now=None):
+        """
+        Totals and rates
+
+        Rates are averaged over the last interval completed by advance(),
+        they are zero until the first interval is complete.
+
+        Inputs
+        --------
+        now : float or None
+            time.monotonic() value, for testing
+
+        Outputs
+        --------
+        summary : dict
+            connections, connectionCount, packets, bytes, decodeErrors,
+            decodeTime, lockWaitTime, maxLockWait [s], queueDepth,
+            maxQueueDepth, uptime [s], packetRate, byteRate [/s],
+            decodeLoad, lockWaitLoad (fraction of the time spent
+            decoding and waiting for the lock) and channels, a list of
+            dicts from ChannelCounters.summary() sorted by name
+
+        """
+
+        if now is None:
+            now = time.monotonic()
+
+        with self.lock:
+            return {'connections':self.connections,
+                    'connectionCount':self.connectionCount,
+                    'packets':self.packets,
+                    'bytes':self.bytes,
+                    'decodeErrors':self.decodeErrors,
+                    'decodeTime':self.decodeTime,
+                    'lockWaitTime':self.lockWaitTime,
+                    'maxLockWait':self.maxLockWait,
+                    'queueDepth':self.queueDepth,
+                    'maxQueueDepth':self.maxQueueDepth,
+                    'uptime':now - self.startTime,
+                    'packetRate':self.rates['packets'],
+                    'byteRate':self.rates['bytes'],
+                    'decodeLoad':self.rates['decodeTime'],
+                    'lockWaitLoad':self.rates['lockWaitTime'],
+                    'channels':[self.channels[name].summary() for name in sorted(self.channels)]}
+
+
+
+#======================================================================
+#%% Combining
+#======================================================================
+
+# Summary values that are the largest of the servers rather than the total
+MAX_VALUES = ['maxLockWait','maxQueueDepth','uptime']
+
+
+def combineSummaries(summaries):
+    """
+    Add up the summaries of several servers, e.g. TCP, UDP and shared
+    memory
+
+    Inputs
+    --------
+    summaries : list of dict
+        from IngestTelemetry.summary()
+
+    Outputs
+    --------
+    summary : dict or None
+        same keys as IngestTelemetry.summary(). Totals, rates and loads
+        are added, the maximums and uptime are the largest. Channels with
+        the same name are added together. None if there are no summaries.
+
+    """
+
+    if not summaries:
+        return None
+
+    combined = {}
+
+    for name in summaries[0]:
+        if name == 'channels':
+            continue
+
+        values = [summary[name] for summary in summaries]
+        combined[name] = max(values) if name in MAX_VALUES else sum(values)
+
+    channels = {}
+
+    for summary in summaries:
+        for counters in summary['channels']:
+            total = channels.get(counters['channel'])
+
+            if total is None:
+                channels[counters['channel']] = dict(counters)
+                continue
+
+            for name,value in counters.items():
+                if name != 'channel':
+                    total[name] += value
+
+    combined['channels'] = [channels[name] for name in sorted(channels)]
+
+    return combined
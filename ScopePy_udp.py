@@ -0,0 +1,814 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 09:12:40 2026
+
+@author: john
+
+ScopePy UDP datagram ingestion
+===================================
+
+Receives data from sources that can only send UDP, such as embedded
+boards, without a relay process.
+
+Every datagram is self-contained: it holds one block of samples for one
+channel, with a sequence number that the source increments for each
+datagram it sends on that channel. UDP can lose, duplicate and reorder
+datagrams, so each (source, channel) stream goes through a
+StreamReassembler that:
+
+* puts datagrams back in order, waiting for up to a window of datagrams
+* skips datagrams that haven't arrived when the window is full, or after
+  a short timeout, and counts them as lost
+* drops and counts duplicates and datagrams that arrive too late
+
+Datagrams are received on a background thread by UdpReceiver and queued
+for the GUI, which takes everything on the queue once per frame with
+UdpReceiver.drain(), as ScopePy_ingest.IngestServer. Loss and rate
+statistics for each source are available from UdpReceiver.stats().
+
+This module has no Qt code. The Qt wrapper is ScopePy_network.UdpServer.
+
+Datagram layout
+-----------------
+All integers are little endian.
+
+* Datagram header [DATAGRAM_HEADER]
+    - magic number [uint32] same as ScopePy_protocol
+    - version [uint8] DATAGRAM_VERSION
+    - flags [uint8] not used, 0
+    - reserved [uint16] 0
+    - sequence number [uint64]
+* One channel block as in a version 2 frame, see ScopePy_protocol
+
+Example
+--------
+Source:
+
+>>> sender = UdpSender('192.168.1.10')
+>>> sender.sendData('ADC 1',adc_data)
+
+"""
+
+#==============================================================================
+#%% License
+#==============================================================================
+
+"""
+Copyright 2015 John Bainbridge
+
+This file is part of ScopePy.
+
+ScopePy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+ScopePy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+#======================================================================
+#%% Imports
+#======================================================================
+import logging
+import struct
+import socket
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import ScopePy_protocol as protocol
+import ScopePy_telemetry as telemetry
+
+
+#==============================================================================
+#%% Logger
+#==============================================================================
+# create logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Add do nothing handler
+logger.addHandler(logging.NullHandler())
+
+
+#======================================================================
+#%% Constants
+#======================================================================
+
+# Default port, next to the TCP port ScopePy_network.SOCKET_PORT
+UDP_PORT = 63407
+
+DATAGRAM_VERSION = 1
+
+DATAGRAM_HEADER = struct.Struct('<IBBHQ')
+
+# Largest datagram that can be received [bytes]
+MAX_DATAGRAM_SIZE = 65507
+
+# Default datagram size for UdpSender [bytes], fits in one ethernet frame
+# so datagrams are not fragmented
+DEFAULT_DATAGRAM_SIZE = 1472
+
+# Number of datagrams a stream waits for a missing one before skipping it
+DEFAULT_REORDER_WINDOW = 64
+
+# Time after which datagrams waiting for a missing one are passed on
+# anyway [s]
+DEFAULT_REORDER_TIMEOUT = 0.1
+
+# A sequence number this far behind the expected one means the source has
+# restarted, rather than a late datagram
+RESTART_THRESHOLD = 4096
+
+# Socket receive buffer requested from the OS [bytes], big enough to hold
+# a few frames worth of datagrams at high rates
+UDP_RECEIVE_BUFFER = 8*1024*1024
+
+# Time between checks for stopping and stale streams [s]
+UDP_POLL_INTERVAL = 0.02
+
+# Datagrams are dropped when more than this many channel arrays are
+# waiting to be drained
+UDP_MAX_QUEUED = 10000
+
+# Minimum time between rate calculations [s]
+RATE_INTERVAL = 0.5
+
+
+#======================================================================
+#%% Datagram encoding
+#======================================================================
+
+def encodeDatagram(channelLabel,array,sequence):
+    """
+    Make a datagram
+
+    Inputs
+    --------
+    channelLabel : str
+    array : numpy structured array or recarray
+        integer and float columns, sent with their own types
+    sequence : int
+        sequence number of this datagram on this channel
+
+    Outputs
+    --------
+    datagram : bytes
+
+    """
+
+    header = DATAGRAM_HEADER.pack(protocol.MAGIC_NUMBER,DATAGRAM_VERSION,0,0,sequence)
+
+    return b''.join([header] + protocol.frameBodyParts([(channelLabel,array)]))
+
+
+
+def decodeDatagram(datagram):
+    """
+    Extract the data from a datagram
+
+    Inputs
+    --------
+    datagram : bytes, bytearray or memoryview
+
+    Outputs
+    --------
+    channelLabel : str
+    sequence : int
+    data : recarray
+        view of the datagram
+
+    Raises ScopePy_protocol.FrameError if the datagram can't be decoded.
+
+    """
+
+    view = memoryview(datagram)
+
+    if len(view) < DATAGRAM_HEADER.size:
+        raise protocol.FrameError("Datagram is too short [%d bytes]" % len(view))
+
+    magic,version,flags,reserved,sequence = DATAGRAM_HEADER.unpack_from(view)
+
+    if magic != protocol.MAGIC_NUMBER:
+        raise protocol.FrameError("Datagram has wrong magic number [%d]" % magic)
+
+    if version != DATAGRAM_VERSION:
+        raise protocol.FrameError("Unsupported datagram version [%d]" % version)
+
+    channelLabel,data = protocol.decodeChannels(view[DATAGRAM_HEADER.size:],1)[0]
+
+    return channelLabel,sequence,data
+
+
+
+def rowsPerDatagram(channelLabel,dtype,datagramSize):
+    """
+    Number of rows of data that fit in one datagram
+
+    """
+
+    empty = np.zeros(0,dtype)
+    overhead = len(encodeDatagram(channelLabel,empty,0))
+
+    return (datagramSize - overhead)//protocol.packedDtype(empty.dtype).itemsize
+
+
+
+#======================================================================
+#%% Reassembly
+#======================================================================
+
+class StreamReassembler():
+    """
+    Puts the datagrams of one channel from one source back in order
+
+    """
+
+    def __init__(self,window=DEFAULT_REORDER_WINDOW):
+        """
+        Inputs
+        ---------
+        window : int
+            number of datagrams to wait for a missing one
+
+        """
+
+        self.window = window
+
+        # Next sequence number to pass on, None until the first datagram
+        self.expected = None
+
+        # Datagrams waiting for a missing one, by sequence number
+        self.pending = {}
+        self.highest = None
+
+        # Recently skipped sequence numbers, to tell late datagrams from
+        # duplicates
+        self.missing = set()
+
+        # Time the last datagram arrived
+        self.lastTime = 0.0
+
+        # Counters
+        self.received = 0
+        self.lost = 0
+        self.duplicates = 0
+        self.late = 0
+        self.restarts = 0
+
+
+    def push(self,sequence,data,now=None):
+        """
+        Add a datagram
+
+        Inputs
+        --------
+        sequence : int
+            sequence number of the datagram
+        data : array
+            data from the datagram
+        now : float or None
+            arrival time [s], time.monotonic() if None
+
+        Outputs
+        --------
+        ready : list of arrays
+            data that can be passed on, in sequence order
+
+        """
+
+        self.lastTime = time.monotonic() if now is None else now
+        self.received += 1
+
+        if self.expected is None:
+            self.expected = sequence
+            self.highest = sequence
+
+        if sequence < self.expected:
+
+            if self.expected - sequence > RESTART_THRESHOLD:
+                # Source has started again from a lower sequence number
+                ready = self.flush()
+                self.restarts += 1
+                self.expected = sequence
+                self.highest = sequence
+                self.missing.clear()
+                self.pending[sequence] = data
+
+                return ready + self.release()
+
+            if sequence in self.missing:
+                self.missing.discard(sequence)
+                self.late += 1
+            else:
+                self.duplicates += 1
+
+            return []
+
+        if sequence in self.pending:
+            self.duplicates += 1
+            return []
+
+        self.pending[sequence] = data
+        self.highest = max(self.highest,sequence)
+
+        return self.release()
+
+
+    def release(self):
+        """
+        Take the datagrams that are in order, skipping missing ones when
+        the window is full
+
+        """
+
+        ready = []
+
+        while self.pending:
+
+            if self.expected not in self.pending:
+
+                if self.highest - self.expected < self.window:
+                    break
+
+                self.skipTo(min(self.pending))
+
+            ready.append(self.pending.pop(self.expected))
+            self.expected += 1
+
+        return ready
+
+
+    def skipTo(self,sequence):
+        """
+        Give up waiting for the datagrams before sequence
+
+        """
+
+        self.lost += sequence - self.expected
+
+        # Only remember the most recent missing datagrams
+        self.missing.update(range(max(self.expected,sequence-self.window),sequence))
+
+        if len(self.missing) > 2*self.window:
+            self.missing = set([s for s in self.missing if s >= sequence - self.window])
+
+        self.expected = sequence
+
+
+    def flush(self):
+        """
+        Pass on all waiting datagrams, skipping any missing ones
+
+        Outputs
+        --------
+        ready : list of arrays
+
+        """
+
+        ready = []
+
+        while self.pending:
+            if self.expected not in self.pending:
+                self.skipTo(min(self.pending))
+
+            ready.append(self.pending.pop(self.expected))
+            self.expected += 1
+
+        return ready
+
+
+
+class SourceStatistics():
+    """
+    Datagram counts and rates for one source
+
+    """
+
+    def __init__(self,address):
+
+        self.address = address
+
+        # Reassembler for each channel
+        self.streams = {}
+
+        # Counters
+        self.datagrams = 0
+        self.bytes = 0
+        self.errors = 0
+
+        # Rate calculation
+        self.rateTime = time.monotonic()
+        self.rateDatagrams = 0
+        self.rateBytes = 0
+        self.datagramRate = 0.0
+        self.byteRate = 0.0
+
+
+    @property
+    def name(self):
+
+        return "%s:%d" % self.address
+
+
+    def summary(self,now=None):
+        """
+        Statistics for display
+
+        Outputs
+        --------
+        stats : dict
+            source, channels, datagrams, bytes, lost, duplicates, late,
+            restarts, errors, loss [%], datagramRate [/s], byteRate [B/s]
+
+        """
+
+        now = time.monotonic() if now is None else now
+
+        if now - self.rateTime >= RATE_INTERVAL:
+            elapsed = now - self.rateTime
+            self.datagramRate = (self.datagrams - self.rateDatagrams)/elapsed
+            self.byteRate = (self.bytes - self.rateBytes)/elapsed
+            self.rateTime = now
+            self.rateDatagrams = self.datagrams
+            self.rateBytes = self.bytes
+
+        streams = list(self.streams.values())
+
+        lost = sum([stream.lost for stream in streams])
+        received = sum([stream.received for stream in streams])
+
+        return {'source':self.name,
+                'channels':len(streams),
+                'datagrams':self.datagrams,
+                'bytes':self.bytes,
+                'lost':lost,
+                'duplicates':sum([stream.duplicates for stream in streams]),
+                'late':sum([stream.late for stream in streams]),
+                'restarts':sum([stream.restarts for stream in streams]),
+                'errors':self.errors,
+                'loss':100.0*lost/max(lost+received,1),
+                'datagramRate':self.datagramRate,
+                'byteRate':self.byteRate}
+
+
+
+#======================================================================
+#%% Receiver
+#======================================================================
+
+class UdpReceiver():
+    """
+    Receives datagrams on a background thread
+
+    """
+
+    def __init__(self,window=DEFAULT_REORDER_WINDOW,timeout=DEFAULT_REORDER_TIMEOUT,
+                 maxQueued=UDP_MAX_QUEUED):
+        """
+        Inputs
+        ---------
+        window : int
+            reordering window, in datagrams
+        timeout : float
+            time to wait for a missing datagram [s]
+        maxQueued : int
+            number of queued arrays at which datagrams are dropped
+
+        """
+
+        self.window = window
+        self.timeout = timeout
+        self.maxQueued = maxQueued
+
+        # Data in order, waiting for the GUI
+        self.queue = deque()
+
+        # Statistics by source address, only added to by the receiver
+        # thread
+        self.sources = {}
+
+        self.sock = None
+        self.thread = None
+        self.running = False
+        self.error = None
+
+        # Port actually used, port 0 picks a free port
+        self.port = None
+
+        # Datagrams dropped because the queue was full
+        self.queueDrops = 0
+
+        # Live counters for the API and telemetry panel, each source
+        # counts as a connection
+        self.telemetry = telemetry.IngestTelemetry()
+
+
+    @property
+    def isListening(self):
+
+        return self.thread is not None and self.thread.is_alive()
+
+
+    def start(self,host,port):
+        """
+        Open the socket and start the receiver thread
+
+        Inputs
+        --------
+        host : str
+            address to listen on
+        port : int
+            port number
+
+        Outputs
+        --------
+        success : bool
+            False if the socket could not be opened, see errorString()
+
+        """
+
+        if self.isListening:
+            return True
+
+        self.error = None
+
+        sock = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+
+        try:
+            sock.setsockopt(socket.SOL_SOCKET,socket.SO_RCVBUF,UDP_RECEIVE_BUFFER)
+            sock.bind((host,port))
+            sock.settimeout(UDP_POLL_INTERVAL)
+
+        except OSError as error:
+            logger.error("UdpReceiver: Failed to listen on [%s:%d] : %s" % (host,port,error))
+            self.error = error
+            sock.close()
+            return False
+
+        self.sock = sock
+        self.port = sock.getsockname()[1]
+        self.running = True
+
+        self.thread = threading.Thread(target=self.run,name='UdpReceiver')
+        self.thread.daemon = True
+        self.thread.start()
+
+        logger.debug("UdpReceiver: Listening on [%s:%d]" % (host,self.port))
+
+        return True
+
+
+    def errorString(self):
+        """
+        Description of the last error
+
+        """
+
+        return str(self.error) if self.error is not None else ''
+
+
+    def stop(self):
+        """
+        Stop the receiver thread and close the socket
+
+        """
+
+        if not self.isListening:
+            return
+
+        self.running = False
+        self.thread.join()
+        self.sock.close()
+
+        logger.debug("UdpReceiver: Stopped")
+
+
+    def run(self):
+        """
+        Receiver thread
+
+        """
+
+        lastCheck = time.monotonic()
+
+        while self.running:
+
+            try:
+                datagram,address = self.sock.recvfrom(MAX_DATAGRAM_SIZE)
+            except socket.timeout:
+                datagram = None
+            except OSError as error:
+                logger.error("UdpReceiver: Receive failed : %s" % error)
+                break
+
+            now = time.monotonic()
+
+            if datagram is not None:
+                self.handleDatagram(datagram,address,now)
+
+            if now - lastCheck >= UDP_POLL_INTERVAL:
+                self.flushStale(now)
+                lastCheck = now
+
+
+    def handleDatagram(self,datagram,address,now):
+        """
+        Decode a datagram and queue any data that is now in order
+
+        """
+
+        source = self.sources.get(address)
+
+        if source is None:
+            source = SourceStatistics(address)
+            self.sources[address] = source
+            self.telemetry.connectionOpened()
+            logger.debug("UdpReceiver: New source [%s]" % source.name)
+
+        source.datagrams += 1
+        source.bytes += len(datagram)
+
+        start = time.perf_counter()
+
+        try:
+            channelLabel,sequence,data = decodeDatagram(datagram)
+
+        except protocol.FrameError as error:
+            if source.errors == 0:
+                logger.error("UdpReceiver: Bad datagram from [%s] : %s" % (source.name,error))
+            source.errors += 1
+            self.telemetry.decodeError(len(datagram))
+            return
+
+        self.telemetry.packetReceived(len(datagram),time.perf_counter() - start,
+                                      [(channelLabel,data)])
+
+        stream = source.streams.get(channelLabel)
+
+        if stream is None:
+            stream = StreamReassembler(self.window)
+            source.streams[channelLabel] = stream
+
+        self.queueData(channelLabel,stream.push(sequence,data,now))
+
+
+    def flushStale(self,now):
+        """
+        Stop waiting for missing datagrams on streams that have gone quiet
+
+        """
+
+        for source in list(self.sources.values()):
+            for channelLabel,stream in list(source.streams.items()):
+                if stream.pending and now - stream.lastTime > self.timeout:
+                    self.queueData(channelLabel,stream.flush())
+
+
+    def queueData(self,channelLabel,ready):
+
+        for data in ready:
+            if len(self.queue) > self.maxQueued:
+                self.queueDrops += 1
+            else:
+                self.queue.append((channelLabel,data))
+
+        self.telemetry.setQueueDepth(len(self.queue))
+
+
+    # ------------------------------------------------------------------------
+    # Called from the GUI thread
+    # ------------------------------------------------------------------------
+
+    def drain(self):
+        """
+        Take all the data waiting on the queue
+
+        Outputs
+        --------
+        channels : list of (channelLabel,array) tuples
+            in sequence order for each channel
+
+        """
+
+        channels = []
+
+        for index in range(len(self.queue)):
+            channels.append(self.queue.popleft())
+
+        self.telemetry.setQueueDepth(len(self.queue))
+        self.telemetry.advance()
+
+        return channels
+
+
+    def stats(self):
+        """
+        Statistics for each source
+
+        Outputs
+        --------
+        stats : list of dict
+            see SourceStatistics.summary(), sorted by source
+
+        """
+
+        now = time.monotonic()
+
+        return [source.summary(now) for address,source in
+                sorted(list(self.sources.items()))]
+
+
+
+#======================================================================
+#%% Sender
+#======================================================================
+
+class UdpSender():
+    """
+    Sends data to ScopePy as datagrams
+
+    Data is split into datagrams small enough to not be fragmented. The
+    sequence number of each channel is kept so ScopePy can put the
+    datagrams back in order.
+
+    """
+
+    def __init__(self,hostIP,port=UDP_PORT,datagramSize=DEFAULT_DATAGRAM_SIZE):
+        """
+        Inputs
+        ---------
+        hostIP : str
+            address of ScopePy
+        port : int
+            UDP port of ScopePy
+        datagramSize : int
+            largest datagram to send [bytes]
+
+        """
+
+        self.address = (hostIP,port)
+        self.datagramSize = datagramSize
+
+        self.sock = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+
+        # Next sequence number for each channel
+        self.sequences = {}
+
+        # Counters
+        self.datagramsSent = 0
+        self.bytesSent = 0
+
+
+    def sendData(self,channelLabel,array):
+        """
+        Send data for one channel
+
+        Inputs
+        --------
+        channelLabel : str
+        array : numpy structured array or recarray
+            integer and float columns
+
+        Outputs
+        --------
+        ndatagrams : int
+            number of datagrams sent
+
+        """
+
+        rows = rowsPerDatagram(channelLabel,array.dtype,self.datagramSize)
+
+        if rows < 1:
+            raise ValueError("UdpSender: datagram size [%d] is too small for channel [%s]" %
+                             (self.datagramSize,channelLabel))
+
+        sequence = self.sequences.get(channelLabel,0)
+        ndatagrams = 0
+
+        for start in range(0,max(len(array),1),rows):
+            datagram = encodeDatagram(channelLabel,array[start:start+rows],sequence)
+            self.sock.sendto(datagram,self.address)
+
+            sequence += 1
+            ndatagrams += 1
+            self.bytesSent += len(datagram)
+
+        self.sequences[channelLabel] = sequence
+        self.datagramsSent += ndatagrams
+
+        return ndatagrams
+
+
+    def close(self):
+
+        self.sock.close()
@@ -86,6 +86,7 @@ ex = MathFunction()
 ex.name = 'exampleFunc'
 ex.description = 'y =  2*y'
 ex.function = lambda chan : (chan.x,2*chan.y)
+ex.chunk_local = True
 
 mathFunctions.append(ex)
 
@@ -97,6 +98,7 @@ dB10 = MathFunction()
 dB10.name = 'dB10'
 dB10.description = 'y =  10*log10(y)'
 dB10.function = lambda chan : (chan.x,10*np.log10(chan.y))
+dB10.chunk_local = True
 
 mathFunctions.append(dB10)
 
@@ -106,6 +108,7 @@ dB20 = MathFunction()
 dB20.name = 'dB20'
 dB20.description = 'y =  20*log10(y)'
 dB20.function = lambda chan : (chan.x,20*np.log10(chan.y))
+dB20.chunk_local = True
 
 mathFunctions.append(dB20)
 
@@ -115,6 +118,7 @@ flip = MathFunction()
 flip.name = 'flip x & y'
 flip.description = 'y = x x = y'
 flip.function = lambda chan : (chan.y,chan.x)
+flip.chunk_local = True
 
 mathFunctions.append(flip)
 # ++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -123,6 +127,7 @@ diff = MathFunction()
 diff.name = 'diff'
 diff.description = 'y =  channel2 - channel1'
 diff.function = lambda channel1,channel2 : (channel1.x,channel2.y-channel1.y)
+diff.chunk_local = True
 
 mathFunctions.append(diff)
 
@@ -136,43 +141,5 @@ mathFunctions.append(diff)
 #%% More complicated functions
 #==============================================================================
 
-# TODO: This causes a "can't set attribute error"
-
-#class runningAverage(MathFunction):
-#    """
-#    Running average with editable averaging window
-#    
-#    """
-#    
-#    def __init__(self):
-#        
-#        # Initialise base class
-#        super(runningAverage,self).__init__()
-#        
-#        # Make a parameter : averaging window
-#        self.parameter['Averaging window'] = 5
-#        
-#        # Make the running average function
-#        
-#            
-#    
-#    @property
-#    def function(self):
-#        
-#        return self._function()
-#        
-#        
-#        
-#    def _function(self):
-#        
-#        # (lifted from StackOverflow)
-#        def running_mean(x, N):
-#            cumsum = np.cumsum(np.insert(x, 0, 0)) 
-#            return (cumsum[N:] - cumsum[:-N]) / N 
-#            
-#        Navg = self.parameter['Averaging window']
-#        
-#        return lambda x,y : (x,running_mean(y,Navg))
-#
-#
-#mathFunctions.append(runningAverage())
\ No newline at end of file
+# Running averages, filters and other functions that keep state from one
+# chunk to the next are in streaming_functions.py
\ No newline at end of file
@@ -58,7 +58,7 @@ from scipy.stats import probplot
 
 
 # ScopePy
-from ScopePy_channel import MathFunction
+from ScopePy_channel import MathFunction, EXECUTION_PROCESS
 
 
 
@@ -87,6 +87,7 @@ ex = MathFunction()
 ex.name = 'exampleFuncInStats'
 ex.description = 'y =  2*y'
 ex.function = lambda chan : (chan.x,2*chan.y)
+ex.chunk_local = True
 
 mathFunctions.append(ex)
 
@@ -104,6 +105,7 @@ ex = MathFunction()
 ex.name = 'lognormal'
 ex.description = 'x =  std deviations, y = values'
 ex.function = lambda chan : lognormal(chan.y)
+ex.execution = EXECUTION_PROCESS
 
 mathFunctions.append(ex)
 
@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 26 09:18:52 2026
+
+@author: john
+
+ScopePy Streaming Channel Math function library
+===============================================
+
+Math functions that keep state from one chunk to the next: running
+averages, filters and decimation.
+
+Each new chunk of the source channel is processed on its own, carrying
+over the end of the previous chunk (the last few points for running
+averages, the filter state for FIR/IIR filters), so adding a chunk takes
+the same time however long the channel is. The output is the same as
+processing all the data in one go.
+
+All the filters are causal, the output is delayed relative to x in the
+same way as a real-time filter.
+
+Settings are in each function's parameters dictionary. Frequencies are
+given as a fraction of the Nyquist frequency (half the sample rate), as
+scipy.signal.
+
+
+"""
+
+#==============================================================================
+#%% License
+#==============================================================================
+
+"""
+Copyright 2015 John Bainbridge
+
+This file is part of ScopePy.
+
+ScopePy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+ScopePy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+#======================================================================
+#%% Imports
+#======================================================================
+
+# Standard library
+
+
+# Third party
+import numpy as np
+from scipy.signal import firwin, lfilter, lfilter_zi, butter, tf2sos, sosfilt, sosfilt_zi
+
+
+
+# ScopePy
+from ScopePy_channel import StreamingMathFunction
+
+
+
+
+
+#======================================================================
+#%% Constants
+#======================================================================
+
+# Anti-aliasing filter for decimation : taps per unit of decimation factor
+DECIMATE_TAPS_PER_FACTOR = 10
+
+# Anti-aliasing filter cut off, as a fraction of the new Nyquist frequency
+DECIMATE_CUTOFF = 0.8
+
+
+#======================================================================
+#%% Initialise list of functions
+#======================================================================
+# This list will be exported from this module
+
+mathFunctions = []
+
+
+#==============================================================================
+#%% Helper functions
+#==============================================================================
+
+def windowSums(values,tail,window):
+    """
+    Sums over a sliding window, continuing from the end of the previous
+    chunk
+
+    Until the window is full the sum is over the points so far.
+
+    Inputs
+    --------
+    values : numpy array
+        new chunk
+    tail : numpy array
+        last window-1 values from the previous chunks
+    window : int
+        number of points in the window
+
+    Outputs
+    --------
+    sums : numpy array
+        sum of the window ending at each point in values
+    counts : numpy array
+        number of points in each sum
+    tail : numpy array
+        tail for the next chunk
+
+    """
+
+    extended = np.concatenate((tail,values))
+    cumulative = np.concatenate(([0.0],np.cumsum(extended)))
+
+    end = np.arange(len(tail),len(extended))
+    start = np.maximum(end - window + 1,0)
+
+    sums = cumulative[end+1] - cumulative[start]
+    counts = end + 1 - start
+
+    if window > 1:
+        tail = extended[-(window-1):]
+    else:
+        tail = extended[:0]
+
+    return sums,counts,tail
+
+
+
+class DesignedFilter(StreamingMathFunction):
+    """
+    Base for functions with filter coefficients made from the parameters
+
+    The coefficients are only designed again when the parameters change.
+
+    """
+
+    def __init__(self):
+
+        super(DesignedFilter,self).__init__()
+
+        self._design = (None,None)
+
+
+    def coefficients(self):
+
+        key = repr(sorted(self.parameters.items()))
+
+        if self._design[0] != key:
+            self._design = (key,self.design())
+
+        return self._design[1]
+
+
+    def design(self):
+        """
+        Make the filter coefficients from self.parameters
+
+        """
+
+        raise NotImplementedError("DesignedFilter: design() must be defined")
+
+
+
+#==============================================================================
+#%% Running averages
+#==============================================================================
+
+class RunningMean(StreamingMathFunction):
+    """
+    Mean of the last N points
+
+    """
+
+    def __init__(self,window=5):
+
+        super(RunningMean,self).__init__()
+
+        self.name = 'running mean'
+        self.description = 'y = mean of the last N points of y'
+        self.parameters['Window'] = window
+
+
+    def initialState(self):
+
+        return np.zeros(0)
+
+
+    def processChunk(self,x,y,tail):
+
+        sums,counts,tail = windowSums(y,tail,int(self.parameters['Window']))
+
+        return x,sums/counts,tail
+
+
+mathFunctions.append(RunningMean())
+
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class MovingRMS(StreamingMathFunction):
+    """
+    RMS of the last N points
+
+    """
+
+    def __init__(self,window=5):
+
+        super(MovingRMS,self).__init__()
+
+        self.name = 'moving RMS'
+        self.description = 'y = RMS of the last N points of y'
+        self.parameters['Window'] = window
+
+
+    def initialState(self):
+
+        return np.zeros(0)
+
+
+    def processChunk(self,x,y,tail):
+
+        y = np.asarray(y,dtype=float)
+
+        sums,counts,tail = windowSums(y*y,tail,int(self.parameters['Window']))
+
+        # Rounding in the cumulative sum can give tiny negative values
+        return x,np.sqrt(np.maximum(sums/counts,0.0)),tail
+
+
+mathFunctions.append(MovingRMS())
+
+
+
+#==============================================================================
+#%% Filters
+#==============================================================================
+
+class FIRFilter(DesignedFilter):
+    """
+    FIR low pass filter, or any FIR filter given its coefficients
+
+    """
+
+    def __init__(self,taps=31,cutoff=0.1,coefficients=None):
+        """
+        Inputs
+        --------
+        taps : int
+            number of filter taps for the low pass filter
+        cutoff : float
+            cut off frequency as a fraction of the Nyquist frequency
+        coefficients : array or None
+            filter coefficients to use instead of the low pass filter
+
+        """
+
+        super(FIRFilter,self).__init__()
+
+        self.name = 'FIR filter'
+        self.description = 'y = y filtered by a low pass FIR filter'
+
+        if coefficients is None:
+            self.parameters['Taps'] = taps
+            self.parameters['Cut off'] = cutoff
+        else:
+            self.parameters['Coefficients'] = list(coefficients)
+
+
+    def design(self):
+
+        if 'Coefficients' in self.parameters:
+            return np.asarray(self.parameters['Coefficients'],dtype=float)
+
+        return firwin(int(self.parameters['Taps']),float(self.parameters['Cut off']))
+
+
+    def processChunk(self,x,y,zi):
+
+        b = self.coefficients()
+
+        # Filters can't take empty chunks
+        if len(y) == 0:
+            return x,np.zeros(0),zi
+
+        # Start from a steady state at the first value
+        if zi is None:
+            zi = lfilter_zi(b,1.0)*y[0]
+
+        y_out,zi = lfilter(b,1.0,y,zi=zi)
+
+        return x,y_out,zi
+
+
+mathFunctions.append(FIRFilter())
+
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+class IIRFilter(DesignedFilter):
+    """
+    Butterworth low pass filter, or any IIR filter given its coefficients
+
+    The filter is run as second order sections, which stay accurate for
+    higher orders.
+
+    """
+
+    def __init__(self,order=4,cutoff=0.1,b=None,a=None):
+        """
+        Inputs
+        --------
+        order : int
+            order of the Butterworth filter
+        cutoff : float
+            cut off frequency as a fraction of the Nyquist frequency
+        b,a : arrays or None
+            numerator and denominator coefficients to use instead of the
+            Butterworth filter
+
+        """
+
+        super(IIRFilter,self).__init__()
+
+        self.name = 'IIR filter'
+        self.description = 'y = y filtered by a low pass Butterworth filter'
+
+        if b is None:
+            self.parameters['Order'] = order
+            self.parameters['Cut off'] = cutoff
+        else:
+            self.parameters['b'] = list(b)
+            self.parameters['a'] = list(a)
+
+
+    def design(self):
+
+        if 'b' in self.parameters:
+            return tf2sos(self.parameters['b'],self.parameters['a'])
+
+        return butter(int(self.parameters['Order']),float(self.parameters['Cut off']),output='sos')
+
+
+    def processChunk(self,x,y,zi):
+
+        sos = self.coefficients()
+
+        # Filters can't take empty chunks
+        if len(y) == 0:
+            return x,np.zeros(0),zi
+
+        # Start from a steady state at the first value
+        if zi is None:
+            zi = sosfilt_zi(sos)*y[0]
+
+        y_out,zi = sosfilt(sos,y,zi=zi)
+
+        return x,y_out,zi
+
+
+mathFunctions.append(IIRFilter())
+
+
+
+#==============================================================================
+#%% Decimation
+#==============================================================================
+
+class Decimate(DesignedFilter):
+    """
+    Keep every Nth point, after a low pass filter to stop aliasing
+
+    The points kept carry on from one chunk to the next, so chunks don't
+    need to be a multiple of N long.
+
+    """
+
+    def __init__(self,factor=10):
+
+        super(Decimate,self).__init__()
+
+        self.name = 'decimate'
+        self.description = 'Every Nth point of y, after an anti-aliasing filter'
+        self.parameters['Factor'] = factor
+
+
+    def design(self):
+
+        factor = int(self.parameters['Factor'])
+
+        return firwin(DECIMATE_TAPS_PER_FACTOR*factor + 1,DECIMATE_CUTOFF/factor)
+
+
+    def initialState(self):
+
+        # (filter state, index of the next point to keep)
+        return (None,0)
+
+
+    def processChunk(self,x,y,state):
+
+        factor = int(self.parameters['Factor'])
+        b = self.coefficients()
+        zi,phase = state
+
+        if len(y) == 0:
+            return x[:0],np.zeros(0),state
+
+        if zi is None:
+            zi = lfilter_zi(b,1.0)*y[0]
+
+        y_filtered,zi = lfilter(b,1.0,y,zi=zi)
+
+        keep = np.arange(phase,len(y),factor)
+
+        return x[keep],y_filtered[keep],(zi,(phase - len(y)) % factor)
+
+
+mathFunctions.append(Decimate())
@@ -1132,6 +1132,7 @@ ex = MathFunction()
 ex.name = '<funcName>'
 ex.description = '<WhatItDoes>'
 ex.function = math_function
+#ex.execution = 'process' # slow functions can run in a separate process
 
 mathFunctions.append(ex)
 '''
@@ -102,7 +102,10 @@ class RolloverExample(sqt.SimpleBase):
             linestyle = plotLineStyle(lineColour=channel_colours[ch],
                                       marker='o',markerSize=2)
             self.adc_channels[ch] = ScopePyChannel(ch,linestyle)
-            self.adc_channels[ch].rollover = ROLLOVER
+            
+            # Only the last ROLLOVER samples are displayed so keep them
+            # in a fixed size buffer
+            self.adc_channels[ch].setRolloverStorage(ROLLOVER,points_per_chunk=1)
             
             
 
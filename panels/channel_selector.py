@@ -357,6 +357,7 @@ class ChannelSelectorPanel(panel.PanelBase):
         # Setup signals to external sources
         # ====================================
         self.connect(self.API, SIGNAL("channel_added"),self.updateChannelTreeModel)
+        self.connect(self.API, SIGNAL("channels_updated"),self.updateChannelTreeModelBatch)
         self.connect(self.API, SIGNAL("update_channel_selector"),self.updateChannelSelector)
         
         
@@ -403,6 +404,24 @@ class ChannelSelectorPanel(panel.PanelBase):
         
     
     
+    def updateChannelTreeModelBatch(self,channelNames):
+        """
+        Add or update a list of channels in the tree, then update the 
+        selector once for all of them
+        
+        Input
+        ------
+        channelNames : list of str
+        
+        """
+        
+        for channelName in channelNames:
+            self.channelTreeModel.addChannel(channelName,callReset=False)
+            
+        self.channelTreeModel.reset()
+        self.updateChannelSelector()
+        
+        
     def updateChannelSelector(self):
         """
         General update of channel selector TreeView
@@ -779,49 +798,54 @@ class ChannelSelectorPanel(panel.PanelBase):
         dtype = [("x data",float),("y data",float)]
         npoints = 21
         
+        # All the channels are added together at the end
+        channels = []
+        
         name = "Test channel"
         recarray = np.zeros(npoints,dtype)
         recarray["x data"] = np.arange(-10,11,1)
         recarray["y data"] = recarray["x data"]        
-        self.API.addChannelData((name,recarray))
+        channels.append((name,recarray.copy()))
         
         name = "1:1 neg slope"
         recarray["x data"] = -np.arange(-10,11,1)
-        self.API.addChannelData((name,recarray))
+        channels.append((name,recarray.copy()))
         
         name = "Offset 1:1"
         recarray["x data"] = np.arange(-10,11,1)+100
-        self.API.addChannelData((name,recarray))
+        channels.append((name,recarray.copy()))
         
         name = "Horiz line"
         recarray = np.zeros(50,dtype)
         recarray["x data"] = np.linspace(-10,11,50)
         recarray["y data"] = 5*np.ones(50)        
-        self.API.addChannelData((name,recarray))
+        channels.append((name,recarray))
         
         name = "Vert line"
         recarray = np.zeros(50,dtype)        
         recarray["x data"] = 5*np.ones(50)        
         recarray["y data"] = np.linspace(-10,11,50)
-        self.API.addChannelData((name,recarray))
+        channels.append((name,recarray))
         
         name = "sine wave"
         recarray = np.zeros(200,dtype)
         recarray["x data"] = np.linspace(-10,11,200)
         recarray["y data"] = 5*np.sin(recarray["x data"])        
-        self.API.addChannelData((name,recarray))
+        channels.append((name,recarray))
         
         name = "sine wave offset"
         recarray = np.zeros(200,dtype)
         recarray["x data"] = np.linspace(-10,11,200)
         recarray["y data"] = 2*(np.sin(recarray["x data"])+3.01)      
-        self.API.addChannelData((name,recarray))
+        channels.append((name,recarray))
         
         name = "random noise"
         recarray = np.zeros(200,dtype)
         recarray["x data"] = np.linspace(-10,11,200)
         recarray["y data"] = 5*np.random.rand(200)
-        self.API.addChannelData((name,recarray))
+        channels.append((name,recarray))
+        
+        self.API.addChannelDataBatch(channels)
         
     # -----------------------------------------------------------------------    
     # Channel crafter functions
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 24 11:20:46 2026
+
+@author: john
+
+Ingest telemetry Panel
+==============================
+A built-in panel for ScopePy. Shows what the TCP server is doing: the
+connections, packet and data rates, time spent decoding and waiting for
+the channel lock, and the data rate for each channel.
+
+"""
+
+#==============================================================================
+#%% License
+#==============================================================================
+
+"""
+Copyright 2015 John Bainbridge
+
+This file is part of ScopePy.
+
+ScopePy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+ScopePy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+
+# Third party libraries
+from PyQt4.QtCore import *
+from PyQt4.QtGui import *
+
+# My libraries
+import ScopePy_panels as panel
+
+
+#==============================================================================
+#%% Constants
+#==============================================================================
+
+# Time between updates [ms]
+UPDATE_INTERVAL_MS = 1000
+
+# Server values : (label, function to make the text from the telemetry)
+SERVER_VALUES = [("Connections",lambda t: "%d open, %d total" % (t['connections'],t['connectionCount'])),
+                 ("Packets",lambda t: "%d (%.0f /s)" % (t['packets'],t['packetRate'])),
+                 ("Data",lambda t: "%.1f MB (%.2f MB/s)" % (t['bytes']/1e6,t['byteRate']/1e6)),
+                 ("Decode errors",lambda t: "%d" % t['decodeErrors']),
+                 ("Decoding",lambda t: "%.1f %% of the time" % (t['decodeLoad']*100)),
+                 ("Lock waiting",lambda t: "%.1f %% of the time, longest %.1f ms" %
+                                           (t['lockWaitLoad']*100,t['maxLockWait']*1000)),
+                 ("Queue depth",lambda t: "%d (max %d)" % (t['queueDepth'],t['maxQueueDepth']))]
+
+# Channel table columns : (heading, function to make the text from the channel counters)
+CHANNEL_COLUMNS = [("Channel",lambda c: c['channel']),
+                   ("Chunks",lambda c: "%d" % c['chunks']),
+                   ("Points",lambda c: "%d" % c['rows']),
+                   ("Points/s",lambda c: "%.0f" % c['rowRate']),
+                   ("MB/s",lambda c: "%.3f" % (c['byteRate']/1e6))]
+
+
+#==============================================================================
+#%% Class definitions
+#==============================================================================
+
+class IngestTelemetryPanel(panel.PanelBase):
+    """
+    Ingest telemetry panel
+
+    Updates once a second while it is visible
+
+    """
+
+    def drawPanel(self):
+        """
+        Draw the GUI elements of the panel
+
+        This is a Mandatory function. It will be called by ScopePy when
+        the panel is added to a tab.
+
+        """
+
+        # Server values
+        self.valueLabels = []
+        serverLayout = QFormLayout()
+
+        for label,text in SERVER_VALUES:
+            valueLabel = QLabel("")
+            serverLayout.addRow(label,valueLabel)
+            self.valueLabels.append(valueLabel)
+
+        # Channels
+        self.table = QTableWidget(0,len(CHANNEL_COLUMNS))
+        self.table.setHorizontalHeaderLabels([heading for heading,text in CHANNEL_COLUMNS])
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+
+        self.statusLabel = QLabel("")
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel("TCP server"))
+        layout.addLayout(serverLayout)
+        layout.addWidget(QLabel("Channels"))
+        layout.addWidget(self.table)
+        layout.addWidget(self.statusLabel)
+
+        self.setLayout(layout)
+
+        # Update timer
+        self.timer = QTimer(self)
+        self.timer.setInterval(UPDATE_INTERVAL_MS)
+        self.connect(self.timer,SIGNAL("timeout()"),self.updateValues)
+        self.timer.start()
+
+        self.updateValues()
+
+
+    def updateValues(self):
+        """
+        Fill in the latest telemetry
+
+        """
+
+        if not self.isVisible():
+            return
+
+        telemetry = self.API.ingestTelemetry()
+
+        if telemetry is None:
+            self.statusLabel.setText("The server is not running")
+            return
+
+        self.statusLabel.setText("Running for %.0f s" % telemetry['uptime'])
+
+        for valueLabel,(label,text) in zip(self.valueLabels,SERVER_VALUES):
+            valueLabel.setText(text(telemetry))
+
+        channels = telemetry['channels']
+        self.table.setRowCount(len(channels))
+
+        for row,channelCounters in enumerate(channels):
+            for column,(heading,text) in enumerate(CHANNEL_COLUMNS):
+                self.table.setItem(row,column,QTableWidgetItem(text(channelCounters)))
+
+
+
+#==============================================================================
+#%% Panels to export
+#==============================================================================
+# Put any panels to be imported from this file here
+# Note: this must go after the class definitions
+#
+# Panels are passed in a dictionary where:
+#   key = the name to be used on menus
+#   value = PanelFlags class from ScopePy_panels.py
+
+__panels__ = {"Ingest Telemetry":panel.PanelFlags(IngestTelemetryPanel,
+                                                  open_on_startup=False,
+                                                  single_instance=True,
+                                                  location='main_area')}
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 11:02:18 2026
+
+@author: john
+
+UDP statistics Panel
+==============================
+A built-in panel for ScopePy. Shows the datagram rate and loss for each
+source sending data to ScopePy over UDP.
+
+"""
+
+#==============================================================================
+#%% License
+#==============================================================================
+
+"""
+Copyright 2015 John Bainbridge
+
+This file is part of ScopePy.
+
+ScopePy is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+ScopePy is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with ScopePy.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+
+# Third party libraries
+from PyQt4.QtCore import *
+from PyQt4.QtGui import *
+
+# My libraries
+import ScopePy_panels as panel
+
+
+#==============================================================================
+#%% Constants
+#==============================================================================
+
+# Time between updates [ms]
+UPDATE_INTERVAL_MS = 1000
+
+# Table columns : (heading, function to make the text from the statistics)
+COLUMNS = [("Source",lambda s: s['source']),
+           ("Channels",lambda s: "%d" % s['channels']),
+           ("Datagrams/s",lambda s: "%.0f" % s['datagramRate']),
+           ("MB/s",lambda s: "%.2f" % (s['byteRate']/1e6)),
+           ("Lost",lambda s: "%d" % s['lost']),
+           ("Loss %",lambda s: "%.2f" % s['loss']),
+           ("Duplicates",lambda s: "%d" % s['duplicates']),
+           ("Late",lambda s: "%d" % s['late']),
+           ("Restarts",lambda s: "%d" % s['restarts']),
+           ("Errors",lambda s: "%d" % s['errors'])]
+
+
+#==============================================================================
+#%% Class definitions
+#==============================================================================
+
+class UdpStatisticsPanel(panel.PanelBase):
+    """
+    UDP statistics panel
+
+    Updates once a second while it is visible
+
+    """
+
+    def drawPanel(self):
+        """
+        Draw the GUI elements of the panel
+
+        This is a Mandatory function. It will be called by ScopePy when
+        the panel is added to a tab.
+
+        """
+
+        self.table = QTableWidget(0,len(COLUMNS))
+        self.table.setHorizontalHeaderLabels([heading for heading,text in COLUMNS])
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+
+        self.statusLabel = QLabel("")
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel("UDP sources"))
+        layout.addWidget(self.table)
+        layout.addWidget(self.statusLabel)
+
+        self.setLayout(layout)
+
+        # Update timer
+        self.timer = QTimer(self)
+        self.timer.setInterval(UPDATE_INTERVAL_MS)
+        self.connect(self.timer,SIGNAL("timeout()"),self.updateTable)
+        self.timer.start()
+
+        self.updateTable()
+
+
+    def updateTable(self):
+        """
+        Fill the table with the latest statistics
+
+        """
+
+        if not self.isVisible():
+            return
+
+        stats = self.API.udpStatistics()
+
+        if self.API.preferences.udpPort:
+            self.statusLabel.setText("Listening on UDP port %d" % self.API.preferences.udpPort)
+        else:
+            self.statusLabel.setText("UDP is turned off in the preferences")
+
+        self.table.setRowCount(len(stats))
+
+        for row,sourceStats in enumerate(stats):
+            for column,(heading,text) in enumerate(COLUMNS):
+                self.table.setItem(row,column,QTableWidgetItem(text(sourceStats)))
+
+
+
+#==============================================================================
+#%% Panels to export
+#==============================================================================
+# Put any panels to be imported from this file here
+# Note: this must go after the class definitions
+#
+# Panels are passed in a dictionary where:
+#   key = the name to be used on menus
+#   value = PanelFlags class from ScopePy_panels.py
+
+__panels__ = {"UDP Statistics":panel.PanelFlags(UdpStatisticsPanel,
+                                                open_on_startup=False,
+                                                single_instance=True,
+                                                location='main_area')}
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 12:40:15 2026
+
+@author: john
+
+Data to item coordinate benchmark
+=======================================
+Compares the time taken to convert data coordinates to a QPolygonF in item
+coordinates, using:
+
+* the old method : QGraphicsItem.mapFromScene() on every point, then a
+  QPolygonF from a list of QPointF
+* the new method : CoordinateManager.data2itemPolygon(), which transforms
+  whole arrays and fills the polygon directly
+
+Run from the command line:
+
+    python benchmark_data2item.py
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import time
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+from PyQt4.QtCore import *
+from PyQt4.QtGui import *
+
+
+# My libraries
+import ScopePy_graphs as graph
+
+
+#==============================================================================
+#%% Constants
+#==============================================================================
+
+# Number of points to test
+SIZES = [10000,100000,1000000]
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+def oldMethod(coordinateManager,item,x_DC,y_DC):
+    """
+    Original per-point conversion
+    """
+
+    x_SC,y_SC = coordinateManager.data2scene(x_DC,y_DC)
+
+    points = [item.mapFromScene(QPointF(x,y)) for x,y in zip(x_SC,y_SC)]
+
+    return QPolygonF(points)
+
+
+def newMethod(coordinateManager,item,x_DC,y_DC):
+    """
+    Vectorised conversion
+    """
+
+    polygon,x_IC,y_IC = coordinateManager.data2itemPolygon(item,x_DC,y_DC)
+
+    return polygon
+
+
+def timeit(function,*args):
+    """
+    Time a function, returns result and time in seconds
+    """
+
+    start = time.perf_counter()
+    result = function(*args)
+
+    return result,time.perf_counter() - start
+
+
+def benchmark():
+
+    widget = graph.GraphWidget(None)
+    widget.resize(800,600)
+    widget.show()
+
+    cm = widget.coordinateManager
+
+    # Item with a non-trivial transform
+    item = QGraphicsRectItem(0,0,10,10)
+    item.setPos(13.5,-7.25)
+    item.setScale(1.5)
+    widget.scene.addItem(item)
+
+    print("%10s %12s %12s %10s" % ('Points','Old (s)','New (s)','Speed up'))
+
+    for n in SIZES:
+        x_DC = np.linspace(-10,10,n)
+        y_DC = 5*np.sin(x_DC)
+
+        old_poly,old_time = timeit(oldMethod,cm,item,x_DC,y_DC)
+        new_poly,new_time = timeit(newMethod,cm,item,x_DC,y_DC)
+
+        # Check results are the same
+        assert old_poly.count() == new_poly.count()
+        for index in [0,n//2,n-1]:
+            assert abs(old_poly.at(index).x() - new_poly.at(index).x()) < 1e-9
+            assert abs(old_poly.at(index).y() - new_poly.at(index).y()) < 1e-9
+
+        print("%10d %12.4f %12.4f %10.1f" % (n,old_time,new_time,old_time/new_time))
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    benchmark()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 14:05:32 2026
+
+@author: john
+
+Network ingest benchmark
+=======================================
+Streams data packets over a loopback connection and measures how fast they
+can be received and decoded. One connection is used for all the packets,
+which are sent back to back.
+
+The receiver uses recvPacket() and extractDataPacket(), the same functions
+as the server. The target is to keep up with a 1 GbE link (125 MB/s) using
+1 MB packets.
+
+Run from the command line:
+
+    python benchmark_network.py
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import time
+import socket
+import threading
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+import ScopePy_network as net
+
+
+#==============================================================================
+#%% Constants
+#==============================================================================
+
+# Packet sizes to test [bytes of data]
+SIZES = [64*1024,1024*1024,4*1024*1024]
+
+# Amount of data to send for each size [bytes]
+TOTAL_BYTES = 512*1024*1024
+
+# 1 GbE in bytes per second
+TARGET_RATE = 125e6
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+def sender(port,packet,nPackets):
+    """
+    Connect and send the same packet nPackets times
+    """
+
+    conn = socket.create_connection(('127.0.0.1',port))
+    wrappedPacket = net.wrapDataPacket(packet)
+
+    for n in range(nPackets):
+        conn.sendall(wrappedPacket)
+
+    conn.close()
+
+
+def receiver(listener,nPackets):
+    """
+    Accept a connection and decode nPackets packets, returns the number of
+    bytes received
+    """
+
+    conn,addr = listener.accept()
+    nBytes = 0
+
+    for n in range(nPackets):
+        packet = net.recvPacket(conn)
+        packetType,remainingPacket = net.getPacketType(packet)
+        channelLabel,data = net.extractDataPacket(remainingPacket)
+
+        nBytes += len(packet) + net.SIZEOF_UINT64
+
+    conn.close()
+
+    return nBytes
+
+
+def benchmark():
+
+    print("%12s %10s %12s %12s" % ('Packet (kB)','Packets','Rate (MB/s)','1 GbE'))
+
+    for size in SIZES:
+        nPoints = size//16
+        x = np.arange(nPoints,dtype=float)
+        packet = net.makeDataPacket('Benchmark',x,np.sin(x),['x','y'])
+
+        nPackets = max(TOTAL_BYTES//len(packet),1)
+
+        listener = socket.socket()
+        listener.bind(('127.0.0.1',0))
+        listener.listen(1)
+        port = listener.getsockname()[1]
+
+        thread = threading.Thread(target=sender,args=(port,packet,nPackets))
+
+        start = time.perf_counter()
+        thread.start()
+        nBytes = receiver(listener,nPackets)
+        elapsed = time.perf_counter() - start
+
+        thread.join()
+        listener.close()
+
+        rate = nBytes/elapsed
+
+        print("%12d %10d %12.1f %12s" % (size//1024,nPackets,rate/1e6,
+                                          'yes' if rate >= TARGET_RATE else 'no'))
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    net.DEBUG = False
+    benchmark()
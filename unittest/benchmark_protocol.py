@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:10:38 2026
+
+@author: john
+
+Protocol encode/decode benchmark
+=======================================
+Compares the original data packets with version 2 frames for one channel
+of ADC style data:
+
+* v1 : makeDataPacket()/extractDataPacket(), everything sent as float64
+* v2 float64 : encodeFrame()/decodeFrame() with float64 columns
+* v2 int16 : float32 time and int16 samples
+* v2 int16 zlib : as above with compression
+
+Throughput is given in samples per second, with the packet size.
+
+Run from the command line:
+
+    python benchmark_protocol.py
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import time
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+import ScopePy_network as net
+import ScopePy_protocol as protocol
+
+
+#==============================================================================
+#%% Constants
+#==============================================================================
+
+# Number of samples per packet
+SIZES = [1000,100000,1000000]
+
+# Number of repeats for timing
+REPEATS = 20
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+def makeData(npoints,time_type,sample_type):
+    """
+    Sine wave with noise, as a structured array
+    """
+
+    data = np.zeros(npoints,[('time',time_type),('volts',sample_type)])
+    data['time'] = np.arange(npoints)*1e-6
+    data['volts'] = np.round(1000*np.sin(np.arange(npoints)/200.0) +
+                             np.random.RandomState(0).randn(npoints)*5)
+
+    return data
+
+
+def v1(data):
+
+    packet = net.makeDataPacket('ADC',data['time'],data['volts'],['time','volts'])
+    packetType,remainingPacket = net.getPacketType(packet)
+    net.extractDataPacket(remainingPacket)
+
+    return packet
+
+
+def v2(data,compress=False):
+
+    packet = protocol.encodeFrame([('ADC',data)],compress=compress)
+    packetType,remainingPacket = net.getPacketType(packet)
+    protocol.decodeFrame(remainingPacket)
+
+    return packet
+
+
+def timeit(function,*args):
+    """
+    Best time of REPEATS calls, returns result and time in seconds
+    """
+
+    best = None
+
+    for n in range(REPEATS):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return result,best
+
+
+def benchmark():
+
+    print("%10s %16s %12s %14s" % ('Samples','Format','Bytes','Samples/s'))
+
+    for n in SIZES:
+        float_data = makeData(n,'<f8','<f8')
+        adc_data = makeData(n,'<f4','<i2')
+
+        tests = [('v1',v1,(float_data,)),
+                 ('v2 float64',v2,(float_data,)),
+                 ('v2 int16',v2,(adc_data,)),
+                 ('v2 int16 zlib',v2,(adc_data,True))]
+
+        for name,function,args in tests:
+            packet,elapsed = timeit(function,*args)
+
+            print("%10d %16s %12d %14.3g" % (n,name,len(packet),n/elapsed))
+
+        print()
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    benchmark()
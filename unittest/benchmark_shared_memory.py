@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:15:52 2026
+
+@author: john
+
+Shared memory vs TCP benchmark
+=======================================
+A producer process sends x,y data at a fixed rate and this process receives
+it, the way ScopePy does:
+
+* TCP : original float64 data packets (makeDataPacket) over a loopback
+  connection to the asyncio ingest server
+* shared memory : send2ring() into a shared memory ring, read by a
+  RingConsumer once per frame
+
+For each rate it prints the rate received, the data lost and the CPU used by
+the receiving process.
+
+Run from the command line:
+
+    python benchmark_shared_memory.py
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import time
+import socket
+import multiprocessing
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+import ScopePy_network as net
+import ScopePy_ingest as ingest
+import ScopePy_shared_memory as sharedmem
+
+
+#==============================================================================
+#%% Constants
+#==============================================================================
+
+# Rates to test [MB/s]
+RATES = [10,30,100]
+
+# Length of each test [s]
+DURATION = 3.0
+
+# Points per packet, 16 bytes per point
+POINTS_PER_PACKET = 16384
+
+# Receiver frame rate [Hz]
+FRAME_RATE = 30
+
+
+#==============================================================================
+#%% Producers
+#==============================================================================
+
+def pace(rate,packetBytes,send):
+    """
+    Call send() often enough to produce rate MB/s for DURATION
+    """
+
+    interval = packetBytes/(rate*1e6)
+    x = np.arange(POINTS_PER_PACKET,dtype=float)
+    y = np.sin(x)
+
+    start = time.perf_counter()
+    n = 0
+
+    while True:
+        due = start + n*interval
+        now = time.perf_counter()
+
+        if now - start > DURATION:
+            break
+
+        if due > now:
+            time.sleep(due - now)
+
+        send(x + n*POINTS_PER_PACKET,y)
+        n += 1
+
+    return n
+
+
+def tcpProducer(port,rate,result):
+
+    conn = socket.create_connection(('127.0.0.1',port))
+
+    def send(x,y):
+        packet = net.makeDataPacket('TCP',x,y,['x','y'],packetType=net.DATA_PACKET_NOACK)
+        conn.sendall(net.wrapDataPacket(packet))
+
+    result.value = pace(rate,16*POINTS_PER_PACKET,send)
+    conn.close()
+
+
+def ringProducer(name,rate,result,overflows):
+
+    ring = net.openRing(name,capacity=32*1024*1024)
+
+    def send(x,y):
+        net.send2ring(ring,'Ring',x,y,'x','y')
+
+    result.value = pace(rate,16*POINTS_PER_PACKET,send)
+
+    # Give the consumer time to read the last data
+    time.sleep(0.5)
+    overflows.value = ring.overflows
+    ring.close()
+
+
+#==============================================================================
+#%% Receivers
+#==============================================================================
+
+def receiveTCP(rate):
+
+    server = ingest.IngestServer(net.decodePacket,maxQueued=10**6)
+    server.start('127.0.0.1',0)
+
+    sent = multiprocessing.Value('l',0)
+    producer = multiprocessing.Process(target=tcpProducer,args=(server.port,rate,sent))
+
+    cpu = time.process_time()
+    producer.start()
+
+    received = 0
+    while producer.is_alive() or server.queue:
+        for label,data in server.drain():
+            received += len(data)
+        time.sleep(1.0/FRAME_RATE)
+
+    producer.join()
+    cpu = time.process_time() - cpu
+    server.stop()
+
+    return sent.value*POINTS_PER_PACKET,received,0,cpu
+
+
+def receiveRing(rate):
+
+    name = 'benchmark_%d' % os.getpid()
+
+    sent = multiprocessing.Value('l',0)
+    overflows = multiprocessing.Value('l',0)
+    producer = multiprocessing.Process(target=ringProducer,args=(name,rate,sent,overflows))
+
+    cpu = time.process_time()
+    producer.start()
+
+    # Wait for the ring
+    ring = None
+    while ring is None:
+        try:
+            ring = sharedmem.RingConsumer(sharedmem.RING_PREFIX + name)
+        except (FileNotFoundError,sharedmem.RingNotReady):
+            time.sleep(0.001)
+
+    received = 0
+    while not ring.isClosed:
+        received += sum([len(data) for label,data in ring.read()])
+        ring.release()
+        time.sleep(1.0/FRAME_RATE)
+
+    producer.join()
+    cpu = time.process_time() - cpu
+    ring.close()
+
+    return sent.value*POINTS_PER_PACKET,received,overflows.value,cpu
+
+
+def benchmark():
+
+    print("%10s %8s %14s %10s %10s %10s" % ('Rate MB/s','Path','Received MB/s','Lost %','Overflows','CPU %'))
+
+    for rate in RATES:
+        for path,function in [('TCP',receiveTCP),('Ring',receiveRing)]:
+            sent,received,overflows,cpu = function(rate)
+
+            lost = 100.0*(sent - received)/max(sent,1)
+
+            print("%10d %8s %14.1f %10.1f %10d %10.1f" % (rate,path,16*received/DURATION/1e6,
+                                                         lost,overflows,100*cpu/DURATION))
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    net.DEBUG = False
+    benchmark()
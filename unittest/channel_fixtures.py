@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Nov  1 10:05:37 2026
+
+@author: john
+
+Channel fixtures for the unit tests
+=======================================
+Test channels made from chunks of 't' and 'volts' data, shared by the
+math channel, math worker and expression tests.
+
+Each test script gives its own volts waveform, e.g.
+
+>>> makeChunk = functools.partial(channel_fixtures.makeChunk,volts=np.sin)
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+import ScopePy_channel as ch
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+def makeChunk(start,npoints,volts=np.sin):
+    """
+    Chunk of data with t = start, start+1, ...
+
+    Inputs
+    --------
+    start : int
+        first t value
+    npoints : int
+        length of the chunk
+    volts : function
+        volts from the t array
+
+    """
+
+    chunk = np.zeros(npoints,[('t',float),('volts',float)])
+    chunk['t'] = np.arange(start,start+npoints)
+    chunk['volts'] = volts(chunk['t'])
+
+    return chunk
+
+
+def makeChannel(name,nchunks=1,npoints=100,volts=np.sin):
+    """
+    Channel with nchunks chunks of npoints each, t carries on from one
+    chunk to the next
+
+    """
+
+    channel = ch.ScopePyChannel(name)
+
+    for index in range(nchunks):
+        channel.addData2Channel(makeChunk(index*npoints,npoints,volts),update_signal=False)
+
+    return channel
@@ -36,6 +36,7 @@ import numpy as np
 
 # My libraries
 from ScopePy_graphs import AxisManager,NiceScale
+import ScopePy_graphs as gr
 
 
 #==============================================================================
@@ -377,6 +378,85 @@ class Test_BaseClass(unittest.TestCase):
         
         
         
+#==============================================================================
+#%% Tick label cache test
+#==============================================================================
+
+class FakeFont():
+    
+    def key(self):
+        return 'font'
+        
+        
+class FakePainter():
+    
+    def font(self):
+        return FakeFont()
+        
+    def transform(self):
+        return None
+        
+        
+class FakeStaticText():
+    
+    def __init__(self,text):
+        self.text = text
+        
+    def setTextFormat(self,textFormat):
+        pass
+        
+    def prepare(self,transform,font):
+        pass
+        
+        
+class FakeAxis():
+    """
+    Stands in for an Axis when calling staticTickLabel()
+    """
+    
+    def __init__(self):
+        self._tickLabelCache = {}
+        self._tickLabelFontKey = None
+        
+        
+class Test_TickLabelCache(unittest.TestCase):
+    """
+    Tests the tick label cache of the Axis class
+    """
+    
+    def setUp(self):
+        
+        # No text layout needed
+        self.QStaticText = getattr(gr,'QStaticText',None)
+        gr.QStaticText = FakeStaticText
+        
+        
+    def tearDown(self):
+        
+        gr.QStaticText = self.QStaticText
+        
+        
+    def test_bounded(self):
+        """
+        Labels of a scrolling axis don't fill up the cache
+        """
+        
+        axis = FakeAxis()
+        painter = FakePainter()
+        
+        first = gr.Axis.staticTickLabel(axis,'0',painter)
+        
+        for value in range(1,3*gr.TICK_LABEL_CACHE_SIZE):
+            gr.Axis.staticTickLabel(axis,'0',painter)
+            gr.Axis.staticTickLabel(axis,str(value),painter)
+            
+        self.assertEqual(len(axis._tickLabelCache),gr.TICK_LABEL_CACHE_SIZE)
+        
+        # Used on every paint, so it is kept
+        self.assertIs(gr.Axis.staticTickLabel(axis,'0',painter),first)
+        
+        
+        
 #==============================================================================
 #%% Runner
 #==============================================================================
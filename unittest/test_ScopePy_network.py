@@ -18,6 +18,8 @@ sys.path.append('/home/john/Documents/Python/scopePy/unittest')
 # Imports
 # ================
 import unittest
+import socket
+import threading
 import numpy as np
 
 from ScopePy_network import *
@@ -105,6 +107,239 @@ class TestSequenceFunctions(unittest.TestCase):
         
          # test condition
         self.assertTrue(len(wrappedPacket) == 223)
+        
+        
+    def test_extract_is_view(self):
+        # Data is not copied out of the packet
+        packet = makeDataPacket("MyChannel",self.standardArray[:,0],
+                                self.standardArray[:,1],list(self.standardColumnNames))
+        
+        packet = bytearray(packet)
+        packetType,remainingPacket = getPacketType(packet)
+        channelLabel,recArray_out = extractDataPacket(remainingPacket)
+        
+        self.assertEqual(packetType,DATA_PACKET)
+        self.assertEqual(channelLabel,"MyChannel")
+        self.assertFalse(recArray_out.flags['OWNDATA'])
+        self.assertTrue(np.all(recArray_out['y axis'] == self.standardArray[:,1]))
+        
+        
+    def test_packetReader(self):
+        # Back to back packets fed in uneven pieces
+        packets = [makeDataPacket("Channel %d" % n,np.arange(n+1),np.arange(n+1)*2.0,
+                                  ['x','y']) for n in range(5)]
+                                  
+        stream = b''.join([wrapDataPacket(packet) for packet in packets])
+        
+        reader = PacketReader()
+        received = []
+        
+        for start in range(0,len(stream),37):
+            received.extend(reader.feed(stream[start:start+37]))
+            
+        self.assertEqual([bytes(packet) for packet in received],packets)
+        
+        for n,packet in enumerate(received):
+            packetType,remainingPacket = getPacketType(packet)
+            channelLabel,recArray_out = extractDataPacket(remainingPacket)
+            
+            self.assertEqual(channelLabel,"Channel %d" % n)
+            self.assertTrue(np.all(recArray_out['y'] == np.arange(n+1)*2.0))
+            
+            
+    def test_packetReader_too_long(self):
+        # Lengths over the maximum are rejected before the packet is made
+        reader = PacketReader()
+        
+        with self.assertRaises(PacketError):
+            reader.feed(LENGTH_HEADER.pack(MAX_PACKET_SIZE + 1))
+            
+            
+    def test_extractDataPacket_bad(self):
+        # Bad packets raise PacketError, not AssertionError
+        packet = makeDataPacket("MyChannel",self.standardArray[:,0],
+                                self.standardArray[:,1],list(self.standardColumnNames))
+        packetType,remainingPacket = getPacketType(packet)
+        
+        # Too short, wrong number of columns and data missing
+        wrongColumns = bytearray(remainingPacket)
+        DATA_HEADER.pack_into(wrongColumns,0,len(self.standardArray),3,
+                              DATA_HEADER.unpack_from(remainingPacket)[2])
+        
+        for badPacket in [remainingPacket[:10],wrongColumns,remainingPacket[:-8]]:
+            with self.assertRaises(PacketError):
+                extractDataPacket(badPacket)
+                
+                
+    def test_recvPacket(self):
+        # Several packets on the same connection
+        conn_a,conn_b = socket.socketpair()
+        
+        packets = [makeDataPacket("Channel",np.arange(1000.0),np.ones(1000),
+                                  ['x','y']) for n in range(3)]
+        
+        # Send from a thread so the socket buffer doesn't fill up
+        def sendAll():
+            for packet in packets:
+                conn_a.sendall(wrapDataPacket(packet))
+                
+        sender = threading.Thread(target=sendAll)
+        sender.start()
+        
+        try:
+            for packet in packets:
+                self.assertEqual(bytes(recvPacket(conn_b)),packet)
+                
+        finally:
+            sender.join()
+            conn_a.close()
+            conn_b.close()
+            
+            
+    def receivePackets(self,nPackets,reply):
+        # Start a server that reads nPackets from one connection
+        listener = socket.socket()
+        listener.bind(('127.0.0.1',0))
+        listener.listen(1)
+        
+        received = []
+        
+        def serve():
+            conn,addr = listener.accept()
+            for n in range(nPackets):
+                received.append(recvPacket(conn))
+                if reply:
+                    conn.sendall(wrapDataPacket("Packet received"))
+            conn.close()
+            listener.close()
+            
+        server = threading.Thread(target=serve)
+        server.start()
+        
+        return listener.getsockname()[1],server,received
+        
+        
+    def test_ScopeClient(self):
+        # Packets are sent in order over one connection without replies
+        nPackets = 200
+        port,server,received = self.receivePackets(nPackets,False)
+        
+        client = ScopeClient('127.0.0.1',port)
+        for n in range(nPackets):
+            self.assertTrue(client.sendData("Channel",[n,n+1],[0.0,1.0],'x','y'))
+        client.close()
+        server.join()
+        
+        self.assertIsNone(client.lastError)
+        self.assertEqual(client.packetsSent,nPackets)
+        self.assertLessEqual(client.writes,nPackets)
+        
+        for n,packet in enumerate(received):
+            packetType,remainingPacket = getPacketType(packet)
+            channelLabel,recArray_out = extractDataPacket(remainingPacket)
+            
+            self.assertEqual(packetType,DATA_PACKET_NOACK)
+            self.assertEqual(recArray_out['x'][0],n)
+            
+            
+    def test_ScopeClient_acknowledge(self):
+        # Replies are read for each packet
+        port,server,received = self.receivePackets(10,True)
+        
+        client = ScopeClient('127.0.0.1',port,acknowledge=True)
+        for n in range(10):
+            client.sendData("Channel",[n],[0.0],'x','y')
+        client.flush()
+        
+        self.assertEqual(client.replies,10)
+        
+        client.close()
+        server.join()
+
+
+        
+        
+    def test_ScopeClient_no_server(self):
+        # Failed sends are reported by the next call
+        listener = socket.socket()
+        listener.bind(('127.0.0.1',0))
+        port = listener.getsockname()[1]
+        listener.close()
+        
+        client = ScopeClient('127.0.0.1',port)
+        client.sendData("Channel",[0],[0.0],'x','y')
+        client.flush()
+        
+        self.assertIsInstance(client.lastError,OSError)
+        self.assertFalse(client.sendData("Channel",[1],[0.0],'x','y'))
+        
+        client.close()
+        
+        
+    def test_defaultClient_acknowledge(self):
+        # send2scope() waits for replies unless told not to
+        acked = defaultClient('127.0.0.1')
+        noack = defaultClient('127.0.0.1',acknowledge=False)
+        
+        try:
+            self.assertTrue(acked.acknowledge)
+            self.assertFalse(noack.acknowledge)
+            self.assertIs(defaultClient('127.0.0.1'),acked)
+        finally:
+            closeDefaultClients()
+        
+        
+    def test_decodePacket_command(self):
+        # Commands are passed on and acknowledged
+        packet = TYPE_HEADER.pack(COMMAND_PACKET) + b'plot|test'
+        
+        channels,reply,commands = decodePacket(bytearray(packet))
+        
+        self.assertEqual(channels,[])
+        self.assertEqual(commands,[b'plot|test'])
+        self.assertIsNotNone(reply)
+        
+        
+    def test_command_reply(self):
+        # Both servers give the same reply to a command
+        class FakeSocket():
+            written = []
+            def writeData(self,data):
+                self.written.append(bytes(data))
+                
+        class FakeThread():
+            commands = []
+            def commandUploadFunction(self,socket,command):
+                self.commands.append((socket,command))
+                
+        packet = bytearray(TYPE_HEADER.pack(COMMAND_PACKET) + b'plot|test')
+        socket = FakeSocket()
+        
+        SocketThread.processPacket(FakeThread(),socket,packet)
+        channels,reply,commands = decodePacket(packet)
+        
+        self.assertEqual(FakeThread.commands,[(socket,b'plot|test')])
+        self.assertEqual(FakeSocket.written,[reply])
+        self.assertEqual(reply,wrapDataPacket(COMMAND_REPLY))
+        
+        
+    def test_processPacket_bad_frame(self):
+        # A corrupt frame is counted and dropped, the thread carries on
+        class FakeThread():
+            telemetry = telemetry.IngestTelemetry()
+            
+        packet = bytearray(TYPE_HEADER.pack(DATA_FRAME_V2) + b'rubbish')
+        
+        SocketThread.processPacket(FakeThread(),None,packet)
+        
+        self.assertEqual(FakeThread.telemetry.summary()['decodeErrors'],1)
+        
+        
+    def test_frameInterval(self):
+        # 0 or None means no limit, the timer runs every event loop pass
+        self.assertEqual(frameInterval(30),33)
+        self.assertEqual(frameInterval(0),0)
+        self.assertEqual(frameInterval(None),0)
 
 
 
@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:02:51 2026
+
+@author: john
+
+Channel storage Unit test script
+=======================================
+Non-graphical test of the channel storage classes
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import unittest
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+from ScopePy_channel_storage import RingBuffer, ConcatCache, ChunkStatistics, summarise
+from ScopePy_channel_storage import mergeConsecutive
+from ScopePy_channel_storage import MinMaxPyramid
+
+
+#==============================================================================
+#%% Constants
+#==============================================================================
+
+DTYPE = [('x',float),('y',float),('transparency',float)]
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+def makeChunk(chunk_number,npoints):
+    """
+    Make a chunk where x counts from chunk_number*100 and y is the
+    chunk number
+
+    """
+
+    chunk = np.zeros(npoints,DTYPE)
+    chunk['x'] = np.arange(npoints) + 100*chunk_number
+    chunk['y'] = chunk_number
+
+    return chunk
+
+
+
+#==============================================================================
+#%% RingBuffer test
+#==============================================================================
+
+class Test_RingBuffer(unittest.TestCase):
+    """
+    Tests RingBuffer class
+
+    """
+
+    def test_keeps_latest_chunks(self):
+        """
+        Only the last max_chunks chunks are kept
+
+        """
+
+        ring = RingBuffer(DTYPE,max_chunks=3,points_per_chunk=4)
+
+        for n in range(10):
+            ring.append(makeChunk(n,4))
+
+        self.assertEqual(ring.first_chunk,7)
+        self.assertEqual(ring.last_chunk,9)
+        self.assertEqual(len(ring),12)
+        self.assertTrue(all( np.unique(ring.view()['y']) == [7,8,9] ))
+
+
+    def test_view_is_contiguous_across_wrap(self):
+        """
+        Views that wrap around the end of the buffer are still in order and
+        don't copy the data
+
+        """
+
+        ring = RingBuffer(DTYPE,max_chunks=3,points_per_chunk=3)
+
+        for n in range(5):
+            ring.append(makeChunk(n,3))
+
+        data = ring.view()
+        expected = np.concatenate([makeChunk(n,3)['x'] for n in [2,3,4]])
+
+        self.assertTrue(all( data['x'] == expected ))
+        self.assertFalse(data.flags['OWNDATA'])
+
+
+    def test_chunk_access(self):
+        """
+        Individual chunks and ranges of chunks
+
+        """
+
+        ring = RingBuffer(DTYPE,max_chunks=4,points_per_chunk=2)
+
+        for n in range(6):
+            ring.append(makeChunk(n,n+1))
+
+        self.assertIsNone(ring.chunk(1))
+        self.assertTrue(all( ring.chunk(4)['x'] == makeChunk(4,5)['x'] ))
+        self.assertTrue(all( ring.view(3,4)['y'] == [3]*4 + [4]*5 ))
+
+
+    def test_grows_when_estimate_too_low(self):
+        """
+        Chunks bigger than the estimate are kept by growing the buffer
+
+        """
+
+        ring = RingBuffer(DTYPE,max_chunks=2,points_per_chunk=1)
+
+        ring.append(makeChunk(0,5))
+        ring.append(makeChunk(1,7))
+
+        self.assertEqual(ring.n_chunks,2)
+        self.assertGreaterEqual(ring.capacity,12)
+        self.assertTrue(all( ring.view()['y'] == [0]*5 + [1]*7 ))
+
+
+    def test_rename_columns(self):
+        """
+        Renaming the x and y columns leaves the others alone
+
+        """
+
+        ring = RingBuffer(DTYPE,max_chunks=2)
+        ring.append(makeChunk(0,2))
+        ring.setNames(('time','amplitude'))
+
+        self.assertEqual(ring.view().dtype.names,('time','amplitude','transparency'))
+
+
+
+#==============================================================================
+#%% ConcatCache test
+#==============================================================================
+
+class Test_ConcatCache(unittest.TestCase):
+    """
+    Tests ConcatCache class
+
+    """
+
+    def setUp(self):
+
+        self.chunks = [makeChunk(n,3) for n in range(20)]
+        self.cache = ConcatCache()
+        self.getChunk = lambda n: self.chunks[n]
+
+
+    def expected(self,chunkList):
+
+        return np.concatenate([self.chunks[n] for n in chunkList])
+
+
+    def test_growing_range(self):
+        """
+        Adding chunks to the end gives the same result as stacking them all
+
+        """
+
+        for last in range(1,20):
+            chunkList = list(range(last+1))
+            data = self.cache.get('all',chunkList,self.getChunk)
+
+            self.assertTrue(all( data == self.expected(chunkList) ))
+
+
+    def test_only_new_chunks_copied(self):
+        """
+        Existing chunks are not fetched again when the range grows
+
+        """
+
+        fetched = []
+
+        def getChunk(n):
+            fetched.append(n)
+            return self.chunks[n]
+
+        self.cache.get('all',[0,1,2],getChunk)
+        self.cache.get('all',[0,1,2,3,4],getChunk)
+
+        self.assertEqual(fetched,[0,1,2,3,4])
+
+
+    def test_sliding_range(self):
+        """
+        Rollover style ranges that drop chunks at the start
+
+        """
+
+        for last in range(3,20):
+            chunkList = list(range(last-3,last+1))
+            data = self.cache.get('rollover',chunkList,self.getChunk)
+
+            self.assertTrue(all( data == self.expected(chunkList) ))
+
+
+    def test_previous_views_unchanged(self):
+        """
+        Data returned earlier is not overwritten by later updates
+
+        """
+
+        old = self.cache.get('rollover',[0,1],self.getChunk)
+        old_copy = old.copy()
+
+        for last in range(2,20):
+            self.cache.get('rollover',[last-1,last],self.getChunk)
+
+        self.assertTrue(all( old == old_copy ))
+
+
+    def test_selection_and_invalidate(self):
+        """
+        Non consecutive selections and invalidating the cache
+
+        """
+
+        data = self.cache.get('selection',[1,5,7],self.getChunk)
+        self.assertTrue(all( data == self.expected([1,5,7]) ))
+
+        self.chunks[5] = makeChunk(15,3)
+        self.cache.invalidate()
+
+        data = self.cache.get('selection',[1,5,7],self.getChunk)
+        self.assertTrue(all( data == self.expected([1,5,7]) ))
+        self.assertEqual(self.cache.generation,1)
+
+
+    def test_mixed_dtypes_not_cached(self):
+        """
+        Chunks with different dtypes are left to the caller
+
+        """
+
+        self.chunks[1] = np.zeros(3,[('x',int),('y',float),('transparency',float)])
+
+        self.assertIsNone(self.cache.get('all',[0,1],self.getChunk))
+
+
+
+class Test_MergeConsecutive(unittest.TestCase):
+    """
+    Tests mergeConsecutive function
+
+    """
+
+    def test_merge(self):
+
+        other = np.zeros(2,[('x',float)])
+        chunks = [makeChunk(0,3),makeChunk(1,2),other,makeChunk(2,4)]
+
+        merged = mergeConsecutive(chunks)
+
+        self.assertEqual([len(chunk) for chunk in merged],[5,2,4])
+        self.assertTrue(np.all(merged[0]['y'] == [0,0,0,1,1]))
+        self.assertIs(merged[1],other)
+        self.assertEqual(mergeConsecutive([]),[])
+
+
+
+#==============================================================================
+#%% ChunkStatistics test
+#==============================================================================
+
+class Test_ChunkStatistics(unittest.TestCase):
+    """
+    Tests ChunkStatistics class
+
+    """
+
+    def setUp(self):
+
+        rng = np.random.RandomState(1234)
+
+        self.x = [np.arange(10.0) + 10*n for n in range(8)]
+        self.y = [rng.randn(10) for n in range(8)]
+
+        self.stats = ChunkStatistics()
+
+        for x,y in zip(self.x,self.y):
+            self.stats.append(x,y)
+
+
+    def check(self,summary,chunkList):
+
+        x = np.concatenate([self.x[n] for n in chunkList])
+        y = np.concatenate([self.y[n] for n in chunkList])
+
+        self.assertEqual(summary.xmin,x.min())
+        self.assertEqual(summary.xmax,x.max())
+        self.assertEqual(summary.ymin,y.min())
+        self.assertEqual(summary.ymax,y.max())
+        self.assertEqual(summary.count,len(x))
+        self.assertAlmostEqual(summary.ymean,y.mean())
+        self.assertAlmostEqual(summary.ystd,y.std())
+
+
+    def test_range_and_selection(self):
+        """
+        Consecutive and non-consecutive chunk lists match the data
+
+        """
+
+        self.check(self.stats.summary(list(range(8))),list(range(8)))
+        self.check(self.stats.summary([2,3,4]),[2,3,4])
+        self.check(self.stats.summary([6,1,4]),[6,1,4])
+
+
+    def test_zero_minimum(self):
+        """
+        A minimum of zero is handled as a real value
+
+        """
+
+        stats = ChunkStatistics()
+        stats.append(np.array([0.0,1.0]),np.array([0.0,0.0]))
+        stats.append(np.array([2.0,3.0]),np.array([-1.0,5.0]))
+
+        summary = stats.summary([0,1])
+
+        self.assertEqual(summary.xmin,0.0)
+        self.assertEqual(summary.ymin,-1.0)
+
+
+    def test_monotonic(self):
+        """
+        x is only monotonic if chunks are in order and don't overlap
+
+        """
+
+        self.assertTrue(self.stats.summary(list(range(8))).x_monotonic)
+        self.assertFalse(self.stats.summary([3,1]).x_monotonic)
+
+        self.stats.append(np.array([5.0,4.0]),np.array([0.0,0.0]))
+        self.assertFalse(self.stats.summary([8]).x_monotonic)
+
+
+    def test_discard(self):
+        """
+        Discarded chunks are ignored and the table is reused
+
+        """
+
+        for n in range(200):
+            self.stats.discardBefore(self.stats.last_chunk)
+            self.stats.append(np.arange(3.0),np.ones(3)*n)
+
+        self.assertEqual(len(self.stats),2)
+        self.assertEqual(self.stats.summary(list(range(208))).ymin,198)
+
+
+    def test_summarise(self):
+        """
+        Direct calculation from data
+
+        """
+
+        summary = summarise(self.x[0],self.y[0])
+        self.check(summary,[0])
+
+
+
+#==============================================================================
+#%% MinMaxPyramid test
+#==============================================================================
+
+class Test_MinMaxPyramid(unittest.TestCase):
+    """
+    Tests MinMaxPyramid class
+
+    """
+
+    def setUp(self):
+
+        self.x = np.arange(200003.0)
+        self.y = np.sin(self.x/500.0)
+
+        # Single sample spikes that must survive decimation
+        self.y[100017] = 10.0
+        self.y[150001] = -10.0
+
+        self.pyramid = MinMaxPyramid()
+
+        # Add in uneven chunks
+        for start in range(0,len(self.x),999):
+            self.pyramid.append(self.x[start:start+999],self.y[start:start+999])
+
+
+    def test_levels(self):
+        """
+        Each level has a quarter of the buckets of the level below
+
+        """
+
+        self.assertEqual(self.pyramid.samples,len(self.x))
+        self.assertEqual(self.pyramid.level_counts[0],len(self.x)//16)
+
+        for n in range(1,len(self.pyramid.levels)):
+            self.assertEqual(self.pyramid.level_counts[n],self.pyramid.level_counts[n-1]//4)
+
+        self.assertEqual(self.pyramid.level(2)['ymax'].max(),10.0)
+
+
+    def test_peaks_kept(self):
+        """
+        Zoomed out data is reduced but keeps the extremes and covers the
+        whole range
+
+        """
+
+        x,y = self.pyramid.decimate(self.x,self.y,0,self.x[-1],500)
+
+        self.assertLess(len(x),8*500+64)
+        self.assertEqual(y.max(),10.0)
+        self.assertEqual(y.min(),-10.0)
+        self.assertEqual(x[0],self.x[0])
+        self.assertEqual(x[-1],self.x[-1])
+        self.assertTrue(np.all(np.diff(x) >= 0))
+
+
+    def test_zoomed_in_raw(self):
+        """
+        Zoomed in far enough the raw samples are returned, with one either
+        side of the range
+
+        """
+
+        x,y = self.pyramid.decimate(self.x,self.y,1000.5,1200.5,500)
+
+        self.assertTrue(all( x == self.x[1000:1202] ))
+        self.assertTrue(all( y == self.y[1000:1202] ))
+
+
+    def test_partial_range(self):
+        """
+        Visible range in the middle of the data
+
+        """
+
+        x,y = self.pyramid.decimate(self.x,self.y,90000,110000,100)
+
+        self.assertLessEqual(x[0],90000)
+        self.assertGreaterEqual(x[-1],110000)
+        self.assertEqual(y.max(),10.0)
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 10:52:37 2026
+
+@author: john
+
+Record daemon Unit test script
+=======================================
+Non-graphical test of recording to HDF5 without the GUI
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import time
+import socket
+import tempfile
+import shutil
+import subprocess
+import unittest
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+import h5py
+
+
+# My libraries
+import ScopePy_daemon as daemon
+import ScopePy_network as nw
+import ScopePy_protocol as protocol
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+def makeData(start,npoints):
+
+    data = np.zeros(npoints,[('x','<f8'),('y','<i2')])
+    data['x'] = np.arange(start,start+npoints)
+
+    return data
+
+
+
+#==============================================================================
+#%% HDF5Recorder test
+#==============================================================================
+
+class Test_HDF5Recorder(unittest.TestCase):
+    """
+    Tests HDF5Recorder class
+
+    """
+
+    def setUp(self):
+
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder,'test.h5')
+        self.recorder = daemon.HDF5Recorder(self.filename,chunkRows=16)
+
+
+    def tearDown(self):
+
+        self.recorder.close()
+        shutil.rmtree(self.folder)
+
+
+    def read(self,name):
+
+        self.recorder.close()
+
+        with h5py.File(self.filename,'r') as h5file:
+            return h5file[daemon.CHANNEL_GROUP][name][:]
+
+
+    def test_append(self):
+        """
+        Chunks from several flushes end up in one dataset in order
+
+        """
+
+        self.recorder.add([('A',makeData(0,10)),('B',makeData(0,5))])
+        self.recorder.add([('A',makeData(10,10))])
+        self.recorder.flush()
+        self.recorder.add([('A',makeData(20,30))])
+
+        data = self.read('A')
+
+        self.assertTrue(np.all(data['x'] == np.arange(50)))
+        self.assertEqual(data.dtype['y'],np.dtype('<i2'))
+        self.assertEqual(self.recorder.rows,55)
+
+
+    def test_reopen(self):
+        """
+        Recording again adds to the same dataset
+
+        """
+
+        self.recorder.add([('A',makeData(0,10))])
+        self.recorder.close()
+
+        self.recorder = daemon.HDF5Recorder(self.filename)
+        self.recorder.add([('A',makeData(10,10))])
+
+        self.assertTrue(np.all(self.read('A')['x'] == np.arange(20)))
+
+
+    def test_column_change(self):
+        """
+        Different columns go into a new dataset, different types are
+        converted
+
+        """
+
+        other = np.zeros(3,[('t','<f4')])
+
+        self.recorder.add([('A',makeData(0,2)),('A',makeData(2,2).astype([('x','<f4'),('y','<f8')])),
+                           ('A',other)])
+
+        self.assertEqual(len(self.read('A')),4)
+        self.assertEqual(len(self.read('A (2)')),3)
+
+
+    def test_channel_name(self):
+
+        self.recorder.add([('ADC 1/volts',makeData(0,2))])
+
+        self.recorder.close()
+
+        with h5py.File(self.filename,'r') as h5file:
+            dataset = h5file[daemon.CHANNEL_GROUP]['ADC 1_volts']
+            self.assertEqual(dataset.attrs['channel_name'],'ADC 1/volts')
+            self.assertIsNotNone(dataset.compression)
+
+
+
+#==============================================================================
+#%% RecordDaemon test
+#==============================================================================
+
+class Test_RecordDaemon(unittest.TestCase):
+    """
+    Tests RecordDaemon receiving over TCP
+
+    """
+
+    def test_record(self):
+
+        folder = tempfile.mkdtemp()
+        filename = os.path.join(folder,'test.h5')
+
+        recordDaemon = daemon.RecordDaemon(filename,host='127.0.0.1',port=0,udpPort=0,
+                                           flushInterval=0.05)
+
+        try:
+            self.assertTrue(recordDaemon.start())
+
+            with socket.create_connection(('127.0.0.1',recordDaemon.tcpServer.port)) as conn:
+                x = np.arange(100.0)
+                packet = nw.makeDataPacket('Sine',x,np.sin(x),['x','y'],packetType=nw.DATA_PACKET_NOACK)
+                conn.sendall(nw.wrapDataPacket(packet))
+                conn.sendall(nw.wrapDataPacket(protocol.encodeFrame([('ADC',makeData(0,10))])))
+
+                recordDaemon.run(duration=0.3)
+
+            recordDaemon.close()
+
+            with h5py.File(filename,'r') as h5file:
+                channels = h5file[daemon.CHANNEL_GROUP]
+                self.assertTrue(np.allclose(channels['Sine']['y'],np.sin(x)))
+                self.assertEqual(len(channels['ADC']),10)
+
+            self.assertIn('Rows            : 110',recordDaemon.report())
+
+        finally:
+            recordDaemon.close()
+            shutil.rmtree(folder)
+
+
+    def test_no_qt(self):
+        """
+        The daemon runs where PyQt4 isn't installed
+
+        """
+
+        code = "import sys, ScopePy_daemon; print('PyQt4' in sys.modules)"
+        output = subprocess.check_output([sys.executable,'-c',code],cwd=BASEPATH)
+
+        self.assertEqual(output.strip(),b'False')
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 28 15:32:19 2026
+
+@author: john
+
+Math expressions Unit test script
+=======================================
+Non-graphical test of tracing math functions into expressions and
+working them out block by block
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import tracemalloc
+import unittest
+from functools import partial
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+import ScopePy_expressions as expr
+import ScopePy_channel as ch
+import channel_fixtures
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+def evaluate(outputs,block_size=100):
+    """
+    Work out expressions with small blocks so there are several
+
+    """
+
+    evaluator = expr.Evaluator(outputs)
+    targets = [np.empty(evaluator.length,float) for output in outputs]
+
+    evaluator.evaluate(targets,block_size)
+
+    return targets
+
+
+def makeFunction(function):
+
+    mathFunction = ch.MathFunction()
+    mathFunction.function = function
+
+    return mathFunction
+
+
+# Volts stay positive so the log of them can be taken
+makeChunk = partial(channel_fixtures.makeChunk,volts=lambda t : 1.5 + np.sin(t/10.0))
+makeChannel = partial(channel_fixtures.makeChannel,npoints=1000,volts=lambda t : 1.5 + np.sin(t/10.0))
+
+
+
+#==============================================================================
+#%% Expression test
+#==============================================================================
+
+class Test_Expression(unittest.TestCase):
+    """
+    Tests Expression and Evaluator classes
+
+    """
+
+    def setUp(self):
+
+        self.x = np.arange(1050,dtype=float)
+        self.y = np.cos(self.x/7.0)
+
+
+    def test_operations(self):
+
+        x = expr.Input(self.x)
+        y = expr.Input(self.y)
+
+        [result] = evaluate([20*np.log10(abs(y) + 1) - 3/(x + 1) + (-y)**2])
+
+        expected = 20*np.log10(abs(self.y) + 1) - 3/(self.x + 1) + (-self.y)**2
+
+        self.assertTrue(np.allclose(result,expected))
+
+
+    def test_outputs(self):
+        """
+        Inputs can be outputs and nodes can be shared
+
+        """
+
+        x = expr.Input(self.x)
+        shared = np.sqrt(x)
+
+        x_out,y_out = evaluate([x,shared*shared + shared])
+
+        self.assertTrue(np.array_equal(x_out,self.x))
+        self.assertTrue(np.allclose(y_out,self.x + np.sqrt(self.x)))
+
+
+    def test_buffers(self):
+        """
+        A long chain uses the same few buffers
+
+        """
+
+        y = expr.Input(self.y)
+        result = y
+
+        for index in range(20):
+            result = np.exp(result*0.5) - 1
+
+        evaluator = expr.Evaluator([result])
+
+        self.assertLessEqual(len(evaluator.buffer_dtypes),2)
+        self.assertEqual(len(evaluator.steps),60)
+
+
+    def test_types(self):
+
+        counts = expr.Input(np.arange(20))
+
+        evaluator = expr.Evaluator([counts//3])
+        [result] = evaluate([counts//3 + 0.5],block_size=7)
+
+        self.assertEqual(evaluator.buffer_dtypes,[np.dtype(np.int64)])
+        self.assertTrue(np.array_equal(result,np.arange(20)//3 + 0.5))
+
+
+    def test_empty(self):
+
+        [result] = evaluate([expr.Input(np.zeros(0))*2])
+
+        self.assertEqual(len(result),0)
+
+
+    def test_not_elementwise(self):
+
+        y = expr.Input(self.y)
+
+        for function in [lambda : np.diff(y),lambda : y[1:],lambda : len(y),
+                         lambda : y*self.y,lambda : bool(y > 0),lambda : np.add.reduce(y),
+                         lambda : y*True]:
+            with self.assertRaises((TypeError,expr.ExpressionError)):
+                function()
+
+
+    def test_comparisons(self):
+
+        rounded = np.round(self.y)
+        y = expr.Input(rounded)
+
+        [result] = evaluate([y*(y != 0) + 10*(y == 0) + (y >= 0.5)])
+
+        expected = rounded*(rounded != 0) + 10*(rounded == 0) + (rounded >= 0.5)
+
+        self.assertTrue(np.allclose(result,expected))
+        self.assertEqual(len(set([y,y])),1)
+
+
+    def test_lengths(self):
+
+        with self.assertRaises(expr.ExpressionError):
+            expr.Evaluator([expr.Input(self.x) + expr.Input(self.y[:10])])
+
+
+
+#==============================================================================
+#%% Trace test
+#==============================================================================
+
+class Test_Trace(unittest.TestCase):
+    """
+    Tests trace function
+
+    """
+
+    def setUp(self):
+
+        self.channel = makeChannel('A')
+        self.traced = expr.TracedChannel(self.channel,expr.Input(self.channel.x),
+                                         expr.Input(self.channel.y))
+
+
+    def test_trace(self):
+
+        x_out,y_out = expr.trace(makeFunction(lambda chan : (chan.x,chan.y*2)),[self.traced])
+
+        self.assertIsInstance(y_out,expr.Operation)
+        self.assertEqual(self.traced.name,'A')
+
+
+    def test_not_traced(self):
+
+        for function in [lambda chan : (chan.x[1:],np.diff(chan.y)),
+                         lambda chan : (chan.x,chan.data()[chan.y_axis]),
+                         lambda chan : (np.arange(10),chan.y),
+                         lambda chan : chan.y]:
+            self.assertIsNone(expr.trace(makeFunction(function),[self.traced]))
+
+
+
+#==============================================================================
+#%% MathChannel test
+#==============================================================================
+
+class Test_MathChannelExpression(unittest.TestCase):
+    """
+    Tests chains of math channels worked out as one expression
+
+    """
+
+    def setUp(self):
+
+        self.a = makeChannel('A',npoints=20000)
+        self.b = makeChannel('B',npoints=20000)
+
+        self.diff = ch.MathChannel([self.a,self.b],
+                                   makeFunction(lambda c1,c2 : (c1.x,c1.y - 0.5*c2.y)),'diff')
+        self.dB = ch.MathChannel([self.diff],
+                                 makeFunction(lambda chan : (chan.x,20*np.log10(chan.y))),'dB')
+
+
+    def expected(self):
+
+        return 20*np.log10(self.a.y - 0.5*self.b.y)
+
+
+    def test_chain(self):
+        """
+        The math channel in the middle of the chain isn't calculated
+
+        """
+
+        data = self.dB.data()
+
+        self.assertTrue(np.allclose(data['volts'],self.expected()))
+        self.assertTrue(np.array_equal(data['t'],self.a.x))
+        self.assertIsNone(self.diff.cached_data)
+        self.assertIsNotNone(self.dB.evaluator())
+
+
+    def test_calculated_source(self):
+        """
+        A source that has already been calculated is used as it is
+
+        """
+
+        self.diff.data()
+        evaluator = self.dB.evaluator()
+
+        self.assertEqual(len(evaluator.inputs),2)
+        self.assertTrue(np.allclose(self.dB.data()['volts'],self.expected()))
+
+
+    def test_untraced_source(self):
+        """
+        Functions that aren't element-wise are run as normal in the chain
+
+        """
+
+        smooth = ch.MathChannel([self.a],makeFunction(lambda chan : (chan.x[1:],np.diff(chan.y))),
+                                'smooth')
+        scaled = ch.MathChannel([smooth],makeFunction(lambda chan : (chan.x,chan.y*3)),'scaled')
+
+        self.assertTrue(np.allclose(scaled.data()['volts'],3*np.diff(self.a.y)))
+        self.assertIsNotNone(smooth.cached_data)
+        self.assertEqual(smooth.untraced_key,smooth.functionKey())
+
+
+    def test_comparisons(self):
+        """
+        Comparisons give the same output as the function on the arrays
+
+        """
+
+        chunk = makeChunk(0,5)
+        chunk['volts'] = [0,1,0,2,3]
+
+        source = ch.ScopePyChannel('C')
+        source.addData2Channel(chunk,update_signal=False)
+
+        function = makeFunction(lambda c : (c.x,c.y*(c.y != 0) + 10*(c.y == 0)))
+        channel = ch.MathChannel([source],function,'compare')
+
+        x_out,y_out = function([ch.ChannelSnapshot(source)])
+
+        self.assertIsNotNone(channel.evaluator())
+        self.assertTrue(np.array_equal(channel.data()['volts'],[10,1,10,2,3]))
+        self.assertTrue(np.array_equal(channel.data()['volts'],y_out))
+
+
+    def test_update(self):
+
+        self.dB.data()
+        self.a.addData2Channel(makeChunk(20000,100),update_signal=False)
+        self.b.addData2Channel(makeChunk(20000,100),update_signal=False)
+
+        self.assertEqual(len(self.dB.data()),20100)
+        self.assertTrue(np.allclose(self.dB.data()['volts'],self.expected()))
+
+
+    def test_memory(self):
+        """
+        Temporary arrays are the size of a block, not the data
+
+        """
+
+        tracemalloc.start()
+
+        try:
+            data = self.dB.data()
+            current,peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertLess(peak,data.nbytes + 8*expr.BLOCK_SIZE*8)
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()
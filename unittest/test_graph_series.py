@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:41:26 2026
+
+@author: john
+
+Graph series line drawing Unit test script
+=======================================
+Non-graphical test of the functions ChannelGraphSeries uses to add new
+points to existing lines instead of rebuilding them
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import unittest
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+from ScopePy_graphs import ChannelGraphSeries,LineBuffer,renderShift
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+class FakeCoordinateManager():
+    """
+    Linear data to item conversion, with scales and offsets that the test
+    can change
+    """
+
+    def __init__(self):
+        self.x_scale = 2.0
+        self.y_scale = -3.0
+        self.x_offset = 10.0
+        self.y_offset = 50.0
+
+    def data2item(self,graphics_item,x_DC,y_DC):
+        return (self.x_scale*x_DC + self.x_offset,self.y_scale*y_DC + self.y_offset)
+
+
+class FakeSeries():
+    """
+    Stands in for a ChannelGraphSeries when calling renderKey()
+    """
+
+    def __init__(self):
+        self.coordinateManager = FakeCoordinateManager()
+
+    def renderKey(self):
+        return ChannelGraphSeries.renderKey(self)
+
+
+
+#==============================================================================
+#%% Render key test
+#==============================================================================
+
+class Test_RenderKey(unittest.TestCase):
+    """
+    Tests the append or rebuild decision from renderKey() and renderShift()
+    """
+
+    def setUp(self):
+
+        self.series = FakeSeries()
+        self.cm = self.series.coordinateManager
+        self.old_key = self.series.renderKey()
+
+
+    def test_unchanged(self):
+
+        self.assertEqual(renderShift(self.old_key,self.series.renderKey()),0)
+
+
+    def test_x_offset(self):
+        """
+        Sliding the x axis along shifts the existing lines
+        """
+
+        self.cm.x_offset -= 7.5
+
+        self.assertEqual(renderShift(self.old_key,self.series.renderKey()),-7.5)
+
+
+    def test_rebuild(self):
+        """
+        Changing the scales or the y offset rebuilds the lines
+        """
+
+        for name in ['x_scale','y_scale','y_offset']:
+            self.setUp()
+            setattr(self.cm,name,getattr(self.cm,name) + 1.0)
+
+            self.assertIsNone(renderShift(self.old_key,self.series.renderKey()),name)
+
+
+
+#==============================================================================
+#%% LineBuffer test
+#==============================================================================
+
+class Test_LineBuffer(unittest.TestCase):
+    """
+    Tests LineBuffer class
+    """
+
+    def setUp(self):
+
+        self.buffer = LineBuffer()
+        self.buffer.reset(np.arange(4.0),10 + np.arange(4.0))
+
+
+    def test_append(self):
+
+        for start in range(4,100,6):
+            self.buffer.append(np.arange(start,start+6.0),10 + np.arange(start,start+6.0))
+
+        self.assertTrue(np.array_equal(self.buffer.x,np.arange(100.0)))
+        self.assertTrue(np.array_equal(self.buffer.y,10 + np.arange(100.0)))
+
+
+    def test_growth(self):
+        """
+        The arrays double in size rather than growing for every append
+        """
+
+        sizes = set()
+
+        for index in range(1000):
+            self.buffer.append([1.0],[2.0])
+            sizes.add(len(self.buffer.x_buffer))
+
+        self.assertLess(len(sizes),12)
+        self.assertEqual(self.buffer.count,1004)
+
+
+    def test_shift_in_place(self):
+        """
+        Shifting moves the points in views already handed out
+        """
+
+        x = self.buffer.x
+        self.buffer.shift(-1.0)
+
+        self.assertTrue(np.array_equal(x,np.arange(-1.0,3.0)))
+        self.assertTrue(np.array_equal(self.buffer.x,np.arange(-1.0,3.0)))
+
+
+    def test_views_after_growth(self):
+        """
+        Views from before the arrays were copied keep the old points
+        """
+
+        x = self.buffer.x
+        self.buffer.append([4.0,5.0],[14.0,15.0])
+        self.buffer.shift(-1.0)
+
+        self.assertTrue(np.array_equal(x,np.arange(4.0)))
+        self.assertTrue(np.array_equal(self.buffer.x,np.arange(-1.0,5.0)))
+
+
+    def test_reset(self):
+        """
+        Reset copies the arrays
+        """
+
+        x = np.arange(3.0)
+        self.buffer.reset(x,x)
+        self.buffer.shift(1.0)
+
+        self.assertTrue(np.array_equal(x,np.arange(3.0)))
+        self.assertEqual(self.buffer.count,3)
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()
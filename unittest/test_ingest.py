@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:20:33 2026
+
+@author: john
+
+Ingest server Unit test script
+=======================================
+Non-graphical test of the asyncio ingest server, using version 2 frames
+over local connections
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import time
+import socket
+import unittest
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+import ScopePy_ingest as ingest
+import ScopePy_protocol as protocol
+
+
+#==============================================================================
+#%% Constants
+#==============================================================================
+
+REPLY = ingest.LENGTH_HEADER.pack(12) + b'ack!'
+
+# Time to wait for data to arrive [s]
+TIMEOUT = 5.0
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+def decoder(packet):
+    """
+    Decode frames, reply to frames with a channel called 'reply'
+
+    """
+
+    channels = protocol.decodeFrame(memoryview(packet)[protocol.TYPE_HEADER.size:])
+
+    if channels and channels[0][0] == 'reply':
+        return channels,REPLY
+
+    return channels,None
+
+
+def wrap(packet):
+
+    return ingest.LENGTH_HEADER.pack(len(packet)+ingest.LENGTH_HEADER.size) + packet
+
+
+def makeFrame(label,npoints,start=0):
+
+    data = np.zeros(npoints,[('x','<f8'),('y','<i2')])
+    data['x'] = np.arange(start,start+npoints)
+
+    return wrap(protocol.encodeFrame([(label,data)]))
+
+
+
+#==============================================================================
+#%% IngestServer test
+#==============================================================================
+
+class Test_IngestServer(unittest.TestCase):
+    """
+    Tests IngestServer class
+
+    """
+
+    def setUp(self):
+
+        self.server = ingest.IngestServer(decoder,maxQueued=50)
+        self.assertTrue(self.server.start('127.0.0.1',0))
+
+
+    def tearDown(self):
+
+        self.server.stop()
+
+
+    def connect(self):
+
+        return socket.create_connection(('127.0.0.1',self.server.port))
+
+
+    def waitFor(self,npackets):
+        """
+        Drain until npackets arrays have arrived
+
+        """
+
+        received = []
+        start = time.time()
+
+        while len(received) < npackets and time.time() - start < TIMEOUT:
+            received.extend(self.server.drain())
+            time.sleep(0.001)
+
+        return received
+
+
+    def test_many_connections(self):
+        """
+        Back to back packets on several connections
+
+        """
+
+        connections = [self.connect() for n in range(10)]
+
+        for n,conn in enumerate(connections):
+            conn.sendall(b''.join([makeFrame('Channel %d' % n,10,10*m) for m in range(5)]))
+
+        received = self.waitFor(50)
+
+        for conn in connections:
+            conn.close()
+
+        self.assertEqual(len(received),50)
+
+        # Order is kept within each connection
+        for n in range(10):
+            x = [data.x[0] for label,data in received if label == 'Channel %d' % n]
+            self.assertEqual(x,[0,10,20,30,40])
+
+
+    def test_large_packet(self):
+        """
+        Packets bigger than the read buffer
+
+        """
+
+        npoints = 4*ingest.INGEST_READ_SIZE
+
+        with self.connect() as conn:
+            conn.sendall(makeFrame('Big',npoints) + makeFrame('Small',3))
+            received = self.waitFor(2)
+
+        self.assertEqual([label for label,data in received],['Big','Small'])
+        self.assertTrue(np.all(received[0][1].x == np.arange(npoints)))
+
+
+    def test_reply(self):
+        """
+        Replies from the decoder are sent back
+
+        """
+
+        with self.connect() as conn:
+            conn.sendall(makeFrame('reply',1))
+            conn.settimeout(TIMEOUT)
+
+            reply = b''
+            while len(reply) < len(REPLY):
+                reply += conn.recv(len(REPLY))
+
+        self.assertEqual(reply,REPLY)
+
+
+    def test_backpressure(self):
+        """
+        Reading stops when the queue is full and restarts when it is drained
+
+        """
+
+        with self.connect() as conn:
+            conn.sendall(b''.join([makeFrame('Channel',1,n) for n in range(200)]))
+
+            # Let the queue fill up
+            start = time.time()
+            while self.server.pauses == 0 and time.time() - start < TIMEOUT:
+                time.sleep(0.001)
+
+            self.assertGreater(self.server.pauses,0)
+
+            received = self.waitFor(200)
+
+        self.assertEqual([data.x[0] for label,data in received],list(range(200)))
+
+
+    def test_bad_packet(self):
+        """
+        Packets that can't be decoded are dropped
+
+        """
+
+        with self.connect() as conn:
+            conn.sendall(wrap(b'rubbish') + makeFrame('Good',1))
+            received = self.waitFor(1)
+
+        self.assertEqual(received[0][0],'Good')
+        self.assertEqual(self.server.decodeErrors,1)
+
+
+    def test_commands(self):
+        """
+        Command packets from the decoder are queued separately from data
+
+        """
+
+        def commandDecoder(packet):
+            return [],REPLY,[bytes(packet)]
+
+        self.server.decoder = commandDecoder
+
+        commands = []
+
+        with self.connect() as conn:
+            conn.sendall(wrap(b'command 1') + wrap(b'command 2'))
+
+            start = time.time()
+
+            while len(commands) < 2 and time.time() - start < TIMEOUT:
+                commands.extend(self.server.drainCommands())
+                time.sleep(0.001)
+
+        self.assertEqual(commands,[b'command 1',b'command 2'])
+        self.assertEqual(self.server.drain(),[])
+
+
+    def test_packet_too_long(self):
+        """
+        A length over MAX_PACKET_SIZE closes the connection without
+        allocating the packet
+
+        """
+
+        with self.connect() as conn:
+            conn.sendall(ingest.LENGTH_HEADER.pack(ingest.MAX_PACKET_SIZE + 1) + b'xxxx')
+            conn.settimeout(TIMEOUT)
+
+            self.assertEqual(conn.recv(10),b'')
+
+        with self.assertRaises(ingest.PacketError):
+            ingest.checkPacketLength(4)
+
+
+    def test_port_in_use(self):
+        """
+        A second server on the same port fails to start
+
+        """
+
+        server = ingest.IngestServer(decoder)
+
+        self.assertFalse(server.start('127.0.0.1',self.server.port))
+        self.assertNotEqual(server.errorString(),'')
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 23 11:02:45 2026
+
+@author: john
+
+Load generator Unit test script
+=======================================
+Short load tests against the in-process servers
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import unittest
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+import ScopePy_loadgen as loadgen
+
+
+#==============================================================================
+#%% Load generator test
+#==============================================================================
+
+class Test_LoadGenerator(unittest.TestCase):
+    """
+    Tests runLoad with small loads
+
+    """
+
+    def runLoad(self,**kwargs):
+
+        settings = loadgen.LoadSettings(producers=2,channels=2,points=500,rate=50.0,
+                                        duration=0.3,port=0,**kwargs)
+
+        return loadgen.runLoad(settings)
+
+
+    def check(self,results):
+
+        self.assertGreater(results['sentPackets'],0)
+        self.assertEqual(results['receivedRows'],results['sentRows'])
+        self.assertEqual(results['channels'],4)
+
+        # Latencies are positive and in order
+        self.assertGreater(results['latency'][0],0)
+        self.assertEqual(results['latency'],sorted(results['latency']))
+
+        self.assertIn('Latency',loadgen.formatResults(results))
+
+
+    def test_v1(self):
+
+        self.check(self.runLoad(protocolName='v1ack'))
+
+
+    def test_v2(self):
+
+        results = self.runLoad(protocolName='v2',dtype='int16')
+
+        self.check(results)
+        self.assertEqual(results['receivedBytes'],results['receivedRows']*10)
+
+
+    def test_udp(self):
+
+        self.check(self.runLoad(protocolName='udp',server='udp'))
+
+
+    def test_data(self):
+        """
+        Template data has the right type and isn't all zero
+
+        """
+
+        data = loadgen.makeData(loadgen.LoadSettings(points=100,dtype='uint8'))
+
+        self.assertEqual(data.dtype['y'],np.dtype('uint8'))
+        self.assertGreater(data['y'].max(),0)
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 25 10:12:40 2026
+
+@author: john
+
+Math channel Unit test script
+=======================================
+Non-graphical test of MathChannel evaluation and caching
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import unittest
+from functools import partial
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+import ScopePy_channel as ch
+import channel_fixtures
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+# Volts are t + 1, so they are easy to check
+makeChunk = partial(channel_fixtures.makeChunk,volts=lambda t : t + 1)
+makeChannel = partial(channel_fixtures.makeChannel,nchunks=2,npoints=10,volts=lambda t : t + 1)
+
+
+def countingFunction(function):
+    """
+    MathFunction that counts how many times it is run
+
+    """
+
+    mathFunction = ch.MathFunction()
+    mathFunction.name = 'counting'
+    mathFunction.calls = 0
+
+    def counted(chan):
+        mathFunction.calls += 1
+        return function(chan)
+
+    mathFunction.function = counted
+
+    return mathFunction
+
+
+
+#==============================================================================
+#%% Data version test
+#==============================================================================
+
+class Test_DataVersion(unittest.TestCase):
+    """
+    Tests ScopePyChannel.data_version
+
+    """
+
+    def test_version(self):
+
+        channel = ch.ScopePyChannel('A')
+        versions = [channel.data_version]
+
+        channel.addData2Channel(makeChunk(0,10),update_signal=False)
+        versions.append(channel.data_version)
+
+        channel.setAxisName('x','time')
+        versions.append(channel.data_version)
+
+        channel.setRolloverStorage(5)
+        versions.append(channel.data_version)
+
+        channel.clearChannelData()
+        versions.append(channel.data_version)
+
+        self.assertEqual(versions,sorted(set(versions)))
+
+
+    def test_rejected_chunk(self):
+        """
+        A chunk that isn't added doesn't change the version
+
+        """
+
+        channel = makeChannel('A')
+        version = channel.data_version
+
+        self.assertFalse(channel.addData2Channel(np.zeros(3,[('a',float),('b',float)]),
+                                                 update_signal=False))
+        self.assertEqual(channel.data_version,version)
+
+
+
+#==============================================================================
+#%% Ring storage test
+#==============================================================================
+
+class Test_RingStorage(unittest.TestCase):
+    """
+    Tests ScopePyChannel.getDataFromChannel with rollover storage
+
+    """
+
+    def test_dropped_chunks(self):
+        """
+        A selection of chunks that have all been dropped gives no data
+
+        """
+
+        channel = makeChannel('A',nchunks=0)
+        channel.setRolloverStorage(2)
+
+        for index in range(5):
+            channel.addData2Channel(makeChunk(index*10,10),update_signal=False)
+
+        dropped = channel.getDataFromChannel([0,2],cacheKey='dropped')
+        kept = channel.getDataFromChannel([1,4],cacheKey='kept')
+
+        self.assertEqual(len(dropped),0)
+        self.assertEqual(dropped.dtype,kept.dtype)
+        self.assertTrue(np.all(kept['t'] == np.arange(40,50)))
+
+
+
+#==============================================================================
+#%% MathChannel test
+#==============================================================================
+
+class Test_MathChannel(unittest.TestCase):
+    """
+    Tests MathChannel caching
+
+    """
+
+    def setUp(self):
+
+        self.source = makeChannel('A')
+        self.function = countingFunction(lambda chan : (chan.x,20*np.log10(chan.y)))
+        self.channel = ch.MathChannel([self.source],self.function,'dB')
+
+
+    def test_output(self):
+
+        data = self.channel.data()
+
+        self.assertTrue(np.allclose(data['volts'],20*np.log10(np.arange(20) + 1)))
+        self.assertTrue(np.all(self.channel.x == np.arange(20)))
+
+
+    def test_cache(self):
+        """
+        The function is only run when the source changes
+
+        """
+
+        first = self.channel.data()
+        self.channel.data()
+        self.channel.y
+        self.channel.dataStats()
+
+        self.assertEqual(self.function.calls,1)
+        self.assertIs(self.channel.data(),first)
+
+        self.source.addData2Channel(makeChunk(20,10),update_signal=False)
+
+        self.assertEqual(len(self.channel.data()),30)
+        self.assertEqual(self.function.calls,2)
+
+
+    def test_chunk_mode(self):
+
+        self.channel.data()
+        self.source.chunkMode = ch.CHUNK_MODE_LATEST
+
+        self.assertEqual(len(self.channel.data()),10)
+        self.assertEqual(self.function.calls,2)
+
+
+    def test_parameters(self):
+
+        self.channel.data()
+        self.function.parameters['gain'] = 2
+        self.channel.data()
+
+        self.assertEqual(self.function.calls,2)
+
+
+    def test_source_read_once(self):
+        """
+        x and y come from one call to the source data()
+
+        """
+
+        calls = []
+        data = self.source.data
+
+        def countedData(**kwargs):
+            calls.append(kwargs)
+            return data(**kwargs)
+
+        self.source.data = countedData
+
+        self.channel.data()
+
+        self.assertEqual(len(calls),1)
+
+
+    def test_chained(self):
+        """
+        Math channels of math channels update when the original source
+        changes
+
+        """
+
+        diff = ch.MathFunction()
+        diff.function = lambda channel1,channel2 : (channel1.x,channel2.y-channel1.y)
+
+        chained = ch.MathChannel([self.channel,self.source],diff,'diff')
+        version = self.channel.data_version
+
+        self.assertEqual(len(chained.data()),20)
+        self.assertEqual(self.channel.data_version,version)
+
+        self.source.addData2Channel(makeChunk(20,10),update_signal=False)
+
+        self.assertGreater(self.channel.data_version,version)
+        self.assertEqual(len(chained.data()),30)
+
+
+
+#==============================================================================
+#%% Chunk local MathChannel test
+#==============================================================================
+
+class Test_ChunkLocal(unittest.TestCase):
+    """
+    Tests MathChannel with a chunk local function
+
+    """
+
+    def setUp(self):
+
+        self.source = makeChannel('A',nchunks=3)
+        self.function = countingFunction(lambda chan : (chan.x,2*chan.y))
+        self.function.chunk_local = True
+        self.channel = ch.MathChannel([self.source],self.function,'double')
+
+
+    def addChunk(self,source=None):
+
+        source = self.source if source is None else source
+        source.addData2Channel(makeChunk(source.chunks*10,10),update_signal=False)
+
+
+    def test_output(self):
+
+        data = self.channel.data(chunkMode=ch.CHUNK_MODE_ALL)
+
+        self.assertTrue(self.channel.hasChunks)
+        self.assertEqual(self.channel.chunks,3)
+        self.assertTrue(np.all(data['volts'] == 2*(np.arange(30) + 1)))
+
+
+    def test_new_chunks(self):
+        """
+        Only new chunks are transformed
+
+        """
+
+        self.assertEqual(self.function.calls,3)
+
+        self.addChunk()
+        self.addChunk()
+        self.channel.data()
+        self.channel.data()
+
+        self.assertEqual(self.function.calls,5)
+        self.assertEqual(len(self.channel.data(chunkMode=ch.CHUNK_MODE_ALL)),50)
+
+
+    def test_chunk_modes(self):
+
+        latest = self.channel.data(chunkMode=ch.CHUNK_MODE_LATEST)
+        self.assertTrue(np.all(latest['t'] == np.arange(20,30)))
+
+        selection = self.channel.data(chunkMode=ch.CHUNK_MODE_SELECTION,chunkList=[0,2])
+        self.assertEqual(list(selection['transparency'][::10]),[0,2])
+
+        self.channel.rollover = 2
+        rollover = self.channel.data(chunkMode=ch.CHUNK_MODE_ROLLOVER)
+        self.assertTrue(np.all(rollover['t'] == np.arange(10,30)))
+
+        stats = self.channel.dataStats(chunkMode=ch.CHUNK_MODE_LATEST)
+        self.assertEqual((stats.ymin,stats.ymax),(42,60))
+
+
+    def test_reset(self):
+        """
+        Clearing the source or changing the parameters starts again
+
+        """
+
+        self.source.clearChannelData()
+        self.addChunk()
+
+        self.assertEqual(len(self.channel.data(chunkMode=ch.CHUNK_MODE_ALL)),10)
+        self.assertEqual(self.channel.chunks,1)
+
+        calls = self.function.calls
+        self.function.parameters['gain'] = 3
+        self.channel.data()
+
+        self.assertEqual(self.function.calls,calls + 1)
+
+
+    def test_ring_source(self):
+        """
+        Chunks dropped by a ring buffer source are dropped here too, chunk
+        numbers stay the same as the source
+
+        """
+
+        source = makeChannel('B',nchunks=0)
+        source.setRolloverStorage(2)
+
+        for index in range(4):
+            self.addChunk(source)
+
+        channel = ch.MathChannel([source],self.function,'ring')
+
+        self.assertEqual(channel.chunks,4)
+        self.assertEqual(channel.selectChunks(ch.CHUNK_MODE_ALL),[2,3])
+
+        self.addChunk(source)
+
+        self.assertTrue(np.all(channel.data(chunkMode=ch.CHUNK_MODE_ALL)['t'] == np.arange(30,50)))
+
+
+    def test_chained(self):
+
+        other = makeChannel('B',nchunks=3)
+
+        diff = ch.MathFunction()
+        diff.function = lambda channel1,channel2 : (channel1.x,channel2.y-channel1.y)
+        diff.chunk_local = True
+
+        chained = ch.MathChannel([other,self.channel],diff,'diff')
+
+        self.addChunk()
+        self.addChunk(other)
+
+        data = chained.data(chunkMode=ch.CHUNK_MODE_ALL)
+
+        self.assertEqual(chained.chunks,4)
+        self.assertTrue(np.all(data['volts'] == np.arange(40) + 1))
+
+
+    def test_unaligned_sources(self):
+        """
+        Sources with chunks of different lengths use the whole data
+
+        """
+
+        a = makeChannel('A',nchunks=2,npoints=100)
+        b = makeChannel('B',nchunks=4,npoints=50)
+
+        diff = ch.MathFunction()
+        diff.function = lambda channel1,channel2 : (channel1.x,channel2.y-channel1.y)
+        diff.chunk_local = True
+
+        channel = ch.MathChannel([a,b],diff,'diff')
+        data = channel.data()
+
+        self.assertFalse(channel.hasChunks)
+        self.assertTrue(np.all(data['t'] == np.arange(200)))
+        self.assertTrue(np.all(data['volts'] == 0))
+        self.assertEqual(channel.dataStats().count,200)
+
+        a.addData2Channel(makeChunk(200,100),update_signal=False)
+        b.addData2Channel(makeChunk(200,100),update_signal=False)
+
+        self.assertEqual(len(channel.data()),300)
+
+        # Cleared sources with matching chunks go back to chunk by chunk
+        a.clearChannelData()
+        b.clearChannelData()
+        self.addChunk(a)
+        self.addChunk(b)
+
+        self.assertEqual(len(channel.data(chunkMode=ch.CHUNK_MODE_ALL)),10)
+        self.assertTrue(channel.hasChunks)
+
+
+    def test_not_chunk_local(self):
+        """
+        Sources without chunks use the whole data
+
+        """
+
+        self.function.chunk_local = False
+
+        self.assertFalse(self.channel.hasChunks)
+        self.assertEqual(len(self.channel.data()),30)
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()
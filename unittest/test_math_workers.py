@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 27 14:21:05 2026
+
+@author: john
+
+Math channel workers Unit test script
+=======================================
+Non-graphical test of running math functions in worker threads and
+processes
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import time
+import threading
+import unittest
+from functools import partial
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+from scipy.stats import probplot
+
+
+# My libraries
+import ScopePy_channel as ch
+import ScopePy_math_workers as workers
+from ScopePy_shared_memory import attachSharedMemory
+import channel_fixtures
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+makeChunk = partial(channel_fixtures.makeChunk,volts=lambda t : np.sin(t/5.0))
+makeChannel = partial(channel_fixtures.makeChannel,npoints=100,volts=lambda t : np.sin(t/5.0))
+
+
+def loadFunction(name):
+    """
+    Load a built-in math function from its file
+
+    """
+
+    functions = ch.load_math_functions([os.path.join(BASEPATH,'math_functions')])
+
+    return [function for function in functions if function.name == name][0]
+
+
+def waitForOutput(channel,timeout=10.0):
+    """
+    Wait until the channel has the output for its current sources
+
+    """
+
+    channel.data()
+    start = time.time()
+
+    while channel.cached_key != channel.dataKey():
+        if time.time() - start > timeout:
+            raise AssertionError("No output from the worker")
+
+        time.sleep(0.005)
+
+    return channel.data()
+
+
+class GatedFunction(ch.MathFunction):
+    """
+    Function that waits for the test to let it finish
+
+    """
+
+    def __init__(self,execution=workers.EXECUTION_THREAD):
+
+        super(GatedFunction,self).__init__()
+
+        self.name = 'gated'
+        self.function = lambda chan : (chan.x,2*chan.y)
+        self.execution = execution
+
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.calls = 0
+
+
+    def __call__(self,channel_list):
+
+        self.calls += 1
+        self.started.set()
+        self.gate.wait(10.0)
+
+        return super(GatedFunction,self).__call__(channel_list)
+
+
+
+#==============================================================================
+#%% Worker pool test
+#==============================================================================
+
+class Test_MathWorkerPool(unittest.TestCase):
+    """
+    Tests MathWorkerPool class
+
+    """
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.pool = workers.MathWorkerPool(threads=1,processes=1)
+
+
+    @classmethod
+    def tearDownClass(cls):
+
+        cls.pool.shutdown()
+
+
+    def test_thread(self):
+
+        function = ch.MathFunction()
+        function.function = lambda chan : (chan.x,chan.y + 1)
+
+        source = makeChannel('A')
+        future = self.pool.submit(workers.EXECUTION_THREAD,function,[ch.ChannelSnapshot(source)])
+
+        x_out,y_out = future.result(10.0)
+
+        self.assertTrue(np.all(y_out == source.y + 1))
+
+
+    def test_process(self):
+        """
+        Functions loaded from a file run in a worker process with the data
+        in shared memory, which is removed afterwards
+
+        """
+
+        function = loadFunction('lognormal')
+        self.assertEqual(function.execution,workers.EXECUTION_PROCESS)
+
+        source = makeChannel('A')
+
+        # Keep a note of the shared memory used
+        blocks = []
+        SharedArray = workers.SharedArray
+
+        def recordBlock(array):
+            blocks.append(SharedArray(array))
+            return blocks[-1]
+
+        workers.SharedArray = recordBlock
+
+        try:
+            future = self.pool.submit(workers.EXECUTION_PROCESS,function,
+                                      [ch.ChannelSnapshot(source)])
+        finally:
+            workers.SharedArray = SharedArray
+
+        x_out,y_out = future.result(60.0)
+        (osm,osr),dummy = probplot(source.y,plot=None)
+
+        self.assertTrue(np.allclose(x_out,osm))
+        self.assertTrue(np.allclose(y_out,osr))
+
+        # Released by a done callback, which can run just after result()
+        time.sleep(0.1)
+
+        with self.assertRaises(FileNotFoundError):
+            attachSharedMemory(blocks[0].description[0])
+
+
+    def test_process_fallback(self):
+        """
+        Functions that aren't in a file run in a thread
+
+        """
+
+        function = ch.MathFunction()
+        function.function = lambda chan : (chan.x,-chan.y)
+        function.execution = workers.EXECUTION_PROCESS
+
+        source = makeChannel('A')
+        future = self.pool.submit(workers.EXECUTION_PROCESS,function,[ch.ChannelSnapshot(source)])
+
+        x_out,y_out = future.result(10.0)
+
+        self.assertTrue(np.all(y_out == -source.y))
+
+
+    def test_unknown_policy(self):
+
+        with self.assertRaises(ValueError):
+            self.pool.submit('gpu',ch.MathFunction(),[])
+
+
+
+class Test_SharedArray(unittest.TestCase):
+    """
+    Tests SharedArray class
+
+    """
+
+    def test_round_trip(self):
+
+        data = makeChunk(0,10)
+        block = workers.SharedArray(data)
+
+        name,shape,dtype = block.description
+        shm = attachSharedMemory(name)
+        shared = np.ndarray(shape,dtype,buffer=shm.buf)
+
+        self.assertTrue(np.array_equal(shared,data))
+
+        del shared
+        shm.close()
+        block.release()
+
+        with self.assertRaises(FileNotFoundError):
+            attachSharedMemory(name)
+
+
+    def test_empty(self):
+
+        block = workers.SharedArray(makeChunk(0,0))
+
+        self.assertEqual(block.description[1],(0,))
+
+        block.release()
+
+
+
+#==============================================================================
+#%% MathChannel test
+#==============================================================================
+
+class Test_WorkerMathChannel(unittest.TestCase):
+    """
+    Tests MathChannel with functions run in a worker
+
+    """
+
+    def setUp(self):
+
+        self.source = makeChannel('A')
+        self.function = GatedFunction()
+        self.channel = ch.MathChannel([self.source],self.function,'double')
+
+
+    def tearDown(self):
+
+        self.function.gate.set()
+
+
+    def test_output(self):
+        """
+        Nothing until the first output is ready
+
+        """
+
+        self.assertIsNone(self.channel.data())
+        self.assertTrue(self.channel.isEmpty)
+        self.assertIsNone(self.channel.dataStats())
+
+        self.function.gate.set()
+        data = waitForOutput(self.channel)
+
+        self.assertTrue(np.all(data['volts'] == 2*self.source.y))
+        self.assertFalse(self.channel.isEmpty)
+        self.assertEqual(self.function.calls,1)
+
+
+    def test_last_output(self):
+        """
+        The last output is returned while the new one is calculated
+
+        """
+
+        self.function.gate.set()
+        first = waitForOutput(self.channel)
+
+        self.function.gate.clear()
+        self.function.started.clear()
+        self.source.addData2Channel(makeChunk(100,50),update_signal=False)
+
+        self.assertIs(self.channel.data(),first)
+        self.assertTrue(self.function.started.wait(10.0))
+
+        self.function.gate.set()
+
+        self.assertEqual(len(waitForOutput(self.channel)),150)
+
+
+    def test_stale(self):
+        """
+        Changes while the function is running are calculated once after
+        it has finished
+
+        """
+
+        self.channel.data()
+        self.assertTrue(self.function.started.wait(10.0))
+
+        version = self.channel.data_version
+
+        for index in range(5):
+            self.source.addData2Channel(makeChunk(100+10*index,10),update_signal=False)
+            self.channel.data()
+
+        self.function.gate.set()
+
+        # Output for the first data, then the latest data
+        start = time.time()
+
+        while self.channel.cached_key is None and time.time() - start < 10.0:
+            time.sleep(0.005)
+
+        self.assertEqual(len(self.channel.data()),100)
+        self.assertEqual(len(waitForOutput(self.channel)),150)
+        self.assertEqual(self.function.calls,2)
+        self.assertGreater(self.channel.data_version,version)
+
+
+    def test_cancel(self):
+        """
+        Calculations that haven't started are cancelled when the sources
+        change
+
+        """
+
+        # Keep the only thread busy so the next calculations are queued
+        pool = workers.defaultPool()
+        blocker = threading.Event()
+        busy = [pool.threadPool().submit(blocker.wait,10.0) for index in range(pool.threads)]
+
+        try:
+            self.channel.data()
+            queued = self.channel.pending
+
+            self.source.addData2Channel(makeChunk(100,10),update_signal=False)
+            self.channel.data()
+
+            self.assertTrue(queued.cancelled())
+
+        finally:
+            blocker.set()
+
+        self.function.gate.set()
+
+        self.assertEqual(len(waitForOutput(self.channel)),110)
+        self.assertEqual(self.function.calls,1)
+
+
+    def test_worker_source(self):
+        """
+        A math channel of a worker's output has nothing until the output
+        is ready
+
+        """
+
+        function = ch.MathFunction()
+        function.function = lambda chan : (chan.x,chan.y + 1)
+
+        inline = ch.MathChannel([self.channel],function,'inline')
+        chained = ch.MathChannel([inline],function,'chained')
+
+        # Worker source and a plain source with data
+        diff = ch.MathFunction()
+        diff.function = lambda channel1,channel2 : (channel1.x,channel2.y - channel1.y)
+        mixed = ch.MathChannel([self.channel,self.source],diff,'mixed')
+
+        for channel in [inline,chained,mixed]:
+            self.assertIsNone(channel.data())
+            self.assertIsNone(channel.dataStats())
+            self.assertTrue(channel.isEmpty)
+
+        self.function.gate.set()
+        waitForOutput(self.channel)
+
+        self.assertTrue(np.allclose(chained.data()['volts'],2*self.source.y + 2))
+        self.assertTrue(np.allclose(mixed.data()['volts'],-self.source.y))
+        self.assertFalse(mixed.isEmpty)
+
+
+    def test_error(self):
+        """
+        A function that fails isn't run again until the sources change
+
+        """
+
+        def fails(chan):
+            self.function.calls += 1
+            raise ValueError("test error")
+
+        function = ch.MathFunction()
+        function.function = fails
+        function.execution = workers.EXECUTION_THREAD
+        self.function.calls = 0
+
+        channel = ch.MathChannel([self.source],function,'fails')
+        channel.data()
+        channel.pending.exception(10.0)
+        channel.data()
+
+        self.assertIsNone(channel.data())
+        self.assertEqual(self.function.calls,1)
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:31:07 2026
+
+@author: john
+
+Plot update scheduler Unit test script
+=======================================
+Non-graphical test of the PlotUpdateScheduler class
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import unittest
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+from PyQt4.QtCore import QCoreApplication
+
+
+# My libraries
+from ScopePy_graphs import PlotUpdateScheduler
+
+
+#==============================================================================
+#%% Constants
+#==============================================================================
+
+# Qt application needed for timers
+APP = QCoreApplication.instance() or QCoreApplication(sys.argv)
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+class FakeGraph():
+    """
+    Stands in for a GraphWidget, records the channels it is asked to redraw
+    """
+
+    def __init__(self):
+        self.redrawn = []
+
+    def redrawChannels(self,channel_names):
+        self.redrawn.append(set(channel_names))
+
+
+
+#==============================================================================
+#%% PlotUpdateScheduler test
+#==============================================================================
+
+class Test_PlotUpdateScheduler(unittest.TestCase):
+    """
+    Tests PlotUpdateScheduler class
+
+    """
+
+    def setUp(self):
+
+        self.scheduler = PlotUpdateScheduler(frame_rate=30)
+
+
+    def test_coalesce(self):
+        """
+        Many requests between frames give one redraw per graph
+
+        """
+
+        graph1 = FakeGraph()
+        graph2 = FakeGraph()
+
+        for n in range(100):
+            self.scheduler.requestUpdate(graph1,'ch1')
+            self.scheduler.requestUpdate(graph1,'ch2')
+            self.scheduler.requestUpdate(graph2,'ch3')
+
+        self.scheduler.flush()
+
+        self.assertEqual(graph1.redrawn,[{'ch1','ch2'}])
+        self.assertEqual(graph2.redrawn,[{'ch3'}])
+
+        counters = self.scheduler.counters()
+        self.assertEqual(counters['requested'],300)
+        self.assertEqual(counters['coalesced'],298)
+        self.assertEqual(counters['redraws'],2)
+        self.assertEqual(counters['frames'],1)
+
+
+    def test_deleted_graph(self):
+        """
+        Requests for graphs that have gone are dropped
+
+        """
+
+        graph = FakeGraph()
+        self.scheduler.requestUpdate(graph,'ch1')
+
+        del graph
+        self.scheduler.flush()
+
+        self.assertEqual(self.scheduler.dropped,1)
+        self.assertEqual(self.scheduler.redraws,0)
+
+
+    def test_nothing_pending(self):
+        """
+        Flush with no requests does nothing
+
+        """
+
+        self.scheduler.flush()
+
+        self.assertEqual(self.scheduler.frames,0)
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:52:06 2026
+
+@author: john
+
+Protocol version 2 Unit test script
+=======================================
+Non-graphical test of the version 2 frame encoding and decoding
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import unittest
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+import ScopePy_protocol as protocol
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+def makeADCData(npoints):
+    """
+    Float32 time and int16 samples, like an ADC produces
+
+    """
+
+    data = np.zeros(npoints,[('time','<f4'),('volts','<i2')])
+    data['time'] = np.arange(npoints)*1e-3
+    data['volts'] = (1000*np.sin(np.arange(npoints)/50.0)).astype('<i2')
+
+    return data
+
+
+
+#==============================================================================
+#%% Frame test
+#==============================================================================
+
+class Test_Frames(unittest.TestCase):
+    """
+    Tests encodeFrame and decodeFrame
+
+    """
+
+    def decode(self,packet):
+
+        packetType, = protocol.TYPE_HEADER.unpack_from(packet)
+        self.assertEqual(packetType,protocol.DATA_FRAME_V2)
+
+        return protocol.decodeFrame(memoryview(packet)[protocol.TYPE_HEADER.size:])
+
+
+    def test_round_trip(self):
+        """
+        Several channels with different column types
+
+        """
+
+        adc = makeADCData(1000)
+        scope = np.zeros(10,[('x','<f8'),('y','<f8')])
+        scope['x'] = np.arange(10)
+
+        channels = self.decode(protocol.encodeFrame([('ADC',adc),('Scope',scope)]))
+
+        self.assertEqual([label for label,array in channels],['ADC','Scope'])
+
+        label,array = channels[0]
+        self.assertEqual(array.dtype['volts'],np.dtype('<i2'))
+        self.assertTrue(np.all(array.time == adc['time']))
+        self.assertTrue(np.all(array.volts == adc['volts']))
+
+        self.assertTrue(np.all(channels[1][1]['x'] == scope['x']))
+
+
+    def test_smaller_than_float64(self):
+        """
+        int16/float32 data takes 6 bytes per row plus the headers
+
+        """
+
+        packet = protocol.encodeFrame([('ADC',makeADCData(1000))])
+
+        self.assertLess(len(packet),6*1000 + 100)
+
+
+    def test_view_of_frame(self):
+        """
+        Uncompressed data is not copied
+
+        """
+
+        packet = bytearray(protocol.encodeFrame([('ADC',makeADCData(100))]))
+        label,array = self.decode(packet)[0]
+
+        self.assertFalse(array.flags['OWNDATA'])
+
+
+    def test_compression(self):
+        """
+        Compressed frames decode to the same data, data that doesn't compress
+        is sent as it is
+
+        """
+
+        adc = makeADCData(10000)
+
+        packet = protocol.encodeFrame([('ADC',adc)],compress=True)
+        label,array = self.decode(packet)[0]
+
+        self.assertLess(len(packet),adc.nbytes)
+        self.assertTrue(np.all(array.volts == adc['volts']))
+
+        noise = np.zeros(1000,[('x','u1')])
+        noise['x'] = np.random.RandomState(1).randint(0,256,1000)
+
+        packet = protocol.encodeFrame([('Noise',noise)],compress=True)
+        magic,version,flags,nChannels,bodyLength = protocol.FRAME_HEADER.unpack_from(packet,protocol.TYPE_HEADER.size)
+
+        self.assertEqual(flags & protocol.FLAG_ZLIB,0)
+        self.assertTrue(np.all(self.decode(packet)[0][1]['x'] == noise['x']))
+
+
+    def test_compression_bomb(self):
+        """
+        Compressed bodies are not inflated past the length in the header
+
+        """
+
+        packet = bytearray(protocol.encodeFrame([('ADC',np.zeros(100000,[('x','<f8')]))],
+                                                compress=True))
+        frame = packet[protocol.TYPE_HEADER.size:]
+
+        magic,version,flags,nChannels,bodyLength = protocol.FRAME_HEADER.unpack_from(frame)
+        protocol.FRAME_HEADER.pack_into(frame,0,magic,version,flags,nChannels,1000)
+
+        self.assertRaises(protocol.FrameError,protocol.decodeFrame,frame)
+
+        protocol.FRAME_HEADER.pack_into(frame,0,magic,version,flags,nChannels,
+                                        protocol.MAX_BODY_SIZE + 1)
+
+        self.assertRaises(protocol.FrameError,protocol.decodeFrame,frame)
+
+        self.assertRaises(protocol.FrameError,protocol.decodeFrame,
+                          frame[:protocol.FRAME_HEADER.size] + b'rubbish')
+
+
+    def test_big_endian_input(self):
+        """
+        Columns are sent little endian whatever the input
+
+        """
+
+        data = np.zeros(5,[('x','>f8'),('y','>i4')])
+        data['y'] = [1,2,3,4,5]
+
+        label,array = self.decode(protocol.encodeFrame([('BE',data)]))[0]
+
+        self.assertEqual(array.dtype['y'],np.dtype('<i4'))
+        self.assertTrue(np.all(array.y == [1,2,3,4,5]))
+
+
+    def test_bad_frames(self):
+        """
+        Wrong magic number, version or truncated frames are rejected
+
+        """
+
+        packet = bytearray(protocol.encodeFrame([('ADC',makeADCData(100))]))
+        frame = packet[protocol.TYPE_HEADER.size:]
+
+        wrong_magic = bytearray(frame)
+        wrong_magic[0] ^= 0xFF
+        self.assertRaises(protocol.FrameError,protocol.decodeFrame,wrong_magic)
+
+        wrong_version = bytearray(frame)
+        wrong_version[4] = 1
+        self.assertRaises(protocol.FrameError,protocol.decodeFrame,wrong_version)
+
+        self.assertRaises(protocol.FrameError,protocol.decodeFrame,frame[:-10])
+
+
+    def test_unsupported_column(self):
+        """
+        Only numeric columns can be sent
+
+        """
+
+        data = np.zeros(5,[('x','<f8'),('name','S10')])
+
+        self.assertRaises(TypeError,protocol.encodeFrame,[('Text',data)])
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:48:26 2026
+
+@author: john
+
+Shared memory ring Unit test script
+=======================================
+Non-graphical test of the shared memory producer and consumer
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import subprocess
+import unittest
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+import ScopePy_shared_memory as sharedmem
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+def makeData(start,npoints):
+    """
+    int16 data with x counting from start
+
+    """
+
+    data = np.zeros(npoints,[('x','<f8'),('y','<i2')])
+    data['x'] = np.arange(start,start+npoints)
+    data['y'] = start
+
+    return data
+
+
+#==============================================================================
+#%% Ring test
+#==============================================================================
+
+class Test_Ring(unittest.TestCase):
+    """
+    Tests RingProducer and RingConsumer
+
+    """
+
+    def setUp(self):
+
+        self.producer = sharedmem.RingProducer('unittest_%d' % os.getpid(),capacity=4096)
+        self.consumer = sharedmem.RingConsumer(self.producer.name)
+
+
+    def tearDown(self):
+
+        self.consumer.close()
+        self.producer.close()
+
+
+    def readAll(self):
+
+        channels = [(label,data.copy()) for label,data in self.consumer.read()]
+        self.consumer.release()
+
+        return channels
+
+
+    def test_round_trip(self):
+        """
+        Several records with several channels
+
+        """
+
+        self.producer.write([('A',makeData(0,10)),('B',makeData(100,3))])
+        self.producer.write([('A',makeData(10,10))])
+
+        channels = self.readAll()
+
+        self.assertEqual([label for label,data in channels],['A','B','A'])
+        self.assertTrue(np.all(channels[2][1].x == np.arange(10,20)))
+        self.assertEqual(channels[1][1].dtype['y'],np.dtype('<i2'))
+
+
+    def test_views(self):
+        """
+        The data is read without copying
+
+        """
+
+        self.producer.write([('A',makeData(0,10))])
+
+        label,data = self.consumer.read()[0]
+
+        self.assertFalse(data.flags['OWNDATA'])
+
+        del data
+        self.consumer.release()
+
+
+    def test_wrap_around(self):
+        """
+        Records keep their order when the ring wraps many times
+
+        """
+
+        expected = 0
+
+        for n in range(500):
+            self.assertTrue(self.producer.write([('A',makeData(n*7,7+n%5))]))
+
+            if n % 4 == 3:
+                for label,data in self.readAll():
+                    self.assertEqual(data.x[0],expected*7)
+                    expected += 1
+
+        for label,data in self.readAll():
+            expected += 1
+
+        self.assertEqual(expected,500)
+        self.assertEqual(self.producer.overflows,0)
+
+
+    def test_overflow(self):
+        """
+        A full ring drops data and counts it instead of waiting
+
+        """
+
+        results = [self.producer.write([('A',makeData(n,100))]) for n in range(20)]
+
+        self.assertFalse(all(results))
+        self.assertEqual(self.consumer.overflows,results.count(False))
+
+        # Records that were written are all there and space comes back
+        self.assertEqual(len(self.readAll()),results.count(True))
+        self.assertTrue(self.producer.write([('A',makeData(0,100))]))
+
+
+    def test_closed(self):
+        """
+        The consumer can see the producer has closed and find the ring
+
+        """
+
+        self.assertIn(self.producer.name,sharedmem.findRings())
+        self.assertFalse(self.consumer.isClosed)
+
+        self.producer.header[sharedmem.HDR_CLOSED] = 1
+        self.assertTrue(self.consumer.isClosed)
+
+
+    def test_producer_gone(self):
+        """
+        The consumer can remove a ring whose producer has died
+
+        """
+
+        self.assertTrue(self.consumer.producerAlive)
+
+        # Id of a process that has finished
+        child = subprocess.Popen([sys.executable,'-c','pass'])
+        child.wait()
+        self.producer.header[sharedmem.HDR_PID] = child.pid
+
+        self.assertFalse(self.consumer.producerAlive)
+
+        self.consumer.unlink()
+
+        self.assertNotIn(self.producer.name,sharedmem.findRings())
+
+
+    def test_not_a_ring(self):
+        """
+        Shared memory that isn't a ring is rejected, unless it is still
+        being set up
+
+        """
+
+        other = sharedmem.createSharedMemory('ScopePy_other_%d' % os.getpid(),1024)
+
+        try:
+            self.assertRaises(sharedmem.RingNotReady,sharedmem.RingConsumer,other.name)
+
+            other.buf[:8] = b'not ring'
+            self.assertRaises(ValueError,sharedmem.RingConsumer,other.name)
+        finally:
+            other.close()
+            sharedmem.unlinkSharedMemory(other)
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 26 11:40:07 2026
+
+@author: john
+
+Streaming math functions Unit test script
+=======================================
+Non-graphical test of the streaming math functions, chunk by chunk and
+in MathChannels
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import unittest
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+sys.path.append(os.path.join(BASEPATH,'math_functions'))
+
+
+# Third party libraries
+import numpy as np
+from scipy.signal import lfilter, sosfilt
+
+
+# My libraries
+import ScopePy_channel as ch
+import streaming_functions as sf
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+def processInChunks(function,x,y,sizes):
+    """
+    Run a streaming function over x and y split into chunks of the given
+    sizes
+
+    """
+
+    state = function.initialState()
+    x_out = []
+    y_out = []
+    start = 0
+
+    for size in sizes:
+        xc,yc,state = function.processChunk(x[start:start+size],y[start:start+size],state)
+        x_out.append(xc)
+        y_out.append(yc)
+        start += size
+
+    return np.concatenate(x_out),np.concatenate(y_out)
+
+
+def makeSignal(npoints,seed=0):
+
+    x = np.arange(npoints,dtype=float)
+    y = np.sin(x/20.0) + np.random.RandomState(seed).randn(npoints)
+
+    return x,y
+
+
+
+#==============================================================================
+#%% Streaming function test
+#==============================================================================
+
+class Test_StreamingFunctions(unittest.TestCase):
+    """
+    Processing in chunks gives the same answer as all at once
+
+    """
+
+    # Chunk sizes including empty and single point chunks
+    SIZES = [7,1,0,50,3,120,19]
+
+    def setUp(self):
+
+        self.x,self.y = makeSignal(sum(self.SIZES))
+
+
+    def checkChunked(self,function):
+        """
+        Chunked output is the same as the output for all the data
+
+        """
+
+        x_all,y_all,state = function.processChunk(self.x,self.y,function.initialState())
+        x_chunked,y_chunked = processInChunks(function,self.x,self.y,self.SIZES)
+
+        self.assertTrue(np.array_equal(x_all,x_chunked))
+        self.assertTrue(np.allclose(y_all,y_chunked))
+
+        return x_all,y_all
+
+
+    def test_running_mean(self):
+
+        x,y = self.checkChunked(sf.RunningMean(window=5))
+
+        self.assertAlmostEqual(y[0],self.y[0])
+        self.assertAlmostEqual(y[1],self.y[:2].mean())
+        self.assertTrue(np.allclose(y[4:],np.convolve(self.y,np.ones(5)/5,'valid')))
+
+
+    def test_moving_rms(self):
+
+        x,y = self.checkChunked(sf.MovingRMS(window=8))
+
+        self.assertAlmostEqual(y[-1],np.sqrt(np.mean(self.y[-8:]**2)))
+
+
+    def test_fir(self):
+
+        function = sf.FIRFilter(taps=15,cutoff=0.2)
+        x,y = self.checkChunked(function)
+
+        b = function.coefficients()
+        expected = lfilter(b,1.0,self.y - self.y[0]) + self.y[0]
+
+        self.assertTrue(np.allclose(y,expected))
+
+
+    def test_fir_coefficients(self):
+
+        x,y = self.checkChunked(sf.FIRFilter(coefficients=[0.5,0.5]))
+
+        self.assertTrue(np.allclose(y[1:],(self.y[1:] + self.y[:-1])/2))
+
+
+    def test_iir(self):
+
+        function = sf.IIRFilter(order=4,cutoff=0.1)
+        x,y = self.checkChunked(function)
+
+        expected = sosfilt(function.coefficients(),self.y - self.y[0]) + self.y[0]
+
+        self.assertTrue(np.allclose(y,expected))
+
+
+    def test_iir_coefficients(self):
+
+        x,y = self.checkChunked(sf.IIRFilter(b=[0.1],a=[1.0,-0.9]))
+
+        self.assertTrue(np.allclose(y,lfilter([0.1],[1.0,-0.9],self.y,zi=[0.9*self.y[0]])[0]))
+
+
+    def test_decimate(self):
+
+        x,y = self.checkChunked(sf.Decimate(factor=10))
+
+        self.assertTrue(np.array_equal(x,self.x[::10]))
+
+
+    def test_parameters(self):
+        """
+        The filter is designed again when the parameters change
+
+        """
+
+        function = sf.FIRFilter(taps=15)
+        first = function.coefficients()
+
+        self.assertIs(function.coefficients(),first)
+
+        function.parameters['Taps'] = 21
+
+        self.assertEqual(len(function.coefficients()),21)
+
+
+
+#==============================================================================
+#%% MathChannel test
+#==============================================================================
+
+class Test_StreamingMathChannel(unittest.TestCase):
+    """
+    Tests streaming functions in MathChannels
+
+    """
+
+    def setUp(self):
+
+        self.x,self.y = makeSignal(200)
+
+        self.source = ch.ScopePyChannel('A')
+        self.function = sf.RunningMean(window=10)
+
+
+    def addChunks(self,sizes):
+
+        start = self.source.xMaxValue + 1 if self.source.xMaxValue is not None else 0
+
+        for size in sizes:
+            chunk = np.zeros(size,[('t',float),('volts',float)])
+            chunk['t'] = self.x[int(start):int(start)+size]
+            chunk['volts'] = self.y[int(start):int(start)+size]
+            self.source.addData2Channel(chunk,update_signal=False)
+            start += size
+
+
+    def test_state_carried(self):
+
+        self.addChunks([30,30])
+        channel = ch.MathChannel([self.source],self.function,'mean')
+
+        self.addChunks([40,100])
+
+        x,expected = processInChunks(self.function,self.x,self.y,[200])
+        data = channel.data(chunkMode=ch.CHUNK_MODE_ALL)
+
+        self.assertEqual(channel.chunks,4)
+        self.assertTrue(np.allclose(data['volts'],expected))
+
+
+    def test_shared_function(self):
+        """
+        Two channels using the same function keep their own state
+
+        """
+
+        self.addChunks([50,50])
+
+        first = ch.MathChannel([self.source],self.function,'first')
+        first.data()
+
+        other = ch.ScopePyChannel('B')
+        chunk = np.zeros(10,[('t',float),('volts',float)])
+        chunk['volts'] = 100.0
+        other.addData2Channel(chunk,update_signal=False)
+
+        second = ch.MathChannel([other],self.function,'second')
+
+        self.addChunks([100])
+
+        x,expected = processInChunks(self.function,self.x,self.y,[200])
+
+        self.assertTrue(np.allclose(first.data(chunkMode=ch.CHUNK_MODE_ALL)['volts'],expected))
+        self.assertTrue(np.all(second.data()['volts'] == 100.0))
+
+
+    def test_parameter_change(self):
+
+        self.addChunks([100,100])
+        channel = ch.MathChannel([self.source],self.function,'mean')
+        channel.data()
+
+        self.function.parameters['Window'] = 3
+
+        x,expected = processInChunks(self.function,self.x,self.y,[200])
+
+        self.assertTrue(np.allclose(channel.data(chunkMode=ch.CHUNK_MODE_ALL)['volts'],expected))
+
+
+    def test_decimate_channel(self):
+        """
+        Chunks that decimate to nothing are kept so chunk numbers line up
+
+        """
+
+        self.addChunks([25,3,172])
+        channel = ch.MathChannel([self.source],sf.Decimate(factor=10),'decimated')
+
+        self.assertEqual(channel.chunks,3)
+        self.assertTrue(np.array_equal(channel.data(chunkMode=ch.CHUNK_MODE_ALL)['t'],self.x[::10]))
+        self.assertEqual(len(channel.data(chunkMode=ch.CHUNK_MODE_SELECTION,chunkList=[1])),0)
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()
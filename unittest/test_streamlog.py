@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 22 10:21:09 2026
+
+@author: john
+
+Stream log Unit test script
+=======================================
+Non-graphical test of recording and replaying packets
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import time
+import tempfile
+import shutil
+import unittest
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+import ScopePy_streamlog as streamlog
+import ScopePy_ingest as ingest
+import ScopePy_protocol as protocol
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+def makeFrame(label,start,npoints):
+
+    data = np.zeros(npoints,[('x','<f8'),('y','<i2')])
+    data['x'] = np.arange(start,start+npoints)
+
+    return protocol.encodeFrame([(label,data)])
+
+
+def decoder(packet):
+
+    return protocol.decodeFrame(memoryview(packet)[protocol.TYPE_HEADER.size:]),None
+
+
+
+#==============================================================================
+#%% Stream log test
+#==============================================================================
+
+class Test_StreamLog(unittest.TestCase):
+    """
+    Tests StreamLogWriter, StreamLogReader and replay
+
+    """
+
+    def setUp(self):
+
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder,'test' + streamlog.LOG_EXTENSION)
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.folder)
+
+
+    def writeLog(self,packets):
+        """
+        Write (timestamp [s],connection,packet) records
+
+        """
+
+        writer = streamlog.StreamLogWriter(self.filename)
+
+        for timestamp,connection,packet in packets:
+            writer.write(packet,connection,int(timestamp*1e9))
+
+        writer.close()
+
+
+    def test_round_trip(self):
+
+        packets = [(0.0,1,b'first'),(0.5,2,b''),(1.25,1,makeFrame('A',0,10))]
+
+        self.writeLog(packets)
+
+        records = list(streamlog.StreamLogReader(self.filename))
+
+        self.assertEqual([(t,c,bytes(p)) for t,c,p in records],packets)
+
+
+    def test_timestamps(self):
+        """
+        Timestamps count up from when the log was started
+
+        """
+
+        writer = streamlog.StreamLogWriter(self.filename)
+        writer.write(b'a')
+        time.sleep(0.05)
+        writer.write(b'b')
+        writer.close()
+
+        times = [t for t,c,p in streamlog.StreamLogReader(self.filename)]
+
+        self.assertGreaterEqual(times[1] - times[0],0.04)
+
+
+    def test_incomplete_record(self):
+        """
+        A record cut short at the end is ignored
+
+        """
+
+        self.writeLog([(0.0,1,b'complete'),(0.1,1,b'cut short')])
+
+        with open(self.filename,'r+b') as logFile:
+            logFile.truncate(os.path.getsize(self.filename) - 3)
+
+        records = list(streamlog.StreamLogReader(self.filename))
+
+        self.assertEqual([bytes(p) for t,c,p in records],[b'complete'])
+
+
+    def test_not_a_log(self):
+
+        with open(self.filename,'wb') as logFile:
+            logFile.write(b'\x00'*100)
+
+        self.assertRaises(ValueError,streamlog.StreamLogReader,self.filename)
+
+
+    def test_replay_speed(self):
+        """
+        Replay keeps the original timing, scaled by the speed
+
+        """
+
+        self.writeLog([(n*0.1,1,b'x') for n in range(5)])
+
+        handled = []
+        stats = streamlog.replay(self.filename,lambda c,p: handled.append(time.perf_counter()),speed=2.0)
+
+        self.assertEqual(stats['packets'],5)
+        self.assertAlmostEqual(handled[-1] - handled[0],0.2,delta=0.05)
+
+        stats = streamlog.replay(self.filename,lambda c,p: None,speed=None)
+
+        self.assertLess(stats['elapsed'],0.1)
+
+
+    def test_replay_idle_start(self):
+        """
+        Replay starts at the first packet, not at the start of the log
+
+        """
+
+        self.writeLog([(5.0,1,b'x'),(5.1,1,b'y')])
+
+        stats = streamlog.replay(self.filename,lambda c,p: None,speed=1.0)
+
+        self.assertEqual(stats['packets'],2)
+        self.assertLess(stats['elapsed'],1.0)
+
+
+    def test_replay_tcp(self):
+        """
+        Replay to a server, one connection for each logged connection
+
+        """
+
+        self.writeLog([(0.0,1,makeFrame('A',0,10)),(0.0,2,makeFrame('B',0,5)),
+                       (0.0,1,makeFrame('A',10,10))])
+
+        server = ingest.IngestServer(decoder)
+        self.assertTrue(server.start('127.0.0.1',0))
+
+        replayer = streamlog.TcpReplayer('127.0.0.1',server.port)
+
+        try:
+            streamlog.replay(self.filename,replayer,speed=None)
+
+            received = []
+            start = time.time()
+
+            while len(received) < 3 and time.time() - start < 5.0:
+                received.extend(server.drain())
+                time.sleep(0.001)
+
+        finally:
+            replayer.close()
+            server.stop()
+
+        self.assertEqual(server.connectionCount,2)
+        self.assertEqual([data.x[0] for label,data in received if label == 'A'],[0,10])
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()
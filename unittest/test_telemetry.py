@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 24 12:05:33 2026
+
+@author: john
+
+Ingest telemetry Unit test script
+=======================================
+Non-graphical test of the server counters
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import time
+import socket
+import unittest
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+import ScopePy_telemetry as telemetry
+import ScopePy_ingest as ingest
+import ScopePy_protocol as protocol
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+def makeData(npoints):
+
+    return np.zeros(npoints,[('x','<f8'),('y','<i2')])
+
+
+def decoder(packet):
+
+    return protocol.decodeFrame(memoryview(packet)[protocol.TYPE_HEADER.size:]),None
+
+
+
+#==============================================================================
+#%% IngestTelemetry test
+#==============================================================================
+
+class Test_IngestTelemetry(unittest.TestCase):
+    """
+    Tests IngestTelemetry class
+
+    """
+
+    def setUp(self):
+
+        self.telemetry = telemetry.IngestTelemetry()
+        self.start = self.telemetry.startTime
+
+
+    def test_counters(self):
+
+        self.telemetry.connectionOpened()
+        self.telemetry.connectionOpened()
+        self.telemetry.connectionClosed()
+        self.telemetry.packetReceived(100,0.002,[('A',makeData(10)),('B',makeData(5))])
+        self.telemetry.packetReceived(50,0.001,[('A',makeData(20))])
+        self.telemetry.decodeError(30)
+        self.telemetry.lockWaited(0.01)
+        self.telemetry.lockWaited(0.03)
+        self.telemetry.setQueueDepth(7)
+        self.telemetry.setQueueDepth(2)
+
+        summary = self.telemetry.summary()
+
+        self.assertEqual((summary['connections'],summary['connectionCount']),(1,2))
+        self.assertEqual((summary['packets'],summary['bytes'],summary['decodeErrors']),(3,180,1))
+        self.assertAlmostEqual(summary['decodeTime'],0.003)
+        self.assertAlmostEqual(summary['lockWaitTime'],0.04)
+        self.assertAlmostEqual(summary['maxLockWait'],0.03)
+        self.assertEqual((summary['queueDepth'],summary['maxQueueDepth']),(2,7))
+
+        self.assertEqual([c['channel'] for c in summary['channels']],['A','B'])
+        self.assertEqual(summary['channels'][0]['rows'],30)
+        self.assertEqual(summary['channels'][0]['chunks'],2)
+        self.assertEqual(summary['channels'][1]['bytes'],50)
+
+
+    def test_rates(self):
+        """
+        Rates cover the last interval completed by advance(), reading them
+        doesn't change them
+
+        """
+
+        self.telemetry.packetReceived(1000,0.5,[('A',makeData(100))])
+
+        self.assertEqual(self.telemetry.summary()['packetRate'],0)
+
+        self.telemetry.advance(self.start + 0.5)
+        self.assertEqual(self.telemetry.summary()['packetRate'],0)
+
+        self.telemetry.advance(self.start + 2.0)
+
+        for index in range(2):
+            summary = self.telemetry.summary(self.start + 10.0)
+
+            self.assertAlmostEqual(summary['packetRate'],0.5)
+            self.assertAlmostEqual(summary['byteRate'],500)
+            self.assertAlmostEqual(summary['decodeLoad'],0.25)
+            self.assertAlmostEqual(summary['channels'][0]['rowRate'],50)
+
+        # Nothing new in the next interval
+        self.telemetry.advance(self.start + 4.0)
+        summary = self.telemetry.summary()
+
+        self.assertEqual(summary['packetRate'],0)
+        self.assertEqual(summary['channels'][0]['rowRate'],0)
+        self.assertEqual(summary['packets'],1)
+
+
+    def test_combine(self):
+
+        other = telemetry.IngestTelemetry()
+
+        self.telemetry.packetReceived(100,0.002,[('A',makeData(10))])
+        self.telemetry.lockWaited(0.01)
+        other.connectionOpened()
+        other.packetReceived(50,0.001,[('A',makeData(20)),('B',makeData(5))])
+        other.lockWaited(0.03)
+
+        summary = telemetry.combineSummaries([self.telemetry.summary(),other.summary()])
+
+        self.assertEqual((summary['connections'],summary['packets'],summary['bytes']),(1,2,150))
+        self.assertAlmostEqual(summary['lockWaitTime'],0.04)
+        self.assertAlmostEqual(summary['maxLockWait'],0.03)
+        self.assertEqual([c['channel'] for c in summary['channels']],['A','B'])
+        self.assertEqual(summary['channels'][0]['rows'],30)
+        self.assertIsNone(telemetry.combineSummaries([]))
+
+
+    def test_reset(self):
+
+        self.telemetry.packetReceived(100,0.002,[('A',makeData(10))])
+        self.telemetry.reset()
+
+        summary = self.telemetry.summary()
+
+        self.assertEqual(summary['packets'],0)
+        self.assertEqual(summary['channels'],[])
+
+
+
+#==============================================================================
+#%% Server test
+#==============================================================================
+
+class Test_IngestServerTelemetry(unittest.TestCase):
+    """
+    Tests the counters of the asyncio server
+
+    """
+
+    def test_server(self):
+
+        server = ingest.IngestServer(decoder)
+        self.assertTrue(server.start('127.0.0.1',0))
+
+        try:
+            packet = protocol.encodeFrame([('A',makeData(10)),('B',makeData(5))])
+
+            with socket.create_connection(('127.0.0.1',server.port)) as conn:
+                conn.sendall(ingest.LENGTH_HEADER.pack(len(packet)+ingest.LENGTH_HEADER.size) + packet)
+
+                start = time.time()
+
+                while server.telemetry.summary()['queueDepth'] < 2 and time.time() - start < 5.0:
+                    time.sleep(0.001)
+
+                summary = server.telemetry.summary()
+
+                self.assertEqual(summary['connections'],1)
+                self.assertEqual(summary['packets'],1)
+                self.assertEqual(summary['bytes'],len(packet) + ingest.LENGTH_HEADER.size)
+                self.assertGreater(summary['decodeTime'],0)
+                self.assertEqual(summary['queueDepth'],2)
+
+                server.drain()
+
+                self.assertEqual(server.telemetry.summary()['queueDepth'],0)
+
+            start = time.time()
+
+            while server.telemetry.summary()['connections'] and time.time() - start < 5.0:
+                time.sleep(0.001)
+
+            self.assertEqual(server.telemetry.summary()['connections'],0)
+
+        finally:
+            server.stop()
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 11:40:05 2026
+
+@author: john
+
+UDP ingestion Unit test script
+=======================================
+Non-graphical test of the datagram format, reassembly and receiver
+
+"""
+
+
+#==============================================================================
+#%% Imports
+#==============================================================================
+
+# Standard library
+import os,sys
+import time
+import unittest
+
+# Add main ScopePy folder to paths
+CURRENTPATH, dummy = os.path.split(os.path.abspath(__file__))
+BASEPATH = os.path.dirname(CURRENTPATH)
+sys.path.append(BASEPATH)
+
+
+# Third party libraries
+import numpy as np
+
+
+# My libraries
+import ScopePy_udp as udp
+import ScopePy_protocol as protocol
+
+
+#==============================================================================
+#%% Constants
+#==============================================================================
+
+# Time to wait for data to arrive [s]
+TIMEOUT = 5.0
+
+
+#==============================================================================
+#%% Functions
+#==============================================================================
+
+def makeData(start,npoints):
+
+    data = np.zeros(npoints,[('x','<f8'),('y','<i2')])
+    data['x'] = np.arange(start,start+npoints)
+
+    return data
+
+
+def pushAll(stream,sequences):
+    """
+    Push datagrams with the given sequence numbers, return the sequence
+    numbers that come out
+
+    """
+
+    ready = []
+
+    for sequence in sequences:
+        ready.extend(stream.push(sequence,sequence))
+
+    return ready
+
+
+
+#==============================================================================
+#%% Datagram test
+#==============================================================================
+
+class Test_Datagram(unittest.TestCase):
+    """
+    Tests encodeDatagram and decodeDatagram
+
+    """
+
+    def test_round_trip(self):
+
+        datagram = udp.encodeDatagram('ADC 1',makeData(5,10),1234)
+
+        channelLabel,sequence,data = udp.decodeDatagram(datagram)
+
+        self.assertEqual(channelLabel,'ADC 1')
+        self.assertEqual(sequence,1234)
+        self.assertTrue(np.all(data.x == np.arange(5,15)))
+        self.assertEqual(data.dtype['y'],np.dtype('<i2'))
+
+
+    def test_bad_datagram(self):
+
+        datagram = bytearray(udp.encodeDatagram('ADC 1',makeData(0,10),0))
+
+        self.assertRaises(protocol.FrameError,udp.decodeDatagram,datagram[:10])
+        self.assertRaises(protocol.FrameError,udp.decodeDatagram,b'\x00'*len(datagram))
+
+
+    def test_datagram_size(self):
+        """
+        Rows per datagram fills but doesn't exceed the size
+
+        """
+
+        rows = udp.rowsPerDatagram('ADC 1',makeData(0,1).dtype,udp.DEFAULT_DATAGRAM_SIZE)
+
+        self.assertLessEqual(len(udp.encodeDatagram('ADC 1',makeData(0,rows),0)),udp.DEFAULT_DATAGRAM_SIZE)
+        self.assertGreater(len(udp.encodeDatagram('ADC 1',makeData(0,rows+1),0)),udp.DEFAULT_DATAGRAM_SIZE)
+
+
+
+#==============================================================================
+#%% Reassembler test
+#==============================================================================
+
+class Test_StreamReassembler(unittest.TestCase):
+    """
+    Tests StreamReassembler class
+
+    """
+
+    def setUp(self):
+
+        self.stream = udp.StreamReassembler(window=4)
+
+
+    def test_in_order(self):
+
+        self.assertEqual(pushAll(self.stream,range(10,20)),list(range(10,20)))
+        self.assertEqual(self.stream.lost,0)
+
+
+    def test_reorder(self):
+        """
+        Swapped datagrams within the window are put back in order
+
+        """
+
+        self.assertEqual(pushAll(self.stream,[0,2,1,5,4,3,6]),list(range(7)))
+        self.assertEqual(self.stream.lost,0)
+
+
+    def test_gap(self):
+        """
+        Missing datagrams are skipped when the window is full
+
+        """
+
+        ready = pushAll(self.stream,[0,1,3,4,5])
+
+        self.assertEqual(ready,[0,1])
+
+        ready = pushAll(self.stream,[6])
+
+        self.assertEqual(ready,[3,4,5,6])
+        self.assertEqual(self.stream.lost,1)
+
+
+    def test_duplicates_and_late(self):
+
+        pushAll(self.stream,[0,1,3,4,5,6,7])
+
+        # 1 was passed on, 2 was skipped
+        self.assertEqual(pushAll(self.stream,[1,2,7]),[])
+        self.assertEqual(self.stream.duplicates,2)
+        self.assertEqual(self.stream.late,1)
+
+
+    def test_flush(self):
+
+        pushAll(self.stream,[0,2,3])
+
+        self.assertEqual(self.stream.flush(),[2,3])
+        self.assertEqual(self.stream.lost,1)
+        self.assertEqual(pushAll(self.stream,[4]),[4])
+
+
+    def test_restart(self):
+        """
+        Sequence numbers starting again is a restart, not a duplicate
+
+        """
+
+        pushAll(self.stream,range(10000,10010))
+
+        self.assertEqual(pushAll(self.stream,[0,1]),[0,1])
+        self.assertEqual(self.stream.restarts,1)
+        self.assertEqual(self.stream.duplicates,0)
+
+
+
+#==============================================================================
+#%% Receiver test
+#==============================================================================
+
+class Test_UdpReceiver(unittest.TestCase):
+    """
+    Tests UdpReceiver with UdpSender over the local network
+
+    """
+
+    def setUp(self):
+
+        self.receiver = udp.UdpReceiver(timeout=0.05)
+        self.assertTrue(self.receiver.start('127.0.0.1',0))
+
+        self.sender = udp.UdpSender('127.0.0.1',self.receiver.port,datagramSize=512)
+
+
+    def tearDown(self):
+
+        self.sender.close()
+        self.receiver.stop()
+
+
+    def waitFor(self,npoints):
+
+        received = []
+        start = time.time()
+
+        while sum([len(data) for label,data in received]) < npoints and time.time() - start < TIMEOUT:
+            received.extend(self.receiver.drain())
+            time.sleep(0.001)
+
+        return received
+
+
+    def test_send_receive(self):
+        """
+        Data split into several datagrams arrives in order
+
+        """
+
+        ndatagrams = self.sender.sendData('ADC 1',makeData(0,1000))
+
+        self.assertGreater(ndatagrams,1)
+
+        received = self.waitFor(1000)
+        x = np.concatenate([data.x for label,data in received])
+
+        self.assertTrue(np.all(x == np.arange(1000)))
+
+        stats = self.receiver.stats()
+
+        self.assertEqual(len(stats),1)
+        self.assertEqual(stats[0]['datagrams'],ndatagrams)
+        self.assertEqual(stats[0]['channels'],1)
+
+        summary = self.receiver.telemetry.summary()
+
+        self.assertEqual((summary['connections'],summary['packets']),(1,ndatagrams))
+        self.assertEqual(summary['channels'][0]['rows'],1000)
+
+
+    def test_loss(self):
+        """
+        A datagram that never arrives is counted as lost, the rest are
+        passed on after the timeout
+
+        """
+
+        rows = udp.rowsPerDatagram('ADC 1',makeData(0,1).dtype,512)
+
+        for sequence in [0,2,3]:
+            datagram = udp.encodeDatagram('ADC 1',makeData(sequence*rows,rows),sequence)
+            self.sender.sock.sendto(datagram,self.sender.address)
+
+        received = self.waitFor(3*rows)
+
+        self.assertEqual([data.x[0] for label,data in received],[0,2*rows,3*rows])
+        self.assertEqual(self.receiver.stats()[0]['lost'],1)
+
+
+    def test_bad_datagram(self):
+
+        self.sender.sock.sendto(b'rubbish',self.sender.address)
+        self.sender.sendData('ADC 1',makeData(0,1))
+
+        self.waitFor(1)
+
+        self.assertEqual(self.receiver.stats()[0]['errors'],1)
+        self.assertEqual(self.receiver.telemetry.summary()['decodeErrors'],1)
+
+
+
+#==============================================================================
+#%% Runner
+#==============================================================================
+
+if __name__ == "__main__":
+    unittest.main()